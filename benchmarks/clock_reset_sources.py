@@ -0,0 +1,132 @@
+'''Counts the simulation events per clock cycle caused by clock_source and
+init_reset_source, compared with their previous implementations.
+
+The previous clock source drove a shadow ``clock_state`` signal alongside the
+clock and created a new delay on every edge. The previous reset source (still
+what is converted) is woken on every edge forever. The events counted are the
+signal updates and the generator wake ups in the MyHDL simulator. The run
+time of each is also shown (the best of ``--repeats`` runs).
+
+Run with:
+
+    python benchmarks/clock_reset_sources.py [--cycles N]
+'''
+
+from myhdl import block, instance, delay, Signal, ResetSignal
+from myhdl._Signal import _Signal
+from myhdl import _Waiter
+
+from veriutils import clock_source, init_reset_source
+
+import argparse
+import time
+
+@block
+def legacy_clock_source(clock, period):
+
+    even_period = period//2
+    odd_period = period - even_period
+
+    clock_state = Signal(clock.val)
+
+    @instance
+    def clockgen():
+
+        while True:
+            yield(delay(even_period))
+            clock.next = not clock_state
+            clock_state.next = not clock_state
+            yield(delay(odd_period))
+            clock.next = not clock_state
+            clock_state.next = not clock_state
+
+    return clockgen
+
+@block
+def sources(clock, reset, period, legacy):
+
+    if legacy:
+        clockgen = legacy_clock_source(clock, period)
+        reset_source = init_reset_source(reset, clock)
+    else:
+        clockgen = clock_source(clock, period)
+        reset_source = init_reset_source(
+            reset, clock, stop_after_reset=True)
+
+    return clockgen, reset_source
+
+class EventCounter(object):
+    '''Counts the calls to the signal update method and the waiter next
+    methods while it is in use.
+    '''
+
+    waiter_classes = (
+        _Waiter._Waiter, _Waiter._DelayWaiter, _Waiter._EdgeWaiter)
+
+    def __enter__(self):
+        self.updates = 0
+        self.wake_ups = 0
+        self._originals = []
+
+        def counted(method, counter_name):
+            def wrapper(*args, **kwargs):
+                setattr(self, counter_name, getattr(self, counter_name) + 1)
+                return method(*args, **kwargs)
+
+            return wrapper
+
+        self._originals.append((_Signal, '_update', _Signal._update))
+        _Signal._update = counted(_Signal._update, 'updates')
+
+        for cls in self.waiter_classes:
+            self._originals.append((cls, 'next', cls.__dict__['next']))
+            cls.next = counted(cls.__dict__['next'], 'wake_ups')
+
+        return self
+
+    def __exit__(self, *exc_info):
+        for cls, name, original in self._originals:
+            setattr(cls, name, original)
+
+def run(cycles, period, legacy, count_events):
+    clock = Signal(bool(1))
+    reset = ResetSignal(bool(0), active=1, isasync=False)
+
+    top = sources(clock, reset, period, legacy)
+
+    if count_events:
+        with EventCounter() as counter:
+            top.run_sim(duration=cycles*period, quiet=1)
+        top.quit_sim()
+        return counter.updates, counter.wake_ups
+
+    start = time.perf_counter()
+    top.run_sim(duration=cycles*period, quiet=1)
+    run_time = time.perf_counter() - start
+    top.quit_sim()
+
+    return run_time
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--cycles', type=int, default=20000)
+    parser.add_argument('--period', type=int, default=10)
+    parser.add_argument('--repeats', type=int, default=3)
+    options = parser.parse_args()
+
+    print('{:>10} {:>16} {:>16} {:>10}'.format(
+        '', 'updates/cycle', 'wake ups/cycle', 'time (s)'))
+
+    for name, legacy in (('previous', True), ('current', False)):
+        updates, wake_ups = run(
+            options.cycles, options.period, legacy, True)
+        run_time = min(
+            run(options.cycles, options.period, legacy, False)
+            for n in range(options.repeats))
+
+        print('{:>10} {:>16.2f} {:>16.2f} {:>10.3f}'.format(
+            name, updates/options.cycles, wake_ups/options.cycles,
+            run_time))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+'''Compares the run time of SynchronousTest.cosimulate with the event driven
+and the cycle based engines.
+
+The time to elaborate the design is the same for both engines, so it is
+measured with a single cycle run and subtracted. Each time is the best of
+``--repeats`` runs.
+
+Run with:
+
+    python benchmarks/cycle_simulation.py [--cycles N] [--stages N ...]
+'''
+
+from myhdl import block, always_seq, always_comb, Signal, ResetSignal, intbv
+
+from veriutils import SynchronousTest
+
+import argparse
+import random
+import time
+
+@block
+def adder_pipeline(data_in, data_out, reset, clock, n_stages):
+    '''A pipeline in which each stage adds its index to the previous stage
+    through a combinatorial adder.
+    '''
+
+    registers = [Signal(intbv(0)[16:]) for n in range(n_stages)]
+    sums = [Signal(intbv(0)[16:]) for n in range(n_stages)]
+
+    @block
+    def stage(stage_in, stage_sum, stage_out, increment):
+
+        @always_comb
+        def adder():
+            stage_sum.next = (stage_in + increment) % 2**16
+
+        @always_seq(clock.posedge, reset=reset)
+        def register():
+            stage_out.next = stage_sum
+
+        return adder, register
+
+    stages = [stage(data_in, sums[0], registers[0], 0)]
+    for n in range(1, n_stages):
+        stages.append(stage(registers[n-1], sums[n], registers[n], n))
+
+    @always_comb
+    def output_assignment():
+        data_out.next = registers[n_stages - 1]
+
+    return stages, output_assignment
+
+def run(engine, cycles, n_stages):
+    args = {'data_in': Signal(intbv(0)[16:]),
+            'data_out': Signal(intbv(0)[16:]),
+            'reset': ResetSignal(bool(0), active=1, isasync=False),
+            'clock': Signal(bool(1)),
+            'n_stages': n_stages}
+
+    arg_types = {'data_in': 'random',
+                 'data_out': 'output',
+                 'reset': 'init_reset',
+                 'clock': 'clock',
+                 'n_stages': 'non-signal'}
+
+    random.seed(0)
+    test = SynchronousTest(
+        adder_pipeline, adder_pipeline, args, arg_types)
+
+    start = time.perf_counter()
+    outputs = test.cosimulate(cycles, engine=engine)
+    run_time = time.perf_counter() - start
+
+    assert test.engine_used == engine
+
+    return run_time, outputs
+
+def simulation_time(engine, cycles, n_stages, repeats):
+    '''Return the best simulation time, without the elaboration time, and
+    the outputs.
+    '''
+    elaboration_time = min(
+        run(engine, 1, n_stages)[0] for n in range(repeats))
+
+    run_times = []
+    for n in range(repeats):
+        run_time, outputs = run(engine, cycles, n_stages)
+        run_times.append(run_time)
+
+    return min(run_times) - elaboration_time, outputs
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--cycles', type=int, default=5000)
+    parser.add_argument('--stages', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--repeats', type=int, default=3)
+    options = parser.parse_args()
+
+    print('{:>8} {:>8} {:>10} {:>10} {:>8}'.format(
+        'stages', 'cycles', 'event (s)', 'cycle (s)', 'speedup'))
+
+    for n_stages in options.stages:
+        event_time, event_outputs = simulation_time(
+            'event', options.cycles, n_stages, options.repeats)
+        cycle_time, cycle_outputs = simulation_time(
+            'cycle', options.cycles, n_stages, options.repeats)
+
+        assert event_outputs == cycle_outputs
+
+        print('{:>8} {:>8} {:>10.3f} {:>10.3f} {:>7.2f}x'.format(
+            n_stages, options.cycles, event_time, cycle_time,
+            event_time/cycle_time))
+
+if __name__ == '__main__':
+    main()
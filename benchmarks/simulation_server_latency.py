@@ -0,0 +1,124 @@
+'''Measures the latency of cosimulations requested from a SimulationServer,
+compared with running each in a fresh process and building a new
+SynchronousTest in a running process.
+
+A fresh process pays for importing MyHDL, veriutils and the design, and for
+building and elaborating the test. A new test in a running process only
+pays for building and elaborating it. The server has already done all of
+that, so a request only pays for the simulation and the round trip over a
+local socket. The server runs in its own process. Each time is the best of
+``--repeats`` runs.
+
+Run with:
+
+    python benchmarks/simulation_server_latency.py [--cycles N ...]
+'''
+
+from myhdl import block, always_seq, Signal, ResetSignal, intbv
+
+from veriutils import SynchronousTest, SimulationServer, SimulationClient
+
+import argparse
+import multiprocessing
+import os
+import random
+import subprocess
+import sys
+import time
+
+@block
+def accumulator(data_in, data_out, reset, clock):
+
+    @always_seq(clock.posedge, reset=reset)
+    def accumulate():
+        data_out.next = (data_out + data_in) % 2**16
+
+    return accumulate
+
+def build_test():
+    args = {'data_in': Signal(intbv(0)[16:]),
+            'data_out': Signal(intbv(0)[16:]),
+            'reset': ResetSignal(bool(0), active=1, isasync=False),
+            'clock': Signal(bool(1))}
+
+    arg_types = {'data_in': 'random',
+                 'data_out': 'output',
+                 'reset': 'init_reset',
+                 'clock': 'clock'}
+
+    random.seed(0)
+    return SynchronousTest(accumulator, accumulator, args, arg_types,
+                           reuse_elaboration=True)
+
+def fresh_process_time(cycles):
+    '''Return the wall time of a fresh process that builds and cosimulates
+    the test.
+    '''
+    code = (
+        'import sys; sys.path.insert(0, {!r}); '
+        'import simulation_server_latency as benchmark; '
+        'benchmark.build_test().cosimulate({}, seed=1)'.format(
+            os.path.dirname(os.path.abspath(__file__)), cycles))
+
+    start = time.perf_counter()
+    subprocess.run([sys.executable, '-c', code], check=True)
+    return time.perf_counter() - start
+
+def new_test_time(cycles):
+    '''Return the wall time of building and cosimulating a new test in this
+    process.
+    '''
+    start = time.perf_counter()
+    build_test().cosimulate(cycles, seed=1)
+    return time.perf_counter() - start
+
+def server_time(client, cycles):
+    '''Return the wall time of a cosimulation requested from the server.
+    '''
+    start = time.perf_counter()
+    client.cosimulate(cycles, seed=1)
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--cycles', type=int, nargs='+',
+                        default=[1, 100, 1000])
+    parser.add_argument('--repeats', type=int, default=5)
+    options = parser.parse_args()
+
+    server = SimulationServer(build_test())
+
+    process = multiprocessing.get_context('fork').Process(
+        target=server.serve_forever)
+    process.start()
+    server.close()
+
+    try:
+        with SimulationClient(*server.address) as client:
+            # The server elaborates the test on its first cosimulation
+            client.cosimulate(1)
+
+            print('{:>8} {:>12} {:>12} {:>12}'.format(
+                'cycles', 'fresh (s)', 'new test (s)', 'server (s)'))
+
+            for cycles in options.cycles:
+                fresh = min(fresh_process_time(cycles)
+                            for n in range(options.repeats))
+                new_test = min(new_test_time(cycles)
+                               for n in range(options.repeats))
+                served = min(server_time(client, cycles)
+                             for n in range(options.repeats))
+
+                print('{:>8} {:>12.4f} {:>12.4f} {:>12.4f}'.format(
+                    cycles, fresh, new_test, served))
+
+            client.shutdown()
+
+    finally:
+        process.join(10)
+
+        if process.is_alive():
+            process.terminate()
+
+if __name__ == '__main__':
+    main()
@@ -1,3 +1,16 @@
 from .cosimulation import *
 from .hdl_blocks import *
+from .distributions import *
+from .coverage import *
+from .ref_cache import *
+from .results_db import *
+from .vectorized import *
+from .shared_outputs import *
+from .specs import *
+from .scheduling import *
+from .regression import *
+from .farm import *
+from .sim_server import *
+from .cycle_simulation import *
+from .fuzzing import *
 from .utils import *
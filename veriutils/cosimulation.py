@@ -1,4 +1,12 @@
 from .hdl_blocks import *
+from .coverage import Coverage, coverage_monitor
+from .ref_cache import _describe
+from .vectorized import VectorizedRef, _stimulus_array, _output_values
+from .shared_outputs import (
+    share_outputs, SharedOutputs, SharedSequence, _unlink_descriptor)
+from .results_db import _peak_memory
+from .cycle_simulation import (
+    CycleSimulation, UnsupportedConstructError, _flatten_instances)
 from kea.axi import (
     AxiStreamSlaveBFM, axi_stream_buffer, axi_master_playback,
     AxiStreamInterface)
@@ -6,13 +14,24 @@ from kea.axi import (
 from myhdl import *
 
 import myhdl
+from myhdl._instance import _Instantiator
 from myhdl.conversion._toVHDL import _shortversion
 myhdl_vhdl_package_filename = "pck_myhdl_%s.vhd" % _shortversion
 
 import copy
+import numbers
 import os
+import io
 import tempfile
 import re
+import pickle
+import multiprocessing
+import traceback
+import threading
+import functools
+import concurrent.futures
+import time
+import asyncio
 
 from string import Template
 import csv
@@ -21,7 +40,6 @@ import random
 from collections.abc import MutableMapping, Sequence
 from collections import OrderedDict
 
-import inspect
 
 try:
     # Python 3
@@ -44,66 +62,104 @@ if sys.version_info < (3, 8):
     copy._deepcopy_dispatch[type(re.compile(''))] = lambda r, _: r
 
 __all__ = ['SynchronousTest', 'myhdl_cosimulation', 'SignalOutput',
-           'AxiStreamOutput']
+           'AxiStreamOutput', 'compare_coverage_closure', 'first_mismatch']
 
 PERIOD = 10
 
-# This is a lot of a hack because we want to keep sane signal names in the
-# namespace that myhdl can find when populating v*_code (using the $name)
-# strategy. We can only really do this in globals().
-_quasi_signal_namespace = {}
+# The MyHDL simulator keeps its state in globals, so only one simulation can
+# be run at a time by the threads of a process. It is reentrant because the
+# methods that hold it call each other.
+_simulation_lock = threading.RLock()
 
-def _add_local_signal_to_globals(name, signal):
-
-    # We use the calling stack for our quasi namespace
-    stack_hierarchy = [
-        hierarchy[3] for hierarchy in inspect.stack()[1:-1]][::-1]
-
-    modified_name = name
-
-    if modified_name not in globals():
-        globals()[modified_name] = signal
-
-    else:
-        while modified_name in globals():
-            modified_name = name + '_%06x' % random.randrange(16**6)
-
-        globals()[modified_name] = signal
-
-    containing_dict = _quasi_signal_namespace
-    for each_entry in stack_hierarchy:
-        try:
-            containing_dict = containing_dict[each_entry]
-        except KeyError:
-            containing_dict[each_entry] = {}
-            containing_dict = containing_dict[each_entry]
-
-    containing_dict[name] = modified_name
-
-    return modified_name
-
-def _get_globals_signal_name(name):
-    # We assume we are accessing from the same function that has already
-    # added a signal to the globals
-    stack_hierarchy = [
-        hierarchy[3] for hierarchy in inspect.stack()[1:-1]][::-1]
-
-    containing_dict = _quasi_signal_namespace
-    for each_entry in stack_hierarchy:
-        try:
-            containing_dict = containing_dict[each_entry]
-        except KeyError:
-            raise KeyError('Could not find local signal in the global '
-                           'quasi-namespace. This is likely a Veriutils bug.')
-
-    modified_name = containing_dict[name]
-
-    return modified_name
-
-def _get_local_signal_from_globals(name):
+def _holds_simulation_lock(method):
+    '''Decorates a method so that it holds the simulation lock while it
+    runs.
+    '''
+    @functools.wraps(method)
+    def locked_method(*args, **kwargs):
+        with _simulation_lock:
+            return method(*args, **kwargs)
+
+    return locked_method
+
+# Fewer cycles than this pass from the start of a simulation to the first
+# value of the random and playback sources, which wait for the initial reset.
+# Each shard of a sharded cosimulation that is moved on through the stimulus
+# runs for this many cycles, as well as its warm up cycles, before any of its
+# outputs are kept.
+_SHARD_RESET_CYCLES = 8
+
+# The SynchronousTest that the worker processes of a sharded cosimulation
+# simulate, which they inherit when they are forked.
+_shard_worker_test = None
+
+def _init_shard_worker(test):
+    global _shard_worker_test
+    _shard_worker_test = test
+
+def _run_shard_worker(skip, cycles, engine, seed):
+    return _shard_worker_test._simulate_shard(skip, cycles, engine, seed)
+
+def _dump_simulation_result(result, description):
+    '''Return the dict ``result`` from a simulation in another process,
+    pickled with :class:`_CheckpointPickler`. Not every exception can be
+    pickled, so if ``result`` cannot be, an error saying that
+    ``description`` (such as ``'The ref simulation'``) failed is pickled in
+    its place.
+    '''
+    data = io.BytesIO()
+    try:
+        _CheckpointPickler(data).dump(result)
+    except Exception:
+        # Any outputs in shared memory will not be received, so they are
+        # removed here.
+        descriptors = result.get('shared_outputs', None)
+        if isinstance(descriptors, dict):
+            descriptors = [descriptors]
+
+        for descriptor in descriptors or ():
+            if descriptor is not None:
+                _unlink_descriptor(descriptor)
+
+        data = io.BytesIO()
+        _CheckpointPickler(data).dump(
+            {'error': RuntimeError('{} failed:\n{}'.format(
+                description,
+                result.get('traceback', traceback.format_exc())))})
+
+    return data.getvalue()
+
+def _default_test_id(dut_factory, ref_factory):
+    '''Return the id under which a :class:`SynchronousTest` of
+    ``dut_factory`` and ``ref_factory`` records its results by default: the
+    module and name of the dut factory, or of the ref factory (or its
+    function, if it is a :class:`veriutils.VectorizedRef`) if there is no
+    dut.
+    '''
+    factory = ref_factory if dut_factory is None else dut_factory
+    factory = getattr(factory, 'function', factory)
+
+    return '{}.{}'.format(
+        getattr(factory, '__module__', None),
+        getattr(factory, '__qualname__', type(factory).__name__))
+
+def _add_signals_to_namespace(instance, signals):
+    '''Add the dict ``signals`` to the namespace from which MyHDL fills in
+    the ``$name`` references of the ``verilog_code`` and ``vhdl_code`` of
+    the block that returns ``instance``. The namespace belongs to the block
+    (it is the one MyHDL captured when ``instance`` was created), so signals
+    that are not locals of the block function can be referred to by name
+    without anything being shared between blocks.
+
+    MyHDL names each signal in the converted code after the first name it
+    finds for it in the namespace, so ``signals`` are put first.
+    '''
+    symdict = instance.callinfo.symdict
+    existing = list(symdict.items())
 
-    modified_name = _get_globals_signal_name(name)
-    return globals()[modified_name]
+    symdict.clear()
+    symdict.update(signals)
+    symdict.update(existing)
 
 @block
 def file_writer(filename, signal_list, clock, signal_names=None):
@@ -117,9 +173,11 @@ def file_writer(filename, signal_list, clock, signal_names=None):
     vhdl_annotations = ''
     verilog_annotations = ''
 
+    template_signals = {}
+
     for n, each_signal in enumerate(signal_list):
-        modified_sig_name = (
-            _add_local_signal_to_globals('signal_' + str(n), each_signal))
+        modified_sig_name = 'signal_' + str(n)
+        template_signals[modified_sig_name] = each_signal
         each_signal.read = True
 
         if signal_names is None:
@@ -224,7 +282,9 @@ end process write_to_file;
         # the dummy writer in order that the used signals can be inferred
         # correctly.
         for n in range(len(signal_list)):
-            print(_get_local_signal_from_globals('signal_' + str(n)))
+            print(template_signals['signal_' + str(n)])
+
+    _add_signals_to_namespace(_dummy_file_writer, template_signals)
 
     return _dummy_file_writer
 
@@ -238,13 +298,14 @@ def axi_stream_file_writer(
     verilog_signal_str_write_list = []
     verilog_name_str_write_list = []
 
-    signal_TVALID_name = _add_local_signal_to_globals(
-        'signal_TVALID', axi_stream_interface.TVALID)
-    axi_stream_interface.TVALID.read = True
+    signal_TVALID_name = 'signal_TVALID'
+    signal_TREADY_name = 'signal_TREADY'
 
+    template_signals = {
+        signal_TVALID_name: axi_stream_interface.TVALID,
+        signal_TREADY_name: axi_stream_interface.TREADY}
 
-    signal_TREADY_name = _add_local_signal_to_globals(
-        'signal_TREADY', axi_stream_interface.TREADY)
+    axi_stream_interface.TVALID.read = True
     axi_stream_interface.TREADY.driven = 'reg'
 
     signal_names = ('TDATA', 'TLAST', 'TKEEP', 'TSTRB', 'TID', 'TDEST')
@@ -256,8 +317,8 @@ def axi_stream_file_writer(
             # Attribute not available, so ignore it.
             continue
 
-        modified_sig_name = _add_local_signal_to_globals(
-            'signal_' + each_signal_name, each_signal)
+        modified_sig_name = 'signal_' + each_signal_name
+        template_signals[modified_sig_name] = each_signal
         each_signal.read = True
 
         if signal_names is None:
@@ -368,7 +429,9 @@ end process write_to_file_%s;
 
         if axi_stream_interface.TVALID and axi_stream_interface.TREADY:
             for signal_name in signal_names:
-                print(_get_local_signal_from_globals('signal_' + signal_name))
+                print(template_signals.get('signal_' + signal_name, None))
+
+    _add_signals_to_namespace(_dummy_file_writer, template_signals)
 
     return _dummy_file_writer
 
@@ -1048,6 +1111,10 @@ class Args(object):
     def outputs(self):
         return [each for each in self if each.type == 'output']
 
+    @property
+    def signal_count(self):
+        return len([each for each in self if each.type != 'non-signal'])
+
     @property
     def args(self):
         return self._args
@@ -1166,9 +1233,9 @@ class Args(object):
 
     def __init__(self, args, arg_types):
 
-        valid_arg_types = ('clock', 'init_reset', 'random', 'output',
-                           'custom', 'custom_reset', 'axi_stream_out',
-                           'axi_stream_in', 'non-signal')
+        valid_arg_types = ('clock', 'init_reset', 'random', 'playback',
+                           'output', 'custom', 'custom_reset',
+                           'axi_stream_out', 'axi_stream_in', 'non-signal')
 
         flattened_args = []
         for each_arg in args:
@@ -1230,23 +1297,68 @@ class Args(object):
         self.arg_types = arg_types
 
 
+_CHECKPOINT_VERSION = 2
+
+# Changing this invalidates every entry in every RefCache
+_REF_CACHE_VERSION = 1
+
+class _CheckpointPickler(pickle.Pickler):
+    '''Pickles enum items by name, as MyHDL enum types cannot be pickled.
+    '''
+
+    def persistent_id(self, obj):
+        if isinstance(obj, EnumItemType):
+            return ('enum', tuple(obj._type._names), obj._name)
+
+        return None
+
+class _CheckpointUnpickler(pickle.Unpickler):
+    '''Unpickles the enum items pickled by :class:`_CheckpointPickler`.
+    ``enum_types`` is a dict of enum types keyed by the tuple of their
+    names.
+    '''
+
+    def __init__(self, f, enum_types):
+        pickle.Unpickler.__init__(self, f)
+        self.enum_types = enum_types
+
+    def persistent_load(self, pid):
+        tag, names, name = pid
+
+        try:
+            return getattr(self.enum_types[names], name)
+        except KeyError:
+            raise ValueError('Invalid checkpoint: The checkpoint contains an '
+                             'enum that is not in the design.')
+
 class SynchronousTest(object):
 
     def __init__(self, dut_factory, ref_factory, args, arg_types,
                  period=None, custom_sources=None,
                  enforce_convertible_top_level_interfaces=True,
-                 time_units='ns'):
+                 time_units='ns', random_distributions=None,
+                 playback_data=None, coverage=None, reuse_elaboration=False,
+                 ref_cache=None, rng=None, results_db=None, test_id=None):
         '''Construct a synchronous test case for the pair of factories
         given by `dut_factory` and `ref_factory`. Each factory is constructed
         with the provided args (which probably corresponds to a signal list).
 
         if `dut_factory` is None, then it is simply not used
 
+        `ref_factory` can also be a :class:`veriutils.VectorizedRef`, in
+        which case the ref is not simulated. Instead, the outputs of the ref
+        are computed from the stimulus recorded from the dut after each
+        simulation. There should then be a dut and no AXI stream interfaces,
+        the coverage (which is sampled from the computed values) should not be
+        adaptive and any custom sources should not depend on the outputs of
+        the ref (which are never driven).
+
         arg_types specifies how each arg should be handled. It is a dict to
         a valid type string. The supported type strings are:
             * `'clock'`
             * `'init_reset'`
             * `'random'`
+            * `'playback'`
             * `'output'`
             * `'custom'`
             * `'custom_reset'`
@@ -1261,6 +1373,9 @@ class SynchronousTest(object):
         inactive. That is, it resets at initialization.
         * A `'random'` arg is a signal that is auto-connected to a random
         number generator. This can be any type of signal.
+        * A `'playback'` arg is a signal that is driven on each cycle from
+        a recorded sequence of values (see ``playback_data`` below). Unlike
+        a `'random'` arg, the signal is shared between the dut and the ref.
         * `'output'` args are simply recorded, but are duplicated for the
         dut_factory. This means the dut_factory and the ref_factory can
         output different values. Note, this also means that if a custom_source
@@ -1314,15 +1429,89 @@ class SynchronousTest(object):
 
         ``time_units`` is used to define the units of the ``period`` argument.
         It is also used in cosimulate to create the ``timescale``.
+
+        ``random_distributions`` is an optional dict that sets how the values
+        of the `'random'` args are distributed. Each key is the name of a
+        `'random'` arg, either the full name of a signal (e.g. ``'a.b'`` or
+        ``'a[3]'``) or the name of a top level argument, in which case it
+        applies to every random signal in that argument. Each value is a
+        :class:`veriutils.distributions.Distribution` instance (see
+        :func:`veriutils.random_source`). A full signal name takes precedence
+        over a top level name. Random signals without an entry are uniformly
+        distributed.
+
+        ``playback_data`` is a dict that provides the data for every
+        `'playback'` arg. Each key is the full name of a `'playback'` signal
+        and each value is either a one dimensional sequence of values (such
+        as a NumPy array) or the filename of a ``.npy`` file, which is memory
+        mapped and read in chunks. See :func:`veriutils.playback_source` for
+        more details.
+
+        ``coverage`` is an optional :class:`veriutils.Coverage` object, the
+        cover points of which are sampled from the signals of the ref on every
+        cycle after the initial reset. If the coverage is adaptive, every
+        `'random'` signal with a cover point is driven from a
+        :class:`veriutils.AdaptiveDistribution` (wrapping any distribution
+        set in ``random_distributions``), so the stimulus is steered towards
+        the bins that have not been hit. The coverage is reset at the start of
+        every call to :meth:`cosimulate` and can be inspected afterwards with
+        :meth:`veriutils.Coverage.report`.
+
+        By default, the design is elaborated again on every call to
+        :meth:`cosimulate`. If ``reuse_elaboration`` is ``True``, the ref,
+        the dut, the output recorders and the clock and reset sources are
+        only elaborated on the first call. Later calls reset the signals and
+        restart the generators of those blocks rather than elaborating them
+        again, which can save a lot of time with large designs. Any state
+        that the ref or the dut keep outside of signals and generators (for
+        example, in a list in the enclosing block function) is not reset, so
+        it should only be set if the factories do not rely on being called
+        again. The random,
+        playback, custom and AXI sources are always elaborated on every call
+        to :meth:`cosimulate`, as they hold state that cannot be reset
+        otherwise.
+
+        ``ref_cache`` is an optional :class:`veriutils.RefCache`. If it is
+        set, the outputs of the ref (and the coverage, which is sampled from
+        the ref) are saved to it after each call to :meth:`cosimulate`. A
+        later call with the same ref, arguments, stimulus and number of
+        cycles then loads them from the cache and only simulates the dut
+        (if there is no dut, nothing is simulated and ``engine_used`` is set
+        to ``None``). See :class:`veriutils.RefCache` for what is included
+        in the cache key. The cache is not used if ``cycles`` is ``None``, a
+        vcd file is requested, ``resumable`` is ``True``, there are custom
+        sources or AXI stream interfaces or the coverage is adaptive, as in
+        those cases the ref and the dut can affect each other. Nor is it
+        used if the ref or the dut raises StopSimulation. The seeds of the
+        random sources are part of the key and are drawn from the
+        :mod:`random` module on construction (or from ``rng``), so
+        :func:`random.seed` should be called first for the cache to be hit
+        by a new :class:`SynchronousTest`.
+
+        ``rng`` is an optional :class:`random.Random` instance from which the
+        seeds of the random sources are drawn on construction, in place of
+        the :mod:`random` module. Nothing else that is global is changed by
+        a :class:`SynchronousTest`, so with ``rng`` set, tests can be built
+        and run from several threads and each gives the same outputs as it
+        would on its own. The MyHDL simulator keeps its state in globals,
+        though, so only one simulation runs at a time in a process (the
+        others wait for it), and a simulation left running with
+        ``resumable`` set stops others from running correctly until it is
+        ended.
+
+        ``results_db`` is an optional :class:`veriutils.ResultsDatabase`, in
+        which every call to :meth:`cosimulate` is recorded under
+        ``test_id``. By default, ``test_id`` is the module and the name of
+        the dut factory (or of the ref factory if there is no dut).
         '''
 
-        # Reset the clock source block count
-        global clock_source_block_count
-        clock_source_block_count = 0
+        if rng is None:
+            # The functions of the random module use the global generator
+            rng = random
 
-        valid_arg_types = ('clock', 'init_reset', 'random', 'output',
-                           'custom', 'custom_reset', 'axi_stream_out',
-                           'axi_stream_in', 'non-signal')
+        valid_arg_types = ('clock', 'init_reset', 'random', 'playback',
+                           'output', 'custom', 'custom_reset',
+                           'axi_stream_out', 'axi_stream_in', 'non-signal')
 
         if period is None:
             self.period = PERIOD
@@ -1385,6 +1574,8 @@ class SynchronousTest(object):
                              'one reset in the argument list.')
 
         self.clock = flattened_signals[flattened_types.index('clock')]
+        self._clock_name = flattened_signal_names[
+            flattened_types.index('clock')]
         self.clockgen_factory = (
             clock_source, (self.clock, self.period, self.time_units), {})
 
@@ -1393,20 +1584,26 @@ class SynchronousTest(object):
         if 'init_reset' in flattened_types:
             self.reset = flattened_signals[
                 flattened_types.index('init_reset')]
+            self._reset_name = flattened_signal_names[
+                flattened_types.index('init_reset')]
 
             self.init_reset_factory = (
-                init_reset_source, (self.reset, self.clock), {})
+                init_reset_source, (self.reset, self.clock),
+                {'stop_after_reset': True})
             self._use_init_reset = True
 
         elif 'custom_reset' in flattened_types:
             self.reset = flattened_signals[
                 flattened_types.index('custom_reset')]
+            self._reset_name = flattened_signal_names[
+                flattened_types.index('custom_reset')]
             self.init_reset_factory = ()
 
         else:
             # We need to create a reset to keep dependent HDL blocks happy
             # (though it won't be driven)
             self.reset = ResetSignal(False, active=True, isasync=False)
+            self._reset_name = None
             self.init_reset_factory = ()
 
 
@@ -1430,30 +1627,141 @@ class SynchronousTest(object):
         self.ref_args = self.elaborated_args.args
         self.dut_args = self.elaborated_dut_args.args
 
+        if random_distributions is None:
+            random_distributions = {}
+
+        random_arg_names = set()
+        for each_arg in self.elaborated_args:
+            if each_arg.type == 'random':
+                random_arg_names.add(each_arg.name)
+                random_arg_names.add(each_arg._basename)
+
+        for each_name in random_distributions:
+            if each_name not in random_arg_names:
+                raise ValueError(
+                    'Invalid random distribution: {} is not the name of a '
+                    '\'random\' argument.'.format(each_name))
+
+        signal_args = dict(
+            (each_arg.name, each_arg) for each_arg in self.elaborated_args
+            if isinstance(each_arg.object, myhdl._Signal._Signal))
+
+        if coverage is not None:
+            for each_name in coverage.names:
+                if each_name not in signal_args:
+                    raise ValueError(
+                        'Invalid coverage: {} is not the name of a '
+                        'signal.'.format(each_name))
+
         # Deal with random values
-        # Create the random sources.
+        # Create the random sources. The side each one drives is recorded
+        # so the ref and the dut can be simulated separately.
         self.random_source_factories = []
+        self._random_source_sides = []
         for each_arg, each_dut_arg in zip(self.elaborated_args,
                                           self.elaborated_dut_args):
 
             if each_arg.type == 'random':
-                seed = random.randrange(0, 0x5EEDF00D)
+                seed = rng.randrange(0, 0x5EEDF00D)
+
+                if each_arg.name in random_distributions:
+                    distribution = random_distributions[each_arg.name]
+                else:
+                    distribution = random_distributions.get(
+                        each_arg._basename, None)
+
+                if (coverage is not None and coverage.adaptive and
+                    each_arg.name in coverage.names):
+                    distribution = coverage.adaptive_distribution(
+                        each_arg.name, distribution)
+
                 self.random_source_factories.append(
                     (random_source,
                      (each_arg.object, self.clock, self.reset),
-                     {'seed': seed}))
+                     {'seed': seed, 'distribution': distribution}))
+                self._random_source_sides.append('ref')
 
                 if dut_factory is not None:
                     self.random_source_factories.append(
                         (random_source,
                          (each_dut_arg.object, self.clock, self.reset),
-                         {'seed': seed}))
+                         {'seed': seed, 'distribution': distribution}))
+                    self._random_source_sides.append('dut')
+
+
+        if playback_data is None:
+            playback_data = {}
+
+        playback_arg_names = [
+            each_arg.name for each_arg in self.elaborated_args
+            if each_arg.type == 'playback']
+
+        for each_name in playback_data:
+            if each_name not in playback_arg_names:
+                raise ValueError(
+                    'Invalid playback data: {} is not the name of a '
+                    '\'playback\' argument.'.format(each_name))
+
+        # Playback signals are shared between the dut and the ref, so only
+        # need a single source each.
+        self.playback_source_factories = []
+        for each_arg in self.elaborated_args:
+
+            if each_arg.type == 'playback':
+                if each_arg.name not in playback_data:
+                    raise ValueError(
+                        'Missing playback data: There is no playback data '
+                        'for {}.'.format(each_arg.name))
 
+                self.playback_source_factories.append(
+                    (playback_source,
+                     (each_arg.object, self.clock, self.reset,
+                      playback_data[each_arg.name]), {}))
+
+        self.coverage = coverage
+        self.ref_cache = ref_cache
+        self.results_db = results_db
+
+        if test_id is None:
+            test_id = _default_test_id(dut_factory, ref_factory)
+
+        self.test_id = test_id
+
+        if isinstance(ref_factory, VectorizedRef):
+            if dut_factory is None:
+                raise ValueError('Invalid dut: A vectorized ref needs a dut '
+                                 'to simulate.')
+
+            if (len(self.elaborated_args.axi_stream_in_interfaces) > 0 or
+                len(self.elaborated_args.axi_stream_out_interfaces) > 0):
+                raise ValueError('Invalid ref: A vectorized ref cannot be '
+                                 'used with AXI stream interfaces.')
+
+            if coverage is not None and coverage.adaptive:
+                raise ValueError('Invalid coverage: The coverage cannot be '
+                                 'adaptive with a vectorized ref.')
+
+            self._vectorized_ref = ref_factory
+
+        else:
+            self._vectorized_ref = None
+
+        if coverage is not None:
+            self.coverage_monitor_factories = [
+                (coverage_monitor,
+                 (coverage,
+                  dict((each_name, signal_args[each_name].object)
+                       for each_name in coverage.names),
+                  self.clock, self.reset), {})]
+
+        else:
+            self.coverage_monitor_factories = []
 
         # Now create the recorder sinks for every signal
         self.output_recorder_factories = []
+        self._output_recorder_sides = []
 
-        def _add_recorder_sink(arg, output_dict):
+        def _add_recorder_sink(arg, output_dict, side):
 
             if arg.type == 'non-signal':
                 # We don't record non-signals
@@ -1465,15 +1773,16 @@ class SynchronousTest(object):
                 handler_sink, (arg.object, self.clock, handler), {})
 
             self.output_recorder_factories.append(val_handler_inst)
+            self._output_recorder_sides.append(side)
 
         ref_outputs = SimulationOutputs()
         for arg in self.elaborated_args:
-            _add_recorder_sink(arg, ref_outputs)
+            _add_recorder_sink(arg, ref_outputs, 'ref')
 
         if dut_factory is not None:
             dut_outputs = SimulationOutputs()
             for arg in self.elaborated_dut_args:
-                _add_recorder_sink(arg, dut_outputs)
+                _add_recorder_sink(arg, dut_outputs, 'dut')
 
         else:
             dut_outputs = None
@@ -1562,13 +1871,56 @@ class SynchronousTest(object):
 
         self._outputs = (dut_outputs, ref_outputs)
 
+        self.reuse_elaboration = reuse_elaboration
+        # The blocks kept for reuse, keyed by the sides that they simulate
+        self._persistent_blocks = {}
+
+        # The sides of the test that are simulated. Only one is simulated in
+        # each of the processes of a parallel cosimulation, and a vectorized
+        # ref is never simulated.
+        if self._vectorized_ref is None:
+            self._sides = ('ref', 'dut')
+        else:
+            self._sides = ('dut',)
+        self.parallel_used = False
+
+        self._simulation = None
+        self._simulation_seed = None
+
         # Note: self.ref_args is args
         self.args = args
         self.arg_types = arg_types
 
         self._simulator_run = False
 
-    def cosimulate(self, cycles, vcd_name=None):
+    @_holds_simulation_lock
+    def set_playback_data(self, playback_data):
+        '''Replace the data of the `'playback'` args named in
+        ``playback_data``, which is a dict as for the ``playback_data``
+        argument of :class:`SynchronousTest`. The other `'playback'` args
+        keep their data. The playback sources are elaborated on every call to
+        :meth:`cosimulate`, so the new data is used from the next call
+        without elaborating anything else again.
+        '''
+        # In the order of the playback source factories
+        playback_names = [
+            each_arg.name for each_arg in self.elaborated_args
+            if each_arg.type == 'playback']
+
+        for each_name in playback_data:
+            if each_name not in playback_names:
+                raise ValueError(
+                    'Invalid playback data: {} is not the name of a '
+                    '\'playback\' argument.'.format(each_name))
+
+        self.playback_source_factories = [
+            (factory, args[:3] + (playback_data.get(name, args[3]),), kwargs)
+            for name, (factory, args, kwargs) in zip(
+                playback_names, self.playback_source_factories)]
+
+    @_holds_simulation_lock
+    def cosimulate(self, cycles, vcd_name=None, engine='event', seed=None,
+                   resumable=False, parallel=False):
         '''Co-simulate the device under test and the reference design.
 
         Return a pair tuple of lists, each corresponding to the recorded
@@ -1580,7 +1932,379 @@ class SynchronousTest(object):
 
         If ``vcd_name`` is not ``None``, a vcd file will be created of the
         waveform.
+
+        ``engine`` sets the simulator to use. ``'event'`` (the default) uses
+        the MyHDL event driven simulator. ``'cycle'`` uses a
+        :class:`veriutils.cycle_simulation.CycleSimulation`, which is
+        considerably faster for designs made up only of ``always_seq``,
+        ``always_comb`` and clocked ``always`` blocks. If the design
+        contains anything else, or a vcd file is requested, the event driven
+        simulator is used instead. The engine that was actually used is
+        recorded in the ``engine_used`` attribute.
+
+        By default, every call drives the `'random'` args with the same
+        values. If ``seed`` is not ``None``, the random sources are seeded
+        from it instead, so repeated calls with different seeds give
+        different stimulus (the dut and the ref still receive the same
+        values).
+
+        If ``resumable`` is ``True``, the simulation is left running at the
+        end of the call so that it can be extended with
+        :meth:`continue_cosimulate`. It should be finished with
+        :meth:`end_cosimulation` before any other simulation is run (the
+        next call to :meth:`cosimulate` finishes it automatically).
+
+        If ``parallel`` is ``True``, the ref and the dut are simulated at the
+        same time in two forked processes, each with its own copy of the
+        stimulus, and the outputs are merged afterwards. The result is the
+        same as for a serial cosimulation. This relies on the ref and the dut
+        not affecting each other, so the cosimulation is run serially if
+        there is no dut, ``cycles`` is ``None``, a vcd file is requested,
+        ``resumable`` is ``True``, there are custom sources or AXI stream
+        interfaces (either of which can couple the ref and the dut), the
+        coverage is adaptive (the ref steers the stimulus of both) or the
+        ``fork`` start method is not available. If the ref or the dut raises
+        StopSimulation, the two processes would disagree on when the
+        simulation ended, so the cosimulation is repeated serially. Whether
+        the ref and the dut were simulated in parallel is recorded in the
+        ``parallel_used`` attribute.
+
+        If there is a ``results_db``, the call is recorded in it.
+        '''
+        start_time = time.perf_counter()
+
+        ref_cache_key = None
+        if self.ref_cache is not None:
+            if (cycles is not None and vcd_name is None and not resumable
+                and self._vectorized_ref is None and
+                self._independent_sides()):
+
+                ref_cache_key = self._ref_cache_key(cycles, seed)
+
+            if ref_cache_key is None:
+                self.ref_cache.stats['bypasses'] += 1
+
+        self.parallel_used = False
+
+        if (ref_cache_key is None or
+            not self._cosimulate_with_cached_ref(
+                ref_cache_key, cycles, engine, seed)):
+
+            self.parallel_used = (
+                parallel and
+                self._parallel_supported(cycles, vcd_name, resumable) and
+                self._parallel_cosimulate(cycles, engine, seed))
+
+            if self.parallel_used:
+                stopped = False
+            else:
+                self._start_simulation(vcd_name, engine, seed)
+                stopped = self._run_simulation(cycles, resumable)
+
+            if ref_cache_key is not None and not stopped:
+                self._store_cached_ref(ref_cache_key)
+
+        self._simulator_run = True
+
+        outputs = self._simulation_outputs()
+
+        if self.results_db is not None:
+            self._record_result(
+                outputs, seed, time.perf_counter() - start_time)
+
+        return outputs
+
+    def _record_result(self, outputs, seed, wall_time):
+        '''Record a call to :meth:`cosimulate` that gave ``outputs`` in the
+        results database.
+        '''
+        dut_outputs, ref_outputs = outputs
+
+        if self._dut_factory is None:
+            passed = None
+        else:
+            passed = first_mismatch(dut_outputs, ref_outputs) is None
+
+        self.results_db.record(
+            self.test_id, seed, len(ref_outputs[self._clock_name]), wall_time,
+            passed, peak_memory=_peak_memory(), engine=self.engine_used,
+            signals=self.elaborated_args.signal_count)
+
+    def _independent_sides(self):
+        '''Return ``True`` if the ref and the dut can only be affected by
+        the stimulus and not by each other.
+        '''
+        return (
+            len(self.custom_sources) == 0 and
+            len(self.axi_stream_out_bfm_sink_factories) == 0 and
+            len(self.axi_stream_in_bfm_sink_factories) == 0 and
+            (self.coverage is None or not self.coverage.adaptive))
+
+    def _enum_types(self):
+        '''Return a dict of the enum types of the signals in the arguments,
+        keyed by the tuple of their names, as needed by
+        :class:`_CheckpointUnpickler`.
+        '''
+        return dict(
+            (tuple(each.object._val._type._names), each.object._val._type)
+            for each in self.elaborated_args
+            if isinstance(each.object, myhdl._Signal._Signal) and
+            isinstance(each.object._val, EnumItemType))
+
+    def _ref_cache_key(self, cycles, seed):
+        '''Return the key under which the outputs of the ref are cached for
+        a cosimulation of ``cycles`` cycles with ``seed``, or ``None`` if
+        the ref depends on something that cannot be described (see
+        :class:`veriutils.RefCache`), so the cosimulation cannot be cached.
+        '''
+        ref_random_sources = [
+            (args[0], kwargs) for (factory, args, kwargs), side in zip(
+                self._seeded_random_source_factories(seed),
+                self._random_source_sides)
+            if side == 'ref']
+
+        playback_data = []
+        for factory, args, kwargs in self.playback_source_factories:
+            data = args[3]
+            if isinstance(data, string_type):
+                # Files are assumed to be unchanged if their size and
+                # modification time are the same.
+                stat = os.stat(data)
+                data = ('file', os.path.abspath(data), stat.st_size,
+                        stat.st_mtime_ns)
+
+            playback_data.append((args[0], data))
+
+        if self.coverage is None:
+            coverpoints = None
+        else:
+            coverpoints = repr(self.coverage.coverpoints)
+
+        try:
+            description = _describe((
+                _REF_CACHE_VERSION,
+                self.ref_factory,
+                [(each.name, each.type, each.object)
+                 for each in self.elaborated_args],
+                ref_random_sources, playback_data, coverpoints, self.period,
+                self.time_units, self._use_init_reset, cycles))
+
+        except ValueError:
+            return None
+
+        return self.ref_cache.key(description)
+
+    def _cosimulate_with_cached_ref(self, key, cycles, engine, seed):
+        '''Load the outputs of the ref from the cache and simulate only the
+        dut. Return ``False``, leaving the outputs to be set by a full
+        cosimulation, if nothing is cached under ``key`` (a miss) or the dut
+        raised StopSimulation (which would also have stopped the ref, so the
+        cache is bypassed). A hit is only counted once the cached outputs
+        are used.
         '''
+        data = self.ref_cache.load(key)
+
+        if data is None:
+            self.ref_cache.stats['misses'] += 1
+            return False
+
+        cached = _CheckpointUnpickler(
+            io.BytesIO(data), self._enum_types()).load()
+
+        if self._dut_factory is None:
+            self.end_cosimulation()
+            self.engine_used = None
+
+        else:
+            self._sides = ('dut',)
+            try:
+                self._start_simulation(None, engine, seed)
+                stopped = self._run_simulation(cycles, False)
+            finally:
+                self._sides = ('ref', 'dut')
+
+            if stopped:
+                self.ref_cache.stats['bypasses'] += 1
+                return False
+
+        # The recorders hold references to the output dicts, so they are
+        # updated in place.
+        ref_outputs = self._outputs[1]
+        ref_outputs.clear()
+        for key in cached['outputs']:
+            ref_outputs[key] = cached['outputs'][key]
+
+        if self.coverage is not None:
+            self.coverage.reset()
+            self.coverage.set_state(cached['coverage'])
+
+        self.ref_cache.stats['hits'] += 1
+
+        return True
+
+    def _store_cached_ref(self, key):
+        '''Save the outputs of the ref and the coverage to the cache under
+        ``key``.
+        '''
+        data = io.BytesIO()
+        _CheckpointPickler(data).dump({
+            'outputs': self._outputs[1],
+            'coverage': (
+                None if self.coverage is None else self.coverage.get_state())})
+
+        self.ref_cache.store(key, data.getvalue())
+
+    def _parallel_supported(self, cycles, vcd_name, resumable):
+        '''Return ``True`` if the ref and the dut can be simulated in
+        separate processes. See :meth:`cosimulate` for the arguments.
+        '''
+        return (
+            self._dut_factory is not None and
+            self._vectorized_ref is None and
+            cycles is not None and
+            vcd_name is None and
+            not resumable and
+            self._independent_sides() and
+            'fork' in multiprocessing.get_all_start_methods())
+
+    def _parallel_cosimulate(self, cycles, engine, seed):
+        '''Simulate the ref and the dut in separate processes and copy what
+        they record into the outputs. Return ``False``, without changing the
+        outputs, if either of them raised StopSimulation.
+        '''
+        self.end_cosimulation()
+
+        context = multiprocessing.get_context('fork')
+
+        processes = []
+        for side in ('ref', 'dut'):
+            receiver, sender = context.Pipe(duplex=False)
+            process = context.Process(
+                target=self._simulate_side,
+                args=(side, cycles, engine, seed, sender))
+            process.start()
+            sender.close()
+            processes.append((side, process, receiver))
+
+        enum_types = self._enum_types()
+
+        # The result of every process is received, even if one fails, so
+        # that the shared memory holding the outputs of the other is not
+        # left behind.
+        results = {}
+        try:
+            for side, process, receiver in processes:
+                try:
+                    results[side] = _CheckpointUnpickler(
+                        io.BytesIO(receiver.recv_bytes()), enum_types).load()
+
+                except EOFError:
+                    results[side] = {'error': RuntimeError(
+                        'The {} simulation process exited '
+                        'unexpectedly.'.format(side))}
+
+                except Exception as e:
+                    results[side] = {'error': e}
+
+        except:
+            for side, process, receiver in processes:
+                process.terminate()
+            raise
+
+        finally:
+            for side, process, receiver in processes:
+                receiver.close()
+                process.join()
+
+        # The outputs are copied out of shared memory, which is quicker than
+        # unpickling them. They cannot be left in it, as they outlive the
+        # block.
+        outputs = {}
+        try:
+            for side in ('ref', 'dut'):
+                if 'error' not in results[side]:
+                    with SharedOutputs(results[side]['shared_outputs'],
+                                       enum_types) as shared_outputs:
+                        outputs[side] = shared_outputs.copy()
+
+        finally:
+            for side in ('ref', 'dut'):
+                if side not in outputs and 'shared_outputs' in results[side]:
+                    _unlink_descriptor(results[side]['shared_outputs'])
+
+        for side in ('ref', 'dut'):
+            if 'error' in results[side]:
+                raise results[side]['error']
+
+        if results['ref']['stopped'] or results['dut']['stopped']:
+            return False
+
+        self.engine_used = results['ref']['engine_used']
+
+        # The recorders hold references to the output dicts, so they are
+        # updated in place.
+        for side_outputs, side in zip(self._outputs, ('dut', 'ref')):
+            side_outputs.clear()
+            for key in outputs[side]:
+                side_outputs[key] = outputs[side][key]
+
+        if self.coverage is not None:
+            self.coverage.reset()
+            self.coverage.set_state(results['ref']['coverage'])
+
+        return True
+
+    def _simulate_side(self, side, cycles, engine, seed, connection):
+        '''Simulate only one side (``'ref'`` or ``'dut'``) of the test for
+        ``cycles`` cycles and send what was recorded down ``connection``.
+        This runs in a forked process, so nothing it changes is seen by the
+        parent.
+        '''
+        try:
+            self._sides = (side,)
+
+            self._start_simulation(None, engine, seed)
+            stopped = self._run_simulation(cycles, False)
+
+            # Pickling the outputs is slow, so they are passed in shared
+            # memory, which the parent removes.
+            result = {
+                'stopped': stopped,
+                'engine_used': self.engine_used,
+                'shared_outputs': share_outputs(
+                    self._outputs[0 if side == 'dut' else 1]),
+                'coverage': (
+                    None if self.coverage is None
+                    else self.coverage.get_state())}
+
+        except Exception as e:
+            result = {'error': e, 'traceback': traceback.format_exc()}
+
+        connection.send_bytes(_dump_simulation_result(
+            result, 'The {} simulation'.format(side)))
+        connection.close()
+
+    def _start_simulation(self, vcd_name, engine, seed):
+        '''Elaborate the design and set up the simulation, ready to be run by
+        :meth:`_run_simulation`. See :meth:`cosimulate` for the arguments.
+        '''
+        if engine not in ('event', 'cycle'):
+            raise ValueError('Invalid engine: The engine should be either '
+                             '\'event\' or \'cycle\'.')
+
+        self.end_cosimulation()
+
+        # Kept so that checkpoints of event engine simulations can replay
+        # them.
+        self._simulation_seed = seed
+
+        if self.coverage is not None:
+            self.coverage.reset()
+
+        # Clear the outputs recorded by any previous call
+        for each_outputs in self._outputs:
+            if each_outputs is not None:
+                each_outputs.clear()
 
         # And also clear the AXI sink BFMs
         if self.axi_stream_out_ref_bfms is not None:
@@ -1605,25 +2329,86 @@ class SynchronousTest(object):
                 dut_each.object._clear()
                 ref_each.object._clear()
 
+        random_source_factories = self._seeded_random_source_factories(seed)
+
+        reused_blocks = self._persistent_blocks.get(self._sides, None)
+
+        if reused_blocks is not None:
+            # The blocks have already been simulated, so they need to start
+            # from the beginning again.
+            for each_inst in _flatten_instances(
+                list(reused_blocks.values()), []):
+
+                each_inst.gen = each_inst.genfunc()
+
         @block
         def top():
             random_sources = [
+                factory(*args, **kwargs) for (factory, args, kwargs), side in
+                zip(random_source_factories, self._random_source_sides)
+                if side in self._sides]
+            playback_sources = [
                 factory(*args, **kwargs) for factory, args, kwargs in
-                self.random_source_factories]
-            output_recorders = [
-                factory(*args, **kwargs) for factory, args, kwargs in
-                self.output_recorder_factories]
+                self.playback_source_factories]
+
+            if reused_blocks is None:
+                output_recorders = [
+                    factory(*args, **kwargs)
+                    for (factory, args, kwargs), side in zip(
+                        self.output_recorder_factories,
+                        self._output_recorder_sides)
+                    if side in self._sides]
+
+                # The coverage is sampled from the ref
+                if 'ref' in self._sides:
+                    coverage_monitors = [
+                        factory(*args, **kwargs) for factory, args, kwargs
+                        in self.coverage_monitor_factories]
+                else:
+                    coverage_monitors = []
 
-            test_instances = []
-            for name, (factory, args, kwargs) in zip(
-                ('ref', 'dut'), self.test_factories):
+                test_instances = []
+                for name, (factory, args, kwargs) in zip(
+                    ('ref', 'dut'), self.test_factories):
+
+                    if name not in self._sides:
+                        continue
+
+                    try:
+                        test_instances.append(factory(*args, **kwargs))
+                    except myhdl.BlockError as e:
+                        raise myhdl.BlockError(
+                            'The %s factory returned an invalid object: %s' %
+                            (name, e))
+
+                clockgen = self.clockgen_factory[0](
+                    *self.clockgen_factory[1], **self.clockgen_factory[2])
 
                 try:
-                    test_instances.append(factory(*args, **kwargs))
-                except myhdl.BlockError as e:
-                    raise myhdl.BlockError(
-                        'The %s factory returned an invalid object: %s' %
-                        (name, e))
+                    init_reset = self.init_reset_factory[0](
+                        *self.init_reset_factory[1],
+                        **self.init_reset_factory[2])
+                except IndexError:
+                    init_reset = []
+
+                persistent_blocks = {
+                    'output_recorders': output_recorders,
+                    'coverage_monitors': coverage_monitors,
+                    'test_instances': test_instances,
+                    'clockgen': clockgen,
+                    'init_reset': init_reset}
+
+                # Only blocks made up entirely of generators can be
+                # restarted.
+                if self.reuse_elaboration and all(
+                    isinstance(each, _Instantiator) for each in
+                    _flatten_instances(
+                        list(persistent_blocks.values()), [])):
+
+                    self._persistent_blocks[self._sides] = persistent_blocks
+
+            else:
+                persistent_blocks = reused_blocks
 
             custom_sources = [
                 factory(*args, **kwargs) for factory, args, kwargs in
@@ -1641,43 +2426,798 @@ class SynchronousTest(object):
                 factory(*args, **kwargs) for factory, args, kwargs in
                 self.axi_stream_in_buffer_factories])
 
-            clockgen = self.clockgen_factory[0](
-                *self.clockgen_factory[1], **self.clockgen_factory[2])
+            sim_only_blocks['clockgen'] = persistent_blocks['clockgen']
+            sim_only_blocks['init_reset'] = persistent_blocks['init_reset']
 
-            try:
-                init_reset = self.init_reset_factory[0](
-                    *self.init_reset_factory[1], **self.init_reset_factory[2])
-            except IndexError:
-                init_reset = []
+            return [random_sources, playback_sources,
+                    persistent_blocks['output_recorders'],
+                    persistent_blocks['coverage_monitors'],
+                    persistent_blocks['test_instances'], custom_sources,
+                    axi_sources,
+                    [persistent_blocks['clockgen'],
+                     persistent_blocks['init_reset']]]
 
-            return [random_sources, output_recorders, test_instances,
-                    custom_sources, axi_sources, [clockgen, init_reset]]
+        # The simulation only blocks, which the cycle engine handles itself.
+        sim_only_blocks = {}
 
         top_level_block = top()
 
-        if vcd_name is not None:
-            traceSignals.name = vcd_name
-            trace = True
+        cycle_simulation = None
+        if engine == 'cycle' and vcd_name is None:
+            try:
+                cycle_simulation = CycleSimulation(
+                    top_level_block, self.clock, self.period,
+                    clock_block=sim_only_blocks['clockgen'],
+                    edge_generator_blocks=[sim_only_blocks['init_reset']])
+
+            except UnsupportedConstructError:
+                cycle_simulation = None
+
+        if cycle_simulation is not None:
+            self.engine_used = 'cycle'
+            self._simulation = cycle_simulation
+            self._simulation_traced = False
+
+        else:
+            self.engine_used = 'event'
+
+            if vcd_name is not None:
+                traceSignals.name = vcd_name
+                trace = True
+            else:
+                trace = False
+
+            # Generate the appropriate timescale based on the time_units. This
+            # is in the form '1ns/1ns' (when time_units is ns).
+            timescale = (
+                '1' + str(self.time_units) + '/1' + str(self.time_units))
+
+            top_level_block.config_sim(trace=trace, timescale=timescale)
+
+            self._simulation = top_level_block
+            self._simulation_traced = trace
+
+    def _seeded_random_source_factories(self, seed):
+        '''Return the random source factories with the seeds derived from
+        ``seed``, or the original factories if ``seed`` is ``None``.
+        '''
+        if seed is None:
+            return self.random_source_factories
+
+        # The ref and the dut sources on each signal share a seed, so map
+        # each of the original seeds to a new one.
+        seed_rng = random.Random(seed)
+        new_seeds = {}
+
+        random_source_factories = []
+        for factory, args, kwargs in self.random_source_factories:
+            if kwargs['seed'] not in new_seeds:
+                new_seeds[kwargs['seed']] = seed_rng.randrange(0, 0x5EEDF00D)
+
+            random_source_factories.append(
+                (factory, args, dict(kwargs, seed=new_seeds[kwargs['seed']])))
+
+        return random_source_factories
+
+    @_holds_simulation_lock
+    def continue_cosimulate(self, cycles):
+        '''Continue the simulation left running by a call to
+        :meth:`cosimulate` with ``resumable`` set to ``True``, for a further
+        ``cycles`` clock cycles (or until StopSimulation is raised if
+        ``cycles`` is ``None``).
+
+        The signals, the random sources and the BFMs all carry on from where
+        they were left, so the result is the same as if the original call to
+        :meth:`cosimulate` had run for all the cycles at once. What is
+        returned is the same as for :meth:`cosimulate`, with the outputs of
+        this call appended to the outputs of the previous calls.
+
+        The simulation can be continued any number of times. It is only
+        finished by :meth:`end_cosimulation`, the next call to
+        :meth:`cosimulate` or StopSimulation being raised.
+
+        If there is no simulation to continue, a ``RuntimeError`` is raised.
+        '''
+        if self._simulation is None:
+            raise RuntimeError(
+                'There is no simulation to continue: cosimulate should be '
+                'called with resumable set to True first.')
+
+        self._run_simulation(cycles, True)
+
+        return self._simulation_outputs()
+
+    @_holds_simulation_lock
+    def end_cosimulation(self):
+        '''Finish a simulation left running by a call to :meth:`cosimulate`
+        with ``resumable`` set to ``True``, clearing all the signals. This
+        should be called before any other simulation is run. It does nothing
+        if there is no simulation running.
+        '''
+        if self._simulation is None:
+            return
+
+        simulation = self._simulation
+        self._simulation = None
+
+        if self.engine_used == 'cycle':
+            simulation.quit()
+
         else:
-            trace = False
+            simulation.quit_sim()
+
+            if self._simulation_traced:
+                # MyHDL leaves the signals marked for tracing, which breaks
+                # any later simulation without a trace file.
+                for each_signal in myhdl._simulator._signals:
+                    each_signal._tracing = 0
+
+    async def cosimulate_async(
+        self, cycles, vcd_name=None, engine='event', seed=None,
+        chunk_cycles=1000, progress=None, executor=None):
+        '''A coroutine that does the same as :meth:`cosimulate`, but runs
+        the simulation in ``executor`` (the default executor of the event
+        loop if ``None``) so that the event loop is not blocked. The outputs
+        are returned when it finishes.
+
+        The simulation is run in chunks of ``chunk_cycles`` cycles. If
+        ``progress`` is not ``None``, it is called on the event loop after
+        each chunk with a dict with the following keys:
+            * ``'cycles'``: The number of cycles simulated so far.
+            * ``'total'``: ``cycles`` (which is ``None`` if the simulation
+              runs until StopSimulation is raised).
+        An ``asyncio.Queue`` can be used to consume the events by passing its
+        ``put_nowait`` method.
+
+        If the coroutine is cancelled (for example, by ``asyncio.wait_for``
+        timing out), the simulation is stopped at the end of the current
+        chunk and ended with :meth:`end_cosimulation`, after which the
+        cancellation propagates. ``chunk_cycles`` sets how long that can take.
+
+        The MyHDL simulator keeps its state in globals, so only one
+        simulation runs at a time. Any others wait for their turn in the
+        executor, and are abandoned without being started if they are
+        cancelled before then. Each :class:`SynchronousTest` should only have
+        one cosimulation at a time.
+        '''
+        if chunk_cycles < 1:
+            raise ValueError('Invalid chunk cycles: The number of cycles in '
+                             'each chunk should be at least 1.')
+
+        loop = asyncio.get_running_loop()
+        cancelled = threading.Event()
 
-        # Generate the appropriate timescale based on the time_units. This is
-        # in the form '1ns/1ns' (when time_units is ns).
-        timescale = '1' + str(self.time_units) + '/1' + str(self.time_units)
+        def report(completed):
+            if progress is not None:
+                loop.call_soon_threadsafe(
+                    progress, {'cycles': completed, 'total': cycles})
 
-        top_level_block.config_sim(trace=trace, timescale=timescale)
+        future = loop.run_in_executor(
+            executor, self._cosimulate_in_chunks, cycles, vcd_name, engine,
+            seed, chunk_cycles, cancelled, report)
 
         try:
-            if cycles is not None:
-                top_level_block.run_sim(duration=cycles*self.period, quiet=1)
-            else:
-                top_level_block.run_sim(duration=None, quiet=1)
+            return await asyncio.shield(future)
+
+        except asyncio.CancelledError:
+            cancelled.set()
+
+            # The simulation cannot be interrupted part way through a chunk,
+            # so wait for the executor to end it.
+            while not future.done():
+                try:
+                    await asyncio.wait([future])
+                except asyncio.CancelledError:
+                    pass
+
+            raise
+
+    def _cosimulate_in_chunks(self, cycles, vcd_name, engine, seed,
+                              chunk_cycles, cancelled, report):
+        '''Run a resumable cosimulation ``chunk_cycles`` cycles at a time,
+        calling ``report`` with the number of cycles simulated after each
+        chunk and ending the simulation early if ``cancelled`` is set. Return
+        the outputs, or ``None`` if it was cancelled.
+        '''
+        with _simulation_lock:
+            if cancelled.is_set():
+                return None
+
+            start_time = time.perf_counter()
+
+            # The whole cosimulation is recorded once it has finished, rather
+            # than the first chunk by cosimulate.
+            results_db = self.results_db
+            self.results_db = None
+
+            try:
+                completed = 0
+                while True:
+                    if cycles is None:
+                        chunk = chunk_cycles
+                    else:
+                        chunk = min(chunk_cycles, cycles - completed)
+
+                    if completed == 0:
+                        self.cosimulate(
+                            chunk, vcd_name=vcd_name, engine=engine,
+                            seed=seed, resumable=True)
+                    else:
+                        self.continue_cosimulate(chunk)
+
+                    if self._simulation is None:
+                        # StopSimulation was raised, so the chunk was cut
+                        # short.
+                        completed = len(self._outputs[1][self._clock_name])
+                        report(completed)
+                        break
+
+                    completed += chunk
+                    report(completed)
+
+                    if completed == cycles:
+                        break
+
+                    if cancelled.is_set():
+                        self.end_cosimulation()
+                        return None
+
+                self.end_cosimulation()
+
+            finally:
+                self.results_db = results_db
+
+            outputs = self._simulation_outputs()
+
+            if self.results_db is not None:
+                self._record_result(
+                    outputs, seed, time.perf_counter() - start_time)
+
+            return outputs
+
+    def bisect_failure(self, cycles, vcd_name=None, margin=5,
+                       engine='event', seed=None):
+        '''Find the first cycle on which the outputs of the dut and the ref
+        differ in a cosimulation of ``cycles`` cycles, then cosimulate again
+        only up to that cycle plus ``margin`` more cycles. If ``vcd_name`` is
+        not ``None``, a vcd file of the shorter cosimulation is written.
+        ``engine`` and ``seed`` are passed to :meth:`cosimulate` for every
+        run.
+
+        The stimulus is the same on every run, so the first differing cycle
+        can usually be read straight from the outputs (see
+        :func:`first_mismatch`). If the only differences are not tied to a
+        cycle (for example, in the packets of an AXI stream output), the
+        shortest failing run is found by bisecting the number of cycles
+        instead.
+
+        If the outputs agree, ``None`` is returned. Otherwise a dict is
+        returned with the following keys:
+            * ``'name'``: The name of the first output to differ.
+            * ``'cycle'``: The first cycle on which the outputs differ.
+            * ``'cycles'``: The number of cycles of the shorter cosimulation.
+            * ``'outputs'``: The outputs of the shorter cosimulation, as
+              returned by :meth:`cosimulate`.
+
+        A ``ValueError`` is raised if there is no dut or ``cycles`` is not a
+        positive integer.
+        '''
+        if self._dut_factory is None:
+            raise ValueError('Invalid dut: There should be a dut to compare '
+                             'with the ref.')
+
+        if (isinstance(cycles, bool) or
+            not isinstance(cycles, numbers.Integral) or cycles < 1):
+            raise ValueError('Invalid cycles: The number of cycles should be '
+                             'a positive integer.')
+
+        if margin < 0:
+            raise ValueError('Invalid margin: The margin should not be '
+                             'negative.')
+
+        def run_mismatch(run_cycles):
+            return first_mismatch(*self.cosimulate(
+                run_cycles, engine=engine, seed=seed))
+
+        mismatch = run_mismatch(cycles)
+
+        if mismatch is None:
+            return None
+
+        name, failing_cycle = mismatch
+
+        if failing_cycle is None:
+            # A run of upper cycles fails and a run of lower cycles does not.
+            lower = 0
+            upper = cycles
+            while upper - lower > 1:
+                test_cycles = (lower + upper)//2
+                if run_mismatch(test_cycles) is None:
+                    lower = test_cycles
+                else:
+                    upper = test_cycles
+
+            failing_cycle = upper - 1
+
+        trimmed_cycles = min(failing_cycle + 1 + margin, cycles)
+
+        outputs = self.cosimulate(
+            trimmed_cycles, vcd_name=vcd_name, engine=engine, seed=seed)
+
+        return {'name': name,
+                'cycle': failing_cycle,
+                'cycles': trimmed_cycles,
+                'outputs': outputs}
+
+    @_holds_simulation_lock
+    def cosimulate_sharded(self, cycles, shards, warmup_cycles, workers=None,
+                           engine='event', seed=None, verify=False):
+        '''Co-simulate the dut and the ref for ``cycles`` cycles, as
+        :meth:`cosimulate` does, but split the cycles into ``shards``
+        consecutive ranges that are simulated in parallel by ``workers``
+        forked processes (by default, one per CPU). The outputs of the shards
+        are stitched back together and returned (and kept) as the outputs of
+        :meth:`cosimulate` are. ``engine`` and ``seed`` are as for
+        :meth:`cosimulate`.
+
+        Each shard is a new simulation from the initial reset, in which the
+        random and playback sources are moved on (see the ``skip`` method
+        described in :func:`veriutils.random_source`) so that once the reset
+        is over, the stimulus is that of a serial cosimulation
+        ``warmup_cycles`` cycles before the start of the range of the shard.
+        The outputs of those warm up cycles are discarded. So the stimulus is
+        always that of a serial cosimulation, but the outputs are only the
+        same if the ref and the dut have settled into the same state by the
+        end of the warm up: that is, if their outputs depend on no more than
+        the last ``warmup_cycles`` cycles of stimulus. The first shard (and
+        any other that starts too close to the start to be moved on) is
+        simulated from the start.
+
+        If ``verify`` is ``True``, a serial cosimulation is run alongside the
+        shards and a ``ValueError`` is raised if the stitched outputs differ
+        from it, giving the first cycle that differs. This can be used to
+        check that ``warmup_cycles`` is long enough for a design.
+
+        The stimulus should only come from the random and playback sources,
+        so a ``ValueError`` is raised if there are custom sources, a
+        `'custom_reset'` arg, AXI stream interfaces or coverage. A
+        ``RuntimeError`` is raised if the ref or the dut raises
+        StopSimulation in any shard. The ref cache is not used.
+        '''
+        if cycles is None or cycles < 1:
+            raise ValueError('Invalid cycles: There should be at least one '
+                             'cycle.')
+
+        if shards < 1 or shards > cycles:
+            raise ValueError('Invalid shards: There should be at least one '
+                             'shard and no more shards than cycles.')
+
+        if warmup_cycles < 0:
+            raise ValueError('Invalid warm up cycles: The warm up cycles '
+                             'should not be negative.')
+
+        if workers is None:
+            workers = os.cpu_count() or 1
+
+        if workers < 1:
+            raise ValueError('Invalid workers: There should be at least one '
+                             'worker.')
+
+        if (not self._independent_sides() or self.coverage is not None or
+            (self._reset_name is not None and not self._use_init_reset)):
+            raise ValueError(
+                'Invalid test: Sharded cosimulations do not support custom '
+                'sources, custom resets, AXI stream interfaces or coverage.')
+
+        self.end_cosimulation()
+
+        # Each job is the number of values to skip and the number of cycles
+        # to simulate, and each shard keeps a range of the cycles of its job.
+        jobs = []
+        kept_ranges = []
+        boundaries = [cycles * n // shards for n in range(shards + 1)]
+        for start, end in zip(boundaries[:-1], boundaries[1:]):
+            skip = max(start - warmup_cycles - _SHARD_RESET_CYCLES, 0)
+            jobs.append((skip, end - skip))
+            kept_ranges.append((start - skip, end - skip))
+
+        if verify:
+            jobs.append((0, cycles))
+
+        workers = min(workers, len(jobs))
+
+        if (workers == 1 or
+            'fork' not in multiprocessing.get_all_start_methods()):
+            results = [self._simulate_shard(skip, job_cycles, engine, seed)
+                       for skip, job_cycles in jobs]
+
+        else:
+            executor = concurrent.futures.ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context('fork'),
+                initializer=_init_shard_worker, initargs=(self,))
+
+            try:
+                futures = [
+                    executor.submit(
+                        _run_shard_worker, skip, job_cycles, engine, seed)
+                    for skip, job_cycles in jobs]
+
+                results = [future.result() for future in futures]
+
+            finally:
+                executor.shutdown(wait=True, cancel_futures=True)
+
+        enum_types = self._enum_types()
+        results = [_CheckpointUnpickler(io.BytesIO(data), enum_types).load()
+                   for data in results]
+
+        job_outputs = []
+        try:
+            for result in results:
+                job_outputs.append([
+                    None if descriptor is None
+                    else SharedOutputs(descriptor, enum_types)
+                    for descriptor in result.get('shared_outputs', ())])
+
+            for result in results:
+                if 'error' in result:
+                    raise result['error']
+
+            if any(result['stopped'] for result in results):
+                raise RuntimeError(
+                    'StopSimulation was raised: Sharded cosimulations should '
+                    'run for all the cycles.')
+
+            stitched_outputs = []
+            for side in range(len(self._outputs)):
+                if self._outputs[side] is None:
+                    stitched_outputs.append(None)
+                    continue
+
+                side_outputs = {}
+                for (start, end), outputs in zip(kept_ranges, job_outputs):
+                    for key, values in outputs[side].outputs.items():
+                        side_outputs.setdefault(key, SignalOutput()).extend(
+                            values[start:end])
+
+                stitched_outputs.append(side_outputs)
+
+            if verify:
+                for side_outputs, serial_outputs in zip(
+                    stitched_outputs, job_outputs[-1]):
+
+                    if side_outputs is None:
+                        continue
+
+                    mismatch = first_mismatch(
+                        side_outputs, serial_outputs.outputs)
+
+                    if mismatch is not None:
+                        raise ValueError(
+                            'Invalid warm up cycles: The sharded outputs '
+                            'differ from those of a serial cosimulation on '
+                            'cycle {} of {}.'.format(mismatch[1], mismatch[0]))
 
         finally:
-            top_level_block.quit_sim()
+            for outputs in job_outputs:
+                for shared_outputs in outputs:
+                    if shared_outputs is not None:
+                        shared_outputs.close()
+                        shared_outputs.unlink()
+
+        self.engine_used = results[0]['engine_used']
+        self.parallel_used = False
+
+        # The recorders hold references to the output dicts, so they are
+        # updated in place.
+        for outputs, side_outputs in zip(self._outputs, stitched_outputs):
+            if outputs is not None:
+                outputs.clear()
+                for key in side_outputs:
+                    outputs[key] = side_outputs[key]
+
+        self._simulator_run = True
+
+        return self._simulation_outputs()
+
+    def _simulate_shard(self, skip, cycles, engine, seed):
+        '''Simulate ``cycles`` cycles with the stimulus moved on by ``skip``
+        values, returning what was recorded in shared memory, pickled by
+        :func:`_dump_simulation_result`. This runs in a forked process (or
+        in this one if there is only one worker) for
+        :meth:`cosimulate_sharded`.
+        '''
+        try:
+            self._start_simulation(None, engine, seed)
+
+            if self.engine_used == 'cycle':
+                instances = self._simulation.instances
+            else:
+                instances = _flatten_instances(self._simulation, [])
+
+            for each_inst in instances:
+                if hasattr(each_inst, 'skip'):
+                    each_inst.skip(skip)
+
+            stopped = self._run_simulation(cycles, False)
+
+            result = {
+                'stopped': stopped,
+                'engine_used': self.engine_used,
+                'shared_outputs': [
+                    None if outputs is None else share_outputs(outputs)
+                    for outputs in self._outputs]}
+
+        except Exception as e:
+            result = {'error': e, 'traceback': traceback.format_exc()}
+
+        return _dump_simulation_result(result, 'The shard simulation')
+
+    @_holds_simulation_lock
+    def save_checkpoint(self, filename):
+        '''Save the state of the simulation left running by a call to
+        :meth:`cosimulate` with ``resumable`` set to ``True`` to the file
+        ``filename``. The state can then be restored with
+        :meth:`restore_checkpoint`, possibly in a different process, and the
+        simulation continued from where it was saved.
+
+        If the simulation uses the ``'cycle'`` engine, the checkpoint
+        contains the values of all the signals used by the design, the state
+        of the random and playback sources, the position of the reset source,
+        the outputs recorded so far and the coverage. Any instance (for
+        example, in a custom source) that has ``get_state`` and ``set_state``
+        attributes also has the result of ``get_state()`` saved, which should
+        be picklable, and ``set_state`` called with it on restoring. Any
+        other state that is held outside of signals, such as in a list in a
+        block function, is not saved.
+
+        The generators run by the ``'event'`` engine (which is also used for
+        designs the cycle engine does not support, such as those with AXI
+        stream interfaces) cannot be saved. Instead, the checkpoint holds
+        the seeds of the random sources and the time of the simulation along
+        with the outputs, and
+        :meth:`restore_checkpoint` replays the simulation from the start up
+        to that time. This rebuilds all of its state (including the packets
+        held by the AXI stream BFMs), but takes as long as the simulation
+        took to get there.
+
+        If there is no simulation running, a ``RuntimeError`` is raised.
+        '''
+        if self._simulation is None:
+            raise RuntimeError(
+                'There is no simulation to checkpoint: cosimulate should be '
+                'called with resumable set to True first.')
+
+        if self.engine_used == 'cycle':
+            simulation_state = self._simulation.get_state()
+        else:
+            simulation_state = {
+                'random_seeds': [
+                    kwargs['seed'] for factory, args, kwargs in
+                    self._seeded_random_source_factories(
+                        self._simulation_seed)],
+                'time': myhdl.now()}
+
+        checkpoint = {
+            'simulation': simulation_state,
+            'outputs': self._outputs,
+            'coverage': (
+                None if self.coverage is None else self.coverage.get_state())}
+
+        with open(filename, 'wb') as f:
+            # The header is read first, to know how to restore the rest.
+            pickle.dump({'version': _CHECKPOINT_VERSION,
+                         'engine': self.engine_used}, f)
+            _CheckpointPickler(f).dump(checkpoint)
+
+    @_holds_simulation_lock
+    def restore_checkpoint(self, filename):
+        '''Restore a checkpoint saved with :meth:`save_checkpoint`, leaving
+        the simulation running so that it can be continued with
+        :meth:`continue_cosimulate`. The :class:`SynchronousTest` should be
+        constructed in the same way as the one that saved the checkpoint.
+
+        The simulation is restored with the engine it was saved from. A
+        checkpoint of an ``'event'`` engine simulation is restored by
+        replaying the simulation (see :meth:`save_checkpoint`).
+
+        Any simulation that is already running is finished first. A
+        ``ValueError`` is raised if the checkpoint does not match the design.
+        '''
+        with open(filename, 'rb') as f:
+            header = pickle.load(f)
+
+            if (not isinstance(header, dict) or
+                header.get('version', None) != _CHECKPOINT_VERSION):
+                raise ValueError('Invalid checkpoint: The checkpoint version '
+                                 'is not supported.')
+
+            if header['engine'] == 'cycle':
+                self._restore_cycle_checkpoint(f)
+            else:
+                self._restore_event_checkpoint(f)
 
         self._simulator_run = True
 
+    def _restore_cycle_checkpoint(self, f):
+        '''Restore the checkpoint of a cycle engine simulation from the
+        file ``f``.
+        '''
+        self._start_simulation(None, 'cycle', None)
+
+        try:
+            if self.engine_used != 'cycle':
+                raise ValueError(
+                    'Invalid checkpoint: The checkpoint is of a cycle engine '
+                    'simulation, but the design cannot use the cycle '
+                    'engine.')
+
+            enum_types = dict(
+                (tuple(sig._val._type._names), sig._val._type)
+                for sig in self._simulation.state_signals
+                if isinstance(sig._val, EnumItemType))
+
+            checkpoint = _CheckpointUnpickler(f, enum_types).load()
+
+            self._simulation.set_state(checkpoint['simulation'])
+
+            # The recorders hold references to the output dicts, so they are
+            # updated in place.
+            for outputs, saved_outputs in zip(
+                self._outputs, checkpoint['outputs']):
+
+                if outputs is not None:
+                    outputs.clear()
+                    for key in saved_outputs:
+                        outputs[key] = saved_outputs[key]
+
+            if self.coverage is not None:
+                self.coverage.set_state(checkpoint['coverage'])
+
+        except:
+            self.end_cosimulation()
+            raise
+
+    def _restore_event_checkpoint(self, f):
+        '''Restore the checkpoint of an event engine simulation from the
+        file ``f`` by replaying the simulation up to the time it was saved.
+        '''
+        checkpoint = _CheckpointUnpickler(f, self._enum_types()).load()
+        state = checkpoint['simulation']
+
+        if len(state['random_seeds']) != len(self.random_source_factories):
+            raise ValueError('Invalid checkpoint: The checkpoint is not from '
+                             'the same design.')
+
+        # The replay uses the seeds that the random sources were given when
+        # the checkpoint was saved.
+        random_source_factories = self.random_source_factories
+        self.random_source_factories = [
+            (factory, args, dict(kwargs, seed=random_seed))
+            for (factory, args, kwargs), random_seed in zip(
+                random_source_factories, state['random_seeds'])]
+
+        try:
+            self._start_simulation(None, 'event', None)
+        finally:
+            self.random_source_factories = random_source_factories
+
+        try:
+            if state['time'] > 0:
+                self._simulation.run_sim(duration=state['time'], quiet=1)
+
+            if self._simulation.sim._finished:
+                raise ValueError(
+                    'Invalid checkpoint: The simulation stopped before '
+                    'reaching the time of the checkpoint.')
+
+            for outputs, saved_outputs in zip(
+                self._outputs, checkpoint['outputs']):
+
+                if outputs is not None and outputs != saved_outputs:
+                    raise ValueError(
+                        'Invalid checkpoint: Replaying the simulation did '
+                        'not give the outputs of the checkpoint.')
+
+        except:
+            self.end_cosimulation()
+            raise
+
+    def _run_simulation(self, cycles, resumable):
+        '''Run the current simulation for ``cycles`` clock cycles, ending it
+        afterwards unless ``resumable`` is ``True``. It is always ended if
+        StopSimulation is raised or there is an error. Return ``True`` if
+        StopSimulation was raised.
+        '''
+        finished = True
+        try:
+            if self.engine_used == 'cycle':
+                stopped = self._simulation.run(cycles)
+
+            else:
+                if cycles is not None:
+                    self._simulation.run_sim(
+                        duration=cycles*self.period, quiet=1)
+                else:
+                    self._simulation.run_sim(duration=None, quiet=1)
+
+                stopped = self._simulation.sim._finished
+
+            finished = stopped or not resumable
+
+        finally:
+            if finished:
+                self.end_cosimulation()
+
+        if self._vectorized_ref is not None:
+            self._run_vectorized_ref()
+
+        return stopped
+
+    def _run_vectorized_ref(self):
+        '''Compute the outputs of the vectorized ref from everything that
+        has been recorded from the dut, replacing the outputs of the ref and
+        the coverage.
+        '''
+        dut_outputs, ref_outputs = self._outputs
+        ref_outputs.clear()
+
+        stimulus = {}
+        n_cycles = 0
+        for each_arg in self.elaborated_dut_args:
+            if each_arg.type in ('output', 'non-signal'):
+                continue
+
+            values = dut_outputs[each_arg.name]
+            n_cycles = len(values)
+
+            # Only the outputs are separate for the dut, so everything else
+            # is the same for the ref.
+            ref_outputs[each_arg.name] = SignalOutput(values)
+
+            if each_arg.type != 'clock':
+                stimulus[each_arg.name] = _stimulus_array(
+                    each_arg.object, values)
+
+        latency = self._vectorized_ref.latency
+        results = self._vectorized_ref.function(stimulus)
+
+        for each_arg in self.elaborated_args:
+            if each_arg.type != 'output':
+                continue
+
+            if each_arg.name not in results:
+                raise ValueError(
+                    'Invalid vectorized ref outputs: There are no values for '
+                    '{}.'.format(each_arg.name))
+
+            ref_outputs[each_arg.name] = SignalOutput(_output_values(
+                each_arg.name, each_arg.object, results[each_arg.name],
+                latency, n_cycles))
+
+        if self.coverage is not None:
+            # The coverage monitor only samples when the reset is inactive.
+            self.coverage.reset()
+
+            if self._reset_name is None:
+                reset_values = [not self.reset.active] * n_cycles
+            else:
+                reset_values = ref_outputs[self._reset_name]
+
+            names = self.coverage.names
+            values = [ref_outputs[each_name] for each_name in names]
+
+            for n in range(n_cycles):
+                if reset_values[n] != self.reset.active:
+                    self.coverage.sample(dict(
+                        (each_name, each_values[n]) for each_name, each_values
+                        in zip(names, values)))
+
+    def _simulation_outputs(self):
+        '''Return a copy of the outputs recorded so far, with the AXI
+        stream outputs added.
+        '''
         def axi_signals_from_name(name, output_set):
             object_path = name.split('.')
 
@@ -1727,6 +3267,9 @@ class SynchronousTest(object):
 
         The test vector that serves as the stimulus to all the inputs (except
         the clock) is generated by calls to the :meth:`cosimulate` method.
+        This includes the `'playback'` inputs, which are played back from the
+        values recorded during :meth:`cosimulate` rather than from the
+        original playback data.
         :meth:`cosimulate` should be run for at least as many cycles as is
         the simulation of :meth:`dut_convertible_top`. If
         cosimulate is run for fewer cycles than :meth:`dut_convertible_top`,
@@ -1923,20 +3466,118 @@ class SynchronousTest(object):
 def myhdl_cosimulation(cycles, dut_factory, ref_factory, args, arg_types,
                        period=None, custom_sources=None,
                        enforce_convertible_top_level_interfaces=True,
-                       vcd_name=None, time_units='ns'):
+                       vcd_name=None, time_units='ns',
+                       random_distributions=None, playback_data=None,
+                       coverage=None, engine='event'):
     '''Run a cosimulation of a pair of MyHDL instances. This is a thin
     wrapper around a :class:`SynchronousTest` object, in which the object
     is created and then the cosimulate method is run, with the ``cycles``
     argument. See the documentation for :class:`SynchronousTest` for the
-    definition of all the arguments except ``cycles``.
+    definition of all the arguments except ``cycles``, and
+    :meth:`SynchronousTest.cosimulate` for ``engine``.
 
     What is returned is what is returned from
     :meth:`SynchronousTest.cosimulate`.
     '''
     sim_object = SynchronousTest(
         dut_factory, ref_factory, args, arg_types, period, custom_sources,
-        enforce_convertible_top_level_interfaces, time_units=time_units)
+        enforce_convertible_top_level_interfaces, time_units=time_units,
+        random_distributions=random_distributions,
+        playback_data=playback_data, coverage=coverage)
+
+    return sim_object.cosimulate(cycles, vcd_name=vcd_name, engine=engine)
+
+def first_mismatch(dut_outputs, ref_outputs):
+    '''Compare the outputs of the dut and the ref, as returned by
+    :meth:`SynchronousTest.cosimulate`, and return the earliest difference
+    between them.
+
+    If the outputs agree, ``None`` is returned. Otherwise a tuple of
+    ``(name, cycle)`` is returned, in which ``name`` is the name of the
+    signal and ``cycle`` is the first cycle on which the values differ
+    (ties are broken by the sorted order of the names). If the only
+    differences are not in the values on a given cycle (for example, in the
+    packets of an AXI stream output), ``cycle`` is ``None``.
+
+    The outputs can also be those of :class:`veriutils.SharedOutputs`.
+    '''
+    earliest = None
+    other_mismatch = None
+
+    for name in sorted(set(dut_outputs) | set(ref_outputs)):
+
+        dut_values = dut_outputs.get(name, None)
+        ref_values = ref_outputs.get(name, None)
+
+        if (not isinstance(dut_values, (SignalOutput, SharedSequence)) or
+            not isinstance(ref_values, (SignalOutput, SharedSequence))):
+
+            if other_mismatch is None and dut_values != ref_values:
+                other_mismatch = (name, None)
+
+            continue
+
+        for cycle, (dut_value, ref_value) in enumerate(
+            zip(dut_values, ref_values)):
+
+            if earliest is not None and cycle >= earliest[1]:
+                break
+
+            if dut_value != ref_value:
+                earliest = (name, cycle)
+                break
+
+        else:
+            cycle = min(len(dut_values), len(ref_values))
+
+            if (len(dut_values) != len(ref_values) and
+                (earliest is None or cycle < earliest[1])):
+                earliest = (name, cycle)
+
+    if earliest is None:
+        return other_mismatch
+
+    return earliest
+
+def compare_coverage_closure(
+    cycles, ref_factory, args, arg_types, coverpoints, update_interval=64,
+    bias=0.75, rng=None, **kwargs):
+    '''Measure how many cycles it takes to hit every bin of ``coverpoints``
+    (a list of :class:`veriutils.CoverPoint` objects) with adaptive stimulus
+    compared to uniform stimulus.
+
+    The reference design given by ``ref_factory`` is simulated for ``cycles``
+    cycles twice, with the random sources seeded in the same way: once with
+    an adaptive :class:`veriutils.Coverage` (using ``update_interval`` and
+    ``bias``) and once with one that only tracks the coverage. The seeds are
+    derived from a single value drawn from ``rng`` (a
+    :class:`random.Random`), or from the :mod:`random` module if it is
+    ``None``, which is otherwise left alone. Any other keyword arguments are
+    passed on to :class:`SynchronousTest`.
+
+    Return a dict with the keys ``'adaptive'`` and ``'uniform'``, each
+    of which is the :meth:`veriutils.Coverage.report` of the respective
+    simulation.
+    '''
+    if rng is None:
+        rng = random
+
+    seed = rng.getrandbits(64)
+
+    reports = {}
+    for mode, adaptive in (('adaptive', True), ('uniform', False)):
+
+        coverage = Coverage(
+            coverpoints, adaptive=adaptive, update_interval=update_interval,
+            bias=bias)
+
+        sim_object = SynchronousTest(
+            None, ref_factory, args, arg_types, coverage=coverage,
+            rng=random.Random(seed), **kwargs)
+        sim_object.cosimulate(cycles)
+
+        reports[mode] = coverage.report()
 
-    return sim_object.cosimulate(cycles, vcd_name=vcd_name)
+    return reports
 
 
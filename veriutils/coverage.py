@@ -0,0 +1,263 @@
+from myhdl import block, always, intbv
+
+from .distributions import AdaptiveDistribution
+
+import copy
+
+__all__ = ['CoverPoint', 'Coverage', 'coverage_monitor']
+
+class CoverPoint(object):
+    '''A set of coverage bins on a single signal.
+
+    ``name`` is the full name of the signal, as used in the outputs of
+    :meth:`veriutils.SynchronousTest.cosimulate` (e.g. ``'a'``, ``'a.b'`` or
+    ``'a[3]'``).
+
+    ``bins`` is either a dict, in which the keys are the bin names and the
+    values define the bins, or an iterable of bin definitions, in which case
+    the bin names are the string representations of the definitions. A bin
+    definition is either a single value or a ``(lower, upper)`` tuple
+    denoting the half open range ``[lower, upper)``.
+    '''
+
+    def __init__(self, name, bins):
+
+        self.name = name
+
+        if isinstance(bins, dict):
+            bins = bins.items()
+        else:
+            bins = [(str(each), each) for each in bins]
+
+        self.bin_names = []
+        self.bin_ranges = []
+        self._matchers = []
+
+        for bin_name, bin_def in bins:
+
+            if isinstance(bin_def, tuple):
+                try:
+                    lower, upper = (int(each) for each in bin_def)
+                except (TypeError, ValueError):
+                    raise ValueError(
+                        'Invalid bin: The range of bin {} should be a '
+                        '(lower, upper) pair of integers.'.format(bin_name))
+
+                if lower >= upper:
+                    raise ValueError(
+                        'Invalid bin: The range of bin {} is '
+                        'empty.'.format(bin_name))
+
+                matcher = (
+                    lambda val, lower=lower, upper=upper:
+                    lower <= int(val) < upper)
+
+            elif isinstance(bin_def, (int, intbv)):
+                lower = int(bin_def)
+                upper = lower + 1
+                matcher = lambda val, bin_def=bin_def: val == bin_def
+
+            else:
+                # Enums and the like cannot be targeted
+                lower = None
+                upper = None
+                matcher = lambda val, bin_def=bin_def: val == bin_def
+
+            self.bin_names.append(bin_name)
+            self.bin_ranges.append((lower, upper))
+            self._matchers.append(matcher)
+
+        if len(self.bin_names) == 0:
+            raise ValueError('Invalid bins: There should be at least one bin '
+                             'in cover point {}.'.format(name))
+
+        if len(set(self.bin_names)) != len(self.bin_names):
+            raise ValueError('Invalid bins: The bin names in cover point {} '
+                             'should be unique.'.format(name))
+
+    def __repr__(self):
+        return 'CoverPoint(%r, %r)' % (
+            self.name, dict(zip(self.bin_names, self.bin_ranges)))
+
+    def matching_bins(self, val):
+        '''Return the indices of the bins that contain ``val``.
+        '''
+        return [n for n, matcher in enumerate(self._matchers)
+                if matcher(val)]
+
+class Coverage(object):
+    '''Tracks the hits on a set of :class:`CoverPoint` objects during a
+    simulation and, if ``adaptive`` is ``True``, biases the random stimulus
+    towards the bins that have not been hit.
+
+    The biasing works through :class:`veriutils.AdaptiveDistribution`
+    objects, which are created with :meth:`adaptive_distribution` for each
+    cover point on a `'random'` signal (this is done automatically by
+    :class:`veriutils.SynchronousTest`). Every ``update_interval`` cycles,
+    each of those distributions is biased towards the unhit bins of its cover
+    point with probability ``bias``. Cover points on other signals, such as
+    outputs, are tracked and reported but cannot steer the stimulus directly.
+
+    With ``adaptive`` set to ``False``, the coverage is only tracked. This
+    gives a baseline to compare against.
+    '''
+
+    def __init__(self, coverpoints, adaptive=True, update_interval=64,
+                 bias=0.75):
+
+        self.coverpoints = list(coverpoints)
+
+        names = [each.name for each in self.coverpoints]
+        if len(set(names)) != len(names):
+            raise ValueError('Invalid cover points: There should only be one '
+                             'cover point per signal.')
+
+        if update_interval < 1:
+            raise ValueError('Invalid update interval: The update interval '
+                             'should be at least 1.')
+
+        if bias < 0 or bias > 1:
+            raise ValueError('Invalid bias: The bias should be between 0 '
+                             'and 1.')
+
+        self.adaptive = adaptive
+        self.update_interval = update_interval
+        self.bias = bias
+
+        self._distributions = {}
+        self.reset()
+
+    @property
+    def names(self):
+        '''The names of the signals with a cover point.
+        '''
+        return [each.name for each in self.coverpoints]
+
+    def reset(self):
+        '''Clear all the hits and remove any bias from the distributions.
+        '''
+        self.hits = dict(
+            (each.name, [0] * len(each.bin_names))
+            for each in self.coverpoints)
+
+        self.cycles = 0
+        self.closure_cycle = None
+
+        for distribution in self._distributions.values():
+            distribution.reset()
+
+    def adaptive_distribution(self, name, base=None):
+        '''Return the :class:`veriutils.AdaptiveDistribution` that should be
+        used for the random signal called ``name``. ``base`` is the
+        distribution to use when there is no bias (``None`` for a uniform
+        distribution).
+        '''
+        distribution = AdaptiveDistribution(base, bias=self.bias)
+        self._distributions[name] = distribution
+        return distribution
+
+    @property
+    def closed(self):
+        '''``True`` if every bin has been hit.
+        '''
+        return all(all(hits) for hits in self.hits.values())
+
+    def unhit_bins(self, name):
+        '''Return the names of the bins of the cover point on ``name`` that
+        have not yet been hit.
+        '''
+        coverpoint = self.coverpoints[self.names.index(name)]
+        return [bin_name for bin_name, hits
+                in zip(coverpoint.bin_names, self.hits[name]) if hits == 0]
+
+    def sample(self, values):
+        '''Update the hits from a dict of the values of the signals on a
+        single clock cycle. Every cover point should have an entry in
+        ``values``.
+        '''
+        for coverpoint in self.coverpoints:
+            hits = self.hits[coverpoint.name]
+            for n in coverpoint.matching_bins(values[coverpoint.name]):
+                hits[n] += 1
+
+        self.cycles += 1
+
+        if self.closure_cycle is None and self.closed:
+            self.closure_cycle = self.cycles
+
+        if self.adaptive and self.cycles % self.update_interval == 0:
+            self.update_bias()
+
+    def update_bias(self):
+        '''Bias each adaptive distribution towards the unhit bins of its cover
+        point.
+        '''
+        for coverpoint in self.coverpoints:
+            if coverpoint.name not in self._distributions:
+                continue
+
+            targets = [
+                bin_range for bin_range, hits in
+                zip(coverpoint.bin_ranges, self.hits[coverpoint.name])
+                if hits == 0 and bin_range[0] is not None]
+
+            # The random sources might have already drawn the value for the
+            # next cycle, so the change applies from the one after that.
+            self._distributions[coverpoint.name].bias_towards(
+                targets, from_sample=self.cycles + 1)
+
+    def get_state(self):
+        '''Return the hits and the current bias of the distributions, which
+        can be restored with :meth:`set_state`.
+        '''
+        return {'hits': copy.deepcopy(self.hits),
+                'cycles': self.cycles,
+                'closure_cycle': self.closure_cycle,
+                'schedules': dict(
+                    (name, list(distribution._schedule))
+                    for name, distribution in self._distributions.items())}
+
+    def set_state(self, state):
+        '''Restore a state returned by :meth:`get_state`.
+        '''
+        self.hits = copy.deepcopy(state['hits'])
+        self.cycles = state['cycles']
+        self.closure_cycle = state['closure_cycle']
+
+        for name, schedule in state['schedules'].items():
+            self._distributions[name]._schedule = list(schedule)
+
+    def report(self):
+        '''Return a dict describing the coverage. ``'cycles'`` is the number
+        of cycles sampled, ``'closure_cycle'`` is the number of cycles it took
+        for every bin to be hit (or ``None`` if that never happened) and
+        ``'bins'`` is a dict of dicts giving the number of hits on each bin
+        of each cover point.
+        '''
+        bins = {}
+        for coverpoint in self.coverpoints:
+            bins[coverpoint.name] = dict(
+                zip(coverpoint.bin_names, self.hits[coverpoint.name]))
+
+        return {'cycles': self.cycles,
+                'closure_cycle': self.closure_cycle,
+                'bins': bins}
+
+@block
+def coverage_monitor(coverage, signals, clock, reset):
+    '''Samples the signals in the dict ``signals`` into ``coverage`` (a
+    :class:`Coverage` instance) on every positive clock edge on which
+    ``reset`` is not active. The keys of ``signals`` are the cover point
+    names.
+    '''
+
+    names = list(signals.keys())
+    signal_list = [signals[name] for name in names]
+
+    @always(clock.posedge)
+    def monitor():
+        if reset.val != reset.active:
+            coverage.sample(
+                dict(zip(names, [each.val for each in signal_list])))
+
+    return monitor
@@ -0,0 +1,614 @@
+'''A cycle based simulator for designs in which every process is either
+synchronous to a single clock or combinatorial.
+
+MyHDL's simulator is event driven, which means every clock edge goes through
+the scheduler, the delta cycles and the generator machinery of every process.
+For a purely synchronous design, all that is needed is to run each clocked
+process once per edge and then settle the combinatorial logic, which is what
+:class:`CycleSimulation` does.
+'''
+
+import myhdl
+from myhdl import StopSimulation
+from myhdl import _simulator
+from myhdl._block import _Block
+from myhdl._instance import _Instantiator
+from myhdl._always_seq import _AlwaysSeq
+from myhdl._always_comb import _AlwaysComb
+from myhdl._always import _Always
+from myhdl._Signal import _Signal, _WaiterList, _isListOfSigs
+from myhdl._ShadowSignal import _SliceSignal, ConcatSignal, _ShadowSignal
+
+import copy
+import heapq
+
+__all__ = ['CycleSimulation', 'UnsupportedConstructError']
+
+# Added to the event waiters of a signal so that updating the signal returns
+# something if (and only if) it changes.
+_CHANGE_MARKER = object()
+
+class UnsupportedConstructError(Exception):
+    '''Raised when a design contains something that
+    :class:`CycleSimulation` cannot simulate.
+    '''
+    pass
+
+def _flatten_instances(obj, instances):
+    if isinstance(obj, _Block):
+        for each in obj.subs:
+            _flatten_instances(each, instances)
+
+    elif isinstance(obj, (list, tuple)):
+        for each in obj:
+            _flatten_instances(each, instances)
+
+    else:
+        instances.append(obj)
+
+    return instances
+
+def _signals_from_names(names, symdict):
+    '''Return a list of the signals in ``symdict`` that are referred to by
+    ``names``. Lists of signals are expanded.
+    '''
+    signals = []
+    for name in names:
+        obj = symdict.get(name, None)
+        if isinstance(obj, _Signal):
+            signals.append(obj)
+        elif _isListOfSigs(obj):
+            signals.extend(obj)
+
+    return signals
+
+class _CombProcess(object):
+    '''A process that is run whenever one of its inputs changes.
+    '''
+
+    def __init__(self, func, inputs, outputs, run_initially, name):
+        self.func = func
+        self.inputs = inputs
+        self.outputs = outputs
+        self.run_initially = run_initially
+        self.name = name
+        self.level = 0
+        self.rank = 0
+
+def _shadow_signal_process(shadow_signal):
+
+    generator = shadow_signal._waiter.generator
+    func = lambda: next(generator)
+
+    if isinstance(shadow_signal, _SliceSignal):
+        inputs = [shadow_signal._sig]
+    else:
+        inputs = list(shadow_signal._sigargs)
+
+    return _CombProcess(
+        func, inputs, [shadow_signal], True, repr(shadow_signal))
+
+def _design_signals(instances, comb_procs):
+    '''Return the signals of the design made up of ``instances`` and
+    ``comb_procs``, including the shadow signals derived from them. They are
+    found from the signals that the design refers to, rather than from
+    MyHDL's list of every signal ever created, which includes those of
+    every other design.
+    '''
+    pending = []
+    for inst in instances:
+        pending.extend(inst.sigdict[name] for name in sorted(inst.sigdict))
+        for name in sorted(inst.losdict):
+            pending.extend(inst.losdict[name])
+
+    for proc in comb_procs:
+        pending.extend(proc.inputs)
+        pending.extend(proc.outputs)
+
+    signals = []
+    signal_ids = set()
+
+    # The list grows as the signals that each signal is derived from, or
+    # that are derived from it, are found.
+    for sig in pending:
+        if id(sig) in signal_ids:
+            continue
+
+        signal_ids.add(id(sig))
+        signals.append(sig)
+
+        pending.extend(sig._slicesigs)
+
+        if isinstance(sig, _SliceSignal):
+            pending.append(sig._sig)
+        elif isinstance(sig, ConcatSignal):
+            pending.extend(sig._sigargs)
+
+    return signals
+
+def _edge_generator_process(inst, edges):
+    '''Wrap the generator of ``inst``, which should only ever yield one of
+    ``edges`` (a list of ``(edge, edge_name)`` pairs), so that it can be run
+    on each edge.
+    '''
+    state = {'generator': inst.gen, 'edge': None, 'steps': 0}
+
+    def step():
+        state['steps'] += 1
+        try:
+            clause = next(state['generator'])
+        except StopIteration:
+            state['edge'] = None
+            return
+
+        for edge, edge_name in edges:
+            if clause is edge:
+                state['edge'] = edge_name
+                return
+
+        raise UnsupportedConstructError(
+            'A generator that can only wait on the clock waited on something '
+            'else: {}'.format(clause))
+
+    def replay(steps):
+        # Generators cannot be copied, so the only way to get one back to a
+        # given point is to start it again and step it that many times.
+        inst.gen = inst.genfunc()
+        state['generator'] = inst.gen
+        state['edge'] = None
+        state['steps'] = 0
+
+        for n in range(steps):
+            step()
+
+    return step, state, replay
+
+class CycleSimulation(object):
+    '''Simulates ``top_level_block`` one clock edge at a time.
+
+    ``clock`` is the single clock of the design and ``period`` is its period.
+    The clock is driven by the simulator, so the block that would otherwise
+    drive it (``clock_block``) is not simulated. The clock starts at its
+    current value and the first edge is half a period later, as with
+    :func:`veriutils.clock_source`.
+
+    The supported processes are:
+        * ``always_seq`` blocks on an edge of ``clock`` with either no reset
+          or a synchronous reset.
+        * ``always`` blocks on a single edge of ``clock``.
+        * ``always_comb`` blocks and ``always`` blocks that are sensitive to
+          the level of signals (run whenever an input changes, in
+          topological order).
+        * Slice and concatenation shadow signals.
+        * The generators of the blocks in ``edge_generator_blocks``, which
+          should only ever wait on an edge of ``clock`` (for example,
+          :func:`veriutils.init_reset_source`).
+
+    Anything else causes an :class:`UnsupportedConstructError` to be raised
+    on construction, in which case the event driven simulator should be used
+    instead.
+    '''
+
+    def __init__(self, top_level_block, clock, period, clock_block=None,
+                 edge_generator_blocks=()):
+
+        self.clock = clock
+        self.even_period = period//2
+        self.odd_period = period - self.even_period
+
+        skip = set()
+        if clock_block is not None:
+            skip.update(
+                id(each) for each in _flatten_instances(clock_block, []))
+
+        edge_generators = set()
+        for each_block in edge_generator_blocks:
+            edge_generators.update(
+                id(each) for each in _flatten_instances(each_block, []))
+
+        posedge_procs = []
+        negedge_procs = []
+        comb_procs = []
+        self._edge_generators = []
+
+        edges = [(clock.posedge, 'posedge'), (clock.negedge, 'negedge')]
+
+        self.instances = []
+
+        for inst in _flatten_instances(top_level_block, []):
+
+            if id(inst) in skip:
+                continue
+
+            if not isinstance(inst, _Instantiator):
+                raise UnsupportedConstructError(
+                    'Unsupported object in the design: {}'.format(inst))
+
+            self.instances.append(inst)
+
+            if id(inst) in edge_generators:
+                self._edge_generators.append(
+                    _edge_generator_process(inst, edges))
+                continue
+
+            if isinstance(inst, _AlwaysSeq):
+                edge = inst.senslist[0]
+
+                if len(inst.senslist) != 1:
+                    raise UnsupportedConstructError(
+                        'Asynchronous resets are not supported: '
+                        '{}'.format(inst.name))
+
+                if inst.reset is None:
+                    proc = inst.func
+                else:
+                    proc = self._reset_process(inst)
+
+            elif isinstance(inst, _AlwaysComb):
+                comb_procs.append(_CombProcess(
+                    inst.func, list(inst.senslist),
+                    _signals_from_names(inst.outputs, inst.symdict),
+                    True, inst.name))
+                continue
+
+            elif type(inst) is _Always:
+                senslist = inst.senslist
+
+                if all(isinstance(each, _Signal) for each in senslist):
+                    comb_procs.append(_CombProcess(
+                        inst.func, list(senslist),
+                        _signals_from_names(inst.outputs, inst.symdict),
+                        False, inst.name))
+                    continue
+
+                if len(senslist) != 1:
+                    raise UnsupportedConstructError(
+                        'Unsupported sensitivity list: {}'.format(inst.name))
+
+                edge = senslist[0]
+                proc = inst.func
+
+            else:
+                raise UnsupportedConstructError(
+                    'Only always_seq, always_comb and always blocks are '
+                    'supported: {}'.format(inst.name))
+
+            if edge is clock.posedge:
+                posedge_procs.append(proc)
+            elif edge is clock.negedge:
+                negedge_procs.append(proc)
+            else:
+                raise UnsupportedConstructError(
+                    'Processes should only be sensitive to the clock: '
+                    '{}'.format(inst.name))
+
+        self._signals = _design_signals(self.instances, comb_procs)
+
+        for sig in self._signals:
+            if isinstance(sig, (_SliceSignal, ConcatSignal)):
+                comb_procs.append(_shadow_signal_process(sig))
+
+            elif isinstance(sig, _ShadowSignal):
+                # Only a problem if it is actually used by the design
+                for proc in comb_procs:
+                    if any(each is sig for each in proc.inputs):
+                        raise UnsupportedConstructError(
+                            'Unsupported shadow signal: {}'.format(sig))
+
+        self._posedge_procs = posedge_procs
+        self._negedge_procs = negedge_procs
+        self._comb_procs = self._rank(comb_procs)
+
+        self._sensitivity = {}
+        for n, proc in enumerate(self._comb_procs):
+            for sig in proc.inputs:
+                if id(sig) not in self._sensitivity:
+                    self._sensitivity[id(sig)] = []
+                    sig._eventWaiters.append(_CHANGE_MARKER)
+
+                self._sensitivity[id(sig)].append(n)
+
+        self._edge_count = 0
+        self._started = False
+
+        # The signals that make up the state of the design, in an order that
+        # only depends on the design.
+        self.state_signals = [clock]
+        state_signal_ids = set([id(clock)])
+        for inst in self.instances:
+            inst_signals = [
+                inst.sigdict[name] for name in sorted(inst.sigdict)]
+            for name in sorted(inst.losdict):
+                inst_signals.extend(inst.losdict[name])
+
+            for sig in inst_signals:
+                if id(sig) not in state_signal_ids:
+                    state_signal_ids.add(id(sig))
+                    self.state_signals.append(sig)
+
+    @staticmethod
+    def _reset_process(inst):
+        reset = inst.reset
+        active = reset.active
+        reset_sigs = inst.reset_sigs
+        reset_vars = inst.reset_vars
+        func = inst.func
+
+        def proc():
+            if reset._val == active:
+                reset_sigs()
+                reset_vars()
+            else:
+                func()
+
+        return proc
+
+    @staticmethod
+    def _rank(comb_procs):
+        '''Sort the combinatorial processes topologically, setting the level
+        of each process such that no process depends on a process at the same
+        or a higher level. Processes in a loop are placed together at the
+        highest level in their original order.
+        '''
+        drivers = {}
+        for n, proc in enumerate(comb_procs):
+            for sig in proc.outputs:
+                drivers.setdefault(id(sig), set()).add(n)
+
+        dependencies = []
+        for n, proc in enumerate(comb_procs):
+            deps = set()
+            for sig in proc.inputs:
+                deps.update(drivers.get(id(sig), ()))
+            deps.discard(n)
+            dependencies.append(deps)
+
+        ordered = []
+        placed = set()
+        remaining = list(range(len(comb_procs)))
+        level = 0
+        while remaining:
+            ready = [n for n in remaining if dependencies[n] <= placed]
+            if len(ready) == 0:
+                ready = remaining
+
+            for n in ready:
+                comb_procs[n].level = level
+
+            ordered.extend(ready)
+            placed.update(ready)
+            remaining = [n for n in remaining if n not in placed]
+            level += 1
+
+        ranked = [comb_procs[n] for n in ordered]
+        for rank, proc in enumerate(ranked):
+            proc.rank = rank
+
+        return ranked
+
+    def _update_signals(self):
+        '''Apply all the pending signal updates and return the signals that
+        changed.
+        '''
+        siglist = _simulator._siglist
+        changed = []
+        while siglist:
+            pending = siglist[:]
+            siglist.clear()
+            for sig in pending:
+                # Only the signals that a combinatorial process is sensitive
+                # to have a waiter, so only they return anything when they
+                # change.
+                if sig._update():
+                    sig._eventWaiters.append(_CHANGE_MARKER)
+                    changed.append(sig)
+
+        return changed
+
+    def _settle(self, changed, initial=False):
+        '''Run the combinatorial processes until nothing changes.
+
+        The processes are run a level at a time, with the signals updated
+        after each level. The processes in a level do not depend on each
+        other, so this gives the same result as running them one at a time,
+        but with far fewer signal updates.
+        '''
+        comb_procs = self._comb_procs
+        sensitivity = self._sensitivity
+
+        if not comb_procs:
+            return
+
+        queued = set()
+        heap = []
+
+        if initial:
+            for proc in comb_procs:
+                if proc.run_initially:
+                    queued.add(proc.rank)
+                    heap.append((proc.level, proc.rank))
+
+            heapq.heapify(heap)
+
+        while True:
+            for sig in changed:
+                for rank in sensitivity.get(id(sig), ()):
+                    if rank not in queued:
+                        queued.add(rank)
+                        heapq.heappush(heap, (comb_procs[rank].level, rank))
+
+            if not heap:
+                break
+
+            level = heap[0][0]
+            while heap and heap[0][0] == level:
+                rank = heapq.heappop(heap)[1]
+                queued.discard(rank)
+                comb_procs[rank].func()
+
+            changed = self._update_signals()
+
+    def _edge_time(self, edge_count):
+        '''Return the time of edge number ``edge_count``.
+        '''
+        return ((edge_count + 1)//2 * self.even_period +
+                edge_count//2 * self.odd_period)
+
+    def _edge_function(self, edge_name, procs):
+        '''Return a function that simulates a single ``edge_name`` edge of
+        the clock.
+        '''
+        clock = self.clock
+        clock_val = edge_name == 'posedge'
+        edge_generators = self._edge_generators
+        update_signals = self._update_signals
+        settle = self._settle
+
+        def set_time():
+            self._edge_count += 1
+            _simulator._time = self._edge_time(self._edge_count)
+
+        if (len(procs) == 0 and len(edge_generators) == 0 and
+            id(clock) not in self._sensitivity):
+
+            # Nothing happens on this edge apart from the clock changing
+            def edge():
+                set_time()
+                clock._next = clock_val
+                clock._update()
+
+            return edge
+
+        def edge():
+            set_time()
+            clock._next = clock_val
+            if clock._update():
+                # The clock is an input to a combinatorial process
+                clock._eventWaiters.append(_CHANGE_MARKER)
+
+            for proc in procs:
+                proc()
+
+            for step, state, replay in edge_generators:
+                if state['edge'] == edge_name:
+                    step()
+
+            changed = update_signals()
+            changed.append(clock)
+            settle(changed)
+
+        return edge
+
+    def _start(self):
+        del _simulator._siglist[:]
+        _simulator._time = 0
+
+        for step, state, replay in self._edge_generators:
+            step()
+
+        self._settle(self._update_signals(), initial=True)
+        self._started = True
+
+    def run(self, cycles=None):
+        '''Run the simulation for ``cycles`` clock cycles (that is, for
+        ``cycles`` times the period), or until ``StopSimulation`` is raised if
+        ``cycles`` is ``None``. The simulation can be continued with another
+        call.
+
+        Return ``True`` if the simulation was stopped with
+        ``StopSimulation``.
+        '''
+        if not self._started:
+            self._start()
+
+        posedge = self._edge_function('posedge', self._posedge_procs)
+        negedge = self._edge_function('negedge', self._negedge_procs)
+
+        if self.clock._val:
+            first_edge, second_edge = negedge, posedge
+        else:
+            first_edge, second_edge = posedge, negedge
+
+        try:
+            if cycles is None:
+                while True:
+                    first_edge()
+                    second_edge()
+
+            else:
+                for n in range(cycles):
+                    first_edge()
+                    second_edge()
+
+        except StopSimulation:
+            return True
+
+        return False
+
+    def get_state(self):
+        '''Return the state of the simulation, which can be restored with
+        :meth:`set_state`. This should only be called between calls to
+        :meth:`run`.
+
+        The state is made up of the number of clock edges so far, the values
+        of the signals in :attr:`state_signals`, the position of each
+        generator and the result of calling ``get_state()`` on each instance
+        that has both a ``get_state`` and a ``set_state`` attribute. State
+        that is held anywhere else is not included.
+        '''
+        if not self._started:
+            self._start()
+
+        return {
+            'edge_count': self._edge_count,
+            'signals': [(copy.deepcopy(sig._val), copy.deepcopy(sig._next))
+                        for sig in self.state_signals],
+            'edge_generators': [
+                state['steps'] for step, state, replay in
+                self._edge_generators],
+            'instances': [inst.get_state() for inst in self.instances
+                          if hasattr(inst, 'get_state') and
+                          hasattr(inst, 'set_state')]}
+
+    def set_state(self, state):
+        '''Restore a state returned by :meth:`get_state`, which might have
+        come from a different simulation of the same design.
+        '''
+        if not self._started:
+            self._start()
+
+        stateful_instances = [
+            inst for inst in self.instances
+            if hasattr(inst, 'get_state') and hasattr(inst, 'set_state')]
+
+        if (len(state['signals']) != len(self.state_signals) or
+            len(state['edge_generators']) != len(self._edge_generators) or
+            len(state['instances']) != len(stateful_instances)):
+            raise ValueError('Invalid state: The state is not from the same '
+                             'design.')
+
+        for (step, generator_state, replay), steps in zip(
+            self._edge_generators, state['edge_generators']):
+            replay(steps)
+
+        # Replaying the generators might have set some signals, which the
+        # saved values replace.
+        del _simulator._siglist[:]
+
+        for sig, (val, next_val) in zip(self.state_signals, state['signals']):
+            sig._val = copy.deepcopy(val)
+            sig._next = copy.deepcopy(next_val)
+
+        for inst, inst_state in zip(stateful_instances, state['instances']):
+            inst.set_state(inst_state)
+
+        self._edge_count = state['edge_count']
+        _simulator._time = self._edge_time(self._edge_count)
+
+    def quit(self):
+        '''Finish the simulation, clearing the signals of the design in the
+        same way as MyHDL's simulator.
+        '''
+        del _simulator._siglist[:]
+        for sig in self._signals:
+            sig._clear()
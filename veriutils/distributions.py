@@ -0,0 +1,409 @@
+import abc
+import random
+
+__all__ = ['AliasTable', 'Distribution', 'WeightedValues', 'RangeMixture',
+           'EdgeBoost', 'AdaptiveDistribution']
+
+class AliasTable(object):
+    '''Draws indices from a discrete distribution in constant time using
+    Vose's alias method.
+
+    ``weights`` is a sequence of non-negative numbers, at least one of which
+    should be non-zero. Index ``n`` is returned by :meth:`sample` with
+    probability ``weights[n]/sum(weights)``.
+
+    Construction is linear in the number of weights, but every subsequent
+    draw costs a single call to the random number generator.
+    '''
+
+    def __init__(self, weights):
+
+        weights = [float(each) for each in weights]
+
+        if len(weights) == 0:
+            raise ValueError('Invalid weights: There should be at least one '
+                             'weight.')
+
+        if any(each < 0 for each in weights):
+            raise ValueError('Invalid weights: All the weights should be '
+                             'non-negative.')
+
+        total = sum(weights)
+
+        if total <= 0:
+            raise ValueError('Invalid weights: At least one weight should be '
+                             'greater than zero.')
+
+        n_weights = len(weights)
+        scaled = [each * n_weights / total for each in weights]
+
+        probability = [1.0] * n_weights
+        alias = list(range(n_weights))
+
+        small = [n for n, each in enumerate(scaled) if each < 1.0]
+        large = [n for n, each in enumerate(scaled) if each >= 1.0]
+
+        while small and large:
+            less = small.pop()
+            more = large.pop()
+
+            probability[less] = scaled[less]
+            alias[less] = more
+
+            scaled[more] = (scaled[more] + scaled[less]) - 1.0
+
+            if scaled[more] < 1.0:
+                small.append(more)
+            else:
+                large.append(more)
+
+        # Anything left over is (to within rounding error) exactly 1.0, so
+        # never needs to use its alias.
+        for each in small + large:
+            probability[each] = 1.0
+
+        self._n_weights = n_weights
+        self._probability = probability
+        self._alias = alias
+
+    def __len__(self):
+        return self._n_weights
+
+    def sample(self, rng=random):
+        '''Return a random index into the weights. ``rng`` should provide a
+        ``random()`` method (or function) in the manner of the :mod:`random`
+        module, which is what is used by default.
+        '''
+        # A single uniform draw is split into the column index and the
+        # biased coin toss used to choose between the column and its alias.
+        scaled_draw = rng.random() * self._n_weights
+        idx = int(scaled_draw)
+
+        if idx >= self._n_weights:
+            # Guard against rounding up on very large tables
+            idx = self._n_weights - 1
+
+        if scaled_draw - idx < self._probability[idx]:
+            return idx
+        else:
+            return self._alias[idx]
+
+def _components_sampler(components, min_val, max_val):
+    '''Return a sampler for a list of ``(weight, lower, upper)`` components.
+    See :meth:`Distribution.sampler`.
+    '''
+    components = [each for each in components if each[0] > 0]
+
+    if len(components) == 0:
+        raise ValueError('Invalid distribution: The distribution has no '
+                         'components with a non-zero weight.')
+
+    for weight, lower, upper in components:
+        if lower >= upper:
+            raise ValueError(
+                'Invalid distribution: The range [%d, %d) is '
+                'empty.' % (lower, upper))
+
+        if lower < min_val or upper > max_val:
+            raise ValueError(
+                'Invalid distribution: The range [%d, %d) is outside '
+                'the range of the signal, [%d, %d).' %
+                (lower, upper, min_val, max_val))
+
+    table = AliasTable([weight for weight, lower, upper in components])
+    bounds = [(lower, upper) for weight, lower, upper in components]
+
+    def sample(rng):
+        lower, upper = bounds[table.sample(rng)]
+
+        if upper - lower == 1:
+            return lower
+        else:
+            return rng.randrange(lower, upper)
+
+    return sample
+
+class Distribution(abc.ABC):
+    '''The base class for the distributions that can be used to shape the
+    values generated by :func:`veriutils.random_source`.
+
+    Subclasses implement :meth:`components`, which describes the distribution
+    as a weighted mixture of half open ranges. From that a sampler is built
+    that picks a component from an :class:`AliasTable` and then a uniform
+    value from within the chosen component, so the cost of each sample is
+    independent of the complexity of the distribution. A subclass that does
+    not implement :meth:`components` cannot be instantiated.
+    '''
+
+    @abc.abstractmethod
+    def components(self, min_val, max_val):
+        '''Return a list of ``(weight, lower, upper)`` tuples describing the
+        distribution for a signal that can take values in the half open range
+        ``[min_val, max_val)``. ``lower`` is inclusive and ``upper`` is
+        exclusive.
+        '''
+
+    def sampler(self, min_val, max_val):
+        '''Return a callable that takes a random number generator (in the
+        manner of the :mod:`random` module) and returns a single integer
+        drawn from the distribution.
+
+        A ``ValueError`` is raised if any part of the distribution lies
+        outside of ``[min_val, max_val)``.
+        '''
+        return _components_sampler(
+            self.components(min_val, max_val), min_val, max_val)
+
+class WeightedValues(Distribution):
+    '''A distribution over a fixed set of values, each with its own weight.
+
+    ``weighted_values`` is either a dict, in which the keys are the values and
+    the dict values are the weights, or an iterable of ``(value, weight)``
+    pairs.
+    '''
+
+    def __init__(self, weighted_values):
+
+        if isinstance(weighted_values, dict):
+            weighted_values = weighted_values.items()
+
+        self.weighted_values = [
+            (int(value), weight) for value, weight in weighted_values]
+
+        if len(self.weighted_values) == 0:
+            raise ValueError('Invalid weighted values: There should be at '
+                             'least one value.')
+
+    def __repr__(self):
+        return 'WeightedValues(%r)' % (self.weighted_values,)
+
+    def components(self, min_val, max_val):
+        return [(weight, value, value + 1)
+                for value, weight in self.weighted_values]
+
+class RangeMixture(Distribution):
+    '''A weighted mixture of uniform distributions over ranges.
+
+    ``weighted_ranges`` is an iterable of ``(lower, upper, weight)`` tuples,
+    each of which denotes a uniform distribution over the half open range
+    ``[lower, upper)``. ``lower`` or ``upper`` can be ``None``, in which case
+    the minimum or maximum of the signal respectively is used.
+    '''
+
+    def __init__(self, weighted_ranges):
+
+        self.weighted_ranges = [
+            (lower, upper, weight) for lower, upper, weight
+            in weighted_ranges]
+
+        if len(self.weighted_ranges) == 0:
+            raise ValueError('Invalid weighted ranges: There should be at '
+                             'least one range.')
+
+    def __repr__(self):
+        return 'RangeMixture(%r)' % (self.weighted_ranges,)
+
+    def components(self, min_val, max_val):
+        components = []
+        for lower, upper, weight in self.weighted_ranges:
+            if lower is None:
+                lower = min_val
+
+            if upper is None:
+                upper = max_val
+
+            components.append((weight, lower, upper))
+
+        return components
+
+class EdgeBoost(Distribution):
+    '''A uniform distribution in which the edge values of the signal are
+    made more likely.
+
+    With probability ``edge_probability`` one of the edge values is
+    returned (each edge value being equally likely), otherwise a value is
+    drawn uniformly from the full range of the signal.
+
+    If ``edge_values`` is ``None`` (the default), the edge values are the
+    minimum and maximum values of the signal, plus ``0`` and ``-1`` if the
+    signal can represent them. Otherwise ``edge_values`` should be an
+    iterable of the values to boost.
+    '''
+
+    def __init__(self, edge_probability=0.25, edge_values=None):
+
+        if edge_probability < 0 or edge_probability > 1:
+            raise ValueError('Invalid edge probability: The probability '
+                             'should be between 0 and 1.')
+
+        self.edge_probability = edge_probability
+
+        if edge_values is not None:
+            edge_values = tuple(int(each) for each in edge_values)
+
+            if len(edge_values) == 0:
+                raise ValueError('Invalid edge values: There should be at '
+                                 'least one edge value.')
+
+        self.edge_values = edge_values
+
+    def __repr__(self):
+        return 'EdgeBoost(%r, %r)' % (self.edge_probability, self.edge_values)
+
+    def components(self, min_val, max_val):
+
+        if self.edge_values is None:
+            edge_values = []
+            for each in (min_val, max_val - 1, 0, -1):
+                if min_val <= each < max_val and each not in edge_values:
+                    edge_values.append(each)
+
+        else:
+            edge_values = self.edge_values
+
+        edge_weight = self.edge_probability/len(edge_values)
+
+        components = [(1.0 - self.edge_probability, min_val, max_val)]
+        components += [
+            (edge_weight, value, value + 1) for value in edge_values]
+
+        return components
+
+class AdaptiveDistribution(Distribution):
+    '''A distribution that can be biased towards a set of target ranges
+    while the simulation is running. It is used by
+    :class:`veriutils.Coverage` to steer the random stimulus towards
+    coverage bins that have not yet been hit.
+
+    Until :meth:`bias_towards` is called, values are drawn from ``base``,
+    which is another :class:`Distribution` or ``None`` for the full range of
+    the signal. Once some targets are set, a value is drawn uniformly from one
+    of the targets with probability ``bias`` (each target being equally
+    likely) and from ``base`` otherwise.
+
+    Every sampler counts the values it has drawn, and each change of targets
+    applies from a given sample number. This means that two samplers built
+    from the same distribution (for example, those of the ref and the dut)
+    see the same targets on the same cycle, regardless of the order in
+    which the simulator runs them.
+    '''
+
+    def __init__(self, base=None, bias=0.75):
+
+        if bias < 0 or bias > 1:
+            raise ValueError('Invalid bias: The bias should be between 0 '
+                             'and 1.')
+
+        self.base = base
+        self.bias = bias
+        self.reset()
+
+    def __repr__(self):
+        return 'AdaptiveDistribution(%r, %r)' % (self.base, self.bias)
+
+    def reset(self):
+        '''Remove all the targets.
+        '''
+        # A list of (first_sample, targets) pairs in increasing order of
+        # first_sample.
+        self._schedule = [(0, ())]
+
+    @property
+    def targets(self):
+        '''The most recently set targets.
+        '''
+        return self._schedule[-1][1]
+
+    def bias_towards(self, targets, from_sample=0):
+        '''Bias the distribution towards ``targets``, which is an iterable
+        of ``(lower, upper)`` half open ranges. The change applies from sample
+        number ``from_sample`` (counted from zero for each sampler), which
+        should be no earlier than any previous change. An empty ``targets``
+        removes the bias.
+        '''
+        targets = tuple((int(lower), int(upper)) for lower, upper in targets)
+
+        if from_sample < self._schedule[-1][0]:
+            raise ValueError('Invalid sample number: The targets cannot be '
+                             'changed before a previous change.')
+
+        if targets == self._schedule[-1][1]:
+            return
+
+        if from_sample == self._schedule[-1][0]:
+            self._schedule[-1] = (from_sample, targets)
+        else:
+            self._schedule.append((from_sample, targets))
+
+    def _targeted_components(self, targets, min_val, max_val):
+
+        if self.base is None:
+            base_components = [(1.0, min_val, max_val)]
+        else:
+            base_components = self.base.components(min_val, max_val)
+
+        # Ignore any part of a target the signal cannot represent
+        targets = [(max(lower, min_val), min(upper, max_val))
+                   for lower, upper in targets]
+        targets = [(lower, upper) for lower, upper in targets
+                   if lower < upper]
+
+        if len(targets) == 0 or self.bias == 0:
+            return base_components
+
+        base_total = sum(weight for weight, lower, upper in base_components)
+        target_weight = self.bias/len(targets)
+
+        components = [
+            ((1.0 - self.bias) * weight/base_total, lower, upper)
+            for weight, lower, upper in base_components]
+        components += [
+            (target_weight, lower, upper) for lower, upper in targets]
+
+        return components
+
+    def components(self, min_val, max_val):
+        return self._targeted_components(self.targets, min_val, max_val)
+
+    def sampler(self, min_val, max_val):
+
+        # Check the base distribution is valid now, rather than at the first
+        # sample.
+        samplers = {(): _components_sampler(
+            self._targeted_components((), min_val, max_val),
+            min_val, max_val)}
+
+        state = {'count': 0, 'position': 0}
+
+        def sample(rng):
+            schedule = self._schedule
+            count = state['count']
+            position = state['position']
+
+            if position >= len(schedule):
+                # The distribution has been reset
+                position = 0
+
+            while (position + 1 < len(schedule) and
+                   schedule[position + 1][0] <= count):
+                position += 1
+
+            targets = schedule[position][1]
+
+            try:
+                targets_sampler = samplers[targets]
+            except KeyError:
+                targets_sampler = _components_sampler(
+                    self._targeted_components(targets, min_val, max_val),
+                    min_val, max_val)
+                samplers[targets] = targets_sampler
+
+            state['count'] = count + 1
+            state['position'] = position
+
+            return targets_sampler(rng)
+
+        # So that the position of the sampler can be saved and restored
+        sample.state = state
+
+        return sample
@@ -0,0 +1,392 @@
+'''A coordinator that serves cosimulation jobs to worker processes, possibly
+on other machines, over TCP.
+
+A worker can be started on any machine that can import the factories of the
+jobs with:
+
+    python -c "import veriutils; veriutils.run_worker('HOST', PORT)"
+'''
+
+from .specs import SynchronousTestSpec
+from .regression import _seed_summary
+from .scheduling import schedule_jobs
+
+import collections
+import io
+import os
+import pickle
+import socket
+import struct
+import threading
+import time
+import traceback
+
+__all__ = ['RegressionCoordinator', 'run_worker']
+
+# Each message is a pickle, preceded by its length.
+_HEADER = struct.Struct('!Q')
+
+def _send_message(connection, message, pickler=pickle.Pickler):
+    data = io.BytesIO()
+    pickler(data).dump(message)
+    connection.sendall(_HEADER.pack(len(data.getvalue())) + data.getvalue())
+
+def _receive_exactly(connection, n_bytes):
+    chunks = []
+    while n_bytes > 0:
+        chunk = connection.recv(min(n_bytes, 1 << 20))
+
+        if not chunk:
+            raise ConnectionError('The connection was closed.')
+
+        chunks.append(chunk)
+        n_bytes -= len(chunk)
+
+    return b''.join(chunks)
+
+def _receive_message(connection):
+    n_bytes, = _HEADER.unpack(_receive_exactly(connection, _HEADER.size))
+    return pickle.loads(_receive_exactly(connection, n_bytes))
+
+class RegressionCoordinator(object):
+    '''Serves a list of cosimulation jobs to the workers that connect to it
+    (see :func:`run_worker`) and collects a summary of each.
+
+    Each of ``jobs`` is a tuple of ``(spec, seed, cycles)``, in which
+    ``spec`` is a :class:`veriutils.SynchronousTestSpec`, and is run by a
+    worker as :func:`veriutils.run_seeds` runs a seed: the test built from
+    ``spec`` is cosimulated for ``cycles`` cycles with ``seed`` (which can be
+    ``None``) using ``engine``. A worker builds the test of each spec once and
+    reuses it for every job with the same spec.
+
+    The coordinator listens on ``host`` and ``port`` as soon as it is
+    constructed (a ``port`` of ``0`` picks a free port), and the address it
+    listens on is given by ``address``. Jobs are only handed out once
+    :meth:`run` is called.
+
+    A job is retried on another worker if its worker disconnects, or if
+    ``job_timeout`` is not ``None`` and no summary is received within
+    ``job_timeout`` seconds (in which case the worker is disconnected). A job
+    is attempted at most ``max_attempts`` times, after which it fails.
+
+    If ``results_db`` (a :class:`veriutils.ResultsDatabase`) is given, the
+    jobs are handed out in the order given by :func:`veriutils.schedule_jobs`
+    (recent failures first, then the longest jobs first) and the summary of
+    each job is recorded in it (so the specs should not also record to it).
+
+    The jobs and summaries are sent as pickles, which can run arbitrary code
+    when they are loaded, so the coordinator and the workers should only be
+    run on a trusted network.
+    '''
+
+    def __init__(self, jobs, host='localhost', port=0, engine='event',
+                 max_attempts=3, job_timeout=None, results_db=None):
+
+        jobs = [tuple(job) for job in jobs]
+
+        for job in jobs:
+            if len(job) != 3 or not isinstance(job[0], SynchronousTestSpec):
+                raise ValueError('Invalid job: Each job should be a tuple of '
+                                 '(spec, seed, cycles).')
+
+        if max_attempts < 1:
+            raise ValueError('Invalid max attempts: Each job should be '
+                             'attempted at least once.')
+
+        self.jobs = jobs
+        self.engine = engine
+        self.max_attempts = max_attempts
+        self.job_timeout = job_timeout
+        self.results_db = results_db
+
+        order = range(len(jobs))
+        if results_db is not None:
+            # Each spec is only described once
+            described = {}
+            for spec, seed, cycles in jobs:
+                if id(spec) not in described:
+                    described[id(spec)] = (spec.test_id, spec.signal_count())
+
+            self._job_descriptions = [
+                {'test_id': described[id(spec)][0], 'seed': seed,
+                 'cycles': cycles, 'signals': described[id(spec)][1]}
+                for spec, seed, cycles in jobs]
+
+            order = schedule_jobs(
+                self._job_descriptions, results_db, engine=engine)
+
+        self._listener = socket.create_server((host, port))
+        self.address = self._listener.getsockname()[:2]
+
+        self._condition = threading.Condition()
+        self._pending = collections.deque(order)
+        self._attempts = [0] * len(jobs)
+        self._summaries = {}
+        self._completed = collections.deque()
+        self._busy_connections = set()
+        self._finished = False
+
+    def run(self, on_result=None, timeout=None):
+        '''Hand out the jobs to the workers until every job has a summary,
+        then tell the workers to stop and stop listening. ``on_result`` is
+        called with each summary as it arrives. If ``timeout`` is not
+        ``None`` and the jobs have not finished after ``timeout`` seconds, a
+        ``TimeoutError`` is raised.
+
+        Return a list of summaries, one for each job in the order of the
+        jobs. Each is a dict with the keys of the summaries returned by
+        :func:`veriutils.run_seeds` (``'seed'``, ``'passed'``,
+        ``'mismatch'``, ``'error'``, ``'coverage'`` and ``'time'``), and also:
+            * ``'job'``: The index of the job.
+            * ``'attempts'``: The number of times the job was started.
+            * ``'worker'``: The name of the host and the process id of the
+              worker that ran the job, or ``None`` if it failed on every
+              attempt.
+        '''
+        if self._finished:
+            raise RuntimeError('The coordinator has already been run.')
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        handlers = []
+        accepter = threading.Thread(
+            target=self._accept_workers, args=(handlers,), daemon=True)
+        accepter.start()
+
+        try:
+            while True:
+                with self._condition:
+                    while (not self._completed and
+                           len(self._summaries) < len(self.jobs)):
+
+                        if deadline is None:
+                            self._condition.wait()
+
+                        else:
+                            remaining = deadline - time.monotonic()
+                            if remaining <= 0:
+                                raise TimeoutError(
+                                    'The jobs did not finish within the '
+                                    'timeout.')
+
+                            self._condition.wait(remaining)
+
+                    completed = list(self._completed)
+                    self._completed.clear()
+                    done = len(self._summaries) == len(self.jobs)
+
+                for job in completed:
+                    summary = self._summaries[job]
+
+                    # Lost jobs have no time to record
+                    if (self.results_db is not None and
+                        summary['time'] is not None):
+
+                        description = self._job_descriptions[job]
+                        self.results_db.record(
+                            description['test_id'], summary['seed'],
+                            description['cycles'], summary['time'],
+                            summary['passed'], engine=self.engine,
+                            signals=description['signals'])
+
+                    if on_result is not None:
+                        on_result(summary)
+
+                if done:
+                    break
+
+        finally:
+            with self._condition:
+                self._finished = True
+                self._condition.notify_all()
+                busy_connections = list(self._busy_connections)
+
+            # Only if the jobs did not finish are any workers still running
+            # a job, which would never be received.
+            for connection in busy_connections:
+                try:
+                    connection.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+
+            accepter.join()
+            self._listener.close()
+
+            for handler in list(handlers):
+                handler.join()
+
+        return [self._summaries[job] for job in range(len(self.jobs))]
+
+    def _accept_workers(self, handlers):
+
+        # A thread blocked in accept is not woken when the listener is
+        # closed, so the listener is polled.
+        self._listener.settimeout(0.1)
+
+        while True:
+            try:
+                connection, address = self._listener.accept()
+
+            except socket.timeout:
+                with self._condition:
+                    if self._finished:
+                        return
+
+                continue
+
+            except OSError:
+                # The listener has been closed
+                return
+
+            connection.settimeout(None)
+
+            handler = threading.Thread(
+                target=self._serve_worker, args=(connection,), daemon=True)
+            handler.start()
+            handlers.append(handler)
+
+    def _serve_worker(self, connection):
+        '''Send jobs to the worker on ``connection`` until there are none
+        left. If the worker is lost, its job is handed out again.
+        '''
+        try:
+            worker = _receive_message(connection)['worker']
+
+            while True:
+                with self._condition:
+                    while not self._pending and not self._finished:
+                        self._condition.wait()
+
+                    if self._finished:
+                        break
+
+                    job = self._pending.popleft()
+                    self._attempts[job] += 1
+                    self._busy_connections.add(connection)
+
+                spec, seed, cycles = self.jobs[job]
+
+                try:
+                    connection.settimeout(self.job_timeout)
+                    _send_message(connection, {
+                        'spec': spec, 'seed': seed, 'cycles': cycles,
+                        'engine': self.engine})
+
+                    summary = _receive_message(connection)
+
+                except (OSError, EOFError, pickle.UnpicklingError):
+                    self._lose_job(job)
+                    return
+
+                finally:
+                    with self._condition:
+                        self._busy_connections.discard(connection)
+
+                self._complete_job(job, dict(summary, worker=worker))
+
+            connection.settimeout(None)
+            _send_message(connection, None)
+
+        except (OSError, EOFError, pickle.UnpicklingError, KeyError,
+                TypeError):
+            # The worker was lost before it was given a job, or while it was
+            # being told to stop.
+            pass
+
+        finally:
+            connection.close()
+
+    def _complete_job(self, job, summary):
+
+        with self._condition:
+            summary.update(job=job, attempts=self._attempts[job])
+            self._summaries[job] = summary
+            self._completed.append(job)
+            self._condition.notify_all()
+
+    def _lose_job(self, job):
+
+        with self._condition:
+            if self._attempts[job] < self.max_attempts:
+                # Retried before anything else
+                self._pending.appendleft(job)
+                self._condition.notify_all()
+                return
+
+        spec, seed, cycles = self.jobs[job]
+        self._complete_job(job, {
+            'seed': seed,
+            'passed': False,
+            'mismatch': None,
+            'error': 'The worker was lost on each of {} attempts.'.format(
+                self._attempts[job]),
+            'coverage': None,
+            'time': None,
+            'worker': None})
+
+def _run_job(tests, job):
+    '''Run ``job``, as sent by a :class:`RegressionCoordinator`, and return
+    its summary. The test built from each spec is kept in ``tests``.
+    '''
+    spec = job['spec']
+    key = pickle.dumps(spec)
+
+    if key not in tests:
+        try:
+            tests[key] = spec.build()
+        except Exception as e:
+            tests[key] = e
+
+    test = tests[key]
+
+    if isinstance(test, Exception):
+        return {'seed': job['seed'],
+                'passed': False,
+                'mismatch': None,
+                'error': ''.join(
+                    traceback.format_exception_only(type(test), test)).strip(),
+                'coverage': None,
+                'time': 0.0}
+
+    return _seed_summary(test, job['seed'], job['cycles'], job['engine'])
+
+def run_worker(host, port, connect_timeout=10):
+    '''Connect to the :class:`RegressionCoordinator` listening on ``host``
+    and ``port`` and run the jobs it sends until it has no more, returning
+    the number of jobs that were run. The connection is retried for up to
+    ``connect_timeout`` seconds, so the worker can be started before the
+    coordinator. If the coordinator goes away, the worker returns.
+    '''
+    deadline = time.monotonic() + connect_timeout
+
+    while True:
+        try:
+            connection = socket.create_connection((host, port))
+            break
+        except OSError:
+            if time.monotonic() >= deadline:
+                raise
+
+            time.sleep(0.1)
+
+    tests = {}
+    n_jobs = 0
+
+    with connection:
+        try:
+            _send_message(connection, {
+                'worker': '{}:{}'.format(socket.gethostname(), os.getpid())})
+
+            while True:
+                job = _receive_message(connection)
+
+                if job is None:
+                    break
+
+                _send_message(connection, _run_job(tests, job))
+                n_jobs += 1
+
+        except (OSError, EOFError):
+            pass
+
+    return n_jobs
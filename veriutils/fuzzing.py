@@ -0,0 +1,567 @@
+from myhdl import intbv
+
+import concurrent.futures
+import multiprocessing
+import json
+import os
+import random
+import time
+
+from .cosimulation import SynchronousTest, first_mismatch
+from .coverage import Coverage
+from .hdl_blocks import _INIT_RESET_ACTIVE_EDGES
+
+__all__ = ['Fuzzer', 'load_stimulus', 'save_stimulus']
+
+def save_stimulus(filename, stimulus):
+    '''Write ``stimulus``, a dict of the playback data for each signal (see
+    :class:`Fuzzer`), to the JSON file ``filename``.
+    '''
+    with open(filename, 'w') as f:
+        json.dump(
+            dict((name, [int(each) for each in values])
+                 for name, values in stimulus.items()), f, sort_keys=True)
+
+def load_stimulus(filename):
+    '''Read a stimulus that was written by :func:`save_stimulus`. The result
+    can be passed as the ``playback_data`` argument of
+    :class:`veriutils.SynchronousTest`, with the relevant signals set to be
+    `'playback'` args.
+    '''
+    with open(filename, 'r') as f:
+        return json.load(f)
+
+def _random_to_playback(arg_types):
+    '''Return a copy of ``arg_types`` in which every `'random'` arg is
+    replaced with a `'playback'` arg.
+    '''
+    if isinstance(arg_types, dict):
+        return dict(
+            (key, _random_to_playback(value))
+            for key, value in arg_types.items())
+
+    elif arg_types == 'random':
+        return 'playback'
+
+    else:
+        return arg_types
+
+# The fuzzer that is run by the worker processes. It is inherited by the
+# workers when they are forked.
+_worker_fuzzer = None
+
+def _run_in_worker(stimulus):
+    return _worker_fuzzer.run(stimulus)
+
+class Fuzzer(object):
+    '''A coverage guided fuzzer for a pair of factories, as would be passed
+    to :class:`veriutils.SynchronousTest`.
+
+    Rather than being driven from a random source, the `'random'` args are
+    played back from a stimulus, which is a dict from the full name of each
+    random signal to a list of ``cycles`` values. Only intbv and bool random
+    signals are supported.
+
+    The fuzzer keeps a corpus of the stimuli that hit coverage bins (from
+    ``coverpoints``, a list of :class:`veriutils.CoverPoint` objects) that
+    no previous stimulus hit. New stimuli are created by mutating those in
+    the corpus. Any stimulus that causes the outputs of the dut and the ref
+    to differ (or the simulation to raise an exception) is a failure. A
+    failure is minimized, by shortening it and setting as many of its values
+    as possible to zero, and is then saved.
+
+    ``cycles`` is the length of each stimulus.
+
+    ``seed`` seeds the random number generator used to create and mutate
+    the stimuli.
+
+    If ``corpus_dir`` is set, the corpus is initialised from the ``.json``
+    stimulus files in it (see :func:`save_stimulus`) and every new entry in
+    the corpus is written to it. Otherwise, the corpus is initialised with
+    ``initial_corpus_size`` random stimuli.
+
+    If ``failures_dir`` is set, every minimized failure is written to it.
+
+    ``workers`` sets the number of processes in which the simulations are
+    run. If it is ``None``, one per CPU is used. If it is ``1``, the
+    simulations are run in this process. More than one worker requires the
+    ``fork`` start method, which is not available on Windows. With more than
+    one worker, the results depend on the order in which the simulations
+    complete, so they are not deterministic.
+
+    ``max_minimize_runs`` limits the number of simulations used to minimize
+    each failure. Only the first failure with each signature (the signal
+    that mismatched, or the error that was raised) is minimized and kept, so
+    the same bug is not minimized again every time it is hit.
+
+    A single :class:`veriutils.SynchronousTest` is built (in each worker)
+    and each stimulus is played back by replacing its playback data.
+    Unlike for :class:`veriutils.SynchronousTest`, ``reuse_elaboration`` is
+    ``True`` by default, so the design is only elaborated once. It should
+    be set to ``False`` if the factories keep state outside of signals that
+    relies on them being called again. The stimulus is aligned with the first cycle after the
+    initial reset, so the arg types should not include a `'custom_reset'`,
+    the timing of which is unknown.
+
+    Any other keyword arguments are passed to
+    :class:`veriutils.SynchronousTest`.
+    '''
+
+    def __init__(self, dut_factory, ref_factory, args, arg_types,
+                 coverpoints, cycles=100, seed=None, corpus_dir=None,
+                 failures_dir=None, initial_corpus_size=4, workers=1,
+                 max_minimize_runs=200, reuse_elaboration=True, **kwargs):
+
+        if cycles < 1:
+            raise ValueError('Invalid cycles: The stimulus should be at least '
+                             'one cycle long.')
+
+        if workers is not None and workers < 1:
+            raise ValueError('Invalid workers: There should be at least one '
+                             'worker.')
+
+        self.dut_factory = dut_factory
+        self.ref_factory = ref_factory
+        self.args = args
+        self.arg_types = _random_to_playback(arg_types)
+        self.coverpoints = list(coverpoints)
+        self.cycles = cycles
+        self.corpus_dir = corpus_dir
+        self.failures_dir = failures_dir
+        self.workers = workers
+        self.max_minimize_runs = max_minimize_runs
+        self.kwargs = dict(kwargs, reuse_elaboration=reuse_elaboration)
+
+        self._random = random.Random(seed)
+
+        # Find the ranges of the signals that need a stimulus from a test
+        # object with the original arg types.
+        test_obj = SynchronousTest(
+            None, ref_factory, args, arg_types, **kwargs)
+
+        types = [each_arg.type for each_arg in test_obj.elaborated_args]
+
+        if 'custom_reset' in types:
+            raise ValueError(
+                'Invalid arg types: A stimulus cannot be aligned with a '
+                '\'custom_reset\' arg, as its timing is unknown.')
+
+        # The number of cycles recorded before the first playback value: the
+        # initial value and the cycles during which the initial reset is
+        # active.
+        self._playback_offset = 1
+        if 'init_reset' in types:
+            self._playback_offset += _INIT_RESET_ACTIVE_EDGES + 1
+
+        self.signal_ranges = {}
+        for each_arg in test_obj.elaborated_args:
+            if each_arg.type != 'random':
+                continue
+
+            signal = each_arg.object
+
+            if isinstance(signal.val, intbv):
+                self.signal_ranges[each_arg.name] = (signal.min, signal.max)
+
+            elif isinstance(signal._init, bool):
+                self.signal_ranges[each_arg.name] = (0, 2)
+
+            else:
+                raise ValueError(
+                    'Invalid signal type: Only intbv and bool random signals '
+                    'can be fuzzed, which {} is not.'.format(each_arg.name))
+
+        if len(self.signal_ranges) == 0:
+            raise ValueError('Invalid arg types: There should be at least one '
+                             '\'random\' arg to fuzz.')
+
+        self.corpus = []
+        self.failures = []
+        self.failure_signatures = set()
+        self.hit_bins = set()
+        self.runs = 0
+
+        self._coverage = Coverage(self.coverpoints, adaptive=False)
+        self._test = None
+
+        # The limits of the current call to fuzz, which minimize also keeps
+        # to.
+        self._deadline = None
+        self._max_runs = None
+
+        if corpus_dir is not None and os.path.isdir(corpus_dir):
+            for filename in sorted(os.listdir(corpus_dir)):
+                if filename.endswith('.json'):
+                    stimulus = load_stimulus(
+                        os.path.join(corpus_dir, filename))
+                    self._check_stimulus(stimulus, filename)
+                    self.corpus.append(stimulus)
+
+        if len(self.corpus) == 0:
+            self.corpus = [
+                self.random_stimulus() for n in range(initial_corpus_size)]
+
+        # The stimuli in the initial corpus that have not been run yet.
+        self._unrun = list(self.corpus)
+
+    def _check_stimulus(self, stimulus, filename):
+        if set(stimulus) != set(self.signal_ranges):
+            raise ValueError(
+                'Invalid stimulus: The signals in {} do not match the random '
+                'signals.'.format(filename))
+
+        for name, values in stimulus.items():
+            min_val, max_val = self.signal_ranges[name]
+
+            if len(values) == 0 or not all(
+                min_val <= each < max_val for each in values):
+                raise ValueError(
+                    'Invalid stimulus: The values for {} in {} cannot be '
+                    'represented by the signal.'.format(name, filename))
+
+    def random_stimulus(self):
+        '''Return a new stimulus of uniformly distributed values.
+        '''
+        return dict(
+            (name, [self._random.randrange(min_val, max_val)
+                    for n in range(self.cycles)])
+            for name, (min_val, max_val) in sorted(self.signal_ranges.items()))
+
+    def _random_value(self, min_val, max_val):
+
+        choice = self._random.randrange(3)
+
+        if choice == 0:
+            # Edge values
+            edge_values = [each for each in (min_val, max_val - 1, 0, -1)
+                           if min_val <= each < max_val]
+            return self._random.choice(edge_values)
+
+        else:
+            return self._random.randrange(min_val, max_val)
+
+    def mutate(self, stimulus):
+        '''Return a mutated copy of ``stimulus``.
+        '''
+        stimulus = dict(
+            (name, list(values)) for name, values in stimulus.items())
+
+        for n in range(self._random.randint(1, 4)):
+            name = self._random.choice(sorted(stimulus))
+            values = stimulus[name]
+            min_val, max_val = self.signal_ranges[name]
+
+            if len(values) == 0:
+                continue
+
+            mutation = self._random.randrange(4)
+            idx = self._random.randrange(len(values))
+
+            if mutation == 0:
+                # Replace a value
+                values[idx] = self._random_value(min_val, max_val)
+
+            elif mutation == 1:
+                # Flip a bit (wrapping to stay in the range of the signal)
+                span = max_val - min_val
+                bit = self._random.randrange(max(span.bit_length() - 1, 1))
+                values[idx] = (
+                    ((values[idx] - min_val) ^ (1 << bit)) % span + min_val)
+
+            elif mutation == 2:
+                # Splice in a segment of another stimulus in the corpus
+                other = self._random.choice(self.corpus)[name]
+                length = self._random.randint(1, len(values) - idx)
+                start = self._random.randrange(len(other))
+                segment = other[start:start + length]
+                values[idx:idx + len(segment)] = segment
+
+            else:
+                # Repeat a segment
+                length = self._random.randint(1, len(values) - idx)
+                segment = values[idx:idx + length]
+                repeat_at = self._random.randrange(len(values))
+                values[repeat_at:repeat_at + len(segment)] = segment
+                del values[self.cycles:]
+
+        return stimulus
+
+    def run(self, stimulus):
+        '''Simulate a single stimulus. Return a tuple of
+        ``(hit_bins, mismatch, error)``, in which ``hit_bins`` is a set of
+        ``(signal_name, bin_name)`` pairs, ``mismatch`` is the result of
+        :func:`veriutils.first_mismatch` and ``error`` is the
+        representation of any exception raised by the simulation (or
+        ``None``).
+        '''
+        length = max(len(values) for values in stimulus.values())
+
+        try:
+            if self._test is None:
+                self._test = SynchronousTest(
+                    self.dut_factory, self.ref_factory, self.args,
+                    self.arg_types, coverage=self._coverage,
+                    playback_data=stimulus, **self.kwargs)
+            else:
+                self._test.set_playback_data(stimulus)
+
+            dut_outputs, ref_outputs = self._test.cosimulate(
+                length + self._playback_offset)
+
+        except (KeyboardInterrupt, SystemExit):
+            raise
+
+        except Exception as e:
+            return (set(), None, repr(e))
+
+        hit_bins = set()
+        for name, bins in self._coverage.report()['bins'].items():
+            for bin_name, hits in bins.items():
+                if hits > 0:
+                    hit_bins.add((name, bin_name))
+
+        if dut_outputs is None:
+            mismatch = None
+        else:
+            mismatch = first_mismatch(dut_outputs, ref_outputs)
+
+        return (hit_bins, mismatch, None)
+
+    def _within_limits(self, n_pending=0):
+        '''Return ``True`` if the limits of the current call to
+        :meth:`fuzz` allow another ``n_pending + 1`` simulations to start.
+        '''
+        if self._deadline is not None and time.monotonic() >= self._deadline:
+            return False
+
+        if (self._max_runs is not None and
+            self.runs + n_pending >= self._max_runs):
+            return False
+
+        return True
+
+    def _fails(self, stimulus):
+        hit_bins, mismatch, error = self.run(stimulus)
+        self.runs += 1
+        return mismatch is not None or error is not None
+
+    def minimize(self, stimulus):
+        '''Return the smallest stimulus that can be found that still fails.
+        The stimulus is first shortened as much as possible, then chunks of
+        it are set to zero (or the nearest value the signal can represent).
+
+        At most ``max_minimize_runs`` simulations are used, each of which
+        counts towards the runs of the fuzzer, and minimization stops early
+        once the limits of the current call to :meth:`fuzz` are reached.
+        '''
+        budget = [self.max_minimize_runs]
+
+        def fails(candidate):
+            if budget[0] <= 0 or not self._within_limits():
+                return False
+
+            budget[0] -= 1
+            return self._fails(candidate)
+
+        def truncated(length):
+            return dict(
+                (name, values[:length]) for name, values in stimulus.items())
+
+        # Find the shortest failing prefix
+        lower = 1
+        upper = max(len(values) for values in stimulus.values())
+        while lower < upper:
+            middle = (lower + upper)//2
+            if fails(truncated(middle)):
+                upper = middle
+            else:
+                lower = middle + 1
+
+        stimulus = truncated(upper)
+
+        # Zero as much as possible, in decreasing chunk sizes
+        for name in sorted(stimulus):
+            min_val, max_val = self.signal_ranges[name]
+            zero = min(max(0, min_val), max_val - 1)
+
+            chunk_size = len(stimulus[name])
+            while chunk_size >= 1:
+                for start in range(0, len(stimulus[name]), chunk_size):
+                    values = stimulus[name]
+                    chunk = values[start:start + chunk_size]
+
+                    if all(each == zero for each in chunk):
+                        continue
+
+                    candidate = dict(stimulus)
+                    candidate[name] = (
+                        values[:start] + [zero] * len(chunk) +
+                        values[start + chunk_size:])
+
+                    if fails(candidate):
+                        stimulus = candidate
+
+                chunk_size //= 2
+
+        return stimulus
+
+    def _save(self, directory, prefix, stimulus):
+        if directory is None:
+            return None
+
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        n = 0
+        while True:
+            filename = os.path.join(
+                directory, '{}_{:06d}.json'.format(prefix, n))
+
+            if not os.path.exists(filename):
+                break
+
+            n += 1
+
+        save_stimulus(filename, stimulus)
+        return filename
+
+    def _process_result(self, stimulus, in_corpus, result):
+        hit_bins, mismatch, error = result
+
+        self.runs += 1
+
+        if error is not None:
+            signature = ('error', error)
+        elif mismatch is not None:
+            signature = ('mismatch', mismatch[0])
+        else:
+            signature = None
+
+        if (signature is not None and
+            signature not in self.failure_signatures):
+
+            self.failure_signatures.add(signature)
+
+            minimized = self.minimize(stimulus)
+            filename = self._save(self.failures_dir, 'failure', minimized)
+
+            self.failures.append({
+                'stimulus': minimized,
+                'mismatch': mismatch,
+                'error': error,
+                'filename': filename})
+
+        new_bins = hit_bins - self.hit_bins
+        if len(new_bins) > 0:
+            self.hit_bins |= new_bins
+
+            if not in_corpus:
+                self.corpus.append(stimulus)
+                self._save(self.corpus_dir, 'corpus', stimulus)
+
+    def _next_stimulus(self):
+        '''Return a tuple of the next stimulus to run and whether it is
+        already in the corpus.
+        '''
+        if len(self._unrun) > 0:
+            # Run the initial corpus first
+            return self._unrun.pop(0), True
+
+        return self.mutate(self._random.choice(self.corpus)), False
+
+    def fuzz(self, duration=None, max_runs=None, stop_on_failure=False):
+        '''Run the fuzzer for ``duration`` seconds or ``max_runs``
+        simulations, whichever comes first (at least one should be set). The
+        simulations used to minimize failures count towards ``max_runs`` and
+        stop at the end of ``duration``. If ``stop_on_failure`` is ``True``,
+        the fuzzer stops after the first failure.
+
+        The fuzzer can be run again to continue from where it stopped.
+
+        Return a dict with the following keys:
+            * ``'runs'``: The total number of simulations run, including
+              those used to minimize failures.
+            * ``'corpus'``: The current corpus.
+            * ``'hit_bins'``: The set of ``(signal_name, bin_name)`` pairs
+              that have been hit.
+            * ``'failures'``: A list of the failures, one for each
+              signature (see :class:`Fuzzer`). Each is a dict with
+              the minimized ``'stimulus'``, the ``'mismatch'`` and ``'error'``
+              (see :meth:`run`) of the original failure and the
+              ``'filename'`` to which it was saved (``None`` if it was not
+              saved).
+        '''
+        if duration is None and max_runs is None:
+            raise ValueError('Invalid limits: At least one of duration and '
+                             'max_runs should be set.')
+
+        if duration is not None:
+            self._deadline = time.monotonic() + duration
+
+        if max_runs is not None:
+            self._max_runs = self.runs + max_runs
+
+        def keep_going(n_pending=0):
+            if stop_on_failure and len(self.failures) > 0:
+                return False
+
+            return self._within_limits(n_pending)
+
+        try:
+            workers = self.workers
+            if workers is None:
+                workers = os.cpu_count() or 1
+
+            if workers == 1:
+                while keep_going():
+                    stimulus, in_corpus = self._next_stimulus()
+                    self._process_result(
+                        stimulus, in_corpus, self.run(stimulus))
+
+            else:
+                global _worker_fuzzer
+                _worker_fuzzer = self
+
+                executor = concurrent.futures.ProcessPoolExecutor(
+                    workers, mp_context=multiprocessing.get_context('fork'))
+
+                try:
+                    pending = {}
+                    while True:
+                        while (len(pending) < 2 * workers and
+                               keep_going(len(pending))):
+                            stimulus, in_corpus = self._next_stimulus()
+                            pending[executor.submit(
+                                _run_in_worker, stimulus)] = (
+                                    stimulus, in_corpus)
+
+                        if len(pending) == 0:
+                            break
+
+                        done, not_done = concurrent.futures.wait(
+                            pending,
+                            return_when=concurrent.futures.FIRST_COMPLETED)
+
+                        for future in done:
+                            stimulus, in_corpus = pending.pop(future)
+                            self._process_result(
+                                stimulus, in_corpus, future.result())
+
+                        if not keep_going():
+                            for future in pending:
+                                future.cancel()
+
+                            break
+
+                finally:
+                    executor.shutdown(wait=True)
+                    _worker_fuzzer = None
+
+        finally:
+            self._deadline = None
+            self._max_runs = None
+
+        return {'runs': self.runs,
+                'corpus': self.corpus,
+                'hit_bins': self.hit_bins,
+                'failures': self.failures}
@@ -9,9 +9,14 @@ from math import log, floor
 
 from .utils import check_reset_signal
 
+try:
+    import numpy
+except ImportError: # pragma: no cover
+    numpy = None
+
 __all__ = ['random_source', 'clock_source', 'init_reset_source',
            'recorder_sink', 'handler_sink', 'copy_signal',
-           'lut_signal_driver', 'AVAILABLE_TIME_UNITS']
+           'lut_signal_driver', 'playback_source', 'AVAILABLE_TIME_UNITS']
 
 # These are the available time units. VHDL can also handle 'hr', 'min', 'sec'
 # and 'fs'. These extra time units can be added if required.
@@ -45,8 +50,6 @@ def copy_signal(signal_obj):
 
         return new_signal_obj
 
-clock_source_block_count = 0
-
 @block
 def clock_source(clock, period, time_units='ns'):
 
@@ -58,32 +61,29 @@ def clock_source(clock, period, time_units='ns'):
             'Invalid time unit. Please select from: ' +
             ', '.join(AVAILABLE_TIME_UNITS))
 
-    global clock_source_block_count
-
-    inst_count = clock_source_block_count
-    clock_source_block_count += 1
-
     even_period = period//2
     odd_period = period - even_period
 
     start_val = int(clock.val)
     not_start_val = int(not clock.val)
 
+    # clock_state is only used by the converted code. In simulation, the
+    # clock is toggled directly, which halves the number of signal updates.
     clock_state = Signal(clock.val)
 
+    # Every yield is written as a call to delay, so that MyHDL can tell that
+    # the generator only waits on delays and uses its faster waiter for them.
     @instance
     def clockgen():
 
         while True:
-            yield(delay(even_period))
-            clock.next = not clock_state
-            clock_state.next = not clock_state
-            yield(delay(odd_period))
-            clock.next = not clock_state
-            clock_state.next = not clock_state
+            yield delay(even_period)
+            clock.next = not clock
+            yield delay(odd_period)
+            clock.next = not clock
 
     clock_source.verilog_code = '''
-initial begin: CLOCK_SOURCE_CLOCKGEN_$inst_count
+initial begin: CLOCK_SOURCE_CLOCKGEN_$clock
     while (1'b1) begin
         # $even_period;
         $clock <= (!$clock_state);
@@ -96,7 +96,7 @@ end
 '''
 
     clock_source.vhdl_code = '''
-CLOCK_SOURCE_CLOCKGEN_$inst_count: process is
+CLOCK_SOURCE_CLOCKGEN_$clock: process is
 begin
 while True loop
     wait for $even_period $time_units;
@@ -107,7 +107,7 @@ while True loop
     $clock_state <= not $clock_state;
 end loop;
 wait;
-end process CLOCK_SOURCE_CLOCKGEN_$inst_count;
+end process CLOCK_SOURCE_CLOCKGEN_$clock;
 '''
 
     # These are required so myhdl knows to create the clock and clock_state
@@ -119,17 +119,54 @@ end process CLOCK_SOURCE_CLOCKGEN_$inst_count;
     # code
     clock_state.read = True
 
+    # clock_state is not used by clockgen, so myhdl needs telling that it is
+    # used, or it is not declared in the converted code.
+    clock_state._markUsed()
+
     return clockgen
 
+# The number of edges after the first for which init_reset_source holds the
+# reset active.
+_INIT_RESET_ACTIVE_EDGES = 2
+
 @block
-def init_reset_source(reset, clock, edge_sensitivity='posedge'):
+def init_reset_source(reset, clock, edge_sensitivity='posedge',
+                      stop_after_reset=False):
+    '''Drives ``reset`` active for the first few edges of ``clock``, then
+    inactive.
+
+    By default, the reset is driven inactive on every edge after that, which
+    is what the converted code does. If ``stop_after_reset`` is ``True``,
+    the generator finishes as soon as the reset is inactive, so it is no
+    longer woken on every edge. This gives the same signals in simulation
+    with less work, but the block should not then be converted.
+    '''
 
     check_reset_signal(reset, 'reset', isasync=reset.isasync,
                        active=reset.active)
 
-    active_edges = 2
+    active_edges = _INIT_RESET_ACTIVE_EDGES
     active_reset = reset.active
 
+    if stop_after_reset:
+        if edge_sensitivity == 'posedge':
+            edge = clock.posedge
+        elif edge_sensitivity == 'negedge':
+            edge = clock.negedge
+        else:
+            raise ValueError('Invalid edge sensitivity')
+
+        @instance
+        def init_reset():
+
+            for n in range(active_edges + 1):
+                reset.next = active_reset
+                yield edge
+
+            reset.next = not active_reset
+
+        return init_reset
+
     # Rather annoyingly, the code becomes non-convertible when the the edge
     # to be yielded is an assigned value rather than clock.posedge or
     # clock.negedge. The consequence is two versions need to be written out.
@@ -168,36 +205,96 @@ def init_reset_source(reset, clock, edge_sensitivity='posedge'):
 
     return init_reset
 
-@block
-def _signal_random_source(output_signal, clock, reset,
-                          edge_sensitivity='posedge'):
+def _random_value_function(output_signal, rng, distribution=None):
+    '''Return a function that takes no arguments and returns the next
+    random value for ``output_signal``, drawn using ``rng`` (a
+    :class:`random.Random` instance).
 
+    The state of the sampler of ``distribution`` (a dict, or ``None`` if the
+    sampler has no state) is also returned, so that it can be saved and
+    restored along with ``rng``.
+    '''
 
-    initial_random_state = random.getstate()
+    sampler = None
 
     if isinstance(output_signal.val, intbv):
 
         min_val = output_signal.val.min
         max_val = output_signal.val.max
 
-        next_val_function = lambda: random.randrange(min_val, max_val)
+        if distribution is None:
+            next_val_function = lambda: rng.randrange(min_val, max_val)
+        else:
+            sampler = distribution.sampler(min_val, max_val)
+            next_val_function = lambda: sampler(rng)
 
     elif isinstance(output_signal._init, bool):
         min_val = 0
         max_val = 2
 
-        next_val_function = lambda: bool(random.randrange(min_val, max_val))
+        if distribution is None:
+            next_val_function = (
+                lambda: bool(rng.randrange(min_val, max_val)))
+        else:
+            sampler = distribution.sampler(min_val, max_val)
+            next_val_function = lambda: bool(sampler(rng))
 
     elif isinstance(output_signal.val, EnumItemType):
 
+        if distribution is not None:
+            raise ValueError('Invalid signal type: Distributions are only '
+                             'supported on intbv and bool signals.')
+
         _enum = output_signal.val._type
-        next_val_function = lambda: getattr(_enum,
-                                            random.choice(_enum._names))
+        next_val_function = lambda: getattr(_enum, rng.choice(_enum._names))
 
     else:
         raise ValueError('Invalid signal type: The signal type is not '
                          'supported by the random source.')
 
+    return next_val_function, getattr(sampler, 'state', None)
+
+def _random_state_functions(rngs, sampler_states):
+    '''Return a pair of functions that respectively get and set the state
+    of the random number generators in ``rngs`` and the corresponding
+    sampler states in ``sampler_states``.
+    '''
+
+    def get_state():
+        return [(rng.getstate(), copy.copy(sampler_state))
+                for rng, sampler_state in zip(rngs, sampler_states)]
+
+    def set_state(state):
+        for rng, sampler_state, (rng_state, saved_sampler_state) in zip(
+            rngs, sampler_states, state):
+
+            rng.setstate(rng_state)
+
+            if sampler_state is not None:
+                sampler_state.update(saved_sampler_state)
+
+    return get_state, set_state
+
+def _random_skip_function(next_val_functions):
+    '''Return a function that moves the sequences of ``next_val_functions``
+    on by a given number of values, without them being driven, so that the
+    stimulus can be started part of the way through.
+    '''
+
+    def skip(n_values):
+        for next_val_function in next_val_functions:
+            for n in range(n_values):
+                next_val_function()
+
+    return skip
+
+@block
+def _signal_random_source(output_signal, clock, reset, rng,
+                          edge_sensitivity='posedge', distribution=None):
+
+    next_val_function, sampler_state = _random_value_function(
+        output_signal, rng, distribution)
+
     if edge_sensitivity == 'posedge':
         edge = clock.posedge
     elif edge_sensitivity == 'negedge':
@@ -205,39 +302,105 @@ def _signal_random_source(output_signal, clock, reset,
     else:
         raise ValueError('Invalid edge sensitivity')
 
-    random_state = [initial_random_state]
-
     @always_seq(edge, reset)
     def source():
-        random.setstate(random_state[0])
         output_signal.next = next_val_function()
-        random_state[0] = random.getstate()
+
+    # Allows the state to be checkpointed
+    source.get_state, source.set_state = _random_state_functions(
+        [rng], [sampler_state])
+    source.skip = _random_skip_function([next_val_function])
+
+    return source
+
+@block
+def _signal_list_random_source(signal_list, clock, reset, seed_rng,
+                               edge_sensitivity='posedge',
+                               distribution=None):
+
+    rngs = []
+    sampler_states = []
+    next_val_functions = []
+    for each_signal in signal_list:
+
+        # Each signal gets its own generator, seeded from the previous
+        # signal's seed. This means the sequence on each signal is the same
+        # as if it were generated by its own random source.
+        signal_seed = seed_rng.randrange(0, 0x5EEDF00D)
+        seed_rng = random.Random(signal_seed)
+        rng = random.Random(signal_seed)
+
+        next_val_function, sampler_state = _random_value_function(
+            each_signal, rng, distribution)
+
+        rngs.append(rng)
+        sampler_states.append(sampler_state)
+        next_val_functions.append(next_val_function)
+
+    if edge_sensitivity == 'posedge':
+        edge = clock.posedge
+    elif edge_sensitivity == 'negedge':
+        edge = clock.negedge
+    else:
+        raise ValueError('Invalid edge sensitivity')
+
+    n_signals = len(signal_list)
+
+    # A single block drives every signal, rather than one block per signal.
+    @always_seq(edge, reset)
+    def source():
+        for n in range(n_signals):
+            signal_list[n].next = next_val_functions[n]()
+
+    # Allows the state to be checkpointed
+    source.get_state, source.set_state = _random_state_functions(
+        rngs, sampler_states)
+    source.skip = _random_skip_function(next_val_functions)
 
     return source
 
 @block
 def random_source(output_signal, clock, reset, seed=None,
-                  edge_sensitivity='posedge'):
+                  edge_sensitivity='posedge', distribution=None):
     '''Generate random signals on each clock edge - the specific
     clock edge to use is given by ``edge_sensitivity`` and can be either
     `posedge` for positive edge or `negedge` for negative edge.
 
-    The seed to be used can be specified by ``seed``.
+    The seed to be used can be specified by ``seed``. If it is ``None``, a
+    seed is drawn from the :mod:`random` module. Each source has its own
+    random number generator, so the global random state is otherwise left
+    alone and sources can be elaborated in several threads at once.
 
     Interfaces are supported and the output should be deterministic if
     seed is specified.
+
+    If ``output_signal`` is a list or an interface, a single block drives
+    all the signals it contains. Each signal still has its own random number
+    generator, seeded in turn from the previous signal's, so the sequence on
+    each signal is the same as it would be with a separate source.
+
+    By default the values are drawn uniformly from the range of each signal.
+    ``distribution`` can be set to an instance of a
+    :class:`veriutils.distributions.Distribution` subclass (for example
+    :class:`veriutils.WeightedValues` or :class:`veriutils.EdgeBoost`) to
+    shape the values instead. The same distribution is used for every signal
+    in a list or interface. Distributions are only supported on intbv and
+    bool signals.
+
+    The instance that drives the signals has a ``skip`` method, which takes
+    a number of values and moves every sequence on by that many values
+    without driving them. This allows a simulation to start part of the way
+    through the stimulus.
     '''
 
     if seed is not None:
-        random.seed(seed)
+        rng = random.Random(seed)
     else:
-        # Make sure we've moved the random state away from other calls to
-        # this function.
-        random.seed(randrange(0, 0x5EEDF00D))
+        rng = random.Random(randrange(0, 0x5EEDF00D))
 
     if isinstance(output_signal, myhdl._Signal._Signal):
-        return _signal_random_source(output_signal, clock, reset,
-                                     edge_sensitivity)
+        return _signal_random_source(output_signal, clock, reset, rng,
+                                     edge_sensitivity, distribution)
 
     else:
         signal_list = []
@@ -254,26 +417,165 @@ def random_source(output_signal, clock, reset, seed=None,
                 if isinstance(attribute, myhdl._Signal._Signal):
                     signal_list.append(attribute)
 
-        # We need to get the random state in order that we can set it
-        # on the first loop iteration.
-        random_state = random.getstate()
+        if len(signal_list) == 0:
+            # Nothing to drive
+            return []
 
-        sources = []
-        for each_signal in signal_list:
+        return _signal_list_random_source(
+            signal_list, clock, reset, rng, edge_sensitivity=edge_sensitivity,
+            distribution=distribution)
 
-            # We only want to generate on the signals.
-            random.setstate(random_state)
+@block
+def playback_source(output_signal, clock, reset, data,
+                    edge_sensitivity='posedge', chunk_size=4096):
+    '''Drive ``output_signal`` from the values in ``data``, one value on
+    each clock edge. The clock edge is given by ``edge_sensitivity`` and can
+    be either `posedge` for positive edge or `negedge` for negative edge.
+
+    ``data`` is either a one dimensional sequence of integers (such as a
+    list or a NumPy array) or the filename of a ``.npy`` file. In the
+    latter case, the file is memory mapped, so only the parts that are
+    being played back are read from disk. In either case, the values are
+    read ``chunk_size`` values at a time, so large arrays (including large
+    memory mapped arrays) are never copied in their entirety.
+
+    Like :func:`random_source`, the output is reset synchronously to its
+    initial value while ``reset`` is active. No data is consumed during
+    reset, so the first value in ``data`` is output on the first edge after
+    reset is released.
+
+    When all the values are exhausted, the playback wraps around to the
+    start of ``data`` again.
+
+    Only intbv and bool signals are supported. A ``ValueError`` is raised
+    if a value that is played back cannot be represented by the signal.
+
+    As with :func:`random_source`, the instance has a ``skip`` method that
+    moves the playback on by a number of values.
+    '''
 
-            random.seed(randrange(0, 0x5EEDF00D))
+    if not isinstance(output_signal, myhdl._Signal._Signal):
+        raise ValueError('Invalid signal type: The playback source can only '
+                         'drive a Signal.')
 
-            random_state = random.getstate()
+    if isinstance(output_signal.val, intbv):
+        min_val = output_signal.val.min
+        max_val = output_signal.val.max
+        convert = int
 
-            sources.append(
-                _signal_random_source(each_signal, clock, reset,
-                                      edge_sensitivity=edge_sensitivity))
+    elif isinstance(output_signal._init, bool):
+        min_val = 0
+        max_val = 2
+        convert = bool
 
+    else:
+        raise ValueError('Invalid signal type: The signal type is not '
+                         'supported by the playback source.')
 
-        return sources
+    if edge_sensitivity == 'posedge':
+        edge = clock.posedge
+    elif edge_sensitivity == 'negedge':
+        edge = clock.negedge
+    else:
+        raise ValueError('Invalid edge sensitivity')
+
+    if chunk_size < 1:
+        raise ValueError('Invalid chunk size: The chunk size should be at '
+                         'least 1.')
+
+    if isinstance(data, str):
+        if numpy is None: # pragma: no cover
+            raise ImportError('NumPy is required to play back data from a '
+                              'file.')
+
+        data = numpy.load(data, mmap_mode='r')
+
+    if getattr(data, 'ndim', 1) != 1:
+        raise ValueError('Invalid playback data: The data should be one '
+                         'dimensional.')
+
+    data_length = len(data)
+
+    if data_length == 0:
+        raise ValueError('Invalid playback data: The data should not be '
+                         'empty.')
+
+    def load_chunk(chunk_start):
+        raw_chunk = data[chunk_start:chunk_start + chunk_size]
+
+        try:
+            # NumPy arrays (and memory maps) convert to python values much
+            # more quickly in one go.
+            raw_chunk = raw_chunk.tolist()
+        except AttributeError:
+            pass
+
+        chunk = []
+        for n, each in enumerate(raw_chunk):
+            value = int(each)
+
+            if value != each or value < min_val or value >= max_val:
+                raise ValueError(
+                    'Invalid playback data: The value %s at index %d cannot '
+                    'be represented by the signal.' %
+                    (each, chunk_start + n))
+
+            chunk.append(convert(value))
+
+        return chunk
+
+    playback_state = {'chunk': load_chunk(0), 'chunk_start': 0,
+                      'chunk_idx': 0}
+
+    def next_value():
+        chunk = playback_state['chunk']
+        chunk_idx = playback_state['chunk_idx']
+
+        if chunk_idx >= len(chunk):
+            chunk_start = playback_state['chunk_start'] + len(chunk)
+
+            if chunk_start >= data_length:
+                chunk_start = 0
+
+            chunk = load_chunk(chunk_start)
+            chunk_idx = 0
+
+            playback_state['chunk'] = chunk
+            playback_state['chunk_start'] = chunk_start
+
+        playback_state['chunk_idx'] = chunk_idx + 1
+
+        return chunk[chunk_idx]
+
+    @always_seq(edge, reset)
+    def playback():
+        output_signal.next = next_value()
+
+    # Allows the state to be checkpointed. The chunk itself is reloaded.
+    def get_state():
+        return {'chunk_start': playback_state['chunk_start'],
+                'chunk_idx': playback_state['chunk_idx']}
+
+    def set_state(state):
+        playback_state['chunk'] = load_chunk(state['chunk_start'])
+        playback_state['chunk_start'] = state['chunk_start']
+        playback_state['chunk_idx'] = state['chunk_idx']
+
+    # Allows the playback to be started part of the way through the data
+    def skip(n_values):
+        chunk_start = (
+            playback_state['chunk_start'] + playback_state['chunk_idx'] +
+            n_values) % data_length
+
+        playback_state['chunk'] = load_chunk(chunk_start)
+        playback_state['chunk_start'] = chunk_start
+        playback_state['chunk_idx'] = 0
+
+    playback.get_state = get_state
+    playback.set_state = set_state
+    playback.skip = skip
+
+    return playback
 
 @block
 def recorder_sink(signal, clock, recorded_output_list,
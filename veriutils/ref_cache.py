@@ -0,0 +1,236 @@
+import myhdl
+
+import functools
+import hashlib
+import inspect
+import os
+import re
+import tempfile
+
+__all__ = ['RefCache']
+
+class RefCache(object):
+    '''A directory of the outputs of reference designs, which
+    :class:`veriutils.SynchronousTest` uses to avoid simulating the ref when
+    nothing that affects it has changed.
+
+    Each entry is stored under a key that is a hash of everything that goes
+    into the simulation of the ref: the source code of the ref factory and
+    the values it closes over, the structure and the types of the arguments,
+    the seeds and distributions of the random sources, the playback data,
+    the cover points, the clock period and the number of cycles. Any change
+    to those gives a new key, so stale entries are never used, though they
+    stay in the directory until :meth:`clear` is called.
+
+    The values of the globals that the ref factory reads (such as module
+    level constants) are part of the key, but some changes cannot be
+    detected. Functions and blocks that the ref factory uses are only
+    followed if they are closed over or are globals in the same module as
+    the factory, so a change to a block imported from another module is
+    missed. Values are described by their ``repr``, so an object whose
+    ``repr`` does not describe its whole state can hide a change. In those
+    cases, set ``salt`` to something that changes along with the code that
+    is not followed (such as the version of the package that holds it), or
+    call :meth:`clear`. Changing ``salt`` changes every key.
+
+    An object whose ``repr`` is only its memory address (the default for
+    classes that do not define ``__repr__``) cannot be described at all, so
+    a cosimulation whose ref depends on one is not cached.
+
+    The number of cosimulations that used the cached outputs of the ref,
+    that found nothing in the cache and that could not use the cache are
+    counted by :class:`veriutils.SynchronousTest` in the ``stats`` dict
+    under ``'hits'``, ``'misses'`` and ``'bypasses'``.
+    '''
+
+    def __init__(self, directory, salt=''):
+        self.directory = directory
+        self.salt = salt
+        self.reset_stats()
+
+    def reset_stats(self):
+        '''Set all the counts in ``stats`` to zero.
+        '''
+        self.stats = {'hits': 0, 'misses': 0, 'bypasses': 0}
+
+    def key(self, description):
+        '''Return the key for ``description``, which is a nested structure
+        of strings, numbers and tuples with a stable ``repr``.
+        '''
+        return hashlib.sha256(
+            repr((self.salt, description)).encode('utf-8')).hexdigest()
+
+    def _filename(self, key):
+        return os.path.join(self.directory, key + '.pickle')
+
+    def load(self, key):
+        '''Return the data stored under ``key``, or ``None`` if there is
+        none.
+        '''
+        try:
+            with open(self._filename(key), 'rb') as f:
+                return f.read()
+
+        except (IOError, OSError):
+            return None
+
+    def store(self, key, data):
+        '''Store the bytes ``data`` under ``key``. The file is written
+        atomically, so several processes can share the directory.
+        '''
+        if not os.path.exists(self.directory):
+            os.makedirs(self.directory)
+
+        fd, tmp_filename = tempfile.mkstemp(dir=self.directory)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+
+            os.replace(tmp_filename, self._filename(key))
+
+        except:
+            os.remove(tmp_filename)
+            raise
+
+    def clear(self):
+        '''Remove every entry from the directory.
+        '''
+        if not os.path.exists(self.directory):
+            return
+
+        for filename in os.listdir(self.directory):
+            if filename.endswith('.pickle'):
+                os.remove(os.path.join(self.directory, filename))
+
+# The default repr of an object, which holds its address rather than its state
+_ADDRESS_REPR = re.compile(r' at 0x[0-9a-fA-F]+>')
+
+def _describe(value, seen=None):
+    '''Return a description of ``value`` that can be hashed into a
+    :class:`RefCache` key. Functions and blocks are described by their
+    source code, the values they close over and the globals they read
+    (following the functions and blocks in the same module). Signals are
+    described by their type and initial value (not their current value),
+    arrays by a hash of their contents and anything else by its ``repr``.
+
+    A ``ValueError`` is raised if ``value`` holds anything whose ``repr``
+    includes a memory address, as that differs from one process to the next
+    and cannot say whether the state of the object has changed.
+    '''
+    if seen is None:
+        seen = set()
+
+    if isinstance(value, functools.partial):
+        return ('partial', _describe(value.func, seen),
+                _describe(value.args, seen), _describe(value.keywords, seen))
+
+    # Blocks wrap the function that defines them
+    func = getattr(value, 'func', value)
+
+    if inspect.isfunction(func):
+        return _describe_function(func, seen)
+
+    elif isinstance(value, myhdl._Signal._Signal):
+        init = value._init
+        if isinstance(init, myhdl.EnumItemType):
+            init = (tuple(init._type._names), init._name)
+
+        return ('Signal', type(value._init).__name__, repr(init),
+                value._nrbits, value._min, value._max)
+
+    elif isinstance(value, (list, tuple)):
+        return (type(value).__name__,
+                tuple(_describe(each, seen) for each in value))
+
+    elif isinstance(value, dict):
+        return ('dict', tuple(sorted(
+            (repr(key), _describe(each, seen))
+            for key, each in value.items())))
+
+    elif hasattr(value, 'tobytes') and hasattr(value, 'dtype'):
+        # NumPy arrays only show part of their contents in their repr
+        return ('array', str(value.dtype), value.shape,
+                hashlib.sha256(value.tobytes()).hexdigest())
+
+    else:
+        description = repr(value)
+
+        if _ADDRESS_REPR.search(description):
+            raise ValueError(
+                'Invalid value: {} cannot be described by its repr.'.format(
+                    description))
+
+        return description
+
+def _describe_function(func, seen):
+
+    if func in seen:
+        # Recursion, or a function that has already been described
+        return ('function', func.__module__, func.__qualname__)
+
+    seen.add(func)
+
+    try:
+        source = inspect.getsource(func)
+    except (IOError, OSError, TypeError):
+        source = (func.__code__.co_code,
+                  repr(func.__code__.co_consts))
+
+    closure = []
+    for cell in func.__closure__ or ():
+        try:
+            contents = cell.cell_contents
+        except ValueError:
+            # An empty cell
+            closure.append(None)
+        else:
+            closure.append(_describe(contents, seen))
+
+    used_globals = []
+    for name in sorted(_global_names(func.__code__)):
+        if name not in func.__globals__:
+            # A builtin, or the name of an attribute
+            continue
+
+        used_globals.append((name, _describe_global(
+            func.__globals__[name], func.__module__, seen)))
+
+    return ('function', func.__module__, func.__qualname__, source,
+            tuple(closure), _describe(func.__defaults__, seen),
+            _describe(func.__kwdefaults__, seen), tuple(used_globals))
+
+def _describe_global(value, module, seen):
+    '''Return a description of ``value``, a global of a function in
+    ``module``. Functions and blocks in the same module are followed.
+    Modules, classes and the functions and blocks of other modules are only
+    described by their names. Any other value (such as a module level
+    constant) is described in full.
+    '''
+    func = getattr(value, 'func', value)
+
+    if inspect.ismodule(value):
+        return ('module', value.__name__)
+
+    elif inspect.isfunction(func) or inspect.isbuiltin(func):
+        if getattr(value, '__module__', None) == module:
+            return _describe(value, seen)
+
+        return ('function', getattr(value, '__module__', None),
+                getattr(func, '__qualname__', None))
+
+    elif inspect.isclass(value):
+        return ('class', value.__module__, value.__qualname__)
+
+    else:
+        return _describe(value, seen)
+
+def _global_names(code):
+    '''Return the set of names used by ``code`` and the code nested inside
+    it, some of which are globals.
+    '''
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if inspect.iscode(const):
+            names.update(_global_names(const))
+
+    return names
@@ -0,0 +1,284 @@
+from .cosimulation import SynchronousTest, first_mismatch, _default_test_id
+from .scheduling import schedule_jobs
+
+import concurrent.futures
+import importlib
+import multiprocessing
+import os
+import time
+import traceback
+
+__all__ = ['run_seeds', 'ForkServerPool']
+
+# The SynchronousTest that the worker processes of a ForkServerPool run their
+# seeds with, which they inherit already elaborated when they are forked.
+_worker_test = None
+
+def _init_seed_worker(test):
+    global _worker_test
+    _worker_test = test
+
+def _run_worker_seed(seed, cycles, engine):
+    return _seed_summary(_worker_test, seed, cycles, engine)
+
+def _seed_summary(test, seed, cycles, engine):
+    '''Cosimulate ``test`` with ``seed`` and return a summary of the
+    result. An error raised by the simulation is a failure of the seed.
+    '''
+    start = time.perf_counter()
+
+    try:
+        dut_outputs, ref_outputs = test.cosimulate(
+            cycles, engine=engine, seed=seed)
+
+    except Exception as e:
+        return {'seed': seed,
+                'passed': False,
+                'mismatch': None,
+                'error': ''.join(
+                    traceback.format_exception_only(type(e), e)).strip(),
+                'coverage': None,
+                'time': time.perf_counter() - start}
+
+    mismatch = first_mismatch(dut_outputs, ref_outputs)
+
+    return {'seed': seed,
+            'passed': mismatch is None,
+            'mismatch': mismatch,
+            'error': None,
+            'coverage': (
+                None if test.coverage is None else test.coverage.report()),
+            'time': time.perf_counter() - start}
+
+class ForkServerPool(object):
+    '''A pool of ``workers`` processes (by default, one per CPU) that run
+    seeds of a single :class:`veriutils.SynchronousTest`, all forked from a
+    template that has already been built and elaborated, so that no worker
+    imports or elaborates anything and a job starts as soon as it is
+    submitted. The calling process serves as the fork server: it imports
+    the modules named in ``preload`` (such as ``'kea.axi'``, or modules that
+    the factories only import when they are called), builds the test from
+    ``dut_factory``, ``ref_factory``, ``args``, ``arg_types`` and any other
+    keyword arguments (as for :class:`veriutils.SynchronousTest`), and
+    cosimulates it for ``warmup_cycles`` cycles, which elaborates the blocks
+    that are reused by later cosimulations. Unlike for
+    :class:`veriutils.SynchronousTest`, ``reuse_elaboration`` is ``True`` by
+    default, and should only be set to ``False`` if the factories keep state
+    outside of signals that relies on them being called again (see
+    :class:`veriutils.SynchronousTest`). The warm up is neither
+    recorded in a ``results_db`` nor stored in a ``ref_cache``. The workers
+    are then forked and kept for the life of the pool, so it is worth
+    keeping a pool for as long as there are seeds of the test to run.
+
+    The template test is kept as ``template``. An error in building it is
+    raised, but an error raised by the warm up simulation is left to fail
+    the seeds that meet it. The pool needs the ``fork`` start method, and
+    should be shut down with :meth:`shutdown`, or used as a context manager.
+    '''
+
+    def __init__(self, dut_factory, ref_factory, args, arg_types,
+                 workers=None, preload=(), warmup_cycles=2,
+                 reuse_elaboration=True, **kwargs):
+
+        if 'fork' not in multiprocessing.get_all_start_methods():
+            raise RuntimeError(
+                'A ForkServerPool needs the fork start method.')
+
+        if workers is None:
+            workers = os.cpu_count() or 1
+
+        if workers < 1:
+            raise ValueError('Invalid workers: There should be at least one '
+                             'worker.')
+
+        if warmup_cycles < 1:
+            raise ValueError('Invalid warm up cycles: There should be at '
+                             'least one warm up cycle.')
+
+        for module_name in preload:
+            importlib.import_module(module_name)
+
+        template = SynchronousTest(
+            dut_factory, ref_factory, args, arg_types,
+            reuse_elaboration=reuse_elaboration, **kwargs)
+
+        results_db, ref_cache = template.results_db, template.ref_cache
+        template.results_db, template.ref_cache = None, None
+
+        try:
+            template.cosimulate(warmup_cycles)
+        except Exception:
+            # Left to fail the seeds that meet it
+            pass
+        finally:
+            template.results_db, template.ref_cache = results_db, ref_cache
+
+        self.template = template
+        self.workers = workers
+
+        # The workers are forked by the executor, so they inherit the
+        # template rather than it being pickled.
+        self._executor = concurrent.futures.ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context('fork'),
+            initializer=_init_seed_worker, initargs=(template,))
+
+    def submit(self, seed, cycles, engine='event'):
+        '''Run ``seed`` for ``cycles`` cycles with ``engine`` in one of the
+        workers. Return a :class:`concurrent.futures.Future` of the summary
+        of the seed, as given by :func:`run_seeds`.
+        '''
+        return self._executor.submit(_run_worker_seed, seed, cycles, engine)
+
+    def run_seeds(self, seeds, cycles, engine='event', stop_on_failure=False):
+        '''Run each of ``seeds`` for ``cycles`` cycles with ``engine``,
+        starting them in the order given, and return a dict of the summary of
+        each seed that was run, keyed by the seed. If ``stop_on_failure`` is
+        ``True``, the seeds that have not started are cancelled as soon as
+        one fails.
+        '''
+        futures = [self.submit(seed, cycles, engine) for seed in seeds]
+        summaries = {}
+
+        try:
+            for future in concurrent.futures.as_completed(futures):
+                summary = future.result()
+                summaries[summary['seed']] = summary
+
+                if stop_on_failure and not summary['passed']:
+                    break
+
+        finally:
+            for future in futures:
+                future.cancel()
+
+        # The cancelled futures are never yielded by as_completed, so the
+        # seeds that were already running are collected once they have
+        # finished.
+        for future in futures:
+            if not future.cancelled():
+                summary = future.result()
+                summaries[summary['seed']] = summary
+
+        return summaries
+
+    def shutdown(self, wait=True):
+        '''Stop the workers once they have finished the seeds that have been
+        submitted. The pool cannot be used afterwards.
+        '''
+        self._executor.shutdown(wait=wait, cancel_futures=not wait)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.shutdown(wait=exc_type is None)
+        return False
+
+def run_seeds(n_seeds, cycles, dut_factory, ref_factory, args, arg_types,
+              workers=None, stop_on_failure=False, engine='event',
+              reuse_elaboration=True, **kwargs):
+    '''Cosimulate the dut and the ref for ``cycles`` cycles with each of the
+    seeds ``0`` to ``n_seeds - 1`` (see the ``seed`` argument of
+    :meth:`veriutils.SynchronousTest.cosimulate`), spread over ``workers``
+    processes (by default, one per CPU). ``engine`` is passed to
+    :meth:`veriutils.SynchronousTest.cosimulate` and any other keyword
+    arguments to :class:`veriutils.SynchronousTest`. As for
+    :class:`ForkServerPool`, ``reuse_elaboration`` is ``True`` by default.
+
+    The :class:`veriutils.SynchronousTest` is built and elaborated once by
+    the caller, and the workers are forked from it by a
+    :class:`ForkServerPool`, so the factories do not need to be picklable
+    and nothing is imported or elaborated again. The stimulus of each seed
+    is the same as it would be for a :class:`veriutils.SynchronousTest`
+    built by the caller. If there is only one worker or the ``fork`` start
+    method is not available, the seeds are run one after another in the
+    calling process.
+
+    Only a summary of each seed is returned, not the outputs. If
+    ``stop_on_failure`` is ``True``, the seeds that have not started are
+    cancelled as soon as one fails.
+
+    If a ``results_db`` is passed on to :class:`veriutils.SynchronousTest`,
+    every seed is recorded in it and the seeds are run in the order given by
+    :func:`veriutils.schedule_jobs`, so the seeds that failed on their latest
+    run are run first.
+
+    Return a dict with the following keys:
+        * ``'passed'``: The list of the seeds that passed.
+        * ``'failed'``: The list of the seeds that failed.
+        * ``'cancelled'``: The list of the seeds that were not run.
+        * ``'summaries'``: A list of dicts, one for each seed that was run
+          in the order of the seeds, with the following keys:
+            * ``'seed'``: The seed.
+            * ``'passed'``: ``True`` if the outputs of the dut and the ref
+              agree.
+            * ``'mismatch'``: ``None``, or the first difference between the
+              outputs, as returned by
+              :func:`veriutils.first_mismatch`.
+            * ``'error'``: ``None``, or a description of the exception
+              raised by the simulation (which fails the seed).
+            * ``'coverage'``: ``None``, or the
+              :meth:`veriutils.Coverage.report` of the simulation.
+            * ``'time'``: The wall time of the cosimulation in seconds.
+
+    An error in building the :class:`veriutils.SynchronousTest` is raised.
+    '''
+    if n_seeds < 1:
+        raise ValueError('Invalid number of seeds: There should be at least '
+                         'one seed.')
+
+    if dut_factory is None:
+        raise ValueError('Invalid dut: There should be a dut to compare '
+                         'with the ref.')
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    if workers < 1:
+        raise ValueError('Invalid workers: There should be at least one '
+                         'worker.')
+
+    workers = min(workers, n_seeds)
+
+    test_args = (dut_factory, ref_factory, args, arg_types)
+    seeds = list(range(n_seeds))
+
+    run_order = seeds
+    if kwargs.get('results_db', None) is not None:
+        test_id = kwargs.get('test_id', None)
+        if test_id is None:
+            test_id = _default_test_id(dut_factory, ref_factory)
+
+        run_order = [seeds[n] for n in schedule_jobs(
+            [{'test_id': test_id, 'seed': seed, 'cycles': cycles,
+              'signals': None} for seed in seeds],
+            kwargs['results_db'], engine=engine)]
+
+    summaries = {}
+
+    if workers == 1 or 'fork' not in multiprocessing.get_all_start_methods():
+        test = SynchronousTest(
+            *test_args, reuse_elaboration=reuse_elaboration, **kwargs)
+
+        for seed in run_order:
+            summaries[seed] = _seed_summary(test, seed, cycles, engine)
+
+            if stop_on_failure and not summaries[seed]['passed']:
+                break
+
+    else:
+        with ForkServerPool(
+            *test_args, workers=workers,
+            reuse_elaboration=reuse_elaboration, **kwargs) as pool:
+            summaries = pool.run_seeds(
+                run_order, cycles, engine, stop_on_failure=stop_on_failure)
+
+    return {
+        'passed': [seed for seed in seeds
+                   if seed in summaries and summaries[seed]['passed']],
+        'failed': [seed for seed in seeds
+                   if seed in summaries and not summaries[seed]['passed']],
+        'cancelled': [seed for seed in seeds if seed not in summaries],
+        'summaries': [summaries[seed] for seed in seeds
+                      if seed in summaries]}
@@ -0,0 +1,192 @@
+import sqlite3
+import statistics
+import sys
+import time
+
+try:
+    import resource
+except ImportError: # pragma: no cover
+    # Not available on Windows
+    resource = None
+
+__all__ = ['ResultsDatabase']
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    test_id TEXT NOT NULL,
+    timestamp REAL NOT NULL,
+    seed,
+    cycles INTEGER NOT NULL,
+    wall_time REAL NOT NULL,
+    cycles_per_second REAL,
+    peak_memory INTEGER,
+    passed INTEGER,
+    engine TEXT,
+    signals INTEGER
+);
+CREATE INDEX IF NOT EXISTS runs_by_test ON runs (test_id, id);
+'''
+
+_COLUMNS = ('id', 'test_id', 'timestamp', 'seed', 'cycles', 'wall_time',
+            'cycles_per_second', 'peak_memory', 'passed', 'engine', 'signals')
+
+def _peak_memory():
+    '''Return the peak resident memory of this process so far in bytes, or
+    ``None`` if it cannot be found.
+    '''
+    if resource is None: # pragma: no cover
+        return None
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # In kilobytes, except on macOS
+    if sys.platform == 'darwin': # pragma: no cover
+        return peak
+
+    return peak * 1024
+
+class ResultsDatabase(object):
+    '''A SQLite database of the results of cosimulations, kept in the file
+    ``filename`` (which is created if it does not exist). If it is passed to
+    :class:`veriutils.SynchronousTest` as ``results_db``, every call to
+    :meth:`veriutils.SynchronousTest.cosimulate` is recorded in it.
+
+    Each run records the id of the test, the seed, the number of cycles that
+    were simulated, the wall time, the throughput in cycles per second, the
+    peak memory, whether the dut and the ref agreed, the engine used and the
+    number of signals in the arguments of the test. The peak memory is the
+    peak resident memory of the process so far (as given by
+    :func:`resource.getrusage`), so it only grows during the life of a
+    process and does not include any worker processes.
+
+    A connection is opened for each call, so the database can be used from
+    several threads and processes at once.
+    '''
+
+    def __init__(self, filename):
+        self.filename = filename
+
+        with self._connect() as connection:
+            connection.executescript(_SCHEMA)
+
+            columns = [row[1] for row in connection.execute(
+                'PRAGMA table_info(runs)')]
+
+            # Added after the first version of the table
+            if 'signals' not in columns:
+                connection.execute(
+                    'ALTER TABLE runs ADD COLUMN signals INTEGER')
+
+        connection.close()
+
+    def _connect(self):
+        return sqlite3.connect(self.filename, timeout=30)
+
+    def record(self, test_id, seed, cycles, wall_time, passed,
+               peak_memory=None, engine=None, timestamp=None, signals=None):
+        '''Record a run of the test ``test_id``. ``passed`` is ``True`` or
+        ``False``, or ``None`` if there was nothing to compare (for example,
+        if there was no dut). ``timestamp`` defaults to the current time.
+        ``signals`` is the number of signals in the arguments of the test.
+        '''
+        if timestamp is None:
+            timestamp = time.time()
+
+        if wall_time > 0:
+            cycles_per_second = cycles / wall_time
+        else:
+            cycles_per_second = None
+
+        with self._connect() as connection:
+            connection.execute(
+                'INSERT INTO runs (test_id, timestamp, seed, cycles, '
+                'wall_time, cycles_per_second, peak_memory, passed, engine, '
+                'signals) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (test_id, timestamp, seed, cycles, wall_time,
+                 cycles_per_second, peak_memory,
+                 None if passed is None else int(passed), engine, signals))
+
+        connection.close()
+
+    def runs(self, test_id=None):
+        '''Return a list of the recorded runs, oldest first, of the test
+        ``test_id`` or of every test if it is ``None``. Each run is a dict
+        with the keys ``'id'``, ``'test_id'``, ``'timestamp'``, ``'seed'``,
+        ``'cycles'``, ``'wall_time'``, ``'cycles_per_second'``,
+        ``'peak_memory'``, ``'passed'``, ``'engine'`` and ``'signals'``.
+        '''
+        query = 'SELECT {} FROM runs'.format(', '.join(_COLUMNS))
+        parameters = ()
+
+        if test_id is not None:
+            query += ' WHERE test_id = ?'
+            parameters = (test_id,)
+
+        with self._connect() as connection:
+            rows = connection.execute(query + ' ORDER BY id', parameters)
+            runs = [dict(zip(_COLUMNS, row)) for row in rows]
+
+        connection.close()
+
+        for run in runs:
+            if run['passed'] is not None:
+                run['passed'] = bool(run['passed'])
+
+        return runs
+
+    def test_ids(self):
+        '''Return a sorted list of the ids of the tests with recorded runs.
+        '''
+        with self._connect() as connection:
+            test_ids = [row[0] for row in connection.execute(
+                'SELECT DISTINCT test_id FROM runs ORDER BY test_id')]
+
+        connection.close()
+
+        return test_ids
+
+    def throughput_regressions(self, threshold=0.75, window=5):
+        '''Return a list of the tests of which the latest run was slower than
+        before. The throughput of the latest run of each test is compared
+        with the median throughput of up to ``window`` earlier runs that used
+        the same engine, and the test is flagged if the ratio of the two is
+        less than ``threshold``. Tests without an earlier run are not
+        flagged.
+
+        Each flagged test is a dict with the keys ``'test_id'``,
+        ``'cycles_per_second'`` (of the latest run), ``'baseline'`` (the
+        median of the earlier runs), ``'ratio'`` and ``'run'`` (the latest
+        run, as returned by :meth:`runs`).
+        '''
+        if window < 1:
+            raise ValueError('Invalid window: The window should be at least '
+                             'one run.')
+
+        regressions = []
+        for test_id in self.test_ids():
+            runs = [run for run in self.runs(test_id)
+                    if run['cycles_per_second'] is not None]
+
+            if len(runs) < 2:
+                continue
+
+            latest = runs[-1]
+            earlier = [run['cycles_per_second'] for run in runs[:-1]
+                       if run['engine'] == latest['engine']][-window:]
+
+            if len(earlier) == 0:
+                continue
+
+            baseline = statistics.median(earlier)
+            ratio = latest['cycles_per_second'] / baseline
+
+            if ratio < threshold:
+                regressions.append({
+                    'test_id': test_id,
+                    'cycles_per_second': latest['cycles_per_second'],
+                    'baseline': baseline,
+                    'ratio': ratio,
+                    'run': latest})
+
+        return regressions
@@ -0,0 +1,106 @@
+import statistics
+
+__all__ = ['predict_duration', 'schedule_jobs']
+
+# The throughput, in cycles per second multiplied by the number of signals,
+# that is assumed when nothing has been recorded. It is roughly that of a
+# small design on the event engine.
+_DEFAULT_SIGNAL_THROUGHPUT = 40000.0
+
+def _runs_by_test(results_db):
+    '''Return the runs recorded in ``results_db`` (which can be ``None``) as
+    a dict of lists of runs, oldest first, keyed by test id.
+    '''
+    runs_by_test = {}
+
+    if results_db is not None:
+        for run in results_db.runs():
+            runs_by_test.setdefault(run['test_id'], []).append(run)
+
+    return runs_by_test
+
+def _predict(runs_by_test, test_id, cycles, signals, engine, window):
+
+    def timed(runs):
+        return [run for run in runs
+                if run['cycles_per_second'] is not None and
+                (engine is None or run['engine'] == engine)]
+
+    test_runs = timed(runs_by_test.get(test_id, []))[-window:]
+
+    if len(test_runs) > 0:
+        return cycles / statistics.median(
+            run['cycles_per_second'] for run in test_runs)
+
+    # Otherwise, the throughput of the other tests is scaled by the number
+    # of signals.
+    signal_throughputs = []
+    for runs in runs_by_test.values():
+        runs = [run for run in timed(runs) if run['signals']]
+
+        if len(runs) > 0:
+            signal_throughputs.append(
+                runs[-1]['cycles_per_second'] * runs[-1]['signals'])
+
+    if len(signal_throughputs) > 0:
+        signal_throughput = statistics.median(signal_throughputs)
+    else:
+        signal_throughput = _DEFAULT_SIGNAL_THROUGHPUT
+
+    return cycles * max(signals or 1, 1) / signal_throughput
+
+def predict_duration(results_db, test_id, cycles, signals=None,
+                     engine=None, window=5):
+    '''Predict the wall time in seconds of a cosimulation of ``cycles``
+    cycles of the test ``test_id``, which has ``signals`` signals in its
+    arguments, from the runs recorded in ``results_db`` (a
+    :class:`veriutils.ResultsDatabase`, or ``None``). Only runs with
+    ``engine`` are used, unless it is ``None``.
+
+    If the test has been run before, its median throughput over its latest
+    ``window`` runs is used. Otherwise, the median throughput per signal of
+    the latest runs of the other tests is scaled by ``signals``, or a rough
+    default throughput is used if nothing has been recorded.
+    '''
+    return _predict(_runs_by_test(results_db), test_id, cycles, signals,
+                    engine, window)
+
+def schedule_jobs(jobs, results_db=None, engine=None, window=5):
+    '''Return the order in which to run ``jobs``, as a list of indices into
+    ``jobs``, so that the failures are found early and the long jobs do not
+    start last. Each job is a dict with the keys ``'test_id'``, ``'seed'``,
+    ``'cycles'`` and ``'signals'`` (which can be ``None``).
+
+    The jobs are ordered from the runs recorded in ``results_db`` (a
+    :class:`veriutils.ResultsDatabase`). First come the jobs of which the
+    seed failed on its latest run of the test, then the jobs of the tests
+    that failed in any of their latest ``window`` runs, then the rest. Within
+    each of those, the jobs with the longest predicted duration (see
+    :func:`predict_duration`) come first. Jobs that are otherwise equal keep
+    their order.
+    '''
+    if window < 1:
+        raise ValueError('Invalid window: The window should be at least one '
+                         'run.')
+
+    runs_by_test = _runs_by_test(results_db)
+
+    def priority(index):
+        job = jobs[index]
+        test_runs = runs_by_test.get(job['test_id'], [])
+
+        seed_runs = [run for run in test_runs if run['seed'] == job['seed']]
+
+        if len(seed_runs) > 0 and seed_runs[-1]['passed'] is False:
+            failures = 0
+        elif any(run['passed'] is False for run in test_runs[-window:]):
+            failures = 1
+        else:
+            failures = 2
+
+        duration = _predict(runs_by_test, job['test_id'], job['cycles'],
+                            job['signals'], engine, window)
+
+        return (failures, -duration, index)
+
+    return sorted(range(len(jobs)), key=priority)
@@ -0,0 +1,496 @@
+'''Moves simulation outputs between processes through shared memory.
+
+Pickling the outputs of a long simulation, which are lists of ``intbv``,
+``bool`` and enum values, is slow, and so is sending the result through a
+pipe. Instead, :func:`share_outputs` packs each list into a column of fixed
+size values in a ``multiprocessing.shared_memory`` block and returns a small
+descriptor that can be sent in its place. :class:`SharedOutputs` attaches to
+the block in the receiving process and gives views of the columns, which
+decode the values as they are read rather than copying them all up front.
+'''
+
+from myhdl import intbv, EnumItemType, enum
+
+from collections.abc import Mapping, Sequence
+from collections import deque
+from multiprocessing import shared_memory
+import pickle
+import struct
+
+try:
+    from multiprocessing import resource_tracker
+except ImportError: # pragma: no cover
+    resource_tracker = None
+
+__all__ = ['share_outputs', 'SharedOutputs', 'SharedSequence']
+
+_SHARED_OUTPUTS_VERSION = 1
+
+# Every column starts on a multiple of this
+_ALIGNMENT = 8
+
+_INT64_MIN = -2**63
+_INT64_MAX = 2**63 - 1
+
+def _fits_int64(values):
+    return all(_INT64_MIN <= each <= _INT64_MAX for each in values)
+
+def _wide_itemsize(values):
+    '''Return the number of bytes needed to hold every one of ``values`` as a
+    signed integer.
+    '''
+    return max((each.bit_length() for each in values), default=0)//8 + 1
+
+def _column_codec(values):
+    '''Return a ``(codec, raw_values)`` pair describing how to pack
+    ``values`` into a column, where ``raw_values`` are the integers to pack,
+    or ``None`` if the values are not all of one type that can be packed.
+    '''
+    first = values[0]
+    first_type = type(first)
+
+    if not all(type(each) is first_type for each in values):
+        return None
+
+    if first_type is bool:
+        return ('bool',), [int(each) for each in values]
+
+    elif first_type is int:
+        raw_values = values
+        bounds = None
+
+    elif isinstance(first, intbv):
+        bounds = (first._min, first._max, first._nrbits)
+        if not all((each._min, each._max, each._nrbits) == bounds
+                   for each in values):
+            return None
+
+        raw_values = [each._val for each in values]
+
+    elif isinstance(first, EnumItemType):
+        enum_type = first._type
+        if not all(each._type is enum_type for each in values):
+            return None
+
+        return (('enum', tuple(enum_type._names)),
+                [each._index for each in values])
+
+    else:
+        return None
+
+    if _fits_int64(raw_values):
+        storage = ('int64',)
+    else:
+        storage = ('wide', _wide_itemsize(raw_values))
+
+    if bounds is None:
+        return ('int',) + storage, raw_values
+    else:
+        return ('intbv', first_type) + bounds + storage, raw_values
+
+def _itemsize(codec):
+    if codec[0] == 'bool':
+        return 1
+
+    elif codec[0] == 'enum':
+        return 4
+
+    elif codec[-2] == 'wide':
+        return codec[-1]
+
+    else:
+        return 8
+
+def _pack_column(buf, offset, codec, raw_values):
+    '''Write ``raw_values`` into ``buf`` from ``offset`` as described by
+    ``codec``.
+    '''
+    count = len(raw_values)
+
+    if codec[0] == 'bool':
+        buf[offset:offset + count] = bytes(raw_values)
+
+    elif codec[0] == 'enum':
+        struct.pack_into('<%dI' % count, buf, offset, *raw_values)
+
+    elif codec[-2] == 'wide':
+        itemsize = codec[-1]
+        for n, value in enumerate(raw_values):
+            start = offset + n * itemsize
+            buf[start:start + itemsize] = value.to_bytes(
+                itemsize, 'little', signed=True)
+
+    else:
+        struct.pack_into('<%dq' % count, buf, offset, *raw_values)
+
+def _decoder(codec, enum_types):
+    '''Return a function that turns a raw packed integer back into a value
+    as described by ``codec``.
+    '''
+    if codec[0] == 'bool':
+        return bool
+
+    elif codec[0] == 'int':
+        return None
+
+    elif codec[0] == 'enum':
+        names = codec[1]
+        enum_type = enum_types.get(names, None)
+        if enum_type is None:
+            # Only values of the same enum type can be compared, so
+            # enum_types should be given if the values are compared with
+            # anything else.
+            enum_type = enum(*names)
+            enum_types[names] = enum_type
+
+        return [getattr(enum_type, name) for name in names].__getitem__
+
+    else:
+        cls, min_val, max_val, nrbits = codec[1:5]
+        new = cls.__new__
+
+        # This skips the bounds checks of the constructor, which every value
+        # passed before it was packed.
+        def decode(value):
+            result = new(cls)
+            result._val = value
+            result._min = min_val
+            result._max = max_val
+            result._nrbits = nrbits
+            return result
+
+        return decode
+
+def _plan(value, columns):
+    '''Return the description of ``value`` used to rebuild it, adding each
+    list of values that can be packed to ``columns`` as a
+    ``(codec, raw_values)`` pair.
+    '''
+    if isinstance(value, Mapping):
+        return ('mapping', type(value),
+                [(key, _plan(value[key], columns)) for key in value])
+
+    elif isinstance(value, (list, tuple, deque)):
+        if len(value) > 0:
+            column = _column_codec(value)
+            if column is not None:
+                columns.append(column)
+                return ('column', type(value), len(columns) - 1)
+
+            if all(isinstance(each, (Mapping, list, tuple, deque))
+                   for each in value):
+                return ('sequence', type(value),
+                        [_plan(each, columns) for each in value])
+
+            columns.append((('pickle',), pickle.dumps(
+                list(value), protocol=pickle.HIGHEST_PROTOCOL)))
+            return ('column', type(value), len(columns) - 1)
+
+        return ('sequence', type(value), [])
+
+    else:
+        return ('value', value)
+
+def share_outputs(outputs):
+    '''Copy ``outputs`` into a new shared memory block and return a
+    descriptor from which :class:`SharedOutputs` can rebuild them in another
+    process. ``outputs`` is one of the pair returned by
+    :meth:`veriutils.SynchronousTest.cosimulate`, or any other mapping of
+    lists and nested mappings of lists.
+
+    Each list of values that are all ``bool``, all ``int``, all ``intbv``
+    with the same bounds or all items of one enum is packed as a column of
+    fixed size values. Any other list is pickled into the block.
+
+    The descriptor is a small picklable dict. The block is owned by whoever
+    receives it, so it is not removed when this process exits, and should be
+    removed with :meth:`SharedOutputs.unlink` once it is no longer needed.
+    '''
+    columns = []
+    plan = _plan(outputs, columns)
+
+    layout = []
+    size = 0
+    for codec, raw_values in columns:
+        if codec[0] == 'pickle':
+            nbytes = len(raw_values)
+            count = None
+        else:
+            nbytes = _itemsize(codec) * len(raw_values)
+            count = len(raw_values)
+
+        layout.append((codec, size, count, nbytes))
+        size += -(-nbytes//_ALIGNMENT) * _ALIGNMENT
+
+    block = shared_memory.SharedMemory(create=True, size=max(size, 1))
+
+    try:
+        for (codec, offset, count, nbytes), (codec, raw_values) in zip(
+            layout, columns):
+
+            if codec[0] == 'pickle':
+                block.buf[offset:offset + nbytes] = raw_values
+            else:
+                _pack_column(block.buf, offset, codec, raw_values)
+
+        if resource_tracker is not None:
+            # The receiver is responsible for removing the block.
+            resource_tracker.unregister(block._name, 'shared_memory')
+
+    except:
+        block.close()
+        block.unlink()
+        raise
+
+    block.close()
+
+    return {'version': _SHARED_OUTPUTS_VERSION,
+            'name': block.name,
+            'layout': layout,
+            'plan': plan}
+
+def _unlink_descriptor(descriptor):
+    '''Remove the shared memory block described by ``descriptor``, if it
+    still exists, without rebuilding the outputs.
+    '''
+    try:
+        block = shared_memory.SharedMemory(name=descriptor['name'])
+    except FileNotFoundError:
+        return
+
+    block.close()
+    block.unlink()
+
+class SharedSequence(Sequence):
+    '''A read only view of a column of values in a shared memory block,
+    which decodes each value as it is read. It compares equal to any
+    sequence with the same values, and the comparison of two views of
+    columns packed in the same way is done on the packed bytes.
+
+    A view can only be used until the :class:`SharedOutputs` it belongs to
+    is closed. Use :meth:`copy` to keep the values beyond that.
+    '''
+
+    def __init__(self, buffer, codec, count, decode, sequence_type=list):
+        self._buffer = buffer
+        self._codec = codec
+        self._count = count
+        self._decode = decode
+        self._itemsize = _itemsize(codec)
+        self._sequence_type = sequence_type
+
+        if codec[0] == 'bool':
+            self._raw = buffer
+
+        elif codec[0] == 'enum':
+            self._raw = buffer.cast('I')
+
+        elif codec[-2] == 'wide':
+            self._raw = None
+
+        else:
+            self._raw = buffer.cast('q')
+
+    def _raw_value(self, index):
+
+        if self._raw is not None:
+            return self._raw[index]
+
+        start = index * self._itemsize
+        return int.from_bytes(
+            self._buffer[start:start + self._itemsize], 'little',
+            signed=True)
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, index):
+
+        if isinstance(index, slice):
+            return [self[n] for n in range(*index.indices(self._count))]
+
+        if index < 0:
+            index += self._count
+
+        if index < 0 or index >= self._count:
+            raise IndexError('SharedSequence index out of range')
+
+        value = self._raw_value(index)
+
+        if self._decode is None:
+            return value
+
+        return self._decode(value)
+
+    def __iter__(self):
+        if self._raw is not None:
+            raw_values = iter(self._raw)
+        else:
+            raw_values = (self._raw_value(n) for n in range(self._count))
+
+        if self._decode is None:
+            return raw_values
+
+        return map(self._decode, raw_values)
+
+    def __eq__(self, other):
+
+        if isinstance(other, SharedSequence) and other._codec == self._codec:
+            return self._buffer == other._buffer
+
+        if not isinstance(other, Sequence) or isinstance(other, str):
+            return NotImplemented
+
+        return len(other) == self._count and list(self) == list(other)
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+
+        if result is NotImplemented:
+            return result
+
+        return not result
+
+    __hash__ = None
+
+    def __repr__(self):
+        return 'SharedSequence(%r)' % (list(self),)
+
+    def copy(self):
+        '''Return the values in a new sequence of the type that was shared
+        (such as :class:`veriutils.SignalOutput`).
+        '''
+        return self._sequence_type(self)
+
+    def _release(self):
+        if self._raw is not None and self._raw is not self._buffer:
+            self._raw.release()
+
+        self._buffer.release()
+
+class SharedOutputs(object):
+    '''The outputs shared by :func:`share_outputs` in another process,
+    rebuilt from its ``descriptor``.
+
+    ``outputs`` holds the outputs in the same type of mapping that was
+    shared, with every packed list replaced by a :class:`SharedSequence`
+    view of the shared memory. Lists that were pickled are loaded when this
+    is constructed. :meth:`copy` gives the outputs with ordinary lists in
+    place of the views, as they were before they were shared.
+
+    Only values of the same enum type can be compared, so ``enum_types`` can
+    be set to a dict from the tuple of the names of each enum to the enum
+    type to use for its values. Otherwise, a new enum type is created for
+    each set of names.
+
+    The views can only be read until :meth:`close` is called, after which
+    :meth:`unlink` should be called to remove the block (both are called on
+    leaving a ``with`` block).
+    '''
+
+    def __init__(self, descriptor, enum_types=None):
+
+        if descriptor.get('version', None) != _SHARED_OUTPUTS_VERSION:
+            raise ValueError('Invalid descriptor: The descriptor version is '
+                             'not supported.')
+
+        self._enum_types = dict(enum_types or {})
+        self._plan = descriptor['plan']
+        self._block = shared_memory.SharedMemory(name=descriptor['name'])
+        self._views = []
+        self._columns = []
+        self._closed = False
+
+        try:
+            self._columns = [
+                self._column(codec, offset, count, nbytes)
+                for codec, offset, count, nbytes in descriptor['layout']]
+
+            self.outputs = self._rebuild(self._plan, False)
+
+        except:
+            self.close()
+            raise
+
+    def _column(self, codec, offset, count, nbytes):
+
+        if codec[0] == 'pickle':
+            return pickle.loads(self._block.buf[offset:offset + nbytes])
+
+        buffer = self._block.buf[offset:offset + nbytes]
+
+        return (codec, count, buffer, _decoder(codec, self._enum_types))
+
+    def _rebuild(self, plan, copy_columns):
+
+        kind = plan[0]
+
+        if kind == 'mapping':
+            mapping = plan[1]()
+            for key, each in plan[2]:
+                mapping[key] = self._rebuild(each, copy_columns)
+
+            return mapping
+
+        elif kind == 'sequence':
+            return plan[1](
+                self._rebuild(each, copy_columns) for each in plan[2])
+
+        elif kind == 'column':
+            column = self._columns[plan[2]]
+
+            if isinstance(column, list):
+                return plan[1](column)
+
+            codec, count, buffer, decode = column
+            view = SharedSequence(
+                buffer[:], codec, count, decode, sequence_type=plan[1])
+
+            if copy_columns:
+                values = view.copy()
+                view._release()
+                return values
+
+            self._views.append(view)
+            return view
+
+        else:
+            return plan[1]
+
+    def copy(self):
+        '''Return a copy of the outputs that does not depend on the shared
+        memory.
+        '''
+        return self._rebuild(self._plan, True)
+
+    def close(self):
+        '''Release the views and detach from the shared memory. The views
+        cannot be read after this.
+        '''
+        if self._closed:
+            return
+
+        for view in self._views:
+            view._release()
+
+        for column in self._columns:
+            if not isinstance(column, list):
+                column[2].release()
+
+        self._views = []
+        self._columns = []
+        self._block.close()
+        self._closed = True
+
+    def unlink(self):
+        '''Remove the shared memory block, which should be done once by the
+        receiver of the descriptor.
+        '''
+        self._block.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        self.unlink()
@@ -0,0 +1,320 @@
+'''A server that keeps a :class:`veriutils.SynchronousTest` elaborated in a
+long lived process and cosimulates it on request, so that an interactive
+session or a CI job can run it many times without importing or elaborating
+anything again. A server can be kept running with:
+
+    server = veriutils.SimulationServer(test, port=PORT)
+    server.serve_forever()
+
+and used from another process with a :class:`SimulationClient`.
+'''
+
+from .cosimulation import first_mismatch
+from .farm import _send_message, _receive_message
+
+from myhdl._enum import EnumItemType
+
+import pickle
+import socket
+import threading
+import time
+import traceback
+
+__all__ = ['SimulationServer', 'SimulationClient']
+
+class _EnumNamePickler(pickle.Pickler):
+    '''Pickles enum items as their names, as MyHDL enum types cannot be
+    pickled and a client does not have them.
+    '''
+
+    def reducer_override(self, obj):
+        if isinstance(obj, EnumItemType):
+            return str, (obj._name,)
+
+        return NotImplemented
+
+def _select_outputs(outputs, signals):
+    '''Return a dict with the keys ``'dut'`` and ``'ref'`` of the outputs
+    of the signals named in ``signals``, or of every signal if it is
+    ``None``, from the ``outputs`` returned by
+    :meth:`veriutils.SynchronousTest.cosimulate`.
+    '''
+    dut_outputs, ref_outputs = outputs
+
+    if signals is None:
+        signals = sorted(ref_outputs)
+
+    for name in signals:
+        if name not in ref_outputs:
+            raise ValueError(
+                'Invalid signals: {} is not a recorded signal.'.format(name))
+
+    return {'dut': {name: dut_outputs[name] for name in signals
+                    if name in dut_outputs},
+            'ref': {name: ref_outputs[name] for name in signals}}
+
+class SimulationServer(object):
+    '''Serves cosimulations of ``test``, a :class:`veriutils.SynchronousTest`,
+    to the clients that connect to it (see :class:`SimulationClient`). The
+    test should be constructed with ``reuse_elaboration`` set to ``True``,
+    so that it is elaborated on the first cosimulation and reused for every
+    later one, rather than elaborated again on every request.
+
+    The server listens on ``host`` and ``port`` as soon as it is constructed
+    (a ``port`` of ``0`` picks a free port), and the address it listens on
+    is given by ``address``. Clients are only served once
+    :meth:`serve_forever` is called, or :meth:`start` is called to serve
+    them from a thread.
+
+    Each client is served from its own thread and keeps the outputs of its
+    latest cosimulation, but the requests of every client are handled one at
+    a time on the same test, so the playback data set by one client is used
+    by the others.
+
+    The requests and responses are sent as pickles, which can run arbitrary
+    code when they are loaded, so the server should only listen on a local
+    or trusted network.
+    '''
+
+    def __init__(self, test, host='localhost', port=0):
+        self.test = test
+
+        self._listener = socket.create_server((host, port))
+        self.address = self._listener.getsockname()[:2]
+
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self._serving = False
+        self._thread = None
+
+    def serve_forever(self):
+        '''Serve clients until :meth:`close` is called or a client asks the
+        server to shut down.
+        '''
+        self._serving = True
+
+        # A thread blocked in accept is not woken when the listener is
+        # closed, so the listener is polled.
+        self._listener.settimeout(0.1)
+
+        try:
+            while not self._closed.is_set():
+                try:
+                    connection, address = self._listener.accept()
+                except socket.timeout:
+                    continue
+
+                connection.settimeout(None)
+                connection.setsockopt(
+                    socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+                threading.Thread(
+                    target=self._serve_client, args=(connection,),
+                    daemon=True).start()
+
+        finally:
+            self._listener.close()
+
+    def start(self):
+        '''Serve clients from a daemon thread and return the server.
+        '''
+        if self._thread is not None:
+            raise RuntimeError('The server has already been started.')
+
+        self._thread = threading.Thread(
+            target=self.serve_forever, daemon=True)
+        self._thread.start()
+
+        return self
+
+    def close(self):
+        '''Stop serving clients once the current requests have been handled.
+        '''
+        self._closed.set()
+
+        if self._thread is not None:
+            self._thread.join()
+
+        elif not self._serving:
+            self._listener.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    def _serve_client(self, connection):
+
+        session = {'outputs': None}
+
+        with connection:
+            try:
+                while not self._closed.is_set():
+                    request = _receive_message(connection)
+
+                    try:
+                        with self._lock:
+                            response = {
+                                'result': self._handle(request, session),
+                                'error': None}
+
+                    except Exception as e:
+                        response = {'result': None, 'error': e}
+
+                    try:
+                        _send_message(connection, response, _EnumNamePickler)
+
+                    except (pickle.PicklingError, TypeError,
+                            AttributeError) as e:
+                        # The result or the error could not be pickled, so
+                        # it is described instead.
+                        if response['error'] is not None:
+                            e = response['error']
+
+                        _send_message(connection, {
+                            'result': None,
+                            'error': RuntimeError(''.join(
+                                traceback.format_exception_only(
+                                    type(e), e)).strip())})
+
+            except (OSError, EOFError, pickle.UnpicklingError):
+                # The client has gone
+                pass
+
+    def _handle(self, request, session):
+        '''Return the result of ``request``, a dict of the request and its
+        arguments.
+        '''
+        kind = request.get('request', None)
+
+        if kind == 'cosimulate':
+            start = time.perf_counter()
+            outputs = self.test.cosimulate(
+                request['cycles'], engine=request['engine'],
+                seed=request['seed'])
+            wall_time = time.perf_counter() - start
+
+            session['outputs'] = outputs
+
+            if self.test.dut_factory is None:
+                mismatch = None
+                passed = None
+            else:
+                mismatch = first_mismatch(*outputs)
+                passed = mismatch is None
+
+            if request['signals'] is None:
+                selected = None
+            else:
+                selected = _select_outputs(outputs, request['signals'])
+
+            return {'passed': passed,
+                    'mismatch': mismatch,
+                    'time': wall_time,
+                    'engine_used': self.test.engine_used,
+                    'outputs': selected}
+
+        elif kind == 'playback':
+            self.test.set_playback_data(request['playback_data'])
+            return None
+
+        elif kind == 'outputs':
+            if session['outputs'] is None:
+                raise RuntimeError('No cosimulation has been run.')
+
+            return _select_outputs(session['outputs'], request['signals'])
+
+        elif kind == 'shutdown':
+            self._closed.set()
+            return None
+
+        raise ValueError(
+            'Invalid request: {!r} is not a request.'.format(kind))
+
+class SimulationClient(object):
+    '''A connection to the :class:`SimulationServer` listening on ``host``
+    and ``port``. The connection is retried for up to ``connect_timeout``
+    seconds, so the client can be started before the server. An error
+    raised by a request on the server is raised by the client.
+
+    The values of enum signals are returned as their names.
+    '''
+
+    def __init__(self, host, port, connect_timeout=10):
+        deadline = time.monotonic() + connect_timeout
+
+        while True:
+            try:
+                self._connection = socket.create_connection((host, port))
+                break
+            except OSError:
+                if time.monotonic() >= deadline:
+                    raise
+
+                time.sleep(0.1)
+
+        self._connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def _request(self, request):
+
+        _send_message(self._connection, request)
+        response = _receive_message(self._connection)
+
+        if response['error'] is not None:
+            raise response['error']
+
+        return response['result']
+
+    def cosimulate(self, cycles, seed=None, engine='event', signals=None):
+        '''Cosimulate the test of the server for ``cycles`` cycles, as
+        :meth:`veriutils.SynchronousTest.cosimulate` with ``seed`` and
+        ``engine``. Return a dict with the following keys:
+            * ``'passed'``: ``True`` if the outputs of the dut and the ref
+              agree, or ``None`` if there is no dut.
+            * ``'mismatch'``: ``None``, or the first difference between the
+              outputs, as returned by :func:`veriutils.first_mismatch`.
+            * ``'time'``: The wall time of the cosimulation on the server in
+              seconds.
+            * ``'engine_used'``: The engine that was used.
+            * ``'outputs'``: ``None``, or if ``signals`` is not ``None``,
+              the outputs of the signals named in it, as returned by
+              :meth:`outputs`.
+        '''
+        return self._request({'request': 'cosimulate', 'cycles': cycles,
+                              'seed': seed, 'engine': engine,
+                              'signals': signals})
+
+    def playback(self, playback_data):
+        '''Set the data of the `'playback'` args of the test of the server
+        from ``playback_data``, as
+        :meth:`veriutils.SynchronousTest.set_playback_data`. The data is
+        sent to the server, so should be a sequence (such as a NumPy array)
+        or the name of a ``.npy`` file that the server can read.
+        '''
+        self._request({'request': 'playback', 'playback_data': playback_data})
+
+    def outputs(self, signals=None):
+        '''Return the outputs of the latest cosimulation requested by this
+        client of the signals named in ``signals``, or of every recorded
+        signal if it is ``None``, as a dict with the keys ``'dut'`` and
+        ``'ref'``, each of which is a dict of the outputs keyed by the names
+        of the signals.
+        '''
+        return self._request({'request': 'outputs', 'signals': signals})
+
+    def shutdown(self):
+        '''Ask the server to stop serving clients.
+        '''
+        self._request({'request': 'shutdown'})
+
+    def close(self):
+        self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
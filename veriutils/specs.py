@@ -0,0 +1,261 @@
+from .cosimulation import SynchronousTest, Args, _default_test_id
+from .vectorized import VectorizedRef
+
+from myhdl import ResetSignal, Signal
+from myhdl._Signal import _Signal
+from myhdl._enum import EnumItemType
+
+import copy
+import importlib
+import pickle
+import random
+
+__all__ = ['SynchronousTestSpec', 'ArgConstructor']
+
+def _import_path(obj, description):
+    '''Return the import path of ``obj``, which is either already an import
+    path or a callable that can be imported by its module and name.
+    '''
+    if isinstance(obj, str):
+        _resolve(obj, description)
+        return obj
+
+    try:
+        path = '{}:{}'.format(obj.__module__, obj.__qualname__)
+    except AttributeError:
+        path = None
+
+    if path is None or '<locals>' in path or (
+        _resolve(path, description) is not obj):
+        raise ValueError(
+            'Invalid {}: {!r} should be importable from the top level of '
+            'its module, or be given as an import path.'.format(
+                description, obj))
+
+    return path
+
+def _resolve(path, description):
+    '''Return the object named by the import path ``path``, which is either
+    ``'module:name'`` or ``'module.name'``. The name can be dotted, as in
+    ``'module:Class.attribute'``.
+    '''
+    if ':' in path:
+        module_name, name = path.split(':', 1)
+    else:
+        module_name, _, name = path.rpartition('.')
+
+    if not module_name or not name:
+        raise ValueError(
+            'Invalid {}: {!r} is not an import path.'.format(
+                description, path))
+
+    try:
+        obj = importlib.import_module(module_name)
+        for each_name in name.split('.'):
+            obj = getattr(obj, each_name)
+
+    except (ImportError, AttributeError):
+        raise ValueError(
+            'Invalid {}: {!r} cannot be imported.'.format(description, path))
+
+    return obj
+
+class ArgConstructor(object):
+    '''Describes how to construct an argument of a
+    :class:`SynchronousTestSpec` in the process that builds the test.
+    ``constructor`` is the import path (``'module:name'``) of a callable, or
+    a callable that can be imported by its module and name, which is called
+    with ``args`` and ``kwargs`` to construct the argument. For example,
+    an AXI stream interface could be described by::
+
+        ArgConstructor('kea.axi:AxiStreamInterface', 4, use_TLAST=False)
+
+    ``args`` and ``kwargs`` should be picklable.
+    '''
+
+    def __init__(self, constructor, *args, **kwargs):
+        self.constructor = _import_path(constructor, 'constructor')
+        self.args = args
+        self.kwargs = kwargs
+
+    def __call__(self):
+        constructor = _resolve(self.constructor, 'constructor')
+        return constructor(*self.args, **self.kwargs)
+
+    def __eq__(self, other):
+        if not isinstance(other, ArgConstructor):
+            return NotImplemented
+
+        return ((self.constructor, self.args, self.kwargs) ==
+                (other.constructor, other.args, other.kwargs))
+
+    def __repr__(self):
+        return 'ArgConstructor({})'.format(', '.join(
+            [repr(self.constructor)] +
+            [repr(each) for each in self.args] +
+            ['{}={!r}'.format(key, value)
+             for key, value in sorted(self.kwargs.items())]))
+
+def _describe_arg(name, arg):
+    '''Return ``arg`` in the form in which it is held by a
+    :class:`SynchronousTestSpec`: signals become :class:`ArgConstructor`
+    objects and lists are described item by item.
+    '''
+    if isinstance(arg, ArgConstructor):
+        return arg
+
+    elif isinstance(arg, _Signal):
+        if isinstance(arg._init, EnumItemType):
+            raise ValueError(
+                'Invalid arg: {} is an enum signal, which should be given as '
+                'an ArgConstructor that creates the enum.'.format(name))
+
+        if isinstance(arg, ResetSignal):
+            return ArgConstructor(
+                ResetSignal, copy.copy(arg._init), active=arg.active,
+                isasync=arg.isasync)
+
+        return ArgConstructor(Signal, copy.copy(arg._init))
+
+    elif isinstance(arg, list):
+        return [_describe_arg('{}[{}]'.format(name, n), each)
+                for n, each in enumerate(arg)]
+
+    elif any(isinstance(each, _Signal)
+             for each in getattr(arg, '__dict__', {}).values()):
+        raise ValueError(
+            'Invalid arg: {} is an interface, which should be given as an '
+            'ArgConstructor.'.format(name))
+
+    return arg
+
+def _construct_arg(arg):
+
+    if isinstance(arg, ArgConstructor):
+        return arg()
+
+    elif isinstance(arg, list):
+        return [_construct_arg(each) for each in arg]
+
+    return copy.deepcopy(arg)
+
+class SynchronousTestSpec(object):
+    '''A picklable description of a :class:`veriutils.SynchronousTest`, from
+    which an identical test can be built in another process (or on another
+    machine) with :meth:`build`.
+
+    ``dut_factory`` and ``ref_factory`` are the import paths of the
+    factories (as ``'module:name'``), or factories that can be imported by
+    their module and name (that is, blocks defined at the top level of a
+    module), which are recorded by their import paths. ``dut_factory`` can
+    be ``None`` and ``ref_factory`` can be a
+    :class:`veriutils.VectorizedRef`, the function of which should then be
+    importable.
+
+    Each value of ``args`` is an :class:`ArgConstructor` that constructs the
+    argument, a list of them, or any other picklable value (such as the value
+    of a `'non-signal'` arg), which is copied. Signals and lists of signals
+    are described by :class:`ArgConstructor` objects automatically, so the
+    ``args`` dict of a :class:`veriutils.SynchronousTest` can be used as it
+    is unless it holds interfaces or enum signals, which need an
+    :class:`ArgConstructor`. ``arg_types`` is as for
+    :class:`veriutils.SynchronousTest`.
+
+    The seeds of the random sources are drawn from a :class:`random.Random`
+    seeded with ``seed`` when the test is built, so every test built from
+    the spec has the same stimulus. If ``seed`` is ``None``, it is drawn from
+    the :mod:`random` module when the spec is constructed.
+
+    ``period`` and any other keyword arguments are passed on to
+    :class:`veriutils.SynchronousTest` and should be picklable. The
+    ``custom_sources`` and ``rng`` arguments are not supported, as custom
+    sources refer to the args of a particular test.
+    '''
+
+    def __init__(self, dut_factory, ref_factory, args, arg_types,
+                 period=None, seed=None, **kwargs):
+
+        for unsupported in ('custom_sources', 'rng'):
+            if unsupported in kwargs:
+                raise ValueError(
+                    'Invalid spec: {} is not supported by a '
+                    'SynchronousTestSpec.'.format(unsupported))
+
+        if dut_factory is not None:
+            dut_factory = _import_path(dut_factory, 'dut factory')
+
+        if not isinstance(ref_factory, VectorizedRef):
+            ref_factory = _import_path(ref_factory, 'ref factory')
+
+        if seed is None:
+            seed = random.randrange(0, 0x5EEDF00D)
+
+        self.dut_factory = dut_factory
+        self.ref_factory = ref_factory
+        self.args = {name: _describe_arg(name, arg)
+                     for name, arg in args.items()}
+        self.arg_types = copy.deepcopy(arg_types)
+        self.period = period
+        self.seed = seed
+        self.kwargs = kwargs
+
+        try:
+            pickle.dumps(self)
+        except Exception as e:
+            raise ValueError(
+                'Invalid spec: The spec cannot be pickled ({}).'.format(e))
+
+    @property
+    def test_id(self):
+        '''The id under which the test built from the spec records its
+        results (see :class:`veriutils.ResultsDatabase`), which is found
+        without importing the factories.
+        '''
+        if self.kwargs.get('test_id', None) is not None:
+            return self.kwargs['test_id']
+
+        if self.dut_factory is None:
+            factory = self.ref_factory
+        else:
+            factory = self.dut_factory
+
+        if isinstance(factory, VectorizedRef):
+            return _default_test_id(None, factory)
+
+        return factory.replace(':', '.')
+
+    def signal_count(self):
+        '''Return the number of signals in the arguments of the test built
+        from the spec.
+        '''
+        args = {name: _construct_arg(arg) for name, arg in self.args.items()}
+        return Args(args, self.arg_types).signal_count
+
+    def build(self):
+        '''Return a new :class:`veriutils.SynchronousTest` built from the
+        spec.
+        '''
+        if self.dut_factory is None:
+            dut_factory = None
+        else:
+            dut_factory = _resolve(self.dut_factory, 'dut factory')
+
+        if isinstance(self.ref_factory, VectorizedRef):
+            ref_factory = self.ref_factory
+        else:
+            ref_factory = _resolve(self.ref_factory, 'ref factory')
+
+        args = {name: _construct_arg(arg) for name, arg in self.args.items()}
+
+        return SynchronousTest(
+            dut_factory, ref_factory, args, copy.deepcopy(self.arg_types),
+            period=self.period, rng=random.Random(self.seed),
+            **copy.deepcopy(self.kwargs))
+
+    def __repr__(self):
+        return ('SynchronousTestSpec({!r}, {!r}, {!r}, {!r}, period={!r}, '
+                'seed={!r}{})'.format(
+                    self.dut_factory, self.ref_factory, self.args,
+                    self.arg_types, self.period, self.seed,
+                    ''.join(', {}={!r}'.format(key, value)
+                            for key, value in sorted(self.kwargs.items()))))
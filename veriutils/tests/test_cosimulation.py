@@ -7,21 +7,35 @@ from kea.axi import (
 from myhdl import (intbv, modbv, enum, Signal, ResetSignal, instance,
                    delay, always, always_seq, Simulation, StopSimulation,
                    always_comb, block, BlockError)
+import myhdl
 
 import unittest
 import copy
+import asyncio
+import concurrent.futures
 import random
 from itertools import chain
 from random import randrange
 from collections import deque
 
 import os
+import time
+import pickle
+import re
 import tempfile
 import shutil
 
 from unittest import mock
 
-from veriutils import SynchronousTest, myhdl_cosimulation, random_source
+from veriutils import (
+    SynchronousTest, myhdl_cosimulation, random_source, WeightedValues,
+    EdgeBoost, CoverPoint, Coverage, RefCache, VectorizedRef,
+    ResultsDatabase, share_outputs, SharedOutputs)
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 
 class CosimulationTestMixin(object):
@@ -1375,6 +1389,126 @@ class CosimulationTestMixin(object):
         for signal in dut_results:
             self.assertEqual(dut_results[signal], ref_results[signal])
 
+    def test_random_distributions(self):
+        '''It should be possible to set the distribution of the random args.
+
+        The distribution applies to both the dut and the ref, so their
+        outputs should still agree.
+        '''
+        sim_cycles = 40
+        dut_results, ref_results = self.construct_and_simulate(
+            sim_cycles, self.identity_factory, self.identity_factory,
+            self.default_args, self.default_arg_types,
+            random_distributions={
+                'test_input': WeightedValues({0: 1, 1023: 1})})
+
+        self.assertTrue(
+            set(int(each) for each in
+                ref_results['test_input'][self.reset_cycles:]) <= {0, 1023})
+
+        for signal in dut_results:
+            self.assertEqual(dut_results[signal], ref_results[signal])
+
+    def test_adaptive_coverage(self):
+        '''It should be possible to set an adaptive coverage object that
+        biases the random args towards unhit bins.
+
+        The dut and the ref should still agree.
+        '''
+        sim_cycles = 60
+        coverage = Coverage(
+            [CoverPoint('test_input', {'low': (0, 4), 'high': (1020, 1024)}),
+             CoverPoint('test_output', [7])], update_interval=8)
+
+        dut_results, ref_results = self.construct_and_simulate(
+            sim_cycles, self.identity_factory, self.identity_factory,
+            self.default_args, self.default_arg_types, coverage=coverage)
+
+        report = coverage.report()
+        self.assertEqual(report['cycles'], sim_cycles - self.reset_cycles)
+        self.assertTrue(report['bins']['test_input']['low'] > 0)
+        self.assertTrue(report['bins']['test_input']['high'] > 0)
+
+        for signal in dut_results:
+            self.assertEqual(dut_results[signal], ref_results[signal])
+
+    def test_invalid_coverage_name(self):
+        '''A cover point on a name that is not a signal should raise a
+        ValueError.
+        '''
+        self.assertRaisesRegex(
+            ValueError, 'Invalid coverage',
+            self.construct_and_simulate, 30,
+            self.identity_factory, self.identity_factory, self.default_args,
+            self.default_arg_types,
+            coverage=Coverage([CoverPoint('not_an_arg', [1])]))
+
+    def test_invalid_random_distribution_name(self):
+        '''A random distribution that is not set on a random arg should raise
+        a ValueError.
+        '''
+        self.assertRaisesRegex(
+            ValueError, 'Invalid random distribution',
+            self.construct_and_simulate, 30,
+            self.identity_factory, self.identity_factory, self.default_args,
+            self.default_arg_types,
+            random_distributions={'test_output': EdgeBoost()})
+
+    def test_playback_arg(self):
+        '''It should be possible to drive an arg from recorded data.
+
+        A 'playback' arg is driven from the data in ``playback_data``. No data
+        is consumed during reset, so the first value appears on the first
+        edge after the reset is released.
+        '''
+        sim_cycles = 40
+        data = [random.randrange(0, 2**10) for n in range(100)]
+
+        arg_types = self.default_arg_types.copy()
+        arg_types['test_input'] = 'playback'
+
+        dut_results, ref_results = self.construct_and_simulate(
+            sim_cycles, self.identity_factory, self.identity_factory,
+            self.default_args, arg_types,
+            playback_data={'test_input': data})
+
+        # The initial value is recorded before the first value is played
+        # back.
+        first_data_cycle = self.reset_cycles + 1
+        n_played_back = sim_cycles - first_data_cycle
+
+        self.assertEqual(
+            ref_results['test_input'][:first_data_cycle],
+            [self.default_args['test_input']._init] * first_data_cycle)
+        self.assertEqual(
+            ref_results['test_input'][first_data_cycle:],
+            data[:n_played_back])
+        self.assertEqual(
+            ref_results['test_output'][first_data_cycle + 1:],
+            data[:n_played_back - 1])
+
+        for signal in dut_results:
+            self.assertEqual(dut_results[signal], ref_results[signal])
+
+    def test_missing_playback_data(self):
+        '''A 'playback' arg with no playback data should raise a ValueError,
+        as should playback data for an arg that is not a 'playback' arg.
+        '''
+        arg_types = self.default_arg_types.copy()
+        arg_types['test_input'] = 'playback'
+
+        self.assertRaisesRegex(
+            ValueError, 'Missing playback data',
+            self.construct_and_simulate, 30,
+            self.identity_factory, self.identity_factory, self.default_args,
+            arg_types)
+
+        self.assertRaisesRegex(
+            ValueError, 'Invalid playback data',
+            self.construct_and_simulate, 30,
+            self.identity_factory, self.identity_factory, self.default_args,
+            self.default_arg_types, playback_data={'test_input': [1, 2, 3]})
+
     def test_boolean_data_case(self):
         '''The test object with identity factories and a boolean signal
         should pass every time'''
@@ -2979,221 +3113,1653 @@ class TestSynchronousTestClass(CosimulationTestMixin, TestCase):
 
         self.assertIs(dut_results, None)
 
-    def test_dut_convertible_top_raises_for_insufficient_data(self):
-        '''The convertible top method should raise if the sim not run first.
-
-        In order that there is a correct test vector generated, the simulator
-        should be run before the convertible top is run.
-
-        If this has not happened, a RuntimeError should be raised.
+    def test_multiple_cosimulate_calls(self):
+        '''If multiple calls are made to cosimulate, the outputs should not
+        contain outputs from previous calls, and the same stimulus should be
+        used each time.
         '''
         test_obj = SynchronousTest(
             self.identity_factory, self.identity_factory,
             self.default_args, self.default_arg_types)
 
-        self.assertRaisesRegex(
-            RuntimeError, 'The simulator should be run before '
-            'dut_convertible_top', test_obj.dut_convertible_top,
-            'foobarfile')
+        first_results = test_obj.cosimulate(30)
+        second_results = test_obj.cosimulate(30)
 
-        # Check it happened before the file was written
-        assert not os.path.exists('foobarfile')
+        self.assertEqual(len(first_results[1]['test_output']), 30)
+        self.assertEqual(first_results, second_results)
 
-    def test_dut_convertible_top_raises_for_None_dut(self):
-        '''If the dut is None, an exception should be raise.
+    def test_reuse_elaboration(self):
+        '''By default, the ref and the dut should be elaborated on every call
+        to cosimulate. If ``reuse_elaboration`` is ``True``, they should only
+        be elaborated on the first call, with later calls giving the same
+        results as the first.
+        '''
+        for kwargs, expected_factory_calls in (
+            ({}, 6), ({'reuse_elaboration': False}, 6),
+            ({'reuse_elaboration': True}, 2)):
 
-        It should be possible to set the device under test to be None when
-        constructing the test class, which would yield a nonsense
-        dut_convertible_top. This situation should cause the
-        dut_convertible_top function raise with a suitable error.
+            factory_calls = []
+
+            @block
+            def counted_identity(test_input, test_output, reset, clock):
+                factory_calls.append(None)
+                return self.identity_factory(
+                    test_input, test_output, reset, clock)
+
+            test_obj = SynchronousTest(
+                counted_identity, counted_identity, self.default_args,
+                self.default_arg_types, **kwargs)
+
+            results = [test_obj.cosimulate(20) for n in range(3)]
+
+            self.assertEqual(len(factory_calls), expected_factory_calls)
+            self.assertEqual(results[0], results[1])
+            self.assertEqual(results[0], results[2])
+
+    def test_stateful_ref_by_default(self):
+        '''By default, a ref that keeps state outside of signals should give
+        the same outputs on consecutive calls to cosimulate, as it is
+        elaborated again on each call.
         '''
+        @block
+        def stateful_ref(test_input, test_output, reset, clock):
+            # Python state, which is only reset by elaborating again
+            cycle_count = [0]
+
+            @always_seq(clock.posedge, reset=reset)
+            def model():
+                cycle_count[0] += 1
+                test_output.next = (test_input + cycle_count[0]) % 1024
 
+            return model
 
         test_obj = SynchronousTest(
-            None, self.identity_factory,
-            self.default_args, self.default_arg_types)
-        test_obj.cosimulate(20)
+            None, stateful_ref, self.default_args, self.default_arg_types)
 
-        self.assertRaisesRegex(
-            RuntimeError, 'The dut was configured to be None in construction',
-            test_obj.dut_convertible_top, 'foobarfile')
+        self.assertEqual(test_obj.cosimulate(20), test_obj.cosimulate(20))
 
-        # Check it happened before the file was written
-        assert not os.path.exists('foobarfile')
+        # Reusing the elaboration carries the state over
+        test_obj = SynchronousTest(
+            None, stateful_ref, self.default_args, self.default_arg_types,
+            reuse_elaboration=True)
 
-    def test_dut_convertible_top_raises_with_enum_signals(self):
-        '''enum signals passed to dut_convertible_top should raise
+        self.assertNotEqual(test_obj.cosimulate(20), test_obj.cosimulate(20))
 
-        Whilst enum signals are not supported for conversion, they should
-        raise a proper ValueError.
+    def test_reused_elaboration_is_reset(self):
+        '''When the elaboration is reused, the signals and the generators
+        inside the ref and the dut should be reset between calls.
         '''
-        simulated_input_cycles = 20
+        @block
+        def counter(test_input, test_output, reset, clock):
+            count = Signal(intbv(0)[16:])
+
+            @instance
+            def offset():
+                # Generator state, which should be reset
+                n = 0
+                while True:
+                    yield clock.posedge
+                    n += 1
+                    count.next = n
 
-        args = self.default_args.copy()
+            @always_seq(clock.posedge, reset=reset)
+            def output():
+                test_output.next = count
 
-        enum_names = ('a', 'b', 'c', 'd', 'e')
-        enum_vals = enum(*enum_names)
-        args['test_output'] = Signal(enum_vals.a)
-        args['test_input'] = Signal(enum_vals.a)
+            return offset, output
 
         test_obj = SynchronousTest(
-            self.identity_factory, self.identity_factory,
-            args, self.default_arg_types)
+            counter, counter, self.default_args, self.default_arg_types,
+            reuse_elaboration=True)
 
-        test_obj.cosimulate(simulated_input_cycles)
+        first_results = test_obj.cosimulate(20)
+        second_results = test_obj.cosimulate(20)
 
-        self.assertRaisesRegex(
-            ValueError, 'enum signals are currently unsupported',
-            test_obj.dut_convertible_top, 'foobarfile')
+        self.assertEqual(first_results, second_results)
 
+    def test_cosimulate_seed(self):
+        '''It should be possible to set the seed of the random sources on
+        each call to cosimulate. The same seed should give the same stimulus
+        and the dut and the ref should still receive the same stimulus.
+        '''
+        test_obj = SynchronousTest(
+            self.identity_factory, self.identity_factory,
+            self.default_args, self.default_arg_types)
 
-    def test_dut_convertible_top_to_VHDL(self):
-        '''There should be a method to get a top-level convertible dut that
-        can convert to VHDL
+        default_results = test_obj.cosimulate(30)
+        seed_1_results = test_obj.cosimulate(30, seed=1)
+        seed_2_results = test_obj.cosimulate(30, seed=2)
+        seed_1_again_results = test_obj.cosimulate(30, seed=1)
 
-        In order that the cosimulation class can be used to generate
-        converted code of the device under test, it should be possible to
-        provide a block upon which `convert()` can be called.
+        self.assertEqual(seed_1_results, seed_1_again_results)
+        self.assertNotEqual(seed_1_results, seed_2_results)
+        self.assertNotEqual(seed_1_results, default_results)
 
-        The text file to which the signal outputs should be written should
-        be the only argument to the method.
+        for dut_results, ref_results in (seed_1_results, seed_2_results):
+            self.assertEqual(dut_results, ref_results)
 
-        The method should take no other arguments since the SynchronousTest
-        object should have all the signals internally defined.
+    def test_cosimulate_after_vcd(self):
+        '''It should be possible to cosimulate without a vcd file after
+        cosimulating with one.
         '''
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            test_obj = SynchronousTest(
+                self.identity_factory, self.identity_factory,
+                self.default_args, self.default_arg_types)
 
-        simulated_input_cycles = 20
+            vcd_results = test_obj.cosimulate(
+                20, vcd_name=os.path.join(tmp_dir, 'test'))
+            results = test_obj.cosimulate(20)
 
-        args = self.default_args.copy()
-        arg_types = self.default_arg_types.copy()
+            self.assertEqual(vcd_results, results)
 
-        args['test_input2'] = Signal(intbv(0)[10:])
-        arg_types['test_input2'] = 'random'
+        finally:
+            shutil.rmtree(tmp_dir)
 
-        @block
-        def dut(test_input, test_input2, test_output, reset, clock):
+    def test_continue_cosimulate(self):
+        '''It should be possible to continue a resumable cosimulation, with
+        the outputs of every call appended to the previous outputs, giving
+        the same result as a single cosimulation of all the cycles.
+        '''
+        for engine in ('event', 'cycle'):
+            test_obj = SynchronousTest(
+                self.identity_factory, self.identity_factory,
+                self.default_args, self.default_arg_types)
 
-            @always_seq(self.clock.posedge, reset)
-            def test_dut():
+            expected_results = test_obj.cosimulate(50, engine=engine)
 
-                test_output.next = test_input + test_input2
+            first_results = test_obj.cosimulate(
+                20, engine=engine, resumable=True)
+            second_results = test_obj.continue_cosimulate(10)
+            third_results = test_obj.continue_cosimulate(20)
 
-            return test_dut
+            test_obj.end_cosimulation()
 
-        test_obj = SynchronousTest(dut, dut, args, arg_types)
+            self.assertEqual(test_obj.engine_used, engine)
+            self.assertEqual(len(first_results[1]['test_output']), 20)
+            self.assertEqual(len(second_results[1]['test_output']), 30)
+            self.assertEqual(third_results, expected_results)
 
-        tmp_dir = tempfile.mkdtemp()
-        output_file = os.path.join(tmp_dir, 'dut_convertible_top.vhd')
+    def test_continue_cosimulate_without_simulation(self):
+        '''If there is no resumable simulation running, continuing should
+        raise a RuntimeError.
+        '''
+        test_obj = SynchronousTest(
+            self.identity_factory, self.identity_factory,
+            self.default_args, self.default_arg_types)
 
-        test_obj.cosimulate(simulated_input_cycles)
+        self.assertRaisesRegex(
+            RuntimeError, 'There is no simulation to continue',
+            test_obj.continue_cosimulate, 10)
 
-        try:
+        test_obj.cosimulate(10)
 
-            top = test_obj.dut_convertible_top(tmp_dir)
-            top.convert(hdl='VHDL', path=tmp_dir)
+        self.assertRaisesRegex(
+            RuntimeError, 'There is no simulation to continue',
+            test_obj.continue_cosimulate, 10)
 
-            self.assertTrue(os.path.exists(output_file))
+        test_obj.cosimulate(10, resumable=True)
+        test_obj.end_cosimulation()
 
-        finally:
-            shutil.rmtree(tmp_dir)
+        self.assertRaisesRegex(
+            RuntimeError, 'There is no simulation to continue',
+            test_obj.continue_cosimulate, 10)
 
-    def test_dut_convertible_top_to_verilog(self):
-        '''There should be a method to get a top-level convertible dut that
-        can convert to Verilog
+    def test_continue_cosimulate_after_stop_simulation(self):
+        '''If the simulation is stopped with StopSimulation, it should not
+        be possible to continue it.
+        '''
+        @block
+        def stopping_identity(test_input, test_output, reset, clock):
+            count = [0]
 
-        In order that the cosimulation class can be used to generate
-        converted code of the device under test, it should be possible to
-        provide a block upon which `convert()` can be called.
+            @always_seq(clock.posedge, reset=reset)
+            def identity():
+                count[0] += 1
+                if count[0] == 15:
+                    raise StopSimulation
 
-        The text file to which the signal outputs should be written should
-        be the only argument to the method.
+                test_output.next = test_input
 
-        The method should take no other arguments since the SynchronousTest
-        object should have all the signals internally defined.
-        '''
+            return identity
 
-        simulated_input_cycles = 20
+        for engine in ('event', 'cycle'):
+            test_obj = SynchronousTest(
+                stopping_identity, self.identity_factory,
+                self.default_args, self.default_arg_types,
+                reuse_elaboration=False)
 
-        args = self.default_args.copy()
-        arg_types = self.default_arg_types.copy()
+            test_obj.cosimulate(30, engine=engine, resumable=True)
 
-        args['test_input2'] = Signal(intbv(0)[10:])
-        arg_types['test_input2'] = 'random'
+            self.assertRaisesRegex(
+                RuntimeError, 'There is no simulation to continue',
+                test_obj.continue_cosimulate, 10)
 
+    def test_bisect_failure(self):
+        '''It should be possible to find the first cycle on which the dut
+        and the ref differ, with the cosimulation then re-run only up to that
+        cycle plus a margin, writing a vcd file of the shorter run.
+        '''
         @block
-        def dut(test_input, test_input2, test_output, reset, clock):
+        def late_failure(test_input, test_output, reset, clock):
+            count = Signal(intbv(0, min=0, max=1000))
 
-            @always_seq(self.clock.posedge, reset)
-            def test_dut():
+            @always_seq(clock.posedge, reset=reset)
+            def model():
+                count.next = count + 1
+                if count == 40:
+                    test_output.next = test_input + 2000
+                else:
+                    test_output.next = test_input
 
-                test_output.next = test_input + test_input2
+            return model
 
-            return test_dut
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            vcd_name = os.path.join(tmp_dir, 'failure')
 
-        test_obj = SynchronousTest(dut, dut, args, arg_types)
+            test_obj = SynchronousTest(
+                late_failure, self.identity_factory, self.default_args,
+                self.default_arg_types)
 
-        tmp_dir = tempfile.mkdtemp()
-        output_file = os.path.join(tmp_dir, 'dut_convertible_top.v')
+            result = test_obj.bisect_failure(
+                200, vcd_name=vcd_name, margin=3)
 
-        test_obj.cosimulate(simulated_input_cycles)
+            self.assertEqual(result['name'], 'test_output')
+            self.assertEqual(result['cycles'], result['cycle'] + 4)
 
-        try:
-            top2 = test_obj.dut_convertible_top(tmp_dir)
-            top2.convert(hdl='Verilog', path=tmp_dir)
+            dut_outputs, ref_outputs = result['outputs']
+            dut_values = dut_outputs['test_output']
+            ref_values = ref_outputs['test_output']
+            failing_cycle = result['cycle']
 
-            self.assertTrue(os.path.exists(output_file))
+            self.assertEqual(len(ref_values), result['cycles'])
+            self.assertEqual(
+                dut_values[:failing_cycle], ref_values[:failing_cycle])
+            self.assertNotEqual(
+                dut_values[failing_cycle], ref_values[failing_cycle])
+
+            self.assertTrue(os.path.exists(vcd_name + '.vcd'))
 
         finally:
             shutil.rmtree(tmp_dir)
 
-    def test_dut_convertible_top_with_long_boolean_output(self):
-        '''Output booleans with long type vals (0, 1) should be handled.
-
-        That is, code in which output booleans have had their value set
-        using '1' rather than True should convert fine.
+    def test_bisect_failure_without_failing_cycle(self):
+        '''If the difference between the outputs is not tied to a cycle,
+        the shortest failing cosimulation should be found by bisection.
         '''
+        def packet_mismatch(dut_outputs, ref_outputs):
+            # Pretend that a packet difference appears after 37 cycles
+            if len(ref_outputs['test_output']) >= 37:
+                return ('packets', None)
+            else:
+                return None
 
-        simulated_input_cycles = 20
+        test_obj = SynchronousTest(
+            self.identity_factory, self.identity_factory,
+            self.default_args, self.default_arg_types)
 
-        args = self.default_args.copy()
-        arg_types = self.default_arg_types.copy()
+        with mock.patch(
+            'veriutils.cosimulation.first_mismatch', packet_mismatch):
 
-        args['test_output'] = Signal(bool(0))
+            result = test_obj.bisect_failure(200, margin=2)
 
-        args['test_output'].next = 1
-        args['test_output']._update()
+        self.assertEqual(result['name'], 'packets')
+        self.assertEqual(result['cycle'], 36)
+        self.assertEqual(result['cycles'], 39)
 
-        del args['test_input']
-        del arg_types['test_input']
+    def test_bisect_failure_without_failure(self):
+        '''If the dut and the ref agree, bisect_failure should return None.
+        A ValueError should be raised if there is no dut.
+        '''
+        test_obj = SynchronousTest(
+            self.identity_factory, self.identity_factory,
+            self.default_args, self.default_arg_types)
 
-        @block
-        def dut(test_output, reset, clock):
+        self.assertIsNone(test_obj.bisect_failure(50))
 
-            @always_seq(self.clock.posedge, reset)
-            def test_dut():
-                test_output.next = 1
+        test_obj = SynchronousTest(
+            None, self.identity_factory, self.default_args,
+            self.default_arg_types)
 
-            return test_dut
+        self.assertRaisesRegex(
+            ValueError, 'Invalid dut', test_obj.bisect_failure, 50)
 
-        test_obj = SynchronousTest(dut, dut, args, arg_types)
+    def test_bisect_failure_invalid_cycles(self):
+        '''A ValueError should be raised by bisect_failure before anything
+        is simulated if the cycles are not a positive integer.
+        '''
+        test_obj = SynchronousTest(
+            self.identity_factory, self.identity_factory,
+            self.default_args, self.default_arg_types)
 
-        tmp_dir = tempfile.mkdtemp()
+        for cycles in (None, 0, -5, 2.5, '10', True):
+            self.assertRaisesRegex(
+                ValueError, 'Invalid cycles', test_obj.bisect_failure,
+                cycles)
 
-        output_file = os.path.join(tmp_dir, 'dut_convertible_top.vhd')
+        self.assertFalse(test_obj._simulator_run)
 
-        test_obj.cosimulate(simulated_input_cycles)
+    def test_parallel_cosimulate(self):
+        '''It should be possible to simulate the ref and the dut in separate
+        processes, giving the same outputs and coverage as a serial
+        cosimulation.
+        '''
+        states = enum('a', 'b', 'c')
 
-        try:
-            top = test_obj.dut_convertible_top(tmp_dir)
-            top.convert(hdl='VHDL', path=tmp_dir)
+        @block
+        def stateful(test_input, test_playback, test_output, test_state,
+                     reset, clock, offset):
 
-            self.assertTrue(os.path.exists(output_file))
+            @always_seq(clock.posedge, reset=reset)
+            def model():
+                test_output.next = (test_input + test_playback + offset) % 1024
 
-        finally:
-            shutil.rmtree(tmp_dir)
+                if test_state == states.a:
+                    test_state.next = states.b
+                elif test_state == states.b:
+                    test_state.next = states.c
+                else:
+                    test_state.next = states.a
 
-    def test_dut_convertible_top_with_interface(self):
-        '''Convertible top duts with interfaces should be supported.
+            return model
+
+        @block
+        def ref(test_input, test_playback, test_output, test_state, reset,
+                clock):
+            return stateful(test_input, test_playback, test_output,
+                            test_state, reset, clock, 0)
+
+        @block
+        def dut(test_input, test_playback, test_output, test_state, reset,
+                clock):
+            # Differs from the ref, so the outputs of each can be told apart
+            return stateful(test_input, test_playback, test_output,
+                            test_state, reset, clock, 1)
+
+        args = self.default_args.copy()
+        args['test_state'] = Signal(states.a)
+        args['test_playback'] = Signal(intbv(0)[8:])
+
+        arg_types = self.default_arg_types.copy()
+        arg_types['test_state'] = 'output'
+        arg_types['test_playback'] = 'playback'
+
+        for engine in ('event', 'cycle'):
+            coverage = Coverage(
+                [CoverPoint('test_input', {'high': (512, 1024)})],
+                adaptive=False)
+
+            test_obj = SynchronousTest(
+                dut, ref, args, arg_types,
+                random_distributions={'test_input': EdgeBoost()},
+                playback_data={'test_playback': list(range(7, 200, 3))},
+                coverage=coverage)
+
+            expected_results = test_obj.cosimulate(40, engine=engine)
+            expected_coverage = coverage.report()
+
+            results = test_obj.cosimulate(40, engine=engine, parallel=True)
+
+            self.assertTrue(test_obj.parallel_used)
+            self.assertEqual(test_obj.engine_used, engine)
+            self.assertEqual(results, expected_results)
+            self.assertNotEqual(results[0], results[1])
+            self.assertEqual(coverage.report(), expected_coverage)
+
+            seed_results = test_obj.cosimulate(
+                40, engine=engine, seed=3, parallel=True)
+
+            self.assertEqual(
+                seed_results, test_obj.cosimulate(40, engine=engine, seed=3))
+
+    def test_parallel_cosimulate_fallback(self):
+        '''If the ref and the dut cannot be simulated separately, a parallel
+        cosimulation should be run serially instead.
+        '''
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            test_obj = SynchronousTest(
+                self.identity_factory, self.identity_factory,
+                self.default_args, self.default_arg_types)
+
+            expected_results = test_obj.cosimulate(20)
+
+            for kwargs in ({'vcd_name': os.path.join(tmp_dir, 'test')},
+                           {'resumable': True}):
+                results = test_obj.cosimulate(20, parallel=True, **kwargs)
+                test_obj.end_cosimulation()
+
+                self.assertFalse(test_obj.parallel_used)
+                self.assertEqual(results, expected_results)
+
+        finally:
+            shutil.rmtree(tmp_dir)
+
+        test_obj = SynchronousTest(
+            None, self.identity_factory, self.default_args,
+            self.default_arg_types)
+
+        test_obj.cosimulate(20, parallel=True)
+        self.assertFalse(test_obj.parallel_used)
+
+    def test_parallel_cosimulate_stop_simulation(self):
+        '''If the ref or the dut raises StopSimulation during a parallel
+        cosimulation, it should be repeated serially.
+        '''
+        @block
+        def stopping_identity(test_input, test_output, reset, clock):
+            count = [0]
+
+            @always_seq(clock.posedge, reset=reset)
+            def identity():
+                count[0] += 1
+                if count[0] == 15:
+                    raise StopSimulation
+
+                test_output.next = test_input
+
+            return identity
+
+        test_obj = SynchronousTest(
+            stopping_identity, self.identity_factory, self.default_args,
+            self.default_arg_types, reuse_elaboration=False)
+
+        expected_results = test_obj.cosimulate(30)
+        results = test_obj.cosimulate(30, parallel=True)
+
+        self.assertFalse(test_obj.parallel_used)
+        self.assertEqual(results, expected_results)
+
+    def test_parallel_cosimulate_error(self):
+        '''An error in either process of a parallel cosimulation should be
+        raised in the calling process.
+        '''
+        @block
+        def broken_identity(test_input, test_output, reset, clock):
+
+            @always_seq(clock.posedge, reset=reset)
+            def identity():
+                if test_input > 1000:
+                    raise ValueError('Broken identity')
+
+                test_output.next = test_input
+
+            return identity
+
+        test_obj = SynchronousTest(
+            broken_identity, self.identity_factory, self.default_args,
+            self.default_arg_types)
+
+        self.assertRaisesRegex(
+            ValueError, 'Broken identity', test_obj.cosimulate, 500,
+            parallel=True)
+
+    @unittest.skipIf(not os.path.isdir('/dev/shm'),
+                     'Shared memory is not listed in /dev/shm')
+    def test_parallel_cosimulate_process_exit(self):
+        '''If either process of a parallel cosimulation exits without
+        sending its outputs, a RuntimeError should be raised and no shared
+        memory should be left behind by the other.
+        '''
+        parent_pid = os.getpid()
+
+        @block
+        def exiting_identity(test_input, test_output, reset, clock):
+
+            @always_seq(clock.posedge, reset=reset)
+            def identity():
+                if os.getpid() != parent_pid:
+                    # Give the other process time to send its outputs
+                    time.sleep(0.5)
+                    os._exit(1)
+
+                test_output.next = test_input
+
+            return identity
+
+        shared_memory = set(os.listdir('/dev/shm'))
+
+        for dut, ref in ((self.identity_factory, exiting_identity),
+                         (exiting_identity, self.identity_factory)):
+            test_obj = SynchronousTest(
+                dut, ref, self.default_args, self.default_arg_types)
+
+            self.assertRaisesRegex(
+                RuntimeError, 'exited unexpectedly', test_obj.cosimulate, 20,
+                parallel=True)
+
+        self.assertEqual(set(os.listdir('/dev/shm')) - shared_memory, set())
+
+    def test_unpicklable_result_shared_outputs(self):
+        '''If the result of a simulation process cannot be pickled, the
+        shared memory holding its outputs should be removed, as it will
+        never be received.
+        '''
+        from veriutils.cosimulation import _dump_simulation_result
+
+        descriptor = share_outputs({'test_output': [1, 2, 3]})
+
+        data = _dump_simulation_result(
+            {'shared_outputs': descriptor, 'coverage': lambda: None},
+            'The dut simulation')
+
+        self.assertIsInstance(pickle.loads(data)['error'], RuntimeError)
+        self.assertRaises(FileNotFoundError, SharedOutputs, descriptor)
+
+    def test_cosimulate_async(self):
+        '''There should be a coroutine that runs the cosimulation in an
+        executor, reporting its progress after each chunk of cycles, and
+        returns the same outputs as cosimulate.
+        '''
+        test_obj = SynchronousTest(
+            self.identity_factory, self.identity_factory, self.default_args,
+            self.default_arg_types)
+
+        expected_outputs = test_obj.cosimulate(35)
+
+        events = []
+        outputs = asyncio.run(test_obj.cosimulate_async(
+            35, chunk_cycles=10, progress=events.append))
+
+        self.assertEqual(outputs, expected_outputs)
+        self.assertEqual(
+            events, [{'cycles': n, 'total': 35} for n in (10, 20, 30, 35)])
+
+    def test_cosimulate_async_cancel(self):
+        '''Cancelling the coroutine should stop the simulation at the end of
+        the current chunk and end it with quit_sim.
+        '''
+        test_obj = SynchronousTest(
+            self.identity_factory, self.identity_factory, self.default_args,
+            self.default_arg_types)
+
+        events = []
+
+        async def run():
+            await asyncio.wait_for(
+                test_obj.cosimulate_async(
+                    100000, chunk_cycles=10, progress=events.append),
+                timeout=0.5)
+
+        quit_sim = myhdl._block._Block.quit_sim
+        with mock.patch.object(
+            myhdl._block._Block, 'quit_sim', autospec=True,
+            side_effect=quit_sim) as mock_quit_sim:
+
+            self.assertRaises(asyncio.TimeoutError, asyncio.run, run())
+
+        self.assertEqual(mock_quit_sim.call_count, 1)
+        self.assertIsNone(test_obj._simulation)
+        self.assertLess(events[-1]['cycles'], 100000)
+
+        # A new simulation should run as normal
+        dut_outputs, ref_outputs = test_obj.cosimulate(20)
+        self.assertEqual(dut_outputs, ref_outputs)
+        self.assertEqual(len(ref_outputs['test_output']), 20)
+
+    def test_cosimulate_async_None_cycles(self):
+        '''With cycles set to None, the coroutine should run until
+        StopSimulation is raised, with the last progress event giving the
+        number of cycles that were simulated.
+        '''
+        @block
+        def stopper(clock):
+
+            count = [0]
+            @always(clock.negedge)
+            def inst():
+                count[0] += 1
+
+                if count[0] > 25:
+                    raise StopSimulation
+
+            return inst
+
+        test_obj = SynchronousTest(
+            self.identity_factory, self.identity_factory, self.default_args,
+            self.default_arg_types,
+            custom_sources=[(stopper, (self.default_args['clock'],), {})])
+
+        events = []
+        dut_outputs, ref_outputs = asyncio.run(test_obj.cosimulate_async(
+            None, chunk_cycles=10, progress=events.append))
+
+        self.assertEqual(
+            events,
+            [{'cycles': n, 'total': None} for n in (10, 20, 25)])
+        self.assertEqual(len(ref_outputs['test_output']), 25)
+        self.assertEqual(dut_outputs, ref_outputs)
+
+    def test_cosimulate_async_concurrent(self):
+        '''Several cosimulations should be able to run from one event loop,
+        each giving the same outputs as it would on its own.
+        '''
+        test_objs = [
+            SynchronousTest(
+                self.identity_factory, self.identity_factory,
+                self.default_args, self.default_arg_types)
+            for n in range(3)]
+
+        expected_outputs = [
+            test_obj.cosimulate(30, seed=n)
+            for n, test_obj in enumerate(test_objs)]
+
+        async def run():
+            return await asyncio.gather(*[
+                test_obj.cosimulate_async(30, seed=n, chunk_cycles=7)
+                for n, test_obj in enumerate(test_objs)])
+
+        self.assertEqual(asyncio.run(run()), expected_outputs)
+
+    def test_cosimulate_async_results_db(self):
+        '''With a results database, a chunked cosimulation should be
+        recorded once, with the total number of cycles.
+        '''
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            results_db = ResultsDatabase(os.path.join(tmp_dir, 'results.db'))
+
+            test_obj = SynchronousTest(
+                self.identity_factory, self.identity_factory,
+                self.default_args, self.default_arg_types,
+                results_db=results_db, test_id='async')
+
+            asyncio.run(test_obj.cosimulate_async(
+                35, seed=3, chunk_cycles=10))
+
+            run, = results_db.runs('async')
+            self.assertEqual(run['cycles'], 35)
+            self.assertEqual(run['seed'], 3)
+            self.assertTrue(run['passed'])
+            self.assertGreater(run['wall_time'], 0)
+
+            # The database is still used by later calls
+            test_obj.cosimulate(20)
+            self.assertEqual(len(results_db.runs('async')), 2)
+
+        finally:
+            shutil.rmtree(tmp_dir)
+
+    def test_cosimulate_async_invalid_chunk_cycles(self):
+        '''A chunk_cycles of less than 1 should raise a ValueError.
+        '''
+        test_obj = SynchronousTest(
+            self.identity_factory, self.identity_factory, self.default_args,
+            self.default_arg_types)
+
+        self.assertRaisesRegex(
+            ValueError, 'Invalid chunk cycles', asyncio.run,
+            test_obj.cosimulate_async(10, chunk_cycles=0))
+
+    def test_rng(self):
+        '''The seeds of the random sources should be drawn from ``rng`` if it
+        is given, leaving the global random state unchanged.
+        '''
+        state = random.getstate()
+
+        test_obj = SynchronousTest(
+            self.identity_factory, self.identity_factory, self.default_args,
+            self.default_arg_types, rng=random.Random(5))
+
+        self.assertEqual(random.getstate(), state)
+
+        other_test_obj = SynchronousTest(
+            self.identity_factory, self.identity_factory, self.default_args,
+            self.default_arg_types, rng=random.Random(5))
+
+        self.assertEqual(
+            test_obj.cosimulate(30), other_test_obj.cosimulate(30))
+
+    def test_threads(self):
+        '''Tests built and cosimulated from several threads at once should
+        each give the same outputs as they do when built and cosimulated
+        one after another.
+        '''
+        def build_and_cosimulate(n):
+            test_obj = SynchronousTest(
+                self.identity_factory, self.identity_factory,
+                self.default_args, self.default_arg_types,
+                rng=random.Random(n))
+
+            engine = ('event', 'cycle')[n % 2]
+            return test_obj.cosimulate(40, engine=engine)
+
+        expected_outputs = [build_and_cosimulate(n) for n in range(6)]
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=6) as executor:
+            outputs = list(executor.map(build_and_cosimulate, range(6)))
+
+        self.assertEqual(outputs, expected_outputs)
+
+    def test_file_writer_signal_names(self):
+        '''The signals written by the file writer of the convertible top
+        level should be named after the writer's template signals
+        (``signal_N``) in the converted code, whatever other names the
+        signals have in the namespace of the writer.
+        '''
+        @block
+        def two_outputs(test_input, output_a, output_b, reset, clock):
+
+            @always_seq(clock.posedge, reset=reset)
+            def model():
+                output_a.next = test_input
+                output_b.next = test_input[0]
+
+            return model
+
+        args = {'test_input': Signal(intbv(0)[4:]),
+                'output_a': Signal(intbv(0)[4:]),
+                'output_b': Signal(bool(0)),
+                'reset': self.reset,
+                'clock': self.clock}
+
+        arg_types = {'test_input': 'random',
+                     'output_a': 'output',
+                     'output_b': 'output',
+                     'reset': 'init_reset',
+                     'clock': 'clock'}
+
+        test_obj = SynchronousTest(two_outputs, two_outputs, args, arg_types)
+        test_obj.cosimulate(10)
+
+        for hdl, extension, write_pattern in (
+            ('VHDL', 'vhd', r'write\(output_line, (\w+\()?(\w+)\)+;'),
+            ('Verilog', 'v', r'\$fwrite\(output_file, "%b", ()(\w+)\);')):
+
+            tmp_dir = tempfile.mkdtemp()
+            try:
+                test_obj.dut_convertible_top(tmp_dir).convert(
+                    hdl=hdl, path=tmp_dir, name='top')
+
+                with open(os.path.join(tmp_dir, 'top.' + extension)) as f:
+                    written = [match.group(2) for match in
+                               re.finditer(write_pattern, f.read())]
+
+            finally:
+                shutil.rmtree(tmp_dir)
+
+            self.assertEqual(len(written), 2)
+
+            for n, name in enumerate(written):
+                self.assertRegex(
+                    name, r'^file_writer\w*_signal_{}$'.format(n))
+
+    def test_set_playback_data(self):
+        '''set_playback_data should replace the data of the named playback
+        args from the next call to cosimulate, and playback data for an arg
+        that is not a 'playback' arg should raise a ValueError.
+        '''
+        arg_types = self.default_arg_types.copy()
+        arg_types['test_input'] = 'playback'
+
+        test_obj = SynchronousTest(
+            self.identity_factory, self.identity_factory, self.default_args,
+            arg_types, playback_data={'test_input': list(range(100))})
+
+        test_obj.cosimulate(30)
+
+        data = [random.randrange(0, 2**10) for n in range(100)]
+        test_obj.set_playback_data({'test_input': data})
+
+        dut_results, ref_results = test_obj.cosimulate(30)
+
+        first_data_cycle = self.reset_cycles + 1
+        self.assertEqual(
+            ref_results['test_input'][first_data_cycle:],
+            data[:30 - first_data_cycle])
+        self.assertEqual(dut_results, ref_results)
+
+        self.assertRaisesRegex(
+            ValueError, 'Invalid playback data', test_obj.set_playback_data,
+            {'test_output': data})
+
+    def test_results_db(self):
+        '''With a results database, every call to cosimulate should be
+        recorded, by default under the module and name of the dut factory.
+        '''
+        @block
+        def broken_identity(test_input, test_output, reset, clock):
+
+            @always_seq(clock.posedge, reset=reset)
+            def identity():
+                test_output.next = test_input // 2
+
+            return identity
+
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            results_db = ResultsDatabase(os.path.join(tmp_dir, 'results.db'))
+
+            test_obj = SynchronousTest(
+                self.identity_factory, self.identity_factory,
+                self.default_args, self.default_arg_types,
+                results_db=results_db)
+
+            test_obj.cosimulate(30, seed=4)
+            test_obj.cosimulate(20, engine='cycle')
+
+            SynchronousTest(
+                broken_identity, self.identity_factory, self.default_args,
+                self.default_arg_types, results_db=results_db,
+                test_id='broken').cosimulate(30)
+
+            SynchronousTest(
+                None, self.identity_factory, self.default_args,
+                self.default_arg_types, results_db=results_db,
+                test_id='ref only').cosimulate(10)
+
+            self.assertEqual(results_db.test_ids(), sorted([
+                'broken', 'ref only', test_obj.test_id]))
+            self.assertTrue(test_obj.test_id.endswith('identity_factory'))
+
+            runs = results_db.runs(test_obj.test_id)
+            self.assertEqual(
+                [(run['seed'], run['cycles'], run['passed'], run['engine'])
+                 for run in runs],
+                [(4, 30, True, 'event'), (None, 20, True, 'cycle')])
+
+            for run in runs:
+                self.assertGreater(run['wall_time'], 0)
+                self.assertGreater(run['cycles_per_second'], 0)
+                self.assertGreater(run['peak_memory'], 0)
+
+            self.assertFalse(results_db.runs('broken')[0]['passed'])
+            self.assertIsNone(results_db.runs('ref only')[0]['passed'])
+
+        finally:
+            shutil.rmtree(tmp_dir)
+
+    def test_cosimulate_sharded(self):
+        '''A sharded cosimulation of a design that settles within the warm up
+        should give the same outputs as a serial cosimulation, with either
+        engine, in worker processes or in this one.
+        '''
+        arg_types = self.default_arg_types.copy()
+        arg_types['test_input'] = 'playback'
+
+        for each_arg_types, playback_data in (
+            (self.default_arg_types, None),
+            (arg_types, {'test_input': list(range(3, 1000, 7))})):
+
+            test_obj = SynchronousTest(
+                self.identity_factory, self.identity_factory,
+                self.default_args, each_arg_types,
+                playback_data=playback_data)
+
+            for engine in ('event', 'cycle'):
+                expected_outputs = test_obj.cosimulate(
+                    150, engine=engine, seed=3)
+
+                for workers in (1, 2):
+                    outputs = test_obj.cosimulate_sharded(
+                        150, 4, 1, workers=workers, engine=engine, seed=3,
+                        verify=True)
+
+                    self.assertEqual(outputs, expected_outputs)
+                    self.assertEqual(test_obj.engine_used, engine)
+
+    def test_cosimulate_sharded_verify(self):
+        '''A sharded cosimulation of a design that has not settled by the
+        end of the warm up should differ from a serial cosimulation, which
+        a ValueError should report if ``verify`` is set.
+        '''
+        @block
+        def accumulator(test_input, test_output, reset, clock):
+
+            @always_seq(clock.posedge, reset=reset)
+            def accumulate():
+                test_output.next = (test_output + test_input) % 2**16
+
+            return accumulate
+
+        test_obj = SynchronousTest(
+            accumulator, accumulator, self.default_args,
+            self.default_arg_types)
+
+        expected_outputs = test_obj.cosimulate(100)
+        outputs = test_obj.cosimulate_sharded(100, 2, 10, workers=1)
+
+        self.assertEqual(outputs[1]['test_output'][:50],
+                         expected_outputs[1]['test_output'][:50])
+        self.assertNotEqual(outputs[1]['test_output'][50:],
+                            expected_outputs[1]['test_output'][50:])
+
+        self.assertRaisesRegex(
+            ValueError, 'Invalid warm up cycles: .* on cycle 50 of '
+            'test_output', test_obj.cosimulate_sharded, 100, 2, 10,
+            verify=True)
+
+    def test_invalid_cosimulate_sharded(self):
+        '''Invalid numbers of cycles, shards, warm up cycles or workers, or
+        stimulus that cannot be moved on, should raise a ValueError.
+        '''
+        test_obj = SynchronousTest(
+            self.identity_factory, self.identity_factory, self.default_args,
+            self.default_arg_types)
+
+        for args, kwargs, message in (
+            ((0, 1, 0), {}, 'Invalid cycles'),
+            ((10, 0, 0), {}, 'Invalid shards'),
+            ((10, 11, 0), {}, 'Invalid shards'),
+            ((10, 2, -1), {}, 'Invalid warm up cycles'),
+            ((10, 2, 0), {'workers': 0}, 'Invalid workers')):
+
+            self.assertRaisesRegex(
+                ValueError, message, test_obj.cosimulate_sharded, *args,
+                **kwargs)
+
+        test_obj = SynchronousTest(
+            self.identity_factory, self.identity_factory, self.default_args,
+            self.default_arg_types,
+            coverage=Coverage([CoverPoint('test_input', [1])]))
+
+        self.assertRaisesRegex(
+            ValueError, 'Invalid test', test_obj.cosimulate_sharded, 10, 2,
+            0)
+
+    def test_ref_cache(self):
+        '''With a ref cache, the outputs of the ref and the coverage should
+        be loaded from the cache when nothing that affects the ref has
+        changed, so only the dut is simulated.
+        '''
+        self.ref_calls = 0
+
+        @block
+        def counted_ref(test_input, test_output, reset, clock):
+            self.ref_calls += 1
+            return self.identity_factory(
+                test_input, test_output, reset, clock)
+
+        @block
+        def broken_identity(test_input, test_output, reset, clock):
+
+            @always_seq(clock.posedge, reset=reset)
+            def identity():
+                test_output.next = test_input // 2
+
+            return identity
+
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            ref_cache = RefCache(tmp_dir)
+
+            def construct(dut_factory, cache):
+                # The seeds of the random sources are drawn on construction
+                random.seed(0)
+
+                coverage = Coverage(
+                    [CoverPoint('test_output', {'high': (512, 1024)})],
+                    adaptive=False)
+
+                return SynchronousTest(
+                    dut_factory, counted_ref, self.default_args,
+                    self.default_arg_types, coverage=coverage,
+                    ref_cache=cache)
+
+            expected_obj = construct(broken_identity, None)
+            expected_results = expected_obj.cosimulate(30)
+            expected_coverage = expected_obj.coverage.report()
+
+            construct(self.identity_factory, ref_cache).cosimulate(30)
+
+            self.assertEqual(ref_cache.stats,
+                             {'hits': 0, 'misses': 1, 'bypasses': 0})
+
+            ref_calls = self.ref_calls
+
+            for engine in ('event', 'cycle'):
+                test_obj = construct(broken_identity, ref_cache)
+                results = test_obj.cosimulate(30, engine=engine)
+
+                self.assertEqual(test_obj.engine_used, engine)
+                self.assertEqual(results, expected_results)
+                self.assertEqual(test_obj.coverage.report(), expected_coverage)
+
+            self.assertEqual(self.ref_calls, ref_calls)
+            self.assertEqual(ref_cache.stats,
+                             {'hits': 2, 'misses': 1, 'bypasses': 0})
+
+            # A change to the cycles or the stimulus should miss
+            test_obj.cosimulate(31)
+            test_obj.cosimulate(30, seed=1)
+
+            self.assertEqual(ref_cache.stats,
+                             {'hits': 2, 'misses': 3, 'bypasses': 0})
+
+            test_obj.cosimulate(30, resumable=True)
+            test_obj.end_cosimulation()
+
+            self.assertEqual(ref_cache.stats,
+                             {'hits': 2, 'misses': 3, 'bypasses': 1})
+
+        finally:
+            shutil.rmtree(tmp_dir)
+
+    def test_ref_cache_without_dut(self):
+        '''If there is no dut, nothing should be simulated when the outputs
+        of the ref are cached.
+        '''
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            ref_cache = RefCache(tmp_dir)
+
+            test_obj = SynchronousTest(
+                None, self.identity_factory, self.default_args,
+                self.default_arg_types, ref_cache=ref_cache)
+
+            expected_results = test_obj.cosimulate(30)
+            results = test_obj.cosimulate(30)
+
+            self.assertIsNone(test_obj.engine_used)
+            self.assertEqual(results, expected_results)
+            self.assertEqual(ref_cache.stats['hits'], 1)
+
+        finally:
+            shutil.rmtree(tmp_dir)
+
+    def test_ref_cache_bypasses(self):
+        '''A cosimulation should bypass the cache, and only count a hit
+        when the cached outputs of the ref are used, if the dut stops the
+        simulation or the ref depends on something that cannot be described.
+        '''
+        class Opaque(object):
+            pass
+
+        opaque = Opaque()
+
+        @block
+        def opaque_ref(test_input, test_output, reset, clock):
+            assert opaque is not None
+            return self.identity_factory(
+                test_input, test_output, reset, clock)
+
+        @block
+        def stopping_dut(test_input, test_output, reset, clock):
+
+            identity = self.identity_factory(
+                test_input, test_output, reset, clock)
+
+            @instance
+            def stop():
+                for n in range(10):
+                    yield clock.posedge
+
+                raise StopSimulation
+
+            return identity, stop
+
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            ref_cache = RefCache(tmp_dir)
+
+            def construct(dut_factory, ref_factory):
+                random.seed(0)
+                return SynchronousTest(
+                    dut_factory, ref_factory, self.default_args,
+                    self.default_arg_types, ref_cache=ref_cache)
+
+            construct(self.identity_factory, self.identity_factory).cosimulate(
+                30)
+            self.assertEqual(ref_cache.stats,
+                             {'hits': 0, 'misses': 1, 'bypasses': 0})
+
+            dut_outputs, ref_outputs = construct(
+                stopping_dut, self.identity_factory).cosimulate(30)
+            self.assertEqual(ref_cache.stats,
+                             {'hits': 0, 'misses': 1, 'bypasses': 1})
+
+            # The ref was simulated along with the dut, so it stopped too
+            self.assertEqual(len(ref_outputs['test_output']),
+                             len(dut_outputs['test_output']))
+            self.assertLess(len(ref_outputs['test_output']), 30)
+
+            construct(self.identity_factory, self.identity_factory).cosimulate(
+                30)
+            self.assertEqual(ref_cache.stats,
+                             {'hits': 1, 'misses': 1, 'bypasses': 1})
+
+            for n in range(2):
+                construct(self.identity_factory, opaque_ref).cosimulate(30)
+
+            self.assertEqual(ref_cache.stats,
+                             {'hits': 1, 'misses': 1, 'bypasses': 3})
+            self.assertEqual(len(os.listdir(tmp_dir)), 1)
+
+        finally:
+            shutil.rmtree(tmp_dir)
+
+    @unittest.skipIf(numpy is None, 'NumPy is not available')
+    def test_vectorized_ref(self):
+        '''It should be possible to use a vectorized ref, the outputs of
+        which are computed from the recorded stimulus rather than simulated,
+        giving the same outputs and coverage as the equivalent MyHDL ref.
+        '''
+        def identity(stimulus):
+            # The output is registered, so each value is for the next cycle
+            return {'test_output': numpy.where(
+                stimulus['reset'], 0, stimulus['test_input'])}
+
+        def construct(ref):
+            random.seed(0)
+            coverage = Coverage(
+                [CoverPoint('test_output', {'high': (512, 1024)})],
+                adaptive=False)
+
+            return SynchronousTest(
+                self.identity_factory, ref, self.default_args,
+                self.default_arg_types, coverage=coverage)
+
+        expected_obj = construct(self.identity_factory)
+        expected_results = expected_obj.cosimulate(40)
+        expected_coverage = expected_obj.coverage.report()
+
+        test_obj = construct(VectorizedRef(identity, latency=1))
+
+        for engine in ('event', 'cycle'):
+            results = test_obj.cosimulate(40, engine=engine)
+
+            self.assertEqual(results, expected_results)
+            self.assertEqual(test_obj.coverage.report(), expected_coverage)
+
+        test_obj.cosimulate(25, resumable=True)
+        results = test_obj.continue_cosimulate(15)
+        test_obj.end_cosimulation()
+
+        self.assertEqual(results, expected_results)
+
+    @unittest.skipIf(numpy is None, 'NumPy is not available')
+    def test_invalid_vectorized_ref(self):
+        '''A vectorized ref without a dut or with adaptive coverage should
+        raise a ValueError, as should missing outputs.
+        '''
+        ref = VectorizedRef(lambda stimulus: {}, latency=1)
+
+        self.assertRaisesRegex(
+            ValueError, 'Invalid dut', SynchronousTest, None, ref,
+            self.default_args, self.default_arg_types)
+
+        self.assertRaisesRegex(
+            ValueError, 'Invalid coverage', SynchronousTest,
+            self.identity_factory, ref, self.default_args,
+            self.default_arg_types,
+            coverage=Coverage([CoverPoint('test_input', [0])]))
+
+        test_obj = SynchronousTest(
+            self.identity_factory, ref, self.default_args,
+            self.default_arg_types)
+
+        self.assertRaisesRegex(
+            ValueError, 'Invalid vectorized ref outputs',
+            test_obj.cosimulate, 10)
+
+    def test_checkpoint(self):
+        '''It should be possible to save a checkpoint of a resumable
+        simulation using either engine and restore it into a new
+        SynchronousTest, continuing to the same results as a simulation that
+        was never interrupted.
+        '''
+        states = enum('a', 'b', 'c')
+
+        @block
+        def accumulator(test_input, test_playback, test_output, test_state,
+                        reset, clock):
+            total = Signal(intbv(0)[16:])
+
+            @always_seq(clock.posedge, reset=reset)
+            def model():
+                total.next = (total + test_input + test_playback) % 2**16
+                test_output.next = total
+
+                if test_state == states.a:
+                    test_state.next = states.b
+                elif test_state == states.b:
+                    test_state.next = states.c
+                else:
+                    test_state.next = states.a
+
+            return model
+
+        args = self.default_args.copy()
+        args['test_state'] = Signal(states.a)
+        args['test_playback'] = Signal(intbv(0)[8:])
+
+        arg_types = self.default_arg_types.copy()
+        arg_types['test_state'] = 'output'
+        arg_types['test_playback'] = 'playback'
+
+        def construct():
+            coverage = Coverage(
+                [CoverPoint('test_input', {'high': (1000, 1024)})],
+                update_interval=8)
+
+            return SynchronousTest(
+                accumulator, accumulator, args, arg_types,
+                random_distributions={'test_input': EdgeBoost()},
+                playback_data={'test_playback': list(range(7, 200, 3))},
+                coverage=coverage)
+
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            checkpoint_filename = os.path.join(tmp_dir, 'checkpoint')
+
+            for engine in ('cycle', 'event'):
+                test_obj = construct()
+                expected_results = test_obj.cosimulate(60, engine=engine)
+                expected_coverage = test_obj.coverage.report()
+
+                test_obj.cosimulate(20, engine=engine, resumable=True)
+                test_obj.continue_cosimulate(5)
+                test_obj.save_checkpoint(checkpoint_filename)
+                test_obj.end_cosimulation()
+
+                restored_obj = construct()
+                restored_obj.restore_checkpoint(checkpoint_filename)
+                self.assertEqual(restored_obj.engine_used, engine)
+
+                results = restored_obj.continue_cosimulate(35)
+                restored_obj.end_cosimulation()
+
+                self.assertEqual(results, expected_results)
+                self.assertEqual(
+                    restored_obj.coverage.report(), expected_coverage)
+
+        finally:
+            shutil.rmtree(tmp_dir)
+
+    def test_checkpoint_needs_simulation(self):
+        '''Saving a checkpoint should raise a RuntimeError if there is no
+        simulation running.
+        '''
+        test_obj = SynchronousTest(
+            self.identity_factory, self.identity_factory,
+            self.default_args, self.default_arg_types)
+
+        self.assertRaisesRegex(
+            RuntimeError, 'There is no simulation to checkpoint',
+            test_obj.save_checkpoint, 'unused')
+
+        test_obj.cosimulate(10, resumable=True)
+        test_obj.end_cosimulation()
+
+        self.assertRaisesRegex(
+            RuntimeError, 'There is no simulation to checkpoint',
+            test_obj.save_checkpoint, 'unused')
+
+    def test_event_checkpoint_python_state(self):
+        '''Restoring a checkpoint of an event engine simulation should
+        replay it, which also restores state held outside of signals.
+        '''
+        @block
+        def python_counter(test_input, test_output, reset, clock):
+            count = [0]
+
+            @always(clock.posedge)
+            def model():
+                count[0] += 1
+                test_output.next = (test_input + count[0]) % 1024
+
+            return model
+
+        def construct():
+            random.seed(0)
+            return SynchronousTest(
+                python_counter, python_counter, self.default_args,
+                self.default_arg_types, reuse_elaboration=False)
+
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            checkpoint_filename = os.path.join(tmp_dir, 'checkpoint')
+
+            expected_results = construct().cosimulate(40)
+
+            test_obj = construct()
+            test_obj.cosimulate(15, resumable=True)
+            test_obj.save_checkpoint(checkpoint_filename)
+            test_obj.end_cosimulation()
+
+            restored_obj = construct()
+            restored_obj.restore_checkpoint(checkpoint_filename)
+            results = restored_obj.continue_cosimulate(25)
+            restored_obj.end_cosimulation()
+
+            self.assertEqual(results, expected_results)
+
+        finally:
+            shutil.rmtree(tmp_dir)
+
+    def test_axi_stream_checkpoint(self):
+        '''It should be possible to checkpoint a design with AXI stream
+        interfaces, restoring the packets held by the BFMs.
+        '''
+        clock = Signal(bool(1))
+        test_in = AxiStreamInterface()
+        test_out = AxiStreamInterface()
+
+        args = {'axi_interface_in': test_in,
+                'axi_interface_out': test_out,
+                'clock': clock}
+
+        arg_types = {
+            'axi_interface_in': {'TDATA': 'custom',
+                                 'TVALID': 'custom',
+                                 'TREADY': 'output',
+                                 'TLAST': 'custom'},
+            'axi_interface_out': 'axi_stream_out',
+            'clock': 'clock'}
+
+        @block
+        def axi_identity(clock, axi_interface_in, axi_interface_out):
+
+            @always_comb
+            def assign_signals():
+                axi_interface_in.TREADY.next = axi_interface_out.TREADY
+                axi_interface_out.TVALID.next = axi_interface_in.TVALID
+                axi_interface_out.TLAST.next = axi_interface_in.TLAST
+                axi_interface_out.TDATA.next = axi_interface_in.TDATA
+
+            return assign_signals
+
+        packets = deque([deque(range(n, n + 7)) for n in range(0, 40, 8)])
+
+        def construct():
+            master_bfm = AxiStreamMasterBFM()
+            master_bfm.add_data(copy.deepcopy(packets))
+
+            return SynchronousTest(
+                axi_identity, axi_identity, args, arg_types,
+                custom_sources=[(master_bfm.model, (clock, test_in), {})])
+
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            checkpoint_filename = os.path.join(tmp_dir, 'checkpoint')
+
+            expected_results = construct().cosimulate(50)
+
+            test_obj = construct()
+            test_obj.cosimulate(20, resumable=True)
+            test_obj.save_checkpoint(checkpoint_filename)
+            test_obj.end_cosimulation()
+
+            restored_obj = construct()
+            restored_obj.restore_checkpoint(checkpoint_filename)
+            results = restored_obj.continue_cosimulate(30)
+            restored_obj.end_cosimulation()
+
+            self.assertEqual(results, expected_results)
+            self.assertEqual(
+                results[1]['axi_interface_out']['packets'],
+                {(0, 0): packets})
+
+        finally:
+            shutil.rmtree(tmp_dir)
+
+    def test_restore_checkpoint_from_other_design(self):
+        '''Restoring a checkpoint saved from a different design should
+        raise a ValueError.
+        '''
+        @block
+        def registered_identity(test_input, test_output, reset, clock):
+            delayed = Signal(intbv(0)[10:])
+
+            @always_seq(clock.posedge, reset=reset)
+            def model():
+                delayed.next = test_input
+                test_output.next = delayed
+
+            return model
+
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            checkpoint_filename = os.path.join(tmp_dir, 'checkpoint')
+
+            test_obj = SynchronousTest(
+                registered_identity, registered_identity,
+                self.default_args, self.default_arg_types)
+
+            test_obj.cosimulate(10, engine='cycle', resumable=True)
+            test_obj.save_checkpoint(checkpoint_filename)
+            test_obj.end_cosimulation()
+
+            other_obj = SynchronousTest(
+                self.identity_factory, self.identity_factory,
+                self.default_args, self.default_arg_types)
+
+            self.assertRaisesRegex(
+                ValueError, 'Invalid state', other_obj.restore_checkpoint,
+                checkpoint_filename)
+
+            # An event engine checkpoint replays to different outputs
+            test_obj.cosimulate(10, resumable=True)
+            test_obj.save_checkpoint(checkpoint_filename)
+            test_obj.end_cosimulation()
+
+            self.assertRaisesRegex(
+                ValueError, 'Invalid checkpoint', other_obj.restore_checkpoint,
+                checkpoint_filename)
+            self.assertRaisesRegex(
+                RuntimeError, 'There is no simulation to continue',
+                other_obj.continue_cosimulate, 10)
+
+        finally:
+            shutil.rmtree(tmp_dir)
+
+    def test_dut_convertible_top_raises_for_insufficient_data(self):
+        '''The convertible top method should raise if the sim not run first.
+
+        In order that there is a correct test vector generated, the simulator
+        should be run before the convertible top is run.
+
+        If this has not happened, a RuntimeError should be raised.
+        '''
+        test_obj = SynchronousTest(
+            self.identity_factory, self.identity_factory,
+            self.default_args, self.default_arg_types)
+
+        self.assertRaisesRegex(
+            RuntimeError, 'The simulator should be run before '
+            'dut_convertible_top', test_obj.dut_convertible_top,
+            'foobarfile')
+
+        # Check it happened before the file was written
+        assert not os.path.exists('foobarfile')
+
+    def test_dut_convertible_top_raises_for_None_dut(self):
+        '''If the dut is None, an exception should be raise.
+
+        It should be possible to set the device under test to be None when
+        constructing the test class, which would yield a nonsense
+        dut_convertible_top. This situation should cause the
+        dut_convertible_top function raise with a suitable error.
+        '''
+
+
+        test_obj = SynchronousTest(
+            None, self.identity_factory,
+            self.default_args, self.default_arg_types)
+        test_obj.cosimulate(20)
+
+        self.assertRaisesRegex(
+            RuntimeError, 'The dut was configured to be None in construction',
+            test_obj.dut_convertible_top, 'foobarfile')
+
+        # Check it happened before the file was written
+        assert not os.path.exists('foobarfile')
+
+    def test_dut_convertible_top_raises_with_enum_signals(self):
+        '''enum signals passed to dut_convertible_top should raise
+
+        Whilst enum signals are not supported for conversion, they should
+        raise a proper ValueError.
+        '''
+        simulated_input_cycles = 20
+
+        args = self.default_args.copy()
+
+        enum_names = ('a', 'b', 'c', 'd', 'e')
+        enum_vals = enum(*enum_names)
+        args['test_output'] = Signal(enum_vals.a)
+        args['test_input'] = Signal(enum_vals.a)
+
+        test_obj = SynchronousTest(
+            self.identity_factory, self.identity_factory,
+            args, self.default_arg_types)
+
+        test_obj.cosimulate(simulated_input_cycles)
+
+        self.assertRaisesRegex(
+            ValueError, 'enum signals are currently unsupported',
+            test_obj.dut_convertible_top, 'foobarfile')
+
+
+    def test_dut_convertible_top_to_VHDL(self):
+        '''There should be a method to get a top-level convertible dut that
+        can convert to VHDL
+
+        In order that the cosimulation class can be used to generate
+        converted code of the device under test, it should be possible to
+        provide a block upon which `convert()` can be called.
+
+        The text file to which the signal outputs should be written should
+        be the only argument to the method.
+
+        The method should take no other arguments since the SynchronousTest
+        object should have all the signals internally defined.
+        '''
+
+        simulated_input_cycles = 20
+
+        args = self.default_args.copy()
+        arg_types = self.default_arg_types.copy()
+
+        args['test_input2'] = Signal(intbv(0)[10:])
+        arg_types['test_input2'] = 'random'
+
+        @block
+        def dut(test_input, test_input2, test_output, reset, clock):
+
+            @always_seq(self.clock.posedge, reset)
+            def test_dut():
+
+                test_output.next = test_input + test_input2
+
+            return test_dut
+
+        test_obj = SynchronousTest(dut, dut, args, arg_types)
+
+        tmp_dir = tempfile.mkdtemp()
+        output_file = os.path.join(tmp_dir, 'dut_convertible_top.vhd')
+
+        test_obj.cosimulate(simulated_input_cycles)
+
+        try:
+
+            top = test_obj.dut_convertible_top(tmp_dir)
+            top.convert(hdl='VHDL', path=tmp_dir)
+
+            self.assertTrue(os.path.exists(output_file))
+
+        finally:
+            shutil.rmtree(tmp_dir)
+
+    def test_dut_convertible_top_to_verilog(self):
+        '''There should be a method to get a top-level convertible dut that
+        can convert to Verilog
+
+        In order that the cosimulation class can be used to generate
+        converted code of the device under test, it should be possible to
+        provide a block upon which `convert()` can be called.
+
+        The text file to which the signal outputs should be written should
+        be the only argument to the method.
+
+        The method should take no other arguments since the SynchronousTest
+        object should have all the signals internally defined.
+        '''
+
+        simulated_input_cycles = 20
+
+        args = self.default_args.copy()
+        arg_types = self.default_arg_types.copy()
+
+        args['test_input2'] = Signal(intbv(0)[10:])
+        arg_types['test_input2'] = 'random'
+
+        @block
+        def dut(test_input, test_input2, test_output, reset, clock):
+
+            @always_seq(self.clock.posedge, reset)
+            def test_dut():
+
+                test_output.next = test_input + test_input2
+
+            return test_dut
+
+        test_obj = SynchronousTest(dut, dut, args, arg_types)
+
+        tmp_dir = tempfile.mkdtemp()
+        output_file = os.path.join(tmp_dir, 'dut_convertible_top.v')
+
+        test_obj.cosimulate(simulated_input_cycles)
+
+        try:
+            top2 = test_obj.dut_convertible_top(tmp_dir)
+            top2.convert(hdl='Verilog', path=tmp_dir)
+
+            self.assertTrue(os.path.exists(output_file))
+
+        finally:
+            shutil.rmtree(tmp_dir)
+
+    def test_dut_convertible_top_with_long_boolean_output(self):
+        '''Output booleans with long type vals (0, 1) should be handled.
+
+        That is, code in which output booleans have had their value set
+        using '1' rather than True should convert fine.
+        '''
+
+        simulated_input_cycles = 20
+
+        args = self.default_args.copy()
+        arg_types = self.default_arg_types.copy()
+
+        args['test_output'] = Signal(bool(0))
+
+        args['test_output'].next = 1
+        args['test_output']._update()
+
+        del args['test_input']
+        del arg_types['test_input']
+
+        @block
+        def dut(test_output, reset, clock):
+
+            @always_seq(self.clock.posedge, reset)
+            def test_dut():
+                test_output.next = 1
+
+            return test_dut
+
+        test_obj = SynchronousTest(dut, dut, args, arg_types)
+
+        tmp_dir = tempfile.mkdtemp()
+
+        output_file = os.path.join(tmp_dir, 'dut_convertible_top.vhd')
+
+        test_obj.cosimulate(simulated_input_cycles)
+
+        try:
+            top = test_obj.dut_convertible_top(tmp_dir)
+            top.convert(hdl='VHDL', path=tmp_dir)
+
+            self.assertTrue(os.path.exists(output_file))
+
+        finally:
+            shutil.rmtree(tmp_dir)
+
+    def test_dut_convertible_top_with_interface(self):
+        '''Convertible top duts with interfaces should be supported.
 
         The dut_convertible_top method should be able to handle interfaces,
         expanding them out as necessary.
@@ -3457,6 +5023,42 @@ class TestSimulationOutputs(TestCase):
 
         self.assertTrue(a != b)
 
+class TestFirstMismatch(TestCase):
+    '''There should be a function that finds the first mismatch between the
+    dut and the ref outputs.
+    '''
+
+    def test_earliest_cycle(self):
+        '''The earliest mismatching cycle across all the signals should be
+        returned.
+        '''
+        from veriutils.cosimulation import SimulationOutputs
+        from veriutils import SignalOutput, first_mismatch
+
+        dut = SimulationOutputs({'a': SignalOutput([1, 2, 3, 9]),
+                                 'b': SignalOutput([4, 9, 6, 7])})
+        ref = SimulationOutputs({'a': SignalOutput([1, 2, 3, 4]),
+                                 'b': SignalOutput([4, 5, 6, 7])})
+
+        self.assertEqual(first_mismatch(dut, ref), ('b', 1))
+        self.assertIsNone(first_mismatch(ref, ref))
+
+    def test_length_and_other_mismatches(self):
+        '''A difference in length should be a mismatch on the first missing
+        cycle, and differences in anything other than signal outputs should
+        have a cycle of None.
+        '''
+        from veriutils import SignalOutput, AxiStreamOutput, first_mismatch
+
+        dut = {'a': SignalOutput([1, 2]), 'b': AxiStreamOutput({'p': [1]})}
+        ref = {'a': SignalOutput([1, 2, 3]), 'b': AxiStreamOutput({'p': [1]})}
+
+        self.assertEqual(first_mismatch(dut, ref), ('a', 2))
+
+        dut['a'].append(3)
+        dut['b'] = AxiStreamOutput({'p': [2]})
+
+        self.assertEqual(first_mismatch(dut, ref), ('b', None))
 
 class TestCosimulationFunction(CosimulationTestMixin, TestCase):
     '''In order to simplify the process of running a cosimulation, as well
@@ -3492,3 +5094,96 @@ class TestCosimulationFunction(CosimulationTestMixin, TestCase):
         self.assertIs(dut_results, None)
 
 
+
+class TestCycleEngine(CosimulationTestMixin, TestCase):
+    '''It should be possible to run the cosimulation with the cycle based
+    engine. The results should be identical to those of the event driven
+    engine, with the event driven engine being used for any design that the
+    cycle based engine cannot handle.
+    '''
+
+    def construct_and_simulate(
+        self, sim_cycles, dut_factory, ref_factory, args, arg_types,
+        **kwargs):
+
+        return myhdl_cosimulation(
+            sim_cycles, dut_factory, ref_factory, args, arg_types,
+            engine='cycle', **kwargs)
+
+    def simulate_with_engine(self, engine, sim_cycles=50, **kwargs):
+
+        random.seed(0)
+        test_obj = SynchronousTest(
+            self.identity_factory, self.identity_factory, self.default_args,
+            self.default_arg_types, **kwargs)
+
+        results = test_obj.cosimulate(sim_cycles, engine=engine)
+
+        return results, test_obj.engine_used
+
+    def test_same_as_event_engine(self):
+        '''The cycle based engine should be used for a synchronous design and
+        should give the same results as the event driven engine.
+        '''
+        event_results, event_engine = self.simulate_with_engine('event')
+        cycle_results, cycle_engine = self.simulate_with_engine('cycle')
+
+        self.assertEqual(event_engine, 'event')
+        self.assertEqual(cycle_engine, 'cycle')
+        self.assertEqual(event_results, cycle_results)
+
+    def test_falls_back_to_event_engine(self):
+        '''If the design contains something the cycle based engine cannot
+        simulate, the event driven engine should be used instead.
+        '''
+        @block
+        def delayed_identity(test_input, test_output, reset, clock):
+
+            @instance
+            def model():
+                while True:
+                    yield clock.posedge
+                    yield delay(1)
+                    test_output.next = test_input
+
+            return model
+
+        random.seed(0)
+        test_obj = SynchronousTest(
+            delayed_identity, delayed_identity, self.default_args,
+            self.default_arg_types)
+
+        dut_results, ref_results = test_obj.cosimulate(20, engine='cycle')
+
+        self.assertEqual(test_obj.engine_used, 'event')
+        self.assertEqual(dut_results, ref_results)
+
+    def test_vcd_uses_event_engine(self):
+        '''If a vcd file is requested, the event driven engine should be
+        used.
+        '''
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            test_obj = SynchronousTest(
+                self.identity_factory, self.identity_factory,
+                self.default_args, self.default_arg_types)
+
+            test_obj.cosimulate(
+                10, vcd_name=os.path.join(tmp_dir, 'test'), engine='cycle')
+
+            self.assertEqual(test_obj.engine_used, 'event')
+
+        finally:
+            shutil.rmtree(tmp_dir)
+
+    def test_invalid_engine(self):
+        '''An engine other than 'event' or 'cycle' should raise a
+        ValueError.
+        '''
+        test_obj = SynchronousTest(
+            self.identity_factory, self.identity_factory,
+            self.default_args, self.default_arg_types)
+
+        self.assertRaisesRegex(
+            ValueError, 'Invalid engine', test_obj.cosimulate, 10,
+            engine='fast')
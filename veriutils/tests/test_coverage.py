@@ -0,0 +1,266 @@
+from veriutils.tests.base_hdl_test import TestCase
+from veriutils import (
+    CoverPoint, Coverage, coverage_monitor, AdaptiveDistribution,
+    compare_coverage_closure, WeightedValues)
+
+from myhdl import (
+    intbv, enum, Signal, ResetSignal, block, always_seq, Simulation,
+    StopSimulation, instance, delay)
+
+import random
+
+class TestCoverPoint(TestCase):
+    '''There should be a cover point that defines a set of bins on a signal.
+    '''
+
+    def test_value_and_range_bins(self):
+        '''Bins can be single values or half open ranges.
+        '''
+        coverpoint = CoverPoint('a', {'zero': 0, 'small': (1, 4)})
+
+        self.assertEqual(coverpoint.matching_bins(0), [0])
+        self.assertEqual(coverpoint.matching_bins(3), [1])
+        self.assertEqual(coverpoint.matching_bins(4), [])
+        self.assertEqual(coverpoint.bin_ranges, [(0, 1), (1, 4)])
+
+    def test_bins_from_list(self):
+        '''If the bins are a list, the bin names are the string
+        representations of the bins.
+        '''
+        coverpoint = CoverPoint('a', [5, (6, 10)])
+        self.assertEqual(coverpoint.bin_names, ['5', '(6, 10)'])
+
+    def test_enum_bins(self):
+        '''Enum values can be used as bins, but have no range.
+        '''
+        states = enum('a', 'b')
+        coverpoint = CoverPoint('s', [states.a, states.b])
+
+        self.assertEqual(coverpoint.matching_bins(states.b), [1])
+        self.assertEqual(coverpoint.bin_ranges, [(None, None)] * 2)
+
+    def test_invalid_bins(self):
+        '''Empty or duplicate bins should raise a ValueError.
+        '''
+        self.assertRaisesRegex(
+            ValueError, 'Invalid bins', CoverPoint, 'a', [])
+        self.assertRaisesRegex(
+            ValueError, 'Invalid bins', CoverPoint, 'a', [1, 1])
+        self.assertRaisesRegex(
+            ValueError, 'Invalid bin', CoverPoint, 'a', [(4, 2)])
+
+class TestAdaptiveDistribution(TestCase):
+    '''There should be a distribution that can be biased towards a set of
+    targets during a simulation.
+    '''
+
+    def test_unbiased(self):
+        '''Without any targets, the base distribution should be used.
+        '''
+        sampler = AdaptiveDistribution(
+            WeightedValues({3: 1})).sampler(0, 16)
+        rng = random.Random(0)
+
+        self.assertEqual(set(sampler(rng) for n in range(100)), {3})
+
+    def test_bias_applies_from_sample(self):
+        '''A change of the targets should apply from the given sample
+        number.
+        '''
+        distribution = AdaptiveDistribution(WeightedValues({3: 1}), bias=1.0)
+        sampler = distribution.sampler(0, 16)
+        rng = random.Random(0)
+
+        distribution.bias_towards([(10, 11)], from_sample=5)
+
+        values = [sampler(rng) for n in range(10)]
+        self.assertEqual(values, [3] * 5 + [10] * 5)
+
+    def test_samplers_agree(self):
+        '''Samplers from the same distribution and random state should agree
+        however their samples are interleaved with changes of the targets.
+        '''
+        distribution = AdaptiveDistribution(bias=0.5)
+        sampler_a = distribution.sampler(0, 256)
+        sampler_b = distribution.sampler(0, 256)
+        rng_a = random.Random(1)
+        rng_b = random.Random(1)
+
+        values_a = [sampler_a(rng_a) for n in range(20)]
+        distribution.bias_towards([(0, 2)], from_sample=25)
+        values_a += [sampler_a(rng_a) for n in range(20)]
+
+        values_b = [sampler_b(rng_b) for n in range(40)]
+
+        self.assertEqual(values_a, values_b)
+
+    def test_targets_clipped_to_signal(self):
+        '''Targets the signal cannot represent should be ignored.
+        '''
+        distribution = AdaptiveDistribution(bias=0.5)
+        distribution.bias_towards([(20, 30), (6, 10)])
+
+        self.assertEqual(
+            distribution.components(0, 8),
+            [(0.5, 0, 8), (0.5, 6, 8)])
+
+    def test_invalid_bias(self):
+        '''A bias outside of [0, 1] should raise a ValueError.
+        '''
+        self.assertRaisesRegex(
+            ValueError, 'Invalid bias', AdaptiveDistribution, None, 2)
+
+class TestCoverage(TestCase):
+    '''There should be a coverage object that tracks bin hits and biases
+    the stimulus towards unhit bins.
+    '''
+
+    def test_closure(self):
+        '''The closure cycle should be the number of cycles it took to hit
+        every bin.
+        '''
+        coverage = Coverage([CoverPoint('a', [0, 1]), CoverPoint('b', [5])])
+
+        coverage.sample({'a': 0, 'b': 5})
+        self.assertFalse(coverage.closed)
+        self.assertEqual(coverage.unhit_bins('a'), ['1'])
+
+        coverage.sample({'a': 1, 'b': 2})
+        self.assertTrue(coverage.closed)
+
+        coverage.sample({'a': 0, 'b': 2})
+
+        report = coverage.report()
+        self.assertEqual(report['closure_cycle'], 2)
+        self.assertEqual(report['cycles'], 3)
+        self.assertEqual(report['bins'], {'a': {'0': 2, '1': 1},
+                                          'b': {'5': 1}})
+
+    def test_update_bias(self):
+        '''Every update interval, the adaptive distributions should be biased
+        towards the unhit bins.
+        '''
+        coverage = Coverage(
+            [CoverPoint('a', {'x': 0, 'y': (4, 8)})], update_interval=2)
+        distribution = coverage.adaptive_distribution('a')
+
+        coverage.sample({'a': 0})
+        self.assertEqual(distribution.targets, ())
+
+        coverage.sample({'a': 1})
+        self.assertEqual(distribution.targets, ((4, 8),))
+
+    def test_not_adaptive(self):
+        '''If the coverage is not adaptive, the distributions should not be
+        biased.
+        '''
+        coverage = Coverage(
+            [CoverPoint('a', [1])], adaptive=False, update_interval=1)
+        distribution = coverage.adaptive_distribution('a')
+
+        coverage.sample({'a': 0})
+        self.assertEqual(distribution.targets, ())
+
+    def test_reset(self):
+        '''Resetting the coverage should clear the hits and the bias.
+        '''
+        coverage = Coverage([CoverPoint('a', [1, 2])], update_interval=1)
+        distribution = coverage.adaptive_distribution('a')
+
+        coverage.sample({'a': 1})
+        coverage.reset()
+
+        self.assertEqual(coverage.hits, {'a': [0, 0]})
+        self.assertEqual(coverage.cycles, 0)
+        self.assertEqual(distribution.targets, ())
+
+    def test_invalid_arguments(self):
+        '''Duplicate cover points, an invalid update interval or an invalid
+        bias should raise a ValueError.
+        '''
+        self.assertRaisesRegex(
+            ValueError, 'Invalid cover points', Coverage,
+            [CoverPoint('a', [1]), CoverPoint('a', [2])])
+        self.assertRaisesRegex(
+            ValueError, 'Invalid update interval', Coverage,
+            [CoverPoint('a', [1])], update_interval=0)
+        self.assertRaisesRegex(
+            ValueError, 'Invalid bias', Coverage,
+            [CoverPoint('a', [1])], bias=-1)
+
+class TestCoverageMonitor(TestCase):
+    '''There should be a block that samples signals into a coverage object.
+    '''
+
+    def test_not_sampled_during_reset(self):
+        '''The signals should only be sampled when the reset is not active.
+        '''
+        clock = Signal(bool(1))
+        reset = ResetSignal(bool(1), active=1, isasync=False)
+        test_signal = Signal(intbv(0)[4:])
+
+        coverage = Coverage([CoverPoint('a', [0, 3])])
+
+        @instance
+        def stimulus():
+            for n in range(10):
+                yield delay(5)
+                clock.next = not clock
+                if n == 3:
+                    reset.next = 0
+                    test_signal.next = 3
+
+            raise StopSimulation
+
+        monitor = coverage_monitor(
+            coverage, {'a': test_signal}, clock, reset)
+
+        sim = Simulation(stimulus, monitor)
+        sim.run(quiet=1)
+
+        self.assertEqual(coverage.report()['bins'], {'a': {'0': 0, '3': 3}})
+
+class TestCompareCoverageClosure(TestCase):
+    '''There should be a function to compare the coverage closure of
+    adaptive and uniform stimulus.
+    '''
+
+    def test_adaptive_closes_sooner(self):
+        '''Adaptive stimulus should close narrow bins sooner than uniform
+        stimulus.
+        '''
+        clock = Signal(bool(1))
+        reset = ResetSignal(bool(0), active=1, isasync=False)
+        test_input = Signal(intbv(0)[12:])
+        test_output = Signal(intbv(0)[12:])
+
+        @block
+        def identity(test_input, test_output, reset, clock):
+            @always_seq(clock.posedge, reset=reset)
+            def model():
+                test_output.next = test_input
+
+            return model
+
+        args = {'test_input': test_input, 'test_output': test_output,
+                'reset': reset, 'clock': clock}
+        arg_types = {'test_input': 'random', 'test_output': 'output',
+                     'reset': 'init_reset', 'clock': 'clock'}
+
+        coverpoints = [CoverPoint('test_input', [0, 1, 2, 4095])]
+
+        state = random.getstate()
+
+        reports = compare_coverage_closure(
+            400, identity, args, arg_types, coverpoints, update_interval=16,
+            rng=random.Random(3))
+
+        # The global random state is left alone when rng is given
+        self.assertEqual(random.getstate(), state)
+
+        self.assertIsNotNone(reports['adaptive']['closure_cycle'])
+        self.assertIsNone(reports['uniform']['closure_cycle'])
+        self.assertEqual(reports['uniform']['cycles'], 400 - 3)
+
+    def tearDown(self):
+        random.seed(None)
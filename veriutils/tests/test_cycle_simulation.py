@@ -0,0 +1,236 @@
+from veriutils.tests.base_hdl_test import TestCase
+from veriutils import CycleSimulation, UnsupportedConstructError
+
+from myhdl import (
+    intbv, Signal, ResetSignal, ConcatSignal, block, always, always_seq,
+    always_comb, instance, delay, now, StopSimulation)
+
+class TestCycleSimulation(TestCase):
+    '''There should be a cycle based simulator that runs each clocked process
+    once per clock edge and settles the combinatorial logic in between.
+    '''
+
+    def setUp(self):
+        self.clock = Signal(bool(1))
+        self.reset = ResetSignal(bool(0), active=1, isasync=False)
+
+    def test_combinatorial_ordering(self):
+        '''Chains of combinatorial processes should be settled on each edge,
+        whatever order they are defined in.
+        '''
+        clock = self.clock
+        counter = Signal(intbv(0)[8:])
+        doubled = Signal(intbv(0)[9:])
+        plus_one = Signal(intbv(0)[10:])
+        recorded = []
+
+        @block
+        def design():
+
+            @always_comb
+            def second():
+                plus_one.next = doubled + 1
+
+            @always_comb
+            def first():
+                doubled.next = counter * 2
+
+            @always_seq(clock.posedge, reset=None)
+            def count():
+                counter.next = counter + 1
+
+            @always(clock.negedge)
+            def record():
+                recorded.append(int(plus_one))
+
+            return second, first, count, record
+
+        sim = CycleSimulation(design(), clock, 10)
+        self.assertFalse(sim.run(4))
+        sim.quit()
+
+        # The clock starts high, so the negedge comes first
+        self.assertEqual(recorded, [1, 3, 5, 7])
+
+    def test_synchronous_reset(self):
+        '''Processes with a synchronous reset should be reset while the reset
+        is active.
+        '''
+        clock = self.clock
+        reset = self.reset
+        counter = Signal(intbv(0)[8:])
+        recorded = []
+
+        @block
+        def design():
+
+            @always_seq(clock.posedge, reset=reset)
+            def count():
+                counter.next = counter + 1
+
+            @always(clock.negedge)
+            def record():
+                recorded.append(int(counter))
+                reset.next = len(recorded) == 2
+
+            return count, record
+
+        sim = CycleSimulation(design(), clock, 10)
+        sim.run(5)
+        sim.quit()
+
+        self.assertEqual(recorded, [0, 1, 0, 1, 2])
+
+    def test_shadow_signals(self):
+        '''Slice and concatenation shadow signals should follow the signals
+        they shadow.
+        '''
+        clock = self.clock
+        counter = Signal(intbv(0)[4:])
+        recorded = []
+
+        @block
+        def design():
+            low = counter(2, 0)
+            swapped = ConcatSignal(low, counter(4, 2))
+
+            @always_seq(clock.posedge, reset=None)
+            def count():
+                counter.next = (counter + 1) % 16
+
+            @always(clock.negedge)
+            def record():
+                recorded.append(int(swapped))
+
+            return count, record
+
+        sim = CycleSimulation(design(), clock, 10)
+        sim.run(6)
+        sim.quit()
+
+        self.assertEqual(recorded, [0, 4, 8, 12, 1, 5])
+
+    def test_other_shadow_signals(self):
+        '''Only the shadow signals of the design should be simulated, not
+        those of other designs created in the same process.
+        '''
+        clock = self.clock
+        counter = Signal(intbv(0)[4:])
+        other = Signal(intbv(0)[4:])
+        other_shadows = [other(2, 0), ConcatSignal(other, other)]
+        recorded = []
+
+        @block
+        def design():
+            low = counter(2, 0)
+
+            @always_seq(clock.posedge, reset=None)
+            def count():
+                counter.next = (low + 1) % 4
+
+            @always(clock.negedge)
+            def record():
+                recorded.append(int(counter))
+
+            return count, record
+
+        sim = CycleSimulation(design(), clock, 10)
+        sim.run(6)
+        sim.quit()
+
+        self.assertEqual(recorded, [0, 1, 2, 3, 0, 1])
+
+        simulated = [sig for proc in sim._comb_procs for sig in proc.outputs]
+        self.assertEqual(len(simulated), 1)
+        self.assertFalse(any(sig is shadow for sig in simulated
+                             for shadow in other_shadows))
+
+    def test_time(self):
+        '''The simulation time should advance by half a period per edge.
+        '''
+        clock = self.clock
+        times = []
+
+        @block
+        def design():
+
+            @always(clock.posedge)
+            def record():
+                times.append(now())
+
+            return record
+
+        sim = CycleSimulation(design(), clock, 10)
+        sim.run(3)
+        sim.quit()
+
+        self.assertEqual(times, [10, 20, 30])
+
+    def test_stop_simulation(self):
+        '''Raising ``StopSimulation`` should stop the simulation and ``run``
+        should return ``True``.
+        '''
+        clock = self.clock
+        counter = Signal(intbv(0)[8:])
+
+        @block
+        def design():
+
+            @always_seq(clock.posedge, reset=None)
+            def count():
+                if counter == 4:
+                    raise StopSimulation
+
+                counter.next = counter + 1
+
+            return count
+
+        sim = CycleSimulation(design(), clock, 10)
+        self.assertTrue(sim.run())
+        self.assertEqual(counter, 4)
+        sim.quit()
+
+    def test_unsupported_constructs(self):
+        '''Instances that are not clocked or combinatorial, and asynchronous
+        resets, should raise an ``UnsupportedConstructError``.
+        '''
+        clock = self.clock
+        output = Signal(bool(0))
+
+        @block
+        def delayed():
+
+            @instance
+            def delayed_process():
+                while True:
+                    yield delay(3)
+                    output.next = not output
+
+            return delayed_process
+
+        async_reset = ResetSignal(bool(0), active=1, isasync=True)
+
+        @block
+        def asynchronous():
+
+            @always_seq(clock.posedge, reset=async_reset)
+            def toggle():
+                output.next = not output
+
+            return toggle
+
+        other_clock = Signal(bool(0))
+
+        @block
+        def other_clocked():
+
+            @always(other_clock.posedge)
+            def toggle():
+                output.next = not output
+
+            return toggle
+
+        for design in (delayed, asynchronous, other_clocked):
+            self.assertRaises(
+                UnsupportedConstructError, CycleSimulation, design(), clock,
+                10)
@@ -0,0 +1,159 @@
+from veriutils.tests.base_hdl_test import TestCase
+from veriutils import (
+    AliasTable, Distribution, WeightedValues, RangeMixture, EdgeBoost)
+
+import random
+from collections import Counter
+
+class TestAliasTable(TestCase):
+    '''There should be an alias table that draws indices from a discrete
+    distribution in constant time.
+    '''
+
+    def test_frequencies_follow_weights(self):
+        '''The frequency of each index should be proportional to its weight.
+        '''
+        weights = [1, 0, 3, 6]
+        table = AliasTable(weights)
+        rng = random.Random(5)
+
+        n_samples = 40000
+        counts = Counter(table.sample(rng) for n in range(n_samples))
+
+        self.assertNotIn(1, counts)
+
+        for n, weight in enumerate(weights):
+            expected = n_samples * weight / sum(weights)
+            self.assertAlmostEqual(
+                counts[n]/n_samples, expected/n_samples, places=2)
+
+    def test_single_weight(self):
+        '''A table with a single weight should always return zero.
+        '''
+        table = AliasTable([0.2])
+        rng = random.Random(1)
+        self.assertEqual(set(table.sample(rng) for n in range(100)), {0})
+
+    def test_deterministic(self):
+        '''The samples should depend only on the state of the generator.
+        '''
+        table = AliasTable([5, 1, 1, 2])
+        rng_a = random.Random(10)
+        rng_b = random.Random(10)
+
+        self.assertEqual([table.sample(rng_a) for n in range(100)],
+                         [table.sample(rng_b) for n in range(100)])
+
+    def test_invalid_weights(self):
+        '''Empty, negative or all zero weights should raise a ValueError.
+        '''
+        self.assertRaisesRegex(
+            ValueError, 'at least one weight', AliasTable, [])
+        self.assertRaisesRegex(
+            ValueError, 'non-negative', AliasTable, [1, -1])
+        self.assertRaisesRegex(
+            ValueError, 'greater than zero', AliasTable, [0, 0])
+
+class TestDistributions(TestCase):
+    '''There should be distributions that can be used to shape the output
+    of the random source.
+    '''
+
+    def test_weighted_values(self):
+        '''WeightedValues should only return the given values, with
+        frequencies set by the weights.
+        '''
+        sampler = WeightedValues({3: 1, -7: 3}).sampler(-10, 10)
+        rng = random.Random(0)
+
+        n_samples = 20000
+        counts = Counter(sampler(rng) for n in range(n_samples))
+
+        self.assertEqual(set(counts), {3, -7})
+        self.assertAlmostEqual(counts[-7]/n_samples, 0.75, places=1)
+
+    def test_weighted_values_from_pairs(self):
+        '''WeightedValues should also accept an iterable of pairs.
+        '''
+        sampler = WeightedValues([(4, 1), (5, 1)]).sampler(0, 8)
+        rng = random.Random(0)
+
+        self.assertEqual(set(sampler(rng) for n in range(1000)), {4, 5})
+
+    def test_range_mixture(self):
+        '''RangeMixture should draw from each of its ranges, with None
+        denoting the signal bounds.
+        '''
+        sampler = RangeMixture(
+            [(None, 4, 1), (100, None, 1)]).sampler(-50, 128)
+        rng = random.Random(0)
+
+        values = [sampler(rng) for n in range(5000)]
+
+        self.assertTrue(
+            all(-50 <= each < 4 or 100 <= each < 128 for each in values))
+        self.assertIn(-50, values)
+        self.assertIn(127, values)
+
+    def test_edge_boost(self):
+        '''EdgeBoost should return the edge values of the signal with a
+        boosted probability.
+        '''
+        min_val = -2**15
+        max_val = 2**15
+        sampler = EdgeBoost(0.4).sampler(min_val, max_val)
+        rng = random.Random(2)
+
+        n_samples = 20000
+        counts = Counter(sampler(rng) for n in range(n_samples))
+
+        for each in (min_val, max_val - 1, 0, -1):
+            self.assertAlmostEqual(counts[each]/n_samples, 0.1, places=1)
+
+        self.assertTrue(all(min_val <= each < max_val for each in counts))
+
+    def test_edge_boost_unsigned(self):
+        '''Edge values that the signal cannot represent should be ignored.
+        '''
+        components = EdgeBoost(0.5).components(0, 16)
+        edge_values = [lower for weight, lower, upper in components[1:]]
+
+        self.assertEqual(edge_values, [0, 15])
+
+    def test_edge_boost_invalid_probability(self):
+        '''An edge probability outside of [0, 1] should raise a ValueError.
+        '''
+        self.assertRaisesRegex(
+            ValueError, 'Invalid edge probability', EdgeBoost, 1.5)
+
+    def test_out_of_range_raises(self):
+        '''A distribution that lies outside of the range of the signal should
+        raise a ValueError when the sampler is created.
+        '''
+        self.assertRaisesRegex(
+            ValueError, 'outside the range of the signal',
+            WeightedValues({20: 1}).sampler, 0, 16)
+
+        self.assertRaisesRegex(
+            ValueError, 'outside the range of the signal',
+            RangeMixture([(-1, 4, 1)]).sampler, 0, 16)
+
+        self.assertRaisesRegex(
+            ValueError, 'outside the range of the signal',
+            EdgeBoost(edge_values=(16,)).sampler, 0, 16)
+
+    def test_components_required(self):
+        '''A subclass of Distribution that does not implement components
+        should raise a TypeError when it is instantiated.
+        '''
+        class Incomplete(Distribution):
+            pass
+
+        class Complete(Distribution):
+            def components(self, min_val, max_val):
+                return [(1, min_val, max_val)]
+
+        self.assertRaises(TypeError, Incomplete)
+        self.assertRaises(TypeError, Distribution)
+
+        self.assertIn(Complete().sampler(0, 4)(random.Random(0)), range(4))
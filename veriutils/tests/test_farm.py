@@ -0,0 +1,199 @@
+from veriutils.tests.base_hdl_test import TestCase
+from veriutils import (
+    SynchronousTestSpec, RegressionCoordinator, run_worker, first_mismatch,
+    ResultsDatabase)
+
+from myhdl import intbv, Signal, ResetSignal, block, always_seq
+
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+@block
+def _identity(test_input, test_output, reset, clock, marker):
+
+    @always_seq(clock.posedge, reset=reset)
+    def identity():
+        test_output.next = test_input
+
+    return identity
+
+@block
+def _broken_identity(test_input, test_output, reset, clock, marker):
+    '''Differs from the identity only on the largest input values.
+    '''
+
+    @always_seq(clock.posedge, reset=reset)
+    def identity():
+        if test_input >= 1000:
+            test_output.next = 0
+        else:
+            test_output.next = test_input
+
+    return identity
+
+@block
+def _exiting_identity(test_input, test_output, reset, clock, marker):
+    '''Kills the process the first time it is elaborated (or every time, if
+    ``marker`` is ``None``).
+    '''
+    if marker is None or not os.path.exists(marker):
+        if marker is not None:
+            open(marker, 'w').close()
+
+        os._exit(1)
+
+    return _identity(test_input, test_output, reset, clock, marker)
+
+class TestRegressionCoordinator(TestCase):
+    '''There should be a coordinator that hands out cosimulation jobs to
+    workers over TCP and collects a summary of each.
+    '''
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+        self.args = {'test_input': Signal(intbv(0)[10:]),
+                     'test_output': Signal(intbv(0)[10:]),
+                     'reset': ResetSignal(bool(0), active=1, isasync=False),
+                     'clock': Signal(bool(1)),
+                     'marker': os.path.join(self.tmp_dir, 'marker')}
+
+        self.arg_types = {'test_input': 'random',
+                          'test_output': 'output',
+                          'reset': 'init_reset',
+                          'clock': 'clock',
+                          'marker': 'non-signal'}
+
+        self.processes = []
+
+    def tearDown(self):
+        for process in self.processes:
+            process.join(10)
+
+            if process.is_alive():
+                process.terminate()
+
+        shutil.rmtree(self.tmp_dir)
+
+    def start_workers(self, coordinator, n_workers):
+        context = multiprocessing.get_context('fork')
+
+        for n in range(n_workers):
+            process = context.Process(
+                target=run_worker, args=coordinator.address)
+            process.start()
+            self.processes.append(process)
+
+    def test_jobs(self):
+        '''Every job should be run by one of the workers, giving the same
+        summary as a cosimulation of the test built from the spec.
+        '''
+        specs = [
+            SynchronousTestSpec(dut, _identity, self.args, self.arg_types)
+            for dut in (_identity, _broken_identity)]
+
+        jobs = [(spec, seed, 300) for spec in specs for seed in range(3)]
+
+        coordinator = RegressionCoordinator(jobs)
+        self.start_workers(coordinator, 2)
+
+        received = []
+        summaries = coordinator.run(on_result=received.append, timeout=120)
+
+        self.assertEqual(len(summaries), len(jobs))
+        self.assertEqual(
+            sorted(received, key=lambda summary: summary['job']), summaries)
+
+        for n, ((spec, seed, cycles), summary) in enumerate(
+            zip(jobs, summaries)):
+
+            mismatch = first_mismatch(
+                *spec.build().cosimulate(cycles, seed=seed))
+
+            self.assertEqual(summary['job'], n)
+            self.assertEqual(summary['seed'], seed)
+            self.assertEqual(summary['attempts'], 1)
+            self.assertEqual(summary['mismatch'], mismatch)
+            self.assertEqual(summary['passed'], mismatch is None)
+            self.assertIsNone(summary['error'])
+            self.assertIsNotNone(summary['worker'])
+
+        self.assertTrue(all(summary['passed'] for summary in summaries[:3]))
+        self.assertFalse(all(summary['passed'] for summary in summaries[3:]))
+
+    def test_lost_worker(self):
+        '''The job of a worker that is lost should be retried on another
+        worker.
+        '''
+        spec = SynchronousTestSpec(
+            _exiting_identity, _identity, self.args, self.arg_types)
+
+        coordinator = RegressionCoordinator([(spec, 0, 50)])
+        self.start_workers(coordinator, 2)
+
+        summary, = coordinator.run(timeout=120)
+
+        self.assertTrue(summary['passed'])
+        self.assertEqual(summary['attempts'], 2)
+
+    def test_max_attempts(self):
+        '''A job should fail once it has been attempted ``max_attempts``
+        times.
+        '''
+        args = dict(self.args, marker=None)
+
+        spec = SynchronousTestSpec(
+            _exiting_identity, _identity, args, self.arg_types)
+
+        coordinator = RegressionCoordinator([(spec, 0, 50)], max_attempts=2)
+        self.start_workers(coordinator, 2)
+
+        summary, = coordinator.run(timeout=120)
+
+        self.assertFalse(summary['passed'])
+        self.assertEqual(summary['attempts'], 2)
+        self.assertIsNone(summary['worker'])
+        self.assertIn('lost', summary['error'])
+
+    def test_results_db(self):
+        '''With a results_db, the seeds that failed on their latest run
+        should be handed out first and every summary should be recorded.
+        '''
+        spec = SynchronousTestSpec(
+            _identity, _identity, self.args, self.arg_types)
+
+        results_db = ResultsDatabase(os.path.join(self.tmp_dir, 'results.db'))
+        results_db.record(spec.test_id, 2, 50, 1.0, False)
+
+        coordinator = RegressionCoordinator(
+            [(spec, seed, 50) for seed in range(3)], results_db=results_db)
+        self.start_workers(coordinator, 1)
+
+        received = []
+        coordinator.run(on_result=received.append, timeout=120)
+
+        self.assertEqual([summary['seed'] for summary in received], [2, 0, 1])
+
+        runs = results_db.runs(spec.test_id)[1:]
+        self.assertEqual([run['seed'] for run in runs], [2, 0, 1])
+        self.assertTrue(all(run['passed'] for run in runs))
+        self.assertEqual(runs[0]['signals'], 4)
+        self.assertEqual(runs[0]['engine'], 'event')
+
+    def test_invalid_coordinator(self):
+        '''Jobs that are not tuples of (spec, seed, cycles) or a max
+        attempts of less than one should raise a ValueError.
+        '''
+        spec = SynchronousTestSpec(
+            _identity, _identity, self.args, self.arg_types)
+
+        self.assertRaisesRegex(
+            ValueError, 'Invalid job', RegressionCoordinator, [(spec, 0)])
+        self.assertRaisesRegex(
+            ValueError, 'Invalid job', RegressionCoordinator,
+            [(None, 0, 10)])
+        self.assertRaisesRegex(
+            ValueError, 'Invalid max attempts', RegressionCoordinator,
+            [(spec, 0, 10)], max_attempts=0)
@@ -0,0 +1,255 @@
+from veriutils.tests.base_hdl_test import TestCase
+from veriutils import (
+    Fuzzer, CoverPoint, load_stimulus, save_stimulus)
+
+from myhdl import intbv, enum, Signal, ResetSignal, block, always_seq
+
+import os
+import shutil
+import tempfile
+
+class TestFuzzer(TestCase):
+    '''There should be a coverage guided fuzzer that searches for stimuli that
+    cause the dut and the ref to disagree.
+    '''
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+        self.args = {'test_input': Signal(intbv(0)[10:]),
+                     'test_output': Signal(intbv(0)[10:]),
+                     'reset': ResetSignal(bool(0), active=1, isasync=False),
+                     'clock': Signal(bool(1))}
+
+        self.arg_types = {'test_input': 'random',
+                          'test_output': 'output',
+                          'reset': 'init_reset',
+                          'clock': 'clock'}
+
+        @block
+        def identity(test_input, test_output, reset, clock):
+            @always_seq(clock.posedge, reset=reset)
+            def model():
+                test_output.next = test_input
+
+            return model
+
+        @block
+        def broken_identity(test_input, test_output, reset, clock):
+            # Fails on the maximum input value
+            @always_seq(clock.posedge, reset=reset)
+            def model():
+                if test_input == 1023:
+                    test_output.next = 0
+                else:
+                    test_output.next = test_input
+
+            return model
+
+        self.identity = identity
+        self.broken_identity = broken_identity
+
+        self.coverpoints = [
+            CoverPoint('test_input', {'low': (0, 16), 'high': (1008, 1024)})]
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_finds_and_minimizes_failure(self):
+        '''The fuzzer should find a failing stimulus and minimize it to the
+        shortest stimulus with as many zeros as possible.
+
+        The output is registered, so the failing stimulus needs one more value
+        after the failing value for the failure to be recorded.
+        '''
+        failures_dir = os.path.join(self.tmp_dir, 'failures')
+
+        fuzzer = Fuzzer(
+            self.broken_identity, self.identity, self.args, self.arg_types,
+            self.coverpoints, cycles=20, seed=1, failures_dir=failures_dir)
+
+        report = fuzzer.fuzz(max_runs=200, stop_on_failure=True)
+
+        self.assertEqual(len(report['failures']), 1)
+
+        failure = report['failures'][0]
+        self.assertEqual(failure['mismatch'][0], 'test_output')
+        self.assertIsNone(failure['error'])
+
+        minimized = failure['stimulus']['test_input']
+        self.assertEqual(
+            minimized, [0] * (len(minimized) - 2) + [1023, 0])
+
+        self.assertEqual(
+            load_stimulus(failure['filename']), failure['stimulus'])
+
+    def test_budget(self):
+        '''The simulations used to minimize a failure should count towards
+        ``max_runs``, and each failure signature should only be kept once.
+        '''
+        corpus_dir = os.path.join(self.tmp_dir, 'corpus')
+        os.makedirs(corpus_dir)
+        save_stimulus(os.path.join(corpus_dir, 'failing.json'),
+                      {'test_input': [1023] * 20})
+
+        fuzzer = Fuzzer(
+            self.broken_identity, self.identity, self.args, self.arg_types,
+            self.coverpoints, cycles=20, seed=1, corpus_dir=corpus_dir)
+
+        report = fuzzer.fuzz(max_runs=5)
+
+        self.assertEqual(report['runs'], 5)
+        self.assertEqual(len(report['failures']), 1)
+
+        report = fuzzer.fuzz(max_runs=300)
+
+        self.assertEqual(report['runs'], 305)
+        self.assertEqual(len(report['failures']), 1)
+        self.assertEqual(
+            fuzzer.failure_signatures, set([('mismatch', 'test_output')]))
+
+    def test_single_elaboration(self):
+        '''Every stimulus should be played back through the same test, so
+        the design is only elaborated once.
+        '''
+        elaborations = []
+
+        @block
+        def counted_identity(test_input, test_output, reset, clock):
+            elaborations.append(None)
+            return self.identity(test_input, test_output, reset, clock)
+
+        fuzzer = Fuzzer(
+            counted_identity, self.identity, self.args, self.arg_types,
+            self.coverpoints, cycles=20, seed=2)
+
+        fuzzer.fuzz(max_runs=10)
+
+        self.assertEqual(len(elaborations), 1)
+
+    def test_without_init_reset(self):
+        '''Without an initial reset, the stimulus should still be aligned
+        with the simulation, so a failure is minimized in the same way.
+        '''
+        arg_types = dict(self.arg_types, reset='custom')
+
+        fuzzer = Fuzzer(
+            self.broken_identity, self.identity, self.args, arg_types,
+            self.coverpoints, cycles=20, seed=1)
+
+        report = fuzzer.fuzz(max_runs=500, stop_on_failure=True)
+
+        minimized = report['failures'][0]['stimulus']['test_input']
+        self.assertEqual(
+            minimized, [0] * (len(minimized) - 2) + [1023, 0])
+
+    def test_custom_reset(self):
+        '''A custom reset, the timing of which is unknown, should raise a
+        ValueError.
+        '''
+        arg_types = dict(self.arg_types, reset='custom_reset')
+
+        self.assertRaisesRegex(
+            ValueError, 'Invalid arg types', Fuzzer,
+            self.identity, self.identity, self.args, arg_types,
+            self.coverpoints)
+
+    def test_no_failures(self):
+        '''If the dut and the ref agree, there should be no failures, but the
+        coverage should still be tracked.
+        '''
+        fuzzer = Fuzzer(
+            self.identity, self.identity, self.args, self.arg_types,
+            self.coverpoints, cycles=20, seed=2)
+
+        report = fuzzer.fuzz(max_runs=10)
+
+        self.assertEqual(report['runs'], 10)
+        self.assertEqual(report['failures'], [])
+        self.assertTrue(len(report['hit_bins']) > 0)
+
+    def test_corpus_dir(self):
+        '''New corpus entries should be written to the corpus directory, from
+        which a new fuzzer should be initialised.
+        '''
+        corpus_dir = os.path.join(self.tmp_dir, 'corpus')
+
+        fuzzer = Fuzzer(
+            self.identity, self.identity, self.args, self.arg_types,
+            self.coverpoints, cycles=20, seed=3, corpus_dir=corpus_dir,
+            initial_corpus_size=1)
+
+        stimulus = {'test_input': [1010] * 20}
+        fuzzer._process_result(
+            stimulus, False, fuzzer.run(stimulus))
+
+        filenames = os.listdir(corpus_dir)
+        self.assertEqual(len(filenames), 1)
+
+        new_fuzzer = Fuzzer(
+            self.identity, self.identity, self.args, self.arg_types,
+            self.coverpoints, cycles=20, seed=3, corpus_dir=corpus_dir)
+
+        self.assertEqual(new_fuzzer.corpus, [stimulus])
+
+    def test_invalid_corpus_file(self):
+        '''A corpus file that does not match the random signals should raise
+        a ValueError.
+        '''
+        corpus_dir = os.path.join(self.tmp_dir, 'corpus')
+        os.makedirs(corpus_dir)
+        save_stimulus(
+            os.path.join(corpus_dir, 'bad.json'), {'test_input': [2000]})
+
+        self.assertRaisesRegex(
+            ValueError, 'Invalid stimulus', Fuzzer,
+            self.identity, self.identity, self.args, self.arg_types,
+            self.coverpoints, corpus_dir=corpus_dir)
+
+    def test_mutate_stays_in_range(self):
+        '''Mutated stimuli should always be representable by the signals.
+        '''
+        fuzzer = Fuzzer(
+            self.identity, self.identity, self.args, self.arg_types,
+            self.coverpoints, cycles=20, seed=4)
+
+        stimulus = fuzzer.corpus[0]
+        for n in range(200):
+            stimulus = fuzzer.mutate(stimulus)
+            self.assertEqual(len(stimulus['test_input']), 20)
+            self.assertTrue(
+                all(0 <= each < 1024 for each in stimulus['test_input']))
+
+    def test_process_pool(self):
+        '''It should be possible to run the simulations in a pool of
+        processes.
+        '''
+        fuzzer = Fuzzer(
+            self.broken_identity, self.identity, self.args, self.arg_types,
+            self.coverpoints, cycles=20, seed=5, workers=2)
+
+        report = fuzzer.fuzz(max_runs=100, stop_on_failure=True)
+
+        self.assertTrue(len(report['failures']) > 0)
+
+    def test_unsupported_random_signal(self):
+        '''Random signals that cannot be played back should raise a
+        ValueError.
+        '''
+        args = self.args.copy()
+        args['test_input'] = Signal(enum('a', 'b').a)
+
+        self.assertRaisesRegex(
+            ValueError, 'Invalid signal type', Fuzzer,
+            self.identity, self.identity, args, self.arg_types,
+            self.coverpoints)
+
+    def test_invalid_limits(self):
+        '''Fuzzing without a duration or a maximum number of runs should
+        raise a ValueError.
+        '''
+        fuzzer = Fuzzer(
+            self.identity, self.identity, self.args, self.arg_types,
+            self.coverpoints)
+
+        self.assertRaisesRegex(ValueError, 'Invalid limits', fuzzer.fuzz)
@@ -6,6 +6,7 @@ from myhdl import ToVerilogWarning, ToVHDLWarning
 import myhdl
 
 import copy
+import inspect
 from random import randrange
 import random
 import tempfile
@@ -14,6 +15,13 @@ from math import log
 
 import warnings
 import os
+import unittest
+from unittest import mock
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 
 class TestSignalCopy(TestCase):
@@ -283,6 +291,81 @@ class TestClockSource(TestCase):
         finally:
             shutil.rmtree(tmp_dir)
 
+    def test_clock_state_in_converted_code(self):
+        '''The clock_state signal is not driven in simulation, but should
+        still be declared in the converted code, which uses it.
+        '''
+        for hdl, declaration in (('VHDL', 'signal '), ('Verilog', 'reg ')):
+            clock = Signal(bool(0))
+            q = Signal(intbv(0)[8:])
+
+            @block
+            def top(q):
+                clockgen = clock_source(clock, 10)
+
+                @always(clock.posedge)
+                def counter():
+                    q.next = (q + 1) % 256
+
+                return clockgen, counter
+
+            tmp_dir = tempfile.mkdtemp()
+            try:
+                top(q).convert(hdl=hdl, path=tmp_dir)
+
+                filename = os.path.join(
+                    tmp_dir, 'top.' + ('vhd' if hdl == 'VHDL' else 'v'))
+                with open(filename) as f:
+                    lines = f.readlines()
+
+                self.assertTrue(any(
+                    line.startswith(declaration) and 'clock_state' in line
+                    for line in lines))
+
+            finally:
+                shutil.rmtree(tmp_dir)
+
+    def test_clock_label_in_converted_code(self):
+        '''The process of the converted clock source should be labelled
+        after the clock it drives, so converting the same design again gives
+        the same code.
+        '''
+        for hdl, extension, labels in (
+            ('VHDL', 'vhd', ['CLOCK_SOURCE_CLOCKGEN_clock: process is',
+                             'end process CLOCK_SOURCE_CLOCKGEN_clock;']),
+            ('Verilog', 'v', ['initial begin: CLOCK_SOURCE_CLOCKGEN_clock'])):
+
+            converted = []
+            for n in range(2):
+                clock = Signal(bool(0))
+                q = Signal(intbv(0)[8:])
+
+                @block
+                def top(q):
+                    clockgen = clock_source(clock, 10)
+
+                    @always(clock.posedge)
+                    def counter():
+                        q.next = (q + 1) % 256
+
+                    return clockgen, counter
+
+                tmp_dir = tempfile.mkdtemp()
+                try:
+                    top(q).convert(hdl=hdl, path=tmp_dir)
+
+                    with open(os.path.join(
+                        tmp_dir, 'top.' + extension)) as f:
+                        converted.append(
+                            [line for line in f if 'CLOCK_SOURCE' in line])
+
+                finally:
+                    shutil.rmtree(tmp_dir)
+
+            self.assertEqual(
+                [line.strip() for line in converted[0]], labels)
+            self.assertEqual(converted[0], converted[1])
+
 class TestInitResetSource(HDLTestCase):
     '''There should be a initialisation reset source factory for generating
     instances that output high for the first three periods in order to reset
@@ -436,6 +519,51 @@ class TestInitResetSource(HDLTestCase):
                                init_reset_source, test_signal, self.clock,
                                edge_sensitivity=edge_sensitivity)
 
+    def test_stop_after_reset(self):
+        '''If ``stop_after_reset`` is ``True``, the reset sequence should be
+        the same, but the generator should finish once the reset is
+        inactive.
+        '''
+        for edge_sensitivity in ('posedge', 'negedge'):
+            reset_values = {}
+
+            for stop_after_reset in (False, True):
+                clock = Signal(bool(1))
+                reset = ResetSignal(0, active=True, isasync=False)
+                values = []
+
+                @block
+                def top():
+                    @always(delay(self.clock_period//2))
+                    def recorder():
+                        values.append(int(reset.val))
+
+                    clockgen = clock_source(clock, self.clock_period)
+                    dut = init_reset_source(
+                        reset, clock, edge_sensitivity=edge_sensitivity,
+                        stop_after_reset=stop_after_reset)
+
+                    return recorder, dut, clockgen
+
+                top_level_block = top()
+                top_level_block.run_sim(
+                    duration=20*self.clock_period, quiet=1)
+                top_level_block.quit_sim()
+
+                reset_values[stop_after_reset] = values
+
+                generator = top_level_block.subs[1].subs[0].gen
+                self.assertEqual(
+                    inspect.getgeneratorstate(generator) ==
+                    inspect.GEN_CLOSED, stop_after_reset)
+
+            self.assertEqual(reset_values[True], reset_values[False])
+
+        self.assertRaisesRegex(ValueError, 'Invalid edge sensitivity',
+                               init_reset_source, self.reset_signal,
+                               self.clock, edge_sensitivity='foobar',
+                               stop_after_reset=True)
+
     def test_init_reset_source_convertible_to_VHDL(self):
         '''The init reset source should be convertible to VHDL
         '''
@@ -1046,6 +1174,102 @@ class TestRandomSource(TestCase):
         sim = Simulation(clockgen, dut, output_check)
         sim.run(quiet=1)
 
+    def test_signal_list_single_block(self):
+        '''A signal list should be driven by a single block, rather than one
+        block per signal.
+        '''
+        test_list = [Signal(intbv(0, min=-8, max=8)) for n in range(10)]
+        reset_signal = ResetSignal(intbv(0), active=1, isasync=False)
+
+        dut = random_source(test_list, self.clock, reset_signal, 5)
+
+        self.assertEqual(len(dut.subs), 1)
+
+    def test_empty_signal_list(self):
+        '''A list containing no signals should result in nothing to simulate.
+        '''
+        reset_signal = ResetSignal(intbv(0), active=1, isasync=False)
+
+        dut = random_source(['not a signal'], self.clock, reset_signal, 5)
+
+        self.assertEqual(len(dut.subs), 0)
+
+    def test_independent_of_global_random_state(self):
+        '''The random values should not depend on, or change, the global
+        random state during the simulation.
+        '''
+        test_list = [Signal(intbv(0, min=-100, max=100)) for n in range(4)]
+        reset_signal = ResetSignal(intbv(0), active=1, isasync=False)
+
+        def run(interfere):
+            outputs = []
+
+            @always_seq(self.clock.posedge, reset_signal)
+            def output_check():
+                if interfere:
+                    random.seed(randrange(0, 100))
+
+                outputs.append([int(each) for each in test_list])
+
+                if len(outputs) >= 50:
+                    raise StopSimulation
+
+            dut = random_source(test_list, self.clock, reset_signal, 10)
+            clockgen = clock_source(self.clock, self.clock_period)
+
+            sim = Simulation(clockgen, dut, output_check)
+            sim.run(quiet=1)
+
+            return outputs
+
+        self.assertEqual(run(False), run(True))
+
+    def test_skip(self):
+        '''The random sequence on every signal should be able to be moved on
+        by a number of values without them being driven.
+        '''
+        reset_signal = ResetSignal(intbv(0), active=1, isasync=False)
+
+        def run(skip):
+            test_list = [Signal(intbv(0, min=-100, max=100))
+                         for n in range(3)]
+            outputs = []
+
+            @always_seq(self.clock.posedge, reset_signal)
+            def output_check():
+                outputs.append([int(each) for each in test_list])
+
+                if len(outputs) >= 30:
+                    raise StopSimulation
+
+            dut = random_source(test_list, self.clock, reset_signal, 10)
+
+            # The source is inside the block that drives the list
+            dut.subs[0].subs[0].skip(skip)
+
+            clockgen = clock_source(self.clock, self.clock_period)
+
+            sim = Simulation(clockgen, dut, output_check)
+            sim.run(quiet=1)
+
+            # The first value is not defined yet
+            return outputs[1:]
+
+        self.assertEqual(run(0)[12:], run(12)[:-12])
+
+    def test_seeded_construction_leaves_global_random_state(self):
+        '''Constructing a random source with a seed should not use or change
+        the global random state.
+        '''
+        test_list = [Signal(intbv(0, min=-100, max=100)) for n in range(4)]
+        reset_signal = ResetSignal(intbv(0), active=1, isasync=False)
+
+        state = random.getstate()
+        random_source(test_list, self.clock, reset_signal, 10)
+        random_source(test_list[0], self.clock, reset_signal, 10)
+
+        self.assertEqual(random.getstate(), state)
+
     def test_unsupported_signal(self):
         '''Unsupported signals should fail
         '''
@@ -1057,6 +1281,290 @@ class TestRandomSource(TestCase):
                                random_source, test_signal, self.clock,
                                reset_signal, seed)
 
+    def test_distribution(self):
+        '''It should be possible to set the distribution of the values.
+
+        The values should be drawn from the distribution's sampler using the
+        same random state as the uniform case.
+        '''
+        test_signal = Signal(intbv(0, min=-1000, max=1024))
+        reset_signal = ResetSignal(intbv(0), active=1, isasync=False)
+
+        distribution = EdgeBoost(0.5)
+        sampler = distribution.sampler(test_signal.min, test_signal.max)
+
+        seed = randrange(0, 0x5EEDF00D)
+
+        random.seed(seed)
+        test_output = [sampler(random) for each in range(100)]
+        test_output.reverse()
+        test_output += [0] # The first value is not defined yet.
+
+        # Check the distribution is actually doing something
+        assert test_signal.min in test_output
+
+        @always_seq(self.clock.posedge, reset_signal)
+        def output_check():
+            try:
+                self.assertEqual(test_output.pop(), test_signal)
+            except IndexError:
+                raise StopSimulation
+
+        dut = random_source(test_signal, self.clock, reset_signal, seed,
+                            distribution=distribution)
+
+        clockgen = clock_source(self.clock, self.clock_period)
+
+        sim = Simulation(clockgen, dut, output_check)
+        sim.run(quiet=1)
+
+    def test_bool_distribution(self):
+        '''Distributions should be usable on boolean signals.
+        '''
+        test_signal = Signal(bool(0))
+        reset_signal = ResetSignal(intbv(0), active=1, isasync=False)
+
+        recorded = []
+
+        @always_seq(self.clock.posedge, reset_signal)
+        def output_check():
+            recorded.append(copy.copy(test_signal.val))
+            if len(recorded) > 100:
+                raise StopSimulation
+
+        dut = random_source(test_signal, self.clock, reset_signal,
+                            distribution=WeightedValues({1: 1}))
+
+        clockgen = clock_source(self.clock, self.clock_period)
+
+        sim = Simulation(clockgen, dut, output_check)
+        sim.run(quiet=1)
+
+        self.assertEqual(recorded[1:], [True] * 100)
+
+    def test_distribution_on_enum_raises(self):
+        '''Setting a distribution on an enum signal should raise a
+        ValueError.
+        '''
+        enum_vals = enum('a', 'b', 'c')
+        test_signal = Signal(enum_vals.a)
+        reset_signal = ResetSignal(intbv(0), active=1, isasync=False)
+
+        self.assertRaisesRegex(
+            ValueError, 'Distributions are only supported',
+            random_source, test_signal, self.clock, reset_signal,
+            distribution=EdgeBoost())
+
+    def test_distribution_outside_signal_range_raises(self):
+        '''A distribution that can produce values outside the range of the
+        signal should raise a ValueError.
+        '''
+        test_signal = Signal(intbv(0)[4:])
+        reset_signal = ResetSignal(intbv(0), active=1, isasync=False)
+
+        self.assertRaisesRegex(
+            ValueError, 'outside the range of the signal',
+            random_source, test_signal, self.clock, reset_signal,
+            distribution=WeightedValues({16: 1}))
+
+
+class TestPlaybackSource(TestCase):
+    '''There should be a playback source factory for generating instances
+    that drive a Signal from a sequence of values, such as a NumPy array or
+    a memory mapped ``.npy`` file.
+    '''
+    def setUp(self):
+        self.clock = Signal(bool(1))
+        self.clock_period = 10
+
+    def do_playback_test(self, test_signal, data, expected_output,
+                         skip=0, **kwargs):
+        '''Play back ``data`` on ``test_signal`` and check that the
+        signal takes the values in ``expected_output`` on successive clock
+        edges. The playback is first moved on by ``skip`` values.
+        '''
+        reset_signal = ResetSignal(intbv(0), active=1, isasync=False)
+
+        expected_output = list(expected_output)
+        expected_output.reverse()
+        expected_output += [test_signal._init] # The first value is not
+                                               # defined yet.
+
+        @always_seq(self.clock.posedge, reset_signal)
+        def output_check():
+            try:
+                self.assertEqual(expected_output.pop(), test_signal)
+            except IndexError:
+                raise StopSimulation
+
+        dut = playback_source(test_signal, self.clock, reset_signal, data,
+                              **kwargs)
+
+        if skip > 0:
+            dut.subs[0].skip(skip)
+
+        clockgen = clock_source(self.clock, self.clock_period)
+
+        sim = Simulation(clockgen, dut, output_check)
+        sim.run(quiet=1)
+
+    def test_list_playback(self):
+        '''It should be possible to play back a list of values.
+        '''
+        test_signal = Signal(intbv(0, min=-1000, max=1024))
+        data = [randrange(-1000, 1024) for n in range(100)]
+
+        self.do_playback_test(test_signal, data, data)
+
+    def test_bool_playback(self):
+        '''It should be possible to play back values on a bool signal.
+        '''
+        test_signal = Signal(bool(0))
+        data = [randrange(0, 2) for n in range(100)]
+
+        self.do_playback_test(test_signal, data, data)
+
+    def test_playback_wraps(self):
+        '''When the data is exhausted, the playback should start again
+        from the beginning.
+        '''
+        test_signal = Signal(intbv(0)[8:])
+        data = [randrange(0, 256) for n in range(7)]
+
+        self.do_playback_test(test_signal, data, data * 5, chunk_size=3)
+
+    def test_chunked_playback(self):
+        '''The data should be played back correctly across chunk
+        boundaries.
+        '''
+        test_signal = Signal(intbv(0)[8:])
+        data = [randrange(0, 256) for n in range(100)]
+
+        for chunk_size in (1, 3, 64, 100, 1000):
+            self.do_playback_test(test_signal, data, data,
+                                  chunk_size=chunk_size)
+
+    def test_skip(self):
+        '''The playback should be able to be moved on by a number of values,
+        across chunk boundaries and past the end of the data.
+        '''
+        test_signal = Signal(intbv(0)[8:])
+        data = [randrange(0, 256) for n in range(10)]
+
+        for skip in (1, 4, 9, 10, 23):
+            self.do_playback_test(
+                test_signal, data, (data * 5)[skip:skip + 20], skip=skip,
+                chunk_size=3)
+
+    @unittest.skipIf(numpy is None, 'NumPy is not available')
+    def test_numpy_playback(self):
+        '''It should be possible to play back a NumPy array.
+        '''
+        test_signal = Signal(intbv(0, min=-1000, max=1024))
+        data = numpy.random.randint(-1000, 1024, 100)
+
+        self.do_playback_test(test_signal, data, data.tolist(),
+                              chunk_size=16)
+
+    @unittest.skipIf(numpy is None, 'NumPy is not available')
+    def test_npy_file_playback(self):
+        '''It should be possible to play back a ``.npy`` file, which is
+        memory mapped rather than loaded.
+        '''
+        test_signal = Signal(intbv(0)[16:])
+        data = numpy.random.randint(0, 2**16, 100).astype('uint16')
+
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(tmp_dir, 'data.npy')
+            numpy.save(filename, data)
+
+            with mock.patch('numpy.load', wraps=numpy.load) as mock_load:
+                self.do_playback_test(test_signal, filename, data.tolist(),
+                                      chunk_size=16)
+
+            mock_load.assert_called_once_with(filename, mmap_mode='r')
+
+        finally:
+            shutil.rmtree(tmp_dir)
+
+    def test_output_reset_whilst_reset_active(self):
+        '''The output should be held at its initial value while reset is
+        active and no data should be consumed.
+        '''
+        test_signal = Signal(intbv(5)[8:])
+        reset_signal = ResetSignal(intbv(0), active=1, isasync=False)
+        data = [randrange(0, 256) for n in range(100)]
+
+        @block
+        def top():
+            reset = init_reset_source(reset_signal, self.clock)
+            dut = playback_source(test_signal, self.clock, reset_signal,
+                                  data)
+            clockgen = clock_source(self.clock, self.clock_period)
+
+            recorder = recorder_sink(test_signal, self.clock, recorded)
+
+            return reset, dut, clockgen, recorder
+
+        recorded = []
+        top_level_block = top()
+        top_level_block.run_sim(duration=self.clock_period * 50, quiet=1)
+        top_level_block.quit_sim()
+
+        # Three reset cycles, after which the data should start.
+        self.assertEqual(recorded[:4], [5] * 4)
+        self.assertEqual(recorded[4:], data[:len(recorded) - 4])
+
+    def test_invalid_data_raises(self):
+        '''Empty data, multidimensional data, and values that cannot be
+        represented by the signal should raise a ValueError.
+        '''
+        test_signal = Signal(intbv(0)[4:])
+        reset_signal = ResetSignal(intbv(0), active=1, isasync=False)
+
+        self.assertRaisesRegex(
+            ValueError, 'The data should not be empty', playback_source,
+            test_signal, self.clock, reset_signal, [])
+
+        self.assertRaisesRegex(
+            ValueError, 'cannot be represented', playback_source,
+            test_signal, self.clock, reset_signal, [1, 2, 16])
+
+        self.assertRaisesRegex(
+            ValueError, 'cannot be represented', playback_source,
+            test_signal, self.clock, reset_signal, [1.5])
+
+        if numpy is not None:
+            self.assertRaisesRegex(
+                ValueError, 'one dimensional', playback_source,
+                test_signal, self.clock, reset_signal,
+                numpy.zeros((3, 3), dtype='int64'))
+
+    def test_invalid_sensitivity(self):
+        '''An invalid sensitivity should raise a ValueError.
+        '''
+        reset_signal = ResetSignal(intbv(0), active=1, isasync=False)
+        test_signal = Signal(intbv(0, min=-100, max=100))
+        self.assertRaisesRegex(ValueError, 'Invalid edge sensitivity',
+                               playback_source, test_signal, self.clock,
+                               reset_signal, [1, 2, 3],
+                               edge_sensitivity='foobar')
+
+    def test_unsupported_signal(self):
+        '''Unsupported signals should fail
+        '''
+        enum_vals = enum('a', 'b', 'c')
+        reset_signal = ResetSignal(intbv(0), active=1, isasync=False)
+
+        self.assertRaisesRegex(ValueError, 'Invalid signal type',
+                               playback_source, Signal(enum_vals.a),
+                               self.clock, reset_signal, [0, 1])
+
+        self.assertRaisesRegex(ValueError, 'Invalid signal type',
+                               playback_source, [Signal(bool(0))],
+                               self.clock, reset_signal, [0, 1])
+
 
 class TestHandlerSink(TestCase):
     '''There should be a block that calls a signal handler on every cycle
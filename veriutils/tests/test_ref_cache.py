@@ -0,0 +1,208 @@
+from veriutils.tests.base_hdl_test import TestCase
+from veriutils import RefCache, SynchronousTest
+from veriutils.ref_cache import _describe
+
+from myhdl import intbv, Signal, ResetSignal, block, always_seq
+
+import functools
+import os
+import random
+import shutil
+import tempfile
+
+@block
+def _scaled(test_input, test_output, reset, clock):
+    return _scale(test_input, test_output, reset, clock, 2)
+
+@block
+def _scale(test_input, test_output, reset, clock, scale):
+
+    @always_seq(clock.posedge, reset=reset)
+    def model():
+        test_output.next = test_input * scale
+
+    return model
+
+_GAIN = 2
+
+@block
+def _gained(test_input, test_output, reset, clock):
+
+    @always_seq(clock.posedge, reset=reset)
+    def model():
+        test_output.next = (test_input * _GAIN) % 1024
+
+    return model
+
+class TestRefCache(TestCase):
+    '''There should be a directory based cache of the outputs of reference
+    designs.
+    '''
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.tmp_dir, 'cache')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_store_and_load(self):
+        '''Stored data should be loaded back. Loading should not count a
+        hit or a miss, which are counted by the users of the cache.
+        '''
+        cache = RefCache(self.cache_dir)
+        key = cache.key(('a', 1))
+
+        self.assertIsNone(cache.load(key))
+        cache.store(key, b'data')
+        self.assertEqual(cache.load(key), b'data')
+
+        self.assertEqual(cache.stats, {'hits': 0, 'misses': 0, 'bypasses': 0})
+
+        cache.stats['hits'] += 1
+        cache.reset_stats()
+        self.assertEqual(cache.stats, {'hits': 0, 'misses': 0, 'bypasses': 0})
+
+    def test_clear(self):
+        '''Clearing the cache should remove every entry.
+        '''
+        cache = RefCache(self.cache_dir)
+        key = cache.key('a')
+        cache.store(key, b'data')
+
+        cache.clear()
+
+        self.assertIsNone(cache.load(key))
+        self.assertEqual(os.listdir(self.cache_dir), [])
+
+    def test_salt(self):
+        '''The salt should change every key.
+        '''
+        self.assertEqual(RefCache(self.cache_dir).key('a'),
+                         RefCache(self.cache_dir).key('a'))
+        self.assertNotEqual(RefCache(self.cache_dir).key('a'),
+                            RefCache(self.cache_dir, salt='1').key('a'))
+
+    def test_describe_functions(self):
+        '''Functions should be described by their source code, the values
+        they close over and the functions in the same module that they use.
+        '''
+        def make_factory(offset):
+            def factory(value):
+                return value + offset
+
+            return factory
+
+        self.assertEqual(_describe(make_factory(1)),
+                         _describe(make_factory(1)))
+        self.assertNotEqual(_describe(make_factory(1)),
+                            _describe(make_factory(2)))
+
+        self.assertNotEqual(_describe(lambda value: value + 1),
+                            _describe(lambda value: value - 1))
+
+        self.assertNotEqual(_describe(functools.partial(_scale, scale=2)),
+                            _describe(functools.partial(_scale, scale=3)))
+
+        # _scaled uses _scale, so its description should include it
+        self.assertIn(_describe(_scale), _describe(_scaled)[-1][0])
+
+    def test_describe_signals(self):
+        '''Signals should be described by their type and initial value, but
+        not their current value.
+        '''
+        signal = Signal(intbv(0)[8:])
+        description = _describe(signal)
+
+        signal._val = intbv(5)[8:]
+        self.assertEqual(_describe(signal), description)
+
+        self.assertNotEqual(_describe(Signal(intbv(0)[9:])), description)
+        self.assertNotEqual(_describe(Signal(intbv(1)[8:])), description)
+
+    def test_describe_addresses(self):
+        '''A value that can only be described by a repr holding its memory
+        address should raise a ValueError, including when it is closed over
+        by a function.
+        '''
+        class Opaque(object):
+            pass
+
+        opaque = Opaque()
+
+        def factory(value):
+            return opaque
+
+        self.assertRaisesRegex(
+            ValueError, 'Invalid value', _describe, opaque)
+        self.assertRaisesRegex(
+            ValueError, 'Invalid value', _describe, {'a': [opaque]})
+        self.assertRaisesRegex(
+            ValueError, 'Invalid value', _describe, factory)
+
+    def test_describe_globals(self):
+        '''The description of a function should change when a module level
+        constant that it reads changes, and a global that cannot be
+        described should raise a ValueError.
+        '''
+        global _GAIN
+
+        description = _describe(_gained)
+
+        _GAIN = 3
+        try:
+            self.assertNotEqual(_describe(_gained), description)
+        finally:
+            _GAIN = 2
+
+        self.assertEqual(_describe(_gained), description)
+
+        def uses_opaque():
+            return _OPAQUE
+
+        globals()['_OPAQUE'] = object()
+        try:
+            self.assertRaisesRegex(
+                ValueError, 'Invalid value', _describe, uses_opaque)
+        finally:
+            del globals()['_OPAQUE']
+
+    def test_module_constant_miss(self):
+        '''Changing a module level constant that the ref reads should miss
+        the cache rather than return the outputs of the old ref.
+        '''
+        global _GAIN
+
+        args = {'test_input': Signal(intbv(0)[10:]),
+                'test_output': Signal(intbv(0)[10:]),
+                'reset': ResetSignal(bool(0), active=1, isasync=False),
+                'clock': Signal(bool(1))}
+
+        arg_types = {'test_input': 'random',
+                     'test_output': 'output',
+                     'reset': 'init_reset',
+                     'clock': 'clock'}
+
+        cache = RefCache(self.cache_dir)
+
+        def cosimulate(gain):
+            global _GAIN
+            _GAIN = gain
+
+            random.seed(0)
+            test_obj = SynchronousTest(
+                _gained, _gained, args, arg_types, ref_cache=cache)
+
+            try:
+                return test_obj.cosimulate(20)
+            finally:
+                _GAIN = 2
+
+        cosimulate(2)
+        dut_outputs, ref_outputs = cosimulate(3)
+
+        self.assertEqual(cache.stats, {'hits': 0, 'misses': 2, 'bypasses': 0})
+        self.assertEqual(ref_outputs, dut_outputs)
+
+        cosimulate(3)
+        self.assertEqual(cache.stats, {'hits': 1, 'misses': 2, 'bypasses': 0})
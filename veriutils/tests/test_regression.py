@@ -0,0 +1,290 @@
+from veriutils.tests.base_hdl_test import TestCase
+from veriutils import (
+    SynchronousTest, first_mismatch, run_seeds, ResultsDatabase,
+    ForkServerPool)
+
+from myhdl import intbv, Signal, ResetSignal, block, always_seq
+
+import os
+import random
+import shutil
+import sys
+import tempfile
+
+@block
+def _identity(test_input, test_output, reset, clock):
+
+    @always_seq(clock.posedge, reset=reset)
+    def identity():
+        test_output.next = test_input
+
+    return identity
+
+@block
+def _broken_identity(test_input, test_output, reset, clock):
+    '''Differs from the identity only on the largest input values.
+    '''
+
+    @always_seq(clock.posedge, reset=reset)
+    def identity():
+        if test_input >= 1000:
+            test_output.next = 0
+        else:
+            test_output.next = test_input
+
+    return identity
+
+@block
+def _erroring_identity(test_input, test_output, reset, clock):
+
+    @always_seq(clock.posedge, reset=reset)
+    def identity():
+        if test_input >= 1000:
+            raise ValueError('Broken identity')
+
+        test_output.next = test_input
+
+    return identity
+
+# If set, the name of a file to which _logging_identity appends the process
+# id each time it is elaborated.
+_elaboration_log = None
+
+@block
+def _logging_identity(test_input, test_output, reset, clock):
+
+    if _elaboration_log is not None:
+        with open(_elaboration_log, 'a') as f:
+            f.write('{}\n'.format(os.getpid()))
+
+    return _identity(test_input, test_output, reset, clock)
+
+class TestRunSeeds(TestCase):
+    '''There should be a function that cosimulates many seeds over a pool
+    of worker processes and returns a summary of each.
+    '''
+
+    def setUp(self):
+        self.args = {'test_input': Signal(intbv(0)[10:]),
+                     'test_output': Signal(intbv(0)[10:]),
+                     'reset': ResetSignal(bool(0), active=1, isasync=False),
+                     'clock': Signal(bool(1))}
+
+        self.arg_types = {'test_input': 'random',
+                          'test_output': 'output',
+                          'reset': 'init_reset',
+                          'clock': 'clock'}
+
+    def expected_summaries(self, n_seeds, cycles, dut):
+        random.seed(0)
+        test = SynchronousTest(dut, _identity, self.args, self.arg_types)
+
+        summaries = []
+        for seed in range(n_seeds):
+            mismatch = first_mismatch(*test.cosimulate(cycles, seed=seed))
+            summaries.append({'seed': seed,
+                              'passed': mismatch is None,
+                              'mismatch': mismatch})
+
+        return summaries
+
+    def check_summaries(self, results, expected_summaries):
+        self.assertEqual(
+            [dict((key, summary[key]) for key in ('seed', 'passed', 'mismatch'))
+             for summary in results['summaries']],
+            expected_summaries)
+
+        self.assertEqual(
+            results['passed'],
+            [each['seed'] for each in expected_summaries if each['passed']])
+        self.assertEqual(
+            results['failed'],
+            [each['seed'] for each in expected_summaries
+             if not each['passed']])
+
+    def test_run_seeds(self):
+        '''Each seed should be run in a worker with the same stimulus as the
+        same seed run by the caller, giving a summary of the result.
+        '''
+        expected_summaries = self.expected_summaries(6, 50, _broken_identity)
+
+        # Some seeds should pass and some should fail for a useful test
+        self.assertIn(True, [each['passed'] for each in expected_summaries])
+        self.assertIn(False, [each['passed'] for each in expected_summaries])
+
+        for workers in (1, 3):
+            random.seed(0)
+            results = run_seeds(
+                6, 50, _broken_identity, _identity, self.args,
+                self.arg_types, workers=workers)
+
+            self.check_summaries(results, expected_summaries)
+            self.assertEqual(results['cancelled'], [])
+
+            for summary in results['summaries']:
+                self.assertIsNone(summary['error'])
+                self.assertIsNone(summary['coverage'])
+                self.assertGreater(summary['time'], 0)
+
+    def test_stop_on_failure(self):
+        '''With stop_on_failure set, the seeds that have not started should
+        be cancelled after the first failure.
+        '''
+        for workers in (1, 2):
+            results = run_seeds(
+                40, 200, _broken_identity, _identity, self.args,
+                self.arg_types, workers=workers, stop_on_failure=True)
+
+            self.assertGreater(len(results['failed']), 0)
+            self.assertGreater(len(results['cancelled']), 0)
+            self.assertEqual(
+                sorted(results['passed'] + results['failed'] +
+                       results['cancelled']),
+                list(range(40)))
+
+    def test_results_db_order(self):
+        '''With a results_db, the seeds that failed on their latest run
+        should be run first, and every seed should be recorded.
+        '''
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+
+        results_db = ResultsDatabase(os.path.join(tmp_dir, 'results.db'))
+        results_db.record('identity', 4, 50, 1.0, False)
+        results_db.record('identity', 2, 50, 1.0, False)
+        results_db.record('identity', 4, 50, 1.0, True)
+
+        results = run_seeds(
+            6, 50, _identity, _identity, self.args, self.arg_types,
+            workers=1, results_db=results_db, test_id='identity')
+
+        # The summaries are still in the order of the seeds
+        self.assertEqual(results['passed'], list(range(6)))
+
+        self.assertEqual(
+            [run['seed'] for run in results_db.runs('identity')[3:]],
+            [2, 0, 1, 3, 4, 5])
+
+    def test_simulation_error(self):
+        '''An error raised in the simulation of a seed should fail the seed,
+        with the error in its summary.
+        '''
+        results = run_seeds(
+            2, 200, _erroring_identity, _identity, self.args, self.arg_types,
+            workers=2)
+
+        self.assertEqual(results['failed'], [0, 1])
+
+        for summary in results['summaries']:
+            self.assertIn('Broken identity', summary['error'])
+
+    def test_construction_error(self):
+        '''An error in building the SynchronousTest should be raised.
+        '''
+        arg_types = dict(self.arg_types, test_output='wrong')
+
+        for workers in (1, 2):
+            self.assertRaisesRegex(
+                ValueError, 'Invalid argument or argument types', run_seeds,
+                2, 10, _identity, _identity, self.args, arg_types,
+                workers=workers)
+
+    def test_invalid_arguments(self):
+        '''No seeds, no workers or no dut should raise a ValueError.
+        '''
+        self.assertRaisesRegex(
+            ValueError, 'Invalid number of seeds', run_seeds, 0, 10,
+            _identity, _identity, self.args, self.arg_types)
+
+        self.assertRaisesRegex(
+            ValueError, 'Invalid workers', run_seeds, 2, 10, _identity,
+            _identity, self.args, self.arg_types, workers=0)
+
+        self.assertRaisesRegex(
+            ValueError, 'Invalid dut', run_seeds, 2, 10, None, _identity,
+            self.args, self.arg_types)
+
+class TestForkServerPool(TestCase):
+    '''There should be a pool of worker processes forked from a test that
+    has already been built and elaborated.
+    '''
+
+    def setUp(self):
+        self.args = {'test_input': Signal(intbv(0)[10:]),
+                     'test_output': Signal(intbv(0)[10:]),
+                     'reset': ResetSignal(bool(0), active=1, isasync=False),
+                     'clock': Signal(bool(1))}
+
+        self.arg_types = {'test_input': 'random',
+                          'test_output': 'output',
+                          'reset': 'init_reset',
+                          'clock': 'clock'}
+
+    def test_seeds(self):
+        '''Seeds submitted to the pool, in any number of batches, should
+        give the same summaries as the same seeds run by the caller.
+        '''
+        random.seed(0)
+        test = SynchronousTest(
+            _broken_identity, _identity, self.args, self.arg_types)
+
+        expected_mismatches = [
+            first_mismatch(*test.cosimulate(50, seed=seed))
+            for seed in range(6)]
+
+        random.seed(0)
+        with ForkServerPool(_broken_identity, _identity, self.args,
+                            self.arg_types, workers=2) as pool:
+
+            summaries = pool.run_seeds(range(3), 50)
+            futures = [pool.submit(seed, 50) for seed in range(3, 6)]
+            summaries.update(
+                (future.result()['seed'], future.result())
+                for future in futures)
+
+        self.assertEqual(sorted(summaries), list(range(6)))
+
+        for seed, mismatch in enumerate(expected_mismatches):
+            self.assertEqual(summaries[seed]['mismatch'], mismatch)
+            self.assertEqual(summaries[seed]['passed'], mismatch is None)
+
+    def test_elaborated_once(self):
+        '''The factories should only be elaborated by the caller, before
+        the workers are forked, and the modules in ``preload`` should be
+        imported.
+        '''
+        global _elaboration_log
+
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        self.addCleanup(sys.modules.pop, 'tabnanny', None)
+
+        _elaboration_log = os.path.join(tmp_dir, 'elaborations')
+        self.addCleanup(globals().__setitem__, '_elaboration_log', None)
+
+        sys.modules.pop('tabnanny', None)
+
+        with ForkServerPool(_logging_identity, _identity, self.args,
+                            self.arg_types, workers=2,
+                            preload=['tabnanny']) as pool:
+
+            self.assertIn('tabnanny', sys.modules)
+
+            summaries = pool.run_seeds(range(4), 50)
+
+        self.assertTrue(all(summary['passed']
+                            for summary in summaries.values()))
+
+        with open(_elaboration_log) as f:
+            self.assertEqual(f.read().split(), [str(os.getpid())])
+
+    def test_invalid_pool(self):
+        '''Fewer than one worker or warm up cycle should raise a
+        ValueError.
+        '''
+        self.assertRaisesRegex(
+            ValueError, 'Invalid workers', ForkServerPool, _identity,
+            _identity, self.args, self.arg_types, workers=0)
+        self.assertRaisesRegex(
+            ValueError, 'Invalid warm up cycles', ForkServerPool, _identity,
+            _identity, self.args, self.arg_types, warmup_cycles=0)
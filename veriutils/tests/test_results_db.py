@@ -0,0 +1,88 @@
+from veriutils.tests.base_hdl_test import TestCase
+from veriutils import ResultsDatabase
+
+import os
+import shutil
+import tempfile
+
+class TestResultsDatabase(TestCase):
+    '''There should be a SQLite database of the results of cosimulations
+    that can flag drops in throughput.
+    '''
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tmp_dir, 'results.db')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_record_and_query(self):
+        '''Recorded runs should be returned oldest first, with the
+        throughput computed, and should persist in the file.
+        '''
+        results_db = ResultsDatabase(self.filename)
+        results_db.record('a', 1, 1000, 2.0, True, peak_memory=100,
+                          engine='event', timestamp=10.0)
+        results_db.record('b', None, 500, 1.0, None)
+        results_db.record('a', 2, 1000, 4.0, False, engine='cycle')
+
+        results_db = ResultsDatabase(self.filename)
+
+        self.assertEqual(results_db.test_ids(), ['a', 'b'])
+
+        runs = results_db.runs('a')
+        self.assertEqual(len(runs), 2)
+        self.assertEqual(
+            dict((key, runs[0][key]) for key in (
+                'test_id', 'timestamp', 'seed', 'cycles', 'wall_time',
+                'cycles_per_second', 'peak_memory', 'passed', 'engine')),
+            {'test_id': 'a', 'timestamp': 10.0, 'seed': 1, 'cycles': 1000,
+             'wall_time': 2.0, 'cycles_per_second': 500.0,
+             'peak_memory': 100, 'passed': True, 'engine': 'event'})
+        self.assertEqual(runs[1]['passed'], False)
+        self.assertEqual(runs[1]['cycles_per_second'], 250.0)
+
+        self.assertIsNone(results_db.runs('b')[0]['passed'])
+        self.assertEqual(
+            [run['test_id'] for run in results_db.runs()], ['a', 'b', 'a'])
+
+    def test_throughput_regressions(self):
+        '''A test should be flagged if the throughput of its latest run is
+        below ``threshold`` times the median of up to ``window`` earlier runs
+        with the same engine.
+        '''
+        results_db = ResultsDatabase(self.filename)
+
+        for wall_time in (1.0, 1.1, 0.9, 1.0):
+            results_db.record('slower', None, 1000, wall_time, True)
+            results_db.record('steady', None, 1000, wall_time, True)
+            results_db.record('engine', None, 1000, wall_time, True,
+                              engine='cycle')
+
+        results_db.record('slower', None, 1000, 2.0, True)
+        results_db.record('steady', None, 1000, 1.2, True)
+        results_db.record('engine', None, 1000, 2.0, True, engine='event')
+        results_db.record('single', None, 1000, 1.0, True)
+
+        regressions = results_db.throughput_regressions()
+
+        self.assertEqual(
+            [each['test_id'] for each in regressions], ['slower'])
+        self.assertEqual(regressions[0]['cycles_per_second'], 500.0)
+        self.assertEqual(regressions[0]['baseline'], 1000.0)
+        self.assertEqual(regressions[0]['ratio'], 0.5)
+
+        self.assertEqual(
+            [each['test_id'] for each in
+             results_db.throughput_regressions(threshold=0.9)],
+            ['slower', 'steady'])
+
+        # Only the slowest earlier run is in the window
+        results_db.record('slower', None, 1000, 2.2, True)
+        self.assertEqual(
+            results_db.throughput_regressions(window=1), [])
+
+        self.assertRaisesRegex(
+            ValueError, 'Invalid window', results_db.throughput_regressions,
+            window=0)
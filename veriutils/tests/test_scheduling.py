@@ -0,0 +1,82 @@
+from veriutils.tests.base_hdl_test import TestCase
+from veriutils import ResultsDatabase, predict_duration, schedule_jobs
+
+import os
+import shutil
+import tempfile
+
+class TestScheduling(TestCase):
+    '''There should be functions that predict the duration of a
+    cosimulation and order jobs from the runs in a results database.
+    '''
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.results_db = ResultsDatabase(
+            os.path.join(self.tmp_dir, 'results.db'))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_predict_duration(self):
+        '''The duration should be predicted from the median throughput of
+        the latest runs of the test, or else from the throughput per signal
+        of the other tests.
+        '''
+        for wall_time in (100.0, 1.0, 2.0, 4.0):
+            self.results_db.record(
+                'a', None, 1000, wall_time, True, engine='event', signals=5)
+
+        self.results_db.record(
+            'a', None, 1000, 10.0, True, engine='cycle', signals=5)
+
+        self.assertEqual(
+            predict_duration(self.results_db, 'a', 2000, window=3), 8.0)
+        self.assertEqual(
+            predict_duration(self.results_db, 'a', 2000, engine='event',
+                             window=3), 4.0)
+        self.assertEqual(
+            predict_duration(self.results_db, 'a', 2000, engine='cycle'),
+            20.0)
+
+        # The latest event run of 'a' gives 1250 cycle signals per second
+        self.assertEqual(
+            predict_duration(self.results_db, 'b', 2500, signals=10,
+                             engine='event'), 20.0)
+
+        self.assertGreater(
+            predict_duration(None, 'b', 2000, signals=10),
+            predict_duration(None, 'b', 1000, signals=10))
+
+    def test_schedule_jobs(self):
+        '''Jobs with a seed that failed on its latest run should come first,
+        then jobs of tests that failed recently, then the rest, each longest
+        first.
+        '''
+        self.results_db.record('failing', 1, 1000, 1.0, False)
+        self.results_db.record('failing', 2, 1000, 1.0, False)
+        self.results_db.record('failing', 2, 1000, 1.0, True)
+        self.results_db.record('passing', 1, 1000, 1.0, True)
+
+        def job(test_id, seed, cycles):
+            return {'test_id': test_id, 'seed': seed, 'cycles': cycles,
+                    'signals': None}
+
+        jobs = [job('passing', 1, 1000),
+                job('passing', 2, 5000),
+                job('failing', 2, 1000),
+                job('failing', 3, 2000),
+                job('failing', 1, 1000),
+                job('passing', 3, 1000)]
+
+        self.assertEqual(
+            schedule_jobs(jobs, self.results_db), [4, 3, 2, 1, 0, 5])
+
+        # Without any runs, only the durations are used
+        self.assertEqual(schedule_jobs(jobs), [1, 3, 0, 2, 4, 5])
+
+    def test_invalid_window(self):
+        '''A window of less than one run should raise a ValueError.
+        '''
+        self.assertRaisesRegex(
+            ValueError, 'Invalid window', schedule_jobs, [], window=0)
@@ -0,0 +1,151 @@
+from veriutils.tests.base_hdl_test import TestCase
+from veriutils import (
+    share_outputs, SharedOutputs, SharedSequence, SignalOutput,
+    AxiStreamOutput, first_mismatch)
+from veriutils.cosimulation import SimulationOutputs
+
+from myhdl import intbv, modbv, enum
+
+from collections import deque
+from multiprocessing import shared_memory
+import multiprocessing
+import unittest
+
+def _example_outputs(states):
+
+    outputs = SimulationOutputs()
+    outputs['a'] = SignalOutput([intbv(n)[10:] for n in range(20)])
+    outputs['b.c'] = SignalOutput([True, False, True])
+    outputs['d[1]'] = SignalOutput(
+        [intbv(n, min=-2**80, max=2**80) for n in (-2**79, 0, 2**79)])
+    outputs['e'] = SignalOutput([modbv(n)[4:] for n in range(4)])
+    outputs['f'] = SignalOutput([states.a, states.c, states.b])
+    outputs['g'] = SignalOutput([None, 'mixed', 3])
+    outputs['h'] = SignalOutput()
+    outputs['axi'] = AxiStreamOutput({
+        'packets': {0: [deque([1, 2, 3]), deque([2**70])]},
+        'incomplete_packet': {0: deque()}})
+
+    return outputs
+
+def _share_in_child(states, connection):
+    connection.send(share_outputs(_example_outputs(states)))
+    connection.close()
+
+class TestSharedOutputs(TestCase):
+    '''There should be a way to pass simulation outputs between processes
+    in shared memory, with views of the shared values in the receiver.
+    '''
+
+    def setUp(self):
+        self.states = enum('a', 'b', 'c')
+        self.enum_types = {('a', 'b', 'c'): self.states}
+
+    def test_round_trip(self):
+        '''The outputs should be rebuilt in the same types of container,
+        with views that compare equal to the original lists and give the
+        same values.
+        '''
+        outputs = _example_outputs(self.states)
+
+        with SharedOutputs(
+            share_outputs(outputs), self.enum_types) as shared:
+
+            self.assertIs(type(shared.outputs), SimulationOutputs)
+            self.assertIs(type(shared.outputs['axi']), AxiStreamOutput)
+            self.assertIsInstance(shared.outputs['a'], SharedSequence)
+
+            for key in outputs:
+                self.assertEqual(shared.outputs[key], outputs[key])
+                self.assertEqual(outputs[key], shared.outputs[key])
+
+            for key in ('a', 'd[1]', 'e'):
+                for value, expected in zip(
+                    shared.outputs[key], outputs[key]):
+
+                    self.assertIs(type(value), type(expected))
+                    self.assertEqual(len(value), len(expected))
+                    self.assertEqual(value.min, expected.min)
+                    self.assertEqual(value.max, expected.max)
+
+            self.assertEqual(shared.outputs['a'][-1], 19)
+            self.assertEqual(shared.outputs['a'][2:5], [2, 3, 4])
+            self.assertIs(shared.outputs['f'][1], self.states.c)
+            self.assertRaises(IndexError, shared.outputs['a'].__getitem__, 20)
+
+            copied = shared.copy()
+
+        self.assertIs(type(copied['a']), SignalOutput)
+        self.assertIs(
+            type(copied['axi']['packets'][0][0]), deque)
+        self.assertEqual(dict(copied), dict(outputs))
+
+    def test_view_comparison(self):
+        '''Views of columns packed in the same way should compare by their
+        values.
+        '''
+        outputs = _example_outputs(self.states)
+        other_outputs = _example_outputs(self.states)
+        other_outputs['a'][7] = intbv(0)[10:]
+
+        with SharedOutputs(share_outputs(outputs)) as shared, \
+                SharedOutputs(share_outputs(other_outputs)) as other_shared:
+
+            self.assertEqual(shared.outputs['b.c'], other_shared.outputs['b.c'])
+            self.assertNotEqual(shared.outputs['a'], other_shared.outputs['a'])
+            self.assertNotEqual(shared.outputs['a'], outputs['a'][:-1])
+
+            self.assertEqual(
+                first_mismatch(
+                    {'a': shared.outputs['a']},
+                    {'a': other_shared.outputs['a']}),
+                ('a', 7))
+
+    def test_close(self):
+        '''The views should not be readable once the shared outputs are
+        closed, and the block should be gone once unlinked.
+        '''
+        descriptor = share_outputs(_example_outputs(self.states))
+
+        shared = SharedOutputs(descriptor)
+        view = shared.outputs['a']
+
+        shared.close()
+        self.assertRaises(ValueError, view.__getitem__, 0)
+
+        shared.unlink()
+        self.assertRaises(
+            FileNotFoundError, shared_memory.SharedMemory,
+            name=descriptor['name'])
+
+    @unittest.skipIf(
+        'fork' not in multiprocessing.get_all_start_methods(),
+        'The fork start method is not available')
+    def test_between_processes(self):
+        '''Outputs shared by another process should be readable after that
+        process has exited.
+        '''
+        context = multiprocessing.get_context('fork')
+        receiver, sender = context.Pipe(duplex=False)
+
+        process = context.Process(
+            target=_share_in_child, args=(self.states, sender))
+        process.start()
+        sender.close()
+
+        descriptor = receiver.recv()
+        process.join()
+
+        with SharedOutputs(descriptor, self.enum_types) as shared:
+            self.assertEqual(
+                dict(shared.copy()), dict(_example_outputs(self.states)))
+
+    def test_invalid_descriptor(self):
+        '''A descriptor of an unknown version should raise a ValueError.
+        '''
+        descriptor = share_outputs(_example_outputs(self.states))
+
+        with SharedOutputs(descriptor):
+            self.assertRaisesRegex(
+                ValueError, 'Invalid descriptor', SharedOutputs,
+                dict(descriptor, version=None))
@@ -0,0 +1,162 @@
+from veriutils.tests.base_hdl_test import TestCase
+from veriutils import (
+    SynchronousTest, SimulationServer, SimulationClient, first_mismatch)
+
+from myhdl import intbv, Signal, ResetSignal, block, always_seq
+
+import multiprocessing
+import numpy
+import random
+
+@block
+def _identity(test_input, test_playback, test_output, reset, clock):
+
+    @always_seq(clock.posedge, reset=reset)
+    def identity():
+        test_output.next = test_input ^ test_playback
+
+    return identity
+
+@block
+def _broken_identity(test_input, test_playback, test_output, reset, clock):
+    '''Differs from the identity only on the largest input values.
+    '''
+
+    @always_seq(clock.posedge, reset=reset)
+    def identity():
+        if test_input >= 1000:
+            test_output.next = 0
+        else:
+            test_output.next = test_input ^ test_playback
+
+    return identity
+
+class TestSimulationServer(TestCase):
+    '''There should be a server that keeps a SynchronousTest elaborated and
+    cosimulates it on request from clients over a socket.
+    '''
+
+    def setUp(self):
+        self.args = {'test_input': Signal(intbv(0)[10:]),
+                     'test_playback': Signal(intbv(0)[10:]),
+                     'test_output': Signal(intbv(0)[10:]),
+                     'reset': ResetSignal(bool(0), active=1, isasync=False),
+                     'clock': Signal(bool(1))}
+
+        self.arg_types = {'test_input': 'random',
+                          'test_playback': 'playback',
+                          'test_output': 'output',
+                          'reset': 'init_reset',
+                          'clock': 'clock'}
+
+        self.playback_data = {'test_playback': list(range(1000))}
+
+    def build_test(self, dut=_broken_identity, playback_data=None):
+        if playback_data is None:
+            playback_data = self.playback_data
+
+        random.seed(0)
+        return SynchronousTest(
+            dut, _identity, self.args, self.arg_types,
+            playback_data=playback_data, reuse_elaboration=True)
+
+    def test_cosimulate(self):
+        '''Each cosimulation requested by a client should give the same
+        result as the same cosimulation of the test by the caller, and the
+        outputs of the latest should be returned on request.
+        '''
+        local_test = self.build_test()
+
+        with SimulationServer(self.build_test()).start() as server:
+            with SimulationClient(*server.address) as client:
+
+                for seed in (None, 1, 2, 3):
+                    dut_outputs, ref_outputs = local_test.cosimulate(
+                        100, seed=seed)
+                    mismatch = first_mismatch(dut_outputs, ref_outputs)
+
+                    result = client.cosimulate(
+                        100, seed=seed, signals=['test_output'])
+
+                    self.assertEqual(result['mismatch'], mismatch)
+                    self.assertEqual(result['passed'], mismatch is None)
+                    self.assertEqual(result['engine_used'], 'event')
+                    self.assertGreater(result['time'], 0)
+                    self.assertEqual(
+                        result['outputs'],
+                        {'dut': {'test_output': dut_outputs['test_output']},
+                         'ref': {'test_output': ref_outputs['test_output']}})
+
+                self.assertIsNone(client.cosimulate(10)['outputs'])
+
+                outputs = client.outputs()
+                self.assertEqual(
+                    sorted(outputs['ref']), sorted(self.arg_types))
+                self.assertEqual(
+                    len(outputs['ref']['test_input']), 10)
+
+    def test_playback(self):
+        '''A client should be able to replace the playback data, which is
+        used by the following cosimulations.
+        '''
+        data = numpy.arange(1000, dtype='uint16')[::-1] % 1024
+        local_test = self.build_test(
+            playback_data={'test_playback': data})
+
+        with SimulationServer(self.build_test()).start() as server:
+            with SimulationClient(*server.address) as client:
+                client.playback({'test_playback': data})
+
+                client.cosimulate(50)
+                outputs = client.outputs(['test_playback', 'test_output'])
+
+        dut_outputs, ref_outputs = local_test.cosimulate(50)
+
+        for name in ('test_playback', 'test_output'):
+            self.assertEqual(outputs['ref'][name], ref_outputs[name])
+            self.assertEqual(outputs['dut'][name], dut_outputs[name])
+
+    def test_errors(self):
+        '''An error raised by a request should be raised by the client, and
+        the server should carry on serving it.
+        '''
+        with SimulationServer(self.build_test()).start() as server:
+            with SimulationClient(*server.address) as client:
+
+                self.assertRaisesRegex(
+                    RuntimeError, 'No cosimulation', client.outputs)
+
+                client.cosimulate(20)
+
+                self.assertRaisesRegex(
+                    ValueError, 'Invalid signals', client.outputs,
+                    ['not_a_signal'])
+                self.assertRaisesRegex(
+                    ValueError, 'Invalid playback data', client.playback,
+                    {'test_input': [1, 2, 3]})
+
+                self.assertEqual(
+                    len(client.outputs(['test_output'])['ref']
+                        ['test_output']), 20)
+
+    def test_server_process(self):
+        '''A server in another process should be shut down by a client.
+        '''
+        server = SimulationServer(self.build_test(dut=_identity))
+
+        context = multiprocessing.get_context('fork')
+        process = context.Process(target=server.serve_forever)
+        process.start()
+        server.close()
+
+        try:
+            with SimulationClient(*server.address) as client:
+                self.assertTrue(client.cosimulate(100, seed=5)['passed'])
+                client.shutdown()
+
+            process.join(10)
+            self.assertEqual(process.exitcode, 0)
+
+        finally:
+            if process.is_alive():
+                process.terminate()
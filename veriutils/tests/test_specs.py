@@ -0,0 +1,160 @@
+from veriutils.tests.base_hdl_test import TestCase
+from veriutils import SynchronousTest, SynchronousTestSpec, ArgConstructor
+
+from myhdl import intbv, enum, Signal, ResetSignal, block, always_seq
+
+import multiprocessing
+import pickle
+import random
+
+@block
+def _identity(test_input, test_output, reset, clock):
+
+    @always_seq(clock.posedge, reset=reset)
+    def identity():
+        test_output.next = test_input
+
+    return identity
+
+@block
+def _interface_identity(interface, test_output, reset, clock):
+
+    @always_seq(clock.posedge, reset=reset)
+    def identity():
+        test_output.next = interface.a + interface.b
+
+    return identity
+
+class _Interface(object):
+
+    def __init__(self, width):
+        self.a = Signal(intbv(0)[width:])
+        self.b = Signal(intbv(0)[width:])
+
+def _cosimulate_spec(spec, cycles):
+    return spec.build().cosimulate(cycles)
+
+class TestSynchronousTestSpec(TestCase):
+    '''There should be a picklable specification of a SynchronousTest from
+    which an identical test can be built in another process.
+    '''
+
+    def setUp(self):
+        self.args = {'test_input': Signal(intbv(0)[10:]),
+                     'test_output': Signal(intbv(0)[10:]),
+                     'reset': ResetSignal(bool(0), active=1, isasync=False),
+                     'clock': Signal(bool(1))}
+
+        self.arg_types = {'test_input': 'random',
+                          'test_output': 'output',
+                          'reset': 'init_reset',
+                          'clock': 'clock'}
+
+    def test_build(self):
+        '''A test built from an unpickled spec should give the same outputs
+        as a SynchronousTest built from the same factories and args with
+        ``rng`` seeded with the seed of the spec.
+        '''
+        spec = SynchronousTestSpec(
+            _identity, _identity, self.args, self.arg_types, seed=4,
+            period=20)
+
+        self.assertEqual(
+            spec.dut_factory, 'veriutils.tests.test_specs:_identity')
+
+        test = pickle.loads(pickle.dumps(spec)).build()
+
+        expected_test = SynchronousTest(
+            _identity, _identity, self.args, self.arg_types,
+            period=20, rng=random.Random(4))
+
+        self.assertEqual(test.cosimulate(50), expected_test.cosimulate(50))
+
+    def test_build_in_spawned_process(self):
+        '''A spec should be usable in a new (not forked) process.
+        '''
+        spec = SynchronousTestSpec(
+            'veriutils.tests.test_specs:_identity',
+            'veriutils.tests.test_specs._identity',
+            self.args, self.arg_types, seed=10)
+
+        context = multiprocessing.get_context('spawn')
+        with context.Pool(1) as pool:
+            outputs = pool.apply(_cosimulate_spec, (spec, 30))
+
+        self.assertEqual(outputs, _cosimulate_spec(spec, 30))
+
+    def test_seed_drawn_on_construction(self):
+        '''If no seed is given, it should be drawn from the random module when
+        the spec is constructed.
+        '''
+        random.seed(3)
+        spec = SynchronousTestSpec(
+            None, _identity, self.args, self.arg_types)
+
+        random.seed(3)
+        other_spec = SynchronousTestSpec(
+            None, _identity, self.args, self.arg_types)
+
+        self.assertEqual(spec.seed, other_spec.seed)
+        self.assertEqual(
+            spec.build().cosimulate(20), other_spec.build().cosimulate(20))
+
+    def test_arg_constructor(self):
+        '''Interfaces should be given as an ArgConstructor, which constructs
+        a new interface for each test.
+        '''
+        args = dict(self.args)
+        del args['test_input']
+        args['interface'] = ArgConstructor(_Interface, 4)
+
+        arg_types = dict(self.arg_types)
+        del arg_types['test_input']
+        arg_types['interface'] = 'random'
+
+        spec = SynchronousTestSpec(
+            _interface_identity, _interface_identity, args, arg_types)
+
+        dut_outputs, ref_outputs = spec.build().cosimulate(20)
+        self.assertEqual(dut_outputs, ref_outputs)
+
+        args['interface'] = _Interface(4)
+        self.assertRaisesRegex(
+            ValueError, 'Invalid arg: interface is an interface',
+            SynchronousTestSpec, _interface_identity, _interface_identity,
+            args, arg_types)
+
+    def test_invalid_spec(self):
+        '''Factories that cannot be imported, enum signals, custom sources
+        and unpicklable arguments should raise a ValueError.
+        '''
+        @block
+        def local_identity(test_input, test_output, reset, clock):
+            return _identity(test_input, test_output, reset, clock)
+
+        self.assertRaisesRegex(
+            ValueError, 'Invalid ref factory', SynchronousTestSpec,
+            None, local_identity, self.args, self.arg_types)
+
+        self.assertRaisesRegex(
+            ValueError, 'Invalid dut factory', SynchronousTestSpec,
+            'veriutils.tests.test_specs:_missing', _identity, self.args,
+            self.arg_types)
+
+        args = dict(self.args)
+        args['test_input'] = Signal(enum('a', 'b').a)
+        self.assertRaisesRegex(
+            ValueError, 'Invalid arg: test_input is an enum signal',
+            SynchronousTestSpec, None, _identity, args, self.arg_types)
+
+        self.assertRaisesRegex(
+            ValueError, 'custom_sources is not supported',
+            SynchronousTestSpec, None, _identity, self.args, self.arg_types,
+            custom_sources=[])
+
+        args = dict(self.args)
+        args['constant'] = lambda: None
+        arg_types = dict(self.arg_types, constant='non-signal')
+        self.assertRaisesRegex(
+            ValueError, 'cannot be pickled', SynchronousTestSpec,
+            None, _identity, args, arg_types)
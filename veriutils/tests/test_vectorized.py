@@ -0,0 +1,76 @@
+from veriutils.tests.base_hdl_test import TestCase
+from veriutils import VectorizedRef
+from veriutils.vectorized import _stimulus_array, _output_values
+
+from myhdl import intbv, enum, Signal
+
+import unittest
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+@unittest.skipIf(numpy is None, 'NumPy is not available')
+class TestVectorizedRef(TestCase):
+    '''There should be a reference model that computes the outputs of a
+    whole simulation from arrays of the stimulus.
+    '''
+
+    def test_invalid_latency(self):
+        '''A negative latency should raise a ValueError.
+        '''
+        self.assertRaisesRegex(
+            ValueError, 'Invalid latency', VectorizedRef, lambda s: {}, -1)
+
+    def test_stimulus_array(self):
+        '''The recorded values should be turned into arrays of a suitable
+        type for the signal.
+        '''
+        values = [intbv(n)[8:] for n in range(5)]
+        array = _stimulus_array(Signal(intbv(0)[8:]), values)
+        self.assertEqual(array.dtype, numpy.int64)
+        self.assertEqual(list(array), list(range(5)))
+
+        array = _stimulus_array(Signal(bool(0)), [True, False])
+        self.assertEqual(array.dtype, bool)
+
+        values = [intbv(2**70)[80:]]
+        array = _stimulus_array(Signal(intbv(0)[80:]), values)
+        self.assertEqual(array.dtype, object)
+        self.assertEqual(array[0], 2**70)
+
+        states = enum('a', 'b')
+        array = _stimulus_array(Signal(states.a), [states.a, states.b])
+        self.assertEqual(list(array), [states.a, states.b])
+
+    def test_output_values(self):
+        '''The outputs should be delayed by the latency, starting with the
+        initial value of the signal, and converted to the type recorded from
+        the signal.
+        '''
+        signal = Signal(intbv(7)[8:])
+
+        values = _output_values(
+            'out', signal, numpy.array([1, 2, 3, 4]), 2, 5)
+
+        self.assertEqual(values, [7, 7, 1, 2, 3])
+        self.assertTrue(all(isinstance(each, intbv) for each in values))
+        self.assertEqual([len(each) for each in values], [8] * 5)
+
+        self.assertEqual(
+            _output_values('out', signal, [1], 3, 2), [7, 7])
+
+    def test_invalid_output_values(self):
+        '''Too few values or values that are out of range for the signal
+        should raise a ValueError.
+        '''
+        signal = Signal(intbv(0)[8:])
+
+        self.assertRaisesRegex(
+            ValueError, 'Invalid vectorized ref outputs', _output_values,
+            'out', signal, [1, 2], 1, 5)
+
+        self.assertRaisesRegex(
+            ValueError, 'Invalid vectorized ref outputs', _output_values,
+            'out', signal, [256], 0, 1)
@@ -0,0 +1,108 @@
+from myhdl import intbv
+
+try:
+    import numpy
+except ImportError: # pragma: no cover
+    numpy = None
+
+__all__ = ['VectorizedRef']
+
+class VectorizedRef(object):
+    '''A reference model that computes the outputs of a whole simulation in
+    one call, rather than being simulated one cycle at a time. It can be
+    passed to :class:`veriutils.SynchronousTest` in place of the ref
+    factory, in which case only the dut is simulated.
+
+    ``function`` is called with a dict of NumPy arrays, one for every
+    signal that is not an `'output'` or the `'clock'` (that is, the
+    `'random'`, `'playback'`, `'custom'` and reset signals), keyed by the
+    full name of the signal (as in the outputs of
+    :meth:`veriutils.SynchronousTest.cosimulate`). Each array holds the value
+    of its signal on every clock cycle. Integer signals give integer arrays
+    (or object arrays of python integers if they are wider than 63 bits),
+    boolean signals give boolean arrays and anything else (such as enums)
+    gives object arrays.
+
+    ``function`` should return a dict of sequences, one for each `'output'`
+    signal, again keyed by the full name. Value ``n`` of each sequence is the
+    output on cycle ``n + latency``, so ``latency`` is the number of cycles
+    between the inputs and the outputs that depend on them (``0`` for a
+    combinatorial model and ``1`` for a model with registered outputs). The
+    outputs on the first ``latency`` cycles are the initial values of the
+    output signals. Any values beyond the end of the simulation are ignored.
+    '''
+
+    def __init__(self, function, latency=0):
+
+        if numpy is None: # pragma: no cover
+            raise ImportError('NumPy is required for a vectorized ref.')
+
+        if latency < 0:
+            raise ValueError('Invalid latency: The latency should not be '
+                             'negative.')
+
+        self.function = function
+        self.latency = latency
+
+    def __repr__(self):
+        return 'VectorizedRef(%r, latency=%r)' % (self.function, self.latency)
+
+def _stimulus_array(signal, values):
+    '''Return the recorded ``values`` of ``signal`` as a NumPy array.
+    '''
+    init = signal._init
+
+    if isinstance(init, bool):
+        return numpy.array(values, dtype=bool)
+
+    elif isinstance(init, intbv):
+        ints = [int(each) for each in values]
+
+        if len(signal) > 0 and len(signal) <= 63:
+            return numpy.array(ints, dtype=numpy.int64)
+
+        array = numpy.empty(len(ints), dtype=object)
+        array[:] = ints
+        return array
+
+    else:
+        array = numpy.empty(len(values), dtype=object)
+        array[:] = values
+        return array
+
+def _output_values(name, signal, values, latency, n_cycles):
+    '''Return the list of the values of the output ``signal`` called
+    ``name`` on each of the ``n_cycles`` cycles, from the ``values``
+    returned by a :class:`VectorizedRef` with ``latency``. The values are
+    of the same type as those recorded from the signal in a simulation.
+    '''
+    init = signal._init
+    n_values = max(n_cycles - latency, 0)
+
+    if len(values) < n_values:
+        raise ValueError(
+            'Invalid vectorized ref outputs: There should be at least {} '
+            'values for {}.'.format(n_values, name))
+
+    if isinstance(init, bool):
+        convert = bool
+
+    elif isinstance(init, intbv):
+        min_val = init.min
+        max_val = init.max
+
+        def convert(value):
+            try:
+                return intbv(int(value), min=min_val, max=max_val)
+            except ValueError:
+                raise ValueError(
+                    'Invalid vectorized ref outputs: {} is out of range '
+                    'for {}.'.format(value, name))
+
+    else:
+        convert = lambda value: value
+
+    initial_values = [
+        convert(init) for n in range(min(latency, n_cycles))]
+
+    return initial_values + [convert(each) for each in values[:n_values]]